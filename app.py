@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response, has_request_context, stream_with_context
 import pymysql
 import logging
 import os
@@ -11,62 +11,289 @@ import re # <--- 新增导入
 import copy # <--- 新增导入 copy 用于深拷贝操作
 # from flask_cors import CORS # <--- 注释掉
 import threading
-from langgraph.checkpoint.sqlite import SqliteSaver
+import time
+import asyncio
+import functools
+import hmac
+from langgraph_crud_app.config.logging_config import setup_logging
+from langgraph_crud_app.observability.metrics import registry as metrics_registry
+from langgraph_crud_app.observability import tracing
+from langgraph_crud_app.config import settings
+# langgraph / langchain 相关模块 (checkpointer、会话管理、LLM 用量统计、图) 只在 /chat 和
+# /admin/sessions 首次用到时才导入，只访问数据库接口的进程启动时不加载它们
+
+# 统一日志配置 (级别 / 截断 / 采样 / 后台队列输出)，需在首次访问 app.logger 之前调用
+setup_logging()
 
 app = Flask(__name__)
 # CORS(app)  # 注释掉CORS
-logging.basicConfig(level=logging.DEBUG)
 
 # 全局checkpointer变量和锁
 _checkpointer = None
 _checkpointer_lock = threading.Lock()
+_checkpoint_compactor = None
+_session_manager = None
 
 def get_langgraph_checkpointer():
     """
     获取LangGraph checkpointer单例
-    使用持久化的SQLite文件而不是内存数据库
-    修复：直接使用SqliteSaver构造函数并设置check_same_thread=False来避免SQLite线程安全问题
+    后端由 settings.CHECKPOINT_BACKEND 决定，默认是连接池 + WAL 的 SQLite (PooledSqliteSaver)，
+    各会话可以并行读取，写入在进程内串行化；多节点部署可切换到 postgres。
+    CHECKPOINT_WRITE_BEHIND 开启时外面再包一层 WriteBehindSaver，每回合只落盘一次 (见 /chat 的 flush)。
     """
-    global _checkpointer, _checkpointer_lock
+    global _checkpointer, _checkpointer_lock, _checkpoint_compactor, _session_manager
     
     with _checkpointer_lock:
         if _checkpointer is None:
-            # 使用持久化的SQLite文件存储会话状态
-            # 这样多次请求之间的状态可以保持
-            # 重要修复：使用check_same_thread=False避免Flask多线程问题
-            import sqlite3
-            db_path = "langgraph_sessions.db"
-            conn = sqlite3.connect(db_path, check_same_thread=False)
-            _checkpointer = SqliteSaver(conn=conn)
-            app.logger.info(f"Created persistent checkpointer with database: {db_path}")
+            from langgraph.checkpoint.sqlite import SqliteSaver
+            from langgraph_crud_app.persistence.checkpoint_retention import CheckpointCompactor
+            from langgraph_crud_app.persistence.checkpointer import create_checkpointer
+            from langgraph_crud_app.persistence.session_lifecycle import SessionArchive, SessionManager
+            from langgraph_crud_app.persistence.write_behind import WriteBehindSaver
+            # 使用持久化存储保存会话状态，这样多次请求之间的状态可以保持
+            store = create_checkpointer()
+            app.logger.info("Created persistent checkpointer: backend=%s, url=%s",
+                            settings.CHECKPOINT_BACKEND, settings.CHECKPOINT_DB_URL)
+            _checkpointer = WriteBehindSaver(store) if settings.CHECKPOINT_WRITE_BEHIND else store
+            # 会话生命周期: 空闲超过 TTL 的会话归档后删除，并清理按会话缓存的内存数据
+            archive = SessionArchive(settings.SESSION_ARCHIVE_PATH) if settings.SESSION_ARCHIVE_PATH else None
+            _session_manager = SessionManager(_checkpointer, archive)
+            # SQLite 后端: 后台按保留策略清理旧 checkpoint、过期空闲会话、截断 WAL 并定期 VACUUM
+            if isinstance(store, SqliteSaver):
+                _checkpoint_compactor = CheckpointCompactor(store, settings.CHECKPOINT_DB_URL,
+                                                            sessions=_session_manager)
+                _checkpoint_compactor.start()
         
         return _checkpointer
 
+_async_checkpointer = None
+_async_checkpointer_lock = None
+
+async def get_async_checkpointer():
+    """
+    获取 graph.astream 使用的 checkpointer (ASGI 入口，见 asgi.py)。
+    SQLite / postgres 后端另建一个异步存储 (aiosqlite / psycopg 异步连接池)，
+    开启 write-behind 时挂到同一个 WriteBehindSaver 上，同步和异步入口共用一份缓冲。
+    没有异步后端的 (memory) 直接使用同步 checkpointer，InMemorySaver 本身支持异步接口。
+    """
+    from langgraph_crud_app.persistence.checkpointer import create_async_checkpointer
+    from langgraph_crud_app.persistence.write_behind import WriteBehindSaver
+
+    global _async_checkpointer, _async_checkpointer_lock
+    if _async_checkpointer_lock is None:
+        _async_checkpointer_lock = asyncio.Lock()
+    async with _async_checkpointer_lock:
+        if _async_checkpointer is None:
+            # 同步 checkpointer 的创建会打开 SQLite 文件 / 连接池，放到线程里，不阻塞事件循环
+            saver = await asyncio.to_thread(get_langgraph_checkpointer)
+            store = await create_async_checkpointer()
+            if store is None:
+                _async_checkpointer = saver
+            elif isinstance(saver, WriteBehindSaver):
+                saver.ainner = store
+                _async_checkpointer = saver
+            else:
+                _async_checkpointer = store
+            app.logger.info("Created async checkpointer: %s", type(store or saver).__name__)
+        return _async_checkpointer
+
+def get_session_manager():
+    """获取会话生命周期管理器单例 (与 checkpointer 一起创建)。"""
+    get_langgraph_checkpointer()
+    return _session_manager
+
+# --- 指标定义 (由 /metrics 以 Prometheus 文本格式导出) ---
+HTTP_REQUEST_LATENCY = metrics_registry.histogram(
+    "crud_http_request_duration_seconds", "HTTP 请求处理耗时", ["route", "method", "status"])
+HTTP_IN_FLIGHT = metrics_registry.gauge(
+    "crud_http_requests_in_flight", "正在处理中的 HTTP 请求数", ["route"])
+DB_QUERY_LATENCY = metrics_registry.histogram(
+    "crud_db_query_duration_seconds", "单条 SQL 执行耗时", ["route", "statement"])
+DB_ROWS_RETURNED = metrics_registry.counter(
+    "crud_db_rows_returned_total", "查询语句返回的行数", ["route"])
+DB_ROWS_AFFECTED = metrics_registry.counter(
+    "crud_db_rows_affected_total", "写语句影响的行数", ["route"])
+DB_CONNECT_LATENCY = metrics_registry.histogram(
+    "crud_db_connect_duration_seconds", "获取数据库连接耗时", [])
+DB_ERRORS = metrics_registry.counter(
+    "crud_db_errors_total", "数据库错误次数 (按 MySQL errno)", ["route", "errno"])
+
+# statement 标签只保留常见语句类型，避免标签基数膨胀
+_KNOWN_STATEMENTS = {"SELECT", "INSERT", "UPDATE", "DELETE", "DESCRIBE", "SHOW"}
+
+
+def _current_route():
+    """当前请求匹配到的路由规则，用作指标标签；请求上下文之外返回 'none'。"""
+    if not has_request_context():
+        return "none"
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+def _mysql_errno(error):
+    """从 pymysql 异常中取出 MySQL 错误码，取不到时返回 'unknown'。"""
+    if error.args and isinstance(error.args[0], int):
+        return str(error.args[0])
+    return "unknown"
+
+
+class InstrumentedDictCursor(pymysql.cursors.DictCursor):
+    """在 DictCursor 基础上记录每条 SQL 的耗时、返回 / 影响行数和错误码。"""
+
+    def execute(self, query, args=None):
+        route = _current_route()
+        statement = query.lstrip().split(None, 1)[0].upper() if query and query.strip() else ""
+        if statement not in _KNOWN_STATEMENTS:
+            statement = "OTHER"
+        trace_id = g.get("trace_id") if has_request_context() else None
+        if trace_id and query:
+            # 把 trace id 以注释形式带进 SQL，方便在 processlist / 慢查询日志里对应到具体回合
+            query = f"/* trace_id={trace_id} */ {query}"
+        start = time.perf_counter()
+        try:
+            result = super().execute(query, args)
+        except pymysql.err.MySQLError as e:
+            DB_ERRORS.inc(route=route, errno=_mysql_errno(e))
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            DB_QUERY_LATENCY.observe(elapsed, route=route, statement=statement)
+            if has_request_context():
+                g.db_time = g.get("db_time", 0.0) + elapsed
+        rowcount = max(self.rowcount or 0, 0)
+        if self.description is not None:
+            DB_ROWS_RETURNED.inc(rowcount, route=route)
+        else:
+            DB_ROWS_AFFECTED.inc(rowcount, route=route)
+        return result
+
+
 # 数据库连接上下文管理器
 @contextmanager
 def get_db_connection():
-    connection = pymysql.connect(
-        host=os.environ.get('DB_HOST', '127.0.0.1'),
-        port=int(os.environ.get('DB_PORT', 33306)),
-        user=os.environ.get('DB_USER', 'root'),
-        password=os.environ.get('DB_PASSWORD', 'q75946123'),
-        database=os.environ.get('DB_NAME', 'ai_support_platform_db'),
-        charset='utf8mb4',
-        cursorclass=pymysql.cursors.DictCursor
-    )
+    connect_start = time.perf_counter()
+    try:
+        connection = pymysql.connect(
+            host=os.environ.get('DB_HOST', '127.0.0.1'),
+            port=int(os.environ.get('DB_PORT', 33306)),
+            user=os.environ.get('DB_USER', 'root'),
+            password=os.environ.get('DB_PASSWORD', 'q75946123'),
+            database=os.environ.get('DB_NAME', 'ai_support_platform_db'),
+            charset='utf8mb4',
+            cursorclass=InstrumentedDictCursor
+        )
+    except pymysql.err.MySQLError as e:
+        DB_ERRORS.inc(route=_current_route(), errno=_mysql_errno(e))
+        raise
+    finally:
+        DB_CONNECT_LATENCY.observe(time.perf_counter() - connect_start)
     try:
         yield connection
     finally:
         connection.close()
 
+
+@app.before_request
+def _metrics_before_request():
+    g.metrics_start = time.perf_counter()
+    g.metrics_route = _current_route()
+    # 沿用调用方 (api_client) 传来的 trace id，没有则新生成一个
+    g.trace_id = tracing.sanitize_trace_id(request.headers.get(tracing.TRACE_HEADER)) or tracing.new_trace_id()
+    HTTP_IN_FLIGHT.inc(route=g.metrics_route)
+
+
+@app.after_request
+def _metrics_after_request(response):
+    g.metrics_status = response.status_code
+    # 回显 trace id，并通过 Server-Timing 把数据库 / 端点耗时告诉调用方
+    response.headers[tracing.TRACE_HEADER] = g.get("trace_id", "")
+    db_ms = g.get("db_time", 0.0) * 1000
+    app_ms = (time.perf_counter() - g.get("metrics_start", time.perf_counter())) * 1000
+    response.headers["Server-Timing"] = f"db;dur={db_ms:.2f}, app;dur={app_ms:.2f}"
+    return response
+
+
+@app.teardown_request
+def _metrics_teardown_request(exc):
+    # teardown 无论是否抛异常都会执行，保证 in-flight 计数能减回去
+    start = g.pop("metrics_start", None)
+    if start is None:
+        return
+    route = g.pop("metrics_route", "unmatched")
+    status = g.pop("metrics_status", 500)
+    HTTP_IN_FLIGHT.dec(route=route)
+    HTTP_REQUEST_LATENCY.observe(time.perf_counter() - start, route=route, method=request.method, status=status)
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """以 Prometheus text exposition 格式导出进程内指标。"""
+    return Response(metrics_registry.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+def _admin_only(view):
+    """
+    会话管理接口的开关和鉴权: settings.ADMIN_API_ENABLED 关闭时 (默认) 返回 404；
+    设置了 ADMIN_API_TOKEN 时要求请求头 X-Admin-Token 或 Authorization: Bearer <token>，不匹配返回 401。
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not settings.ADMIN_API_ENABLED:
+            return jsonify({"error": "Not Found"}), 404
+        if settings.ADMIN_API_TOKEN:
+            auth = request.headers.get("Authorization", "")
+            token = request.headers.get("X-Admin-Token") or (auth[7:] if auth.startswith("Bearer ") else "")
+            if not hmac.compare_digest(token.encode("utf-8"), settings.ADMIN_API_TOKEN.encode("utf-8")):
+                return jsonify({"error": "Unauthorized"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.route('/admin/sessions', methods=['GET'])
+@_admin_only
+def admin_list_sessions():
+    """
+    列出存活会话及其占用 (checkpoint 数 / 字节数 / LLM 调用数)，按最近活跃时间倒序。
+    ?limit=N 限制条数 (默认 SESSION_LIST_LIMIT)；?staged=1 时附带每个会话暂存的待确认操作。
+    """
+    limit = request.args.get('limit', type=int)
+    include_staged = request.args.get('staged', '').lower() in ('1', 'true')
+    sessions = get_session_manager().list_sessions(limit=limit, include_staged=include_staged)
+    return jsonify({"count": len(sessions), "ttl_seconds": get_session_manager().ttl_seconds,
+                    "sessions": sessions})
+
+@app.route('/admin/sessions/<session_id>', methods=['DELETE'])
+@_admin_only
+def admin_expire_session(session_id):
+    """立即过期一个会话 (先归档最终状态)。"""
+    if not get_session_manager().expire(session_id):
+        return jsonify({"error": f"会话不存在: {session_id}"}), 404
+    return jsonify({"message": f"会话 {session_id} 已过期", "session_id": session_id})
+
+@app.route('/admin/sessions/expire', methods=['POST'])
+@_admin_only
+def admin_expire_idle_sessions():
+    """立即执行一次空闲会话过期 (非 SQLite 后端没有后台任务时使用)。"""
+    expired = get_session_manager().expire_idle()
+    return jsonify({"expired": expired})
+
+@app.route('/admin/llm_cache', methods=['GET'])
+def admin_llm_cache():
+    """LLM 响应缓存的命中率、节省的调用时间和存储占用。"""
+    from langgraph_crud_app.services.llm import llm_cache
+    return jsonify(llm_cache.stats())
+
+@app.route('/admin/sql_cache', methods=['GET'])
+def admin_sql_cache():
+    """NL→SQL 模板缓存的条目数、存储占用和累计命中次数。"""
+    from langgraph_crud_app.services.llm import sql_cache
+    return jsonify(sql_cache.stats())
+
 @app.route('/execute_query', methods=['POST'])
 def execute_query():
     data = request.get_json()
     sql_query = data.get('sql_query')
-    app.logger.debug(f"Received SQL query length: {len(sql_query) if sql_query else 0}")
+    app.logger.debug("Received SQL query length: %s", len(sql_query) if sql_query else 0)
     if len(sql_query) > 200:
-        app.logger.debug(f"Query start: {sql_query[:100]}...")
-        app.logger.debug(f"Query end: ...{sql_query[-100:]}")
+        app.logger.debug("Query start: %s...", sql_query[:100])
+        app.logger.debug("Query end: ...%s", sql_query[-100:])
 
     if not sql_query:
         return jsonify({"error": "No SQL query provided"}), 400
@@ -91,7 +318,7 @@ def execute_query():
     if has_trailing_semicolon:
         sql_query = sql_query + ';'
     
-    app.logger.debug(f"Processed SQL query length: {len(sql_query)}")
+    app.logger.debug("Processed SQL query length: %s", len(sql_query))
 
     with get_db_connection() as connection:
         try:
@@ -99,7 +326,7 @@ def execute_query():
             app.logger.debug("Executing SQL query...")
             cursor.execute(sql_query)
             result = cursor.fetchall()
-            app.logger.debug(f"Query returned {len(result)} rows")
+            app.logger.debug("Query returned %s rows", len(result))
             
             # 修复: 如果结果为空列表，直接返回空列表
             if not result:
@@ -109,17 +336,17 @@ def execute_query():
             return jsonify(result)
 
         except Exception as e:
-            app.logger.error(f"Error executing query: {e}")
+            app.logger.error("Error executing query: %s", e)
             # 添加更详细的错误信息，特别是对于MySQL 1064错误
             if "1064" in str(e):
                 # 特别处理此类常见错误
-                app.logger.error(f"MySQL syntax error detected: {e}")
+                app.logger.error("MySQL syntax error detected: %s", e)
                 # 尝试诊断错误更精确位置
                 error_match = re.search(r"near '(.*?)' at line (\d+)", str(e))
                 if error_match:
                     near_text = error_match.group(1)
                     line_num = error_match.group(2)
-                    app.logger.error(f"Syntax error near '{near_text}' at line {line_num}")
+                    app.logger.error("Syntax error near '%s' at line %s", near_text, line_num)
                     return jsonify({"error": (1064, f"SQL syntax error near '{near_text}' at line {line_num}")}), 500
             
             return jsonify({"error": e.args}), 500
@@ -157,7 +384,7 @@ def update_record():
                     primary_key = update.get('primary_key')
                     primary_value = update.get('primary_value')
                     update_fields = update.get('update_fields', {})
-                    app.logger.debug(f"Processing update: table={table_name}, {primary_key}={primary_value}, fields={update_fields}")
+                    app.logger.debug("Processing update: table=%s, %s=%s, fields=%s", table_name, primary_key, primary_value, update_fields)
 
                     # 校验表名、主键和主键值
                     if not all([table_name, primary_key, primary_value]):
@@ -301,7 +528,7 @@ def update_record():
                     set_clause = ", ".join(set_clause_parts)
                     params.append(primary_value)
                     sql_query = f"UPDATE {table_name} SET {set_clause} WHERE {primary_key} = %s"
-                    app.logger.debug(f"Executing SQL: {sql_query} with params: {params}")
+                    app.logger.debug("Executing SQL: %s with params: %s", sql_query, params)
                     cursor.execute(sql_query, params)
                     affected_rows = cursor.rowcount
 
@@ -321,26 +548,26 @@ def update_record():
                         })
 
                 connection.commit()
-                app.logger.debug(f"Batch update completed: {results}")
+                app.logger.debug("Batch update completed: %s", results)
                 return jsonify(results)
         except Exception as e:
             connection.rollback()
-            app.logger.error(f"Error updating records: {str(e)}")
+            app.logger.error("Error updating records: %s", e)
             return jsonify({"error": str(e)}), 500
 
 
 @app.route('/insert_record', methods=['POST'])
 def insert_record():
     raw_data = request.get_data(as_text=True)
-    app.logger.debug(f"Raw request data: {raw_data}")
+    app.logger.debug("Raw request data: %s", raw_data)
     
     try:
         data = json.loads(raw_data) if raw_data else request.get_json()
     except json.JSONDecodeError as e:
-        app.logger.error(f"JSON decode error: {str(e)}")
+        app.logger.error("JSON decode error: %s", e)
         return jsonify({"error": f"Invalid JSON format: {str(e)}"}), 400
     
-    app.logger.debug(f"Parsed JSON data: {data}")
+    app.logger.debug("Parsed JSON data: %s", data)
 
     # 确保输入是列表格式
     if isinstance(data, dict):
@@ -388,7 +615,7 @@ def insert_record():
                                    "default": row["Default"],
                                    "extra": row.get("Extra", "") # 获取 Extra 信息 (包含 auto_increment)
                               } for row in cursor.fetchall()}
-                              app.logger.debug(f"Cached schema for table: {table_name}")
+                              app.logger.debug("Cached schema for table: %s", table_name)
                          except Exception as e:
                               raise ValueError(f"Failed to get schema for table '{table_name}': {e}")
 
@@ -410,8 +637,8 @@ def insert_record():
                     else:
                         independent_records.append(record)
                 
-                app.logger.debug(f"Independent records: {len(independent_records)}")
-                app.logger.debug(f"Dependent records: {len(dependent_records)}")
+                app.logger.debug("Independent records: %s", len(independent_records))
+                app.logger.debug("Dependent records: %s", len(dependent_records))
 
                 # --- 辅助函数：执行单条插入并记录主键 ---
                 def execute_single_insert(record_data, current_generated_keys):
@@ -435,7 +662,7 @@ def insert_record():
                     resolved_fields = {}
                     for field, value in fields.items():
                          if field not in schema:
-                              app.logger.warning(f"Field '{field}' not found in schema for table '{table_name}', skipping.")
+                              app.logger.warning("Field '%s' not found in schema for table '%s', skipping.", field, table_name)
                               continue
                          
                          resolved_value = value
@@ -446,7 +673,7 @@ def insert_record():
                                    if dependency_key in current_generated_keys:
                                         actual_id = current_generated_keys[dependency_key]
                                         resolved_value = actual_id # 替换占位符
-                                        app.logger.debug(f"Resolved placeholder '{value}' to '{actual_id}' for field '{field}'")
+                                        app.logger.debug("Resolved placeholder '%s' to '%s' for field '%s'", value, actual_id, field)
                                    else:
                                         # 如果在这里找不到，说明依赖的记录处理出错或顺序错误
                                         raise ValueError(f"Unresolved dependency: Placeholder '{value}' found, but key '{dependency_key}' not found in generated keys. Ensure records are ordered correctly or dependency exists.")
@@ -460,7 +687,7 @@ def insert_record():
                     
                     # 如果是自增主键且用户未提供，则不加入插入列
                     if is_auto_increment and primary_key not in resolved_fields:
-                        app.logger.debug(f"Skipping auto-increment primary key '{primary_key}' in insert statement.")
+                        app.logger.debug("Skipping auto-increment primary key '%s' in insert statement.", primary_key)
                         fields_to_insert = {k: v for k, v in resolved_fields.items() if k != primary_key}
                     else:
                         fields_to_insert = resolved_fields
@@ -514,7 +741,7 @@ def insert_record():
                               param_idx += 1
 
                     sql_query = f"INSERT INTO `{table_name}` ({', '.join(columns)}) VALUES ({', '.join(value_placeholders)})"
-                    app.logger.debug(f"Executing SQL: {sql_query} with values: {final_params}")
+                    app.logger.debug("Executing SQL: %s with values: %s", sql_query, final_params)
                     cursor.execute(sql_query, final_params)
 
                     # --- 获取并记录新插入的主键值 ---
@@ -525,27 +752,27 @@ def insert_record():
                               result = cursor.fetchone()
                               if result and result['LAST_INSERT_ID()'] is not None and int(result['LAST_INSERT_ID()']) > 0:
                                    inserted_id = result['LAST_INSERT_ID()']
-                                   app.logger.debug(f"Retrieved LAST_INSERT_ID(): {inserted_id}")
+                                   app.logger.debug("Retrieved LAST_INSERT_ID(): %s", inserted_id)
                               else:
                                    app.logger.warning("LAST_INSERT_ID() returned 0 or None, check PK definition.")
                          except Exception as e:
-                              app.logger.warning(f"Failed to execute SELECT LAST_INSERT_ID(): {e}")
+                              app.logger.warning("Failed to execute SELECT LAST_INSERT_ID(): %s", e)
                     else:
                          # 对于非自增主键，从解析后的字段中获取值
                          inserted_id = resolved_fields.get(primary_key)
                          if inserted_id is not None:
-                              app.logger.debug(f"Using provided non-auto-increment PK value: {inserted_id}")
+                              app.logger.debug("Using provided non-auto-increment PK value: %s", inserted_id)
                          else:
-                              app.logger.warning(f"Could not get PK value from fields for non-auto-increment PK: {primary_key}")
+                              app.logger.warning("Could not get PK value from fields for non-auto-increment PK: %s", primary_key)
 
                     # 存储生成的键值，供后续记录引用
                     if inserted_id is not None:
                          key_for_lookup = f"{table_name}.{primary_key}"
                          current_generated_keys[key_for_lookup] = inserted_id
-                         app.logger.debug(f"Stored generated key: {key_for_lookup} = {inserted_id}")
+                         app.logger.debug("Stored generated key: %s = %s", key_for_lookup, inserted_id)
                          return {"message": f"Record inserted into {table_name}: {primary_key}={inserted_id}", "generated_id": inserted_id}
                     else:
-                         app.logger.warning(f"Could not determine inserted ID for {table_name}.{primary_key}")
+                         app.logger.warning("Could not determine inserted ID for %s.%s", table_name, primary_key)
                          return {"message": f"Record inserted into {table_name}, but failed to retrieve ID."}
 
                 # --- 1. 插入独立记录 ---
@@ -568,7 +795,7 @@ def insert_record():
 
                 while remaining_dependent and current_pass < max_passes:
                     current_pass += 1
-                    app.logger.debug(f"--- Processing dependent records pass {current_pass}, remaining: {len(remaining_dependent)} ---")
+                    app.logger.debug("--- Processing dependent records pass %s, remaining: %s ---", current_pass, len(remaining_dependent))
                     inserted_in_pass = 0
                     next_remaining = []
 
@@ -581,7 +808,7 @@ def insert_record():
                          except ValueError as ve:
                               # 如果是未解决的依赖错误，则保留到下一轮
                               if "Unresolved dependency" in str(ve):
-                                   app.logger.debug(f"Deferring record due to unresolved dependency: {record}")
+                                   app.logger.debug("Deferring record due to unresolved dependency: %s", record)
                                    next_remaining.append(record)
                               else:
                                    # 如果是其他错误（如日期格式），则直接抛出
@@ -600,7 +827,7 @@ def insert_record():
 
                 # --- 提交事务 ---
                 connection.commit()
-                app.logger.debug(f"Transaction committed. Final generated keys: {generated_keys}")
+                app.logger.debug("Transaction committed. Final generated keys: %s", generated_keys)
                 # 返回成功信息
                 # 注意：这里的 inserted_records 可能不准确，因为它基于原始输入
                 # 返回 generated_keys 可能更有用
@@ -612,11 +839,11 @@ def insert_record():
 
         except ValueError as ve: # 捕获处理过程中的 ValueError
              connection.rollback()
-             app.logger.error(f"Data validation or processing error: {str(ve)}")
+             app.logger.error("Data validation or processing error: %s", ve)
              return jsonify({"error": f"Data Error: {str(ve)}"}), 400 # 返回 400 Bad Request
         except Exception as e:
             connection.rollback()
-            app.logger.error(f"Error inserting records: {str(e)}")
+            app.logger.error("Error inserting records: %s", e)
             
             # 如果是外键约束错误，提供更详细的信息
             if isinstance(e, pymysql.err.IntegrityError):
@@ -647,7 +874,7 @@ def insert_record():
                                     fk_value = record["fields"][fk_column]
                                     break
                         except Exception as extract_err:
-                            app.logger.warning(f"无法从插入数据中提取外键值: {extract_err}")
+                            app.logger.warning("无法从插入数据中提取外键值: %s", extract_err)
                         
                         # 构造包含具体值的用户友好错误信息
                         if fk_value != "未知":
@@ -699,13 +926,13 @@ def get_schema():
                         },
                         "foreign_keys": {}
                     }
-                app.logger.debug(f"Schema retrieved for {db_name}: {len(schema)} tables")
+                app.logger.debug("Schema retrieved for %s: %s tables", db_name, len(schema))
                 return jsonify({"result": [json.dumps(schema, ensure_ascii=False)]})
     except pymysql.err.OperationalError as e:
-        app.logger.error(f"Database connection error in /get_schema: {str(e)}")
+        app.logger.error("Database connection error in /get_schema: %s", e)
         return jsonify({"error": f"Database connection failed: {str(e)}"}), 500
     except Exception as e:
-        app.logger.error(f"Error fetching schema: {str(e)}")
+        app.logger.error("Error fetching schema: %s", e)
         return jsonify({"error": f"An unexpected error occurred while fetching schema: {str(e)}"}), 500
 
 
@@ -716,7 +943,7 @@ def delete_record():
     table_name = data.get('table_name')
     primary_key = data.get('primary_key')
     primary_value = data.get('primary_value')
-    app.logger.debug(f"Received delete request: table={table_name}, {primary_key}={primary_value}")
+    app.logger.debug("Received delete request: table=%s, %s=%s", table_name, primary_key, primary_value)
 
     # 参数校验保持不变
     if not all([table_name, primary_key, primary_value]):
@@ -739,16 +966,16 @@ def delete_record():
                 
                 # 返回结果，修改状态码为200，但内容区分是否实际删除了记录
                 if affected_rows > 0:
-                    app.logger.debug(f"Deleted record in {table_name}: {primary_key}={primary_value}")
+                    app.logger.debug("Deleted record in %s: %s=%s", table_name, primary_key, primary_value)
                     return jsonify({"message": f"Record with {primary_key}={primary_value} deleted successfully"})
                 else:
-                    app.logger.debug(f"No record found with {primary_key}={primary_value} in {table_name}")
+                    app.logger.debug("No record found with %s=%s in %s", primary_key, primary_value, table_name)
                     return jsonify({"message": f"No record found with {primary_key}={primary_value} in {table_name}, but operation completed successfully"}), 200
 
         except Exception as e:
             # 异常时回滚事务
             connection.rollback()
-            app.logger.error(f"Error deleting record: {str(e)}")
+            app.logger.error("Error deleting record: %s", e)
             return jsonify({"error": str(e)}), 500
 
 
@@ -792,7 +1019,7 @@ def export_to_txt():
                 
                 return jsonify({"message": f"Database exported to {output_file}"})
         except Exception as e:
-            app.logger.error(f"Error exporting database: {str(e)}")
+            app.logger.error("Error exporting database: %s", e)
             return jsonify({"error": str(e)}), 500
 
 
@@ -831,14 +1058,14 @@ def execute_batch_operations():
     支持操作间的依赖关系。所有操作在一个事务中执行。
     """
     raw_data = request.get_data(as_text=True)
-    app.logger.debug(f"Raw request data for batch operations: {raw_data}")
+    app.logger.debug("Raw request data for batch operations: %s", raw_data)
 
     try:
         operations = json.loads(raw_data) if raw_data else request.get_json()
         if not isinstance(operations, list):
             return jsonify({"error": "Request body must be a JSON list of operations"}), 400
     except json.JSONDecodeError as e:
-        app.logger.error(f"JSON decode error for batch operations: {str(e)}")
+        app.logger.error("JSON decode error for batch operations: %s", e)
         return jsonify({"error": f"Invalid JSON format: {str(e)}"}), 400
 
     if not operations:
@@ -867,14 +1094,14 @@ def execute_batch_operations():
                                 "key": row["Key"], "default": row["Default"],
                                 "extra": row.get("Extra", "")
                             } for row in cursor.fetchall()}
-                            app.logger.info(f"Pre-cached schema for table: {t_name}")
+                            app.logger.info("Pre-cached schema for table: %s", t_name)
                         except Exception as schema_e:
                             raise ValueError(f"Failed to pre-cache schema for table '{t_name}': {schema_e}")
 
                 # === 主循环处理操作 ===
                 for index, op_original in enumerate(operations):
                     op = copy.deepcopy(op_original) # 处理每个操作的拷贝，防止修改影响原始列表
-                    app.logger.info(f"Processing operation {index}: {op}")
+                    app.logger.info("Processing operation %s: %s", index, op)
                     
                     execute_this_op = True # 标记是否需要执行当前原始操作（如果被展开则设为 False）
                     expanded_op_results = [] # 存储展开操作的结果
@@ -932,7 +1159,7 @@ def execute_batch_operations():
                                 op['where'] = replace_placeholders_recursive(op.get('where'), base_dependent_result, index, depends_on_index)
                             elif op.get('operation') == 'delete':
                                 op['where'] = replace_placeholders_recursive(op.get('where'), base_dependent_result, index, depends_on_index)
-                            app.logger.debug(f"Op {index}: Operation after single dependency resolution: {op}")
+                            app.logger.debug("Op %s: Operation after single dependency resolution: %s", index, op)
                     
                     # --- 执行操作 (可能是单个，也可能是展开后的多个) ---
                     # 定义内部执行函数，以复用 SQL 构建和执行逻辑
@@ -951,7 +1178,7 @@ def execute_batch_operations():
                         # --- 函数：准备参数值（移到内部，方便访问 op_schema 和 index）---
                         def prepare_param_value(column_name, value):
                             if column_name not in op_schema:
-                                app.logger.warning(f"Op {current_index}: Column '{column_name}' not found in schema for table '{op_table}', skipping type conversion.")
+                                app.logger.warning("Op %s: Column '%s' not found in schema for table '%s', skipping type conversion.", current_index, column_name, op_table)
                                 return value
                             col_info = op_schema[column_name]; col_type = col_info["type"].lower()
                             date_types = ["datetime", "timestamp", "date"]; numeric_types = ["int", "tinyint", "bigint", "decimal", "float"]
@@ -977,7 +1204,7 @@ def execute_batch_operations():
                             if not isinstance(values_dict, dict): raise ValueError(f"Op {current_index} (insert): 'values' must be dict.")
                             cols, ph, params_insert = [], [], []
                             for c, v in values_dict.items():
-                                if c not in op_schema: app.logger.warning(f"Op {current_index}: Insert column '{c}' not in schema, skipping."); continue
+                                if c not in op_schema: app.logger.warning("Op %s: Insert column '%s' not in schema, skipping.", current_index, c); continue
                                 cols.append(f"`{c}`")
                                 if isinstance(v, str) and v.lower() == "now()": ph.append("NOW()")
                                 else: ph.append("%s"); params_insert.append(prepare_param_value(c, v))
@@ -989,7 +1216,7 @@ def execute_batch_operations():
                             if not isinstance(set_dict, dict) or not set_dict: raise ValueError(f"Op {current_index} (update): 'set' empty.")
                             s_parts, p_set = [], []
                             for c, v in set_dict.items():
-                                if c not in op_schema: app.logger.warning(f"Op {current_index}: Update SET col '{c}' not in schema, skipping."); continue
+                                if c not in op_schema: app.logger.warning("Op %s: Update SET col '%s' not in schema, skipping.", current_index, c); continue
                                 if isinstance(v, str) and v.lower() == "now()": s_parts.append(f"`{c}` = NOW()")
                                 elif isinstance(v, str) and (v.strip().upper().startswith(("CONCAT(", "SUBSTRING_INDEX(")) or re.match(r"^\w+\s*[+-]\s*\d+$", v.strip())):
                                     s_parts.append(f"`{c}` = {v}")
@@ -997,7 +1224,7 @@ def execute_batch_operations():
                             s_clause = ", ".join(s_parts)
                             w_parts, p_where = [], []
                             for c, cond in where_dict.items():
-                                if c not in op_schema: app.logger.warning(f"Op {current_index}: Update WHERE col '{c}' not in schema, skipping."); continue
+                                if c not in op_schema: app.logger.warning("Op %s: Update WHERE col '%s' not in schema, skipping.", current_index, c); continue
                                 if isinstance(cond, dict):
                                     for opk, opv in cond.items():
                                         sop = opk.upper().strip(); sop_list = [">", "<", ">=", "<=", "LIKE", "NOT LIKE", "IN", "NOT IN", "BETWEEN", "="]
@@ -1020,7 +1247,7 @@ def execute_batch_operations():
                             if not isinstance(where_dict, dict) or not where_dict: raise ValueError(f"Op {current_index} (delete): 'where' empty.")
                             w_parts, p_where = [], []
                             for c, cond in where_dict.items():
-                                if c not in op_schema: app.logger.warning(f"Op {current_index}: Delete WHERE col '{c}' not in schema, skipping."); continue
+                                if c not in op_schema: app.logger.warning("Op %s: Delete WHERE col '%s' not in schema, skipping.", current_index, c); continue
                                 if isinstance(cond, dict):
                                     for opk, opv in cond.items():
                                         sop = opk.upper().strip(); sop_list = [">", "<", ">=", "<=", "LIKE", "NOT LIKE", "IN", "NOT IN", "BETWEEN", "="]
@@ -1043,7 +1270,7 @@ def execute_batch_operations():
                         
                         # 执行 SQL
                         exec_msg_prefix = f"Op {current_index}" + (f" (Expanded {expansion_item_index+1})" if is_expanded else "")
-                        app.logger.debug(f"{exec_msg_prefix}: Executing SQL: {_sql} with params: {_params}")
+                        app.logger.debug("%s: Executing SQL: %s with params: %s", exec_msg_prefix, _sql, _params)
                         current_cursor.execute(_sql, _params)
                         _affected_rows = current_cursor.rowcount
                         if op_type == "insert": _last_insert_id = current_cursor.lastrowid
@@ -1067,7 +1294,7 @@ def execute_batch_operations():
                                         fetch_params = p_where # 使用 WHERE 的参数
                                     
                                     if fetch_sql:
-                                        app.logger.debug(f"{exec_msg_prefix}: Fetching affected: {fetch_sql} PARAMS: {fetch_params}")
+                                        app.logger.debug("%s: Fetching affected: %s PARAMS: %s", exec_msg_prefix, fetch_sql, fetch_params)
                                         current_cursor.execute(fetch_sql, fetch_params)
                                         # --- 修改: 使用 fetchall() 并处理结果 --- 
                                         fetched_results_list = current_cursor.fetchall() # 获取所有行
@@ -1075,13 +1302,13 @@ def execute_batch_operations():
                                              # 如果只影响了一行，或者只关心第一行，可以取 fetched_results_list[0]
                                              # 为了支持后续操作可能依赖多行结果，我们将整个列表存储
                                              _current_op_result = fetched_results_list if len(fetched_results_list) > 1 else fetched_results_list[0]
-                                             app.logger.info(f"{exec_msg_prefix}: Fetched affected result: {_current_op_result}")
+                                             app.logger.info("%s: Fetched affected result: %s", exec_msg_prefix, _current_op_result)
                                         else:
-                                             app.logger.warning(f"{exec_msg_prefix}: Could not fetch affected fields.")
+                                             app.logger.warning("%s: Could not fetch affected fields.", exec_msg_prefix)
                                 else:
-                                    app.logger.warning(f"{exec_msg_prefix}: No valid columns in return_affected or missing condition for fetch.")
+                                    app.logger.warning("%s: No valid columns in return_affected or missing condition for fetch.", exec_msg_prefix)
                             else:
-                                app.logger.warning(f"{exec_msg_prefix}: Could not determine PK for table {op_table} or invalid state for fetching return_affected.")
+                                app.logger.warning("%s: Could not determine PK for table %s or invalid state for fetching return_affected.", exec_msg_prefix, op_table)
                         
                         # 返回执行结果和可能获取到的数据
                         return {
@@ -1116,7 +1343,7 @@ def execute_batch_operations():
                                 op_copy['where'] = replace_placeholders_recursive(op_copy.get('where'), item_res, index, depends_on_index)
                             elif op_copy.get('operation') == 'delete':
                                 op_copy['where'] = replace_placeholders_recursive(op_copy.get('where'), item_res, index, depends_on_index)
-                            app.logger.debug(f"Op {index} (Expanded {item_idx+1}): Executing with resolved data {op_copy}")
+                            app.logger.debug("Op %s (Expanded %s): Executing with resolved data %s", index, item_idx+1, op_copy)
                             
                             # 执行展开后的单个操作
                             expanded_result = _execute_single_op(op_copy, index, cursor, schema_cache, is_expanded=True, expansion_item_index=item_idx)
@@ -1164,7 +1391,7 @@ def execute_batch_operations():
                     "original_error": error_msg_str
                 }
                 app.logger.error(
-                    f"IntegrityError (DuplicateEntry) at operation {current_op_idx} ... Original DB error: {error_msg_str}",
+                    "IntegrityError (DuplicateEntry) at operation %s ... Original DB error: %s", current_op_idx, error_msg_str,
                     exc_info=False 
                 )
                 return jsonify({
@@ -1182,6 +1409,83 @@ def execute_batch_operations():
              app.logger.error(error_msg, exc_info=True)
              return jsonify({"error": error_msg, "results": batch_results}), 500
 
+def finish_chat_trace():
+    """结束本回合的 trace: 按配置导出到文件，DEBUG 级别时在日志里输出瀑布图。"""
+    trace = tracing.end_trace()
+    if settings.TRACE_EXPORT_PATH:
+        tracing.export_trace(trace, settings.TRACE_EXPORT_PATH)
+    if app.logger.isEnabledFor(logging.DEBUG):
+        app.logger.debug("Chat turn trace:\n%s", trace.waterfall())
+    return trace
+
+def chat_response_data(final_state, session_id, trace, debug_trace):
+    """根据图的最终状态组装 /chat 的响应体 (同步 / 异步入口共用)。"""
+    if not final_state:
+        return {
+            "message": "抱歉，没有收到有效响应。", 
+            "success": False,
+            "session_id": session_id
+        }
+    final_answer = final_state.get('final_answer', '抱歉，我暂时无法处理您的请求。')
+    error_message = final_state.get('error_message')
+    
+    response_data = {
+        "message": final_answer,
+        "success": True,
+        "session_id": session_id
+    }
+    
+    if error_message:
+        response_data["error"] = error_message
+    
+    if debug_trace:
+        response_data["trace"] = {
+            "trace_id": trace.trace_id,
+            "waterfall": trace.waterfall(),
+            "spans": trace.to_dict()["spans"],
+        }
+        # 本会话累计的 LLM 调用 / token / 费用 (按流程、节点汇总)
+        from langgraph_crud_app.observability import llm_telemetry
+        response_data["llm_usage"] = llm_telemetry.session_summary(session_id)
+    return response_data
+
+# --- 流式 /chat (Server-Sent Events) ---
+# 逐 token 推送 LLM 输出的节点: 只有生成最终回答的节点，分类 / SQL 生成等中间 LLM 调用不推送
+STREAM_TOKEN_NODES = ("format_query_result", "analyze_analysis_result", "format_operation_response_action")
+# 这些节点里只是回答一部分的 LLM 调用 (按提示词名)，不推送 token: 查询结果的一句话总结后面还要拼上模板渲染的记录
+STREAM_TOKEN_SKIP_PROMPTS = ("summarize_query_result",)
+# updates: 节点执行完成 (进度)；messages: LLM token；values: 最新的完整状态 (最后一个用来组装 done 事件)
+CHAT_STREAM_MODES = ["updates", "messages", "values"]
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def sse_event(event, data):
+    """一条 SSE 消息 (data 为 JSON)。"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+def chat_stream_event(mode, chunk):
+    """
+    把 graph.stream(stream_mode=CHAT_STREAM_MODES) 的一项转成 SSE 消息，不需要推送时返回 None (同步 / 异步入口共用)。
+    事件: node {"node"} 节点执行完成；token {"node", "text"} 回答节点的 LLM 输出片段；
+    answer {"node", "text"} 回答节点完成时的完整回答 (紧跟在该节点的 node 事件之前)。
+    回答不一定经过 LLM (查询结果默认由模板渲染，没有 token)，前端应以 answer 的文本替换已拼接的 token。
+    """
+    if mode == "updates":
+        events = []
+        for name, update in (chunk or {}).items():
+            if name.startswith("__"):
+                continue
+            if name in STREAM_TOKEN_NODES and isinstance(update, dict) and update.get("final_answer"):
+                events.append(sse_event("answer", {"node": name, "text": update["final_answer"]}))
+            events.append(sse_event("node", {"node": name}))
+        return "".join(events) or None
+    if mode == "messages":
+        message, metadata = chunk
+        node = metadata.get("langgraph_node")
+        text = message.content if isinstance(message.content, str) else ""
+        if node in STREAM_TOKEN_NODES and text and metadata.get("prompt") not in STREAM_TOKEN_SKIP_PROMPTS:
+            return sse_event("token", {"node": node, "text": text})
+    return None
+
 @app.route('/chat', methods=['POST'])
 def chat_with_langgraph():
     """
@@ -1196,8 +1500,8 @@ def chat_with_langgraph():
         if not user_query:
             return jsonify({"error": "No message provided"}), 400
             
-        app.logger.debug(f"Received chat message: {user_query}")
-        app.logger.debug(f"Session ID: {session_id}")
+        app.logger.debug("Received chat message: %s", user_query)
+        app.logger.debug("Session ID: %s", session_id)
         
         # 导入 LangGraph 相关模块
         import sys
@@ -1209,12 +1513,14 @@ def chat_with_langgraph():
             sys.path.insert(0, project_root)
             
         from langgraph_crud_app.graph.graph_builder import build_graph
+        from langgraph_crud_app.persistence.write_behind import WriteBehindSaver
         
         # 构建和编译 LangGraph
         graph_builder = build_graph()
         
         # 使用持久化的checkpointer
         checkpointer = get_langgraph_checkpointer()
+        get_session_manager().touch(session_id)
         
         # 直接编译图，不需要上下文管理器
         runnable = graph_builder.compile(checkpointer=checkpointer)
@@ -1225,43 +1531,85 @@ def chat_with_langgraph():
         # 处理用户查询
         inputs = {"user_query": user_query}
         
-        # 执行 LangGraph 流程
-        events = runnable.stream(inputs, config=config, stream_mode="values")
-        
-        final_state = None
-        for event in events:
-            final_state = event
-            
-        # 提取结果
-        if final_state:
-            final_answer = final_state.get('final_answer', '抱歉，我暂时无法处理您的请求。')
-            error_message = final_state.get('error_message')
+        # 本轮的 trace：图节点和 api_client 的 HTTP 调用都会记到这里
+        debug_trace = bool(data.get('debug')) or settings.TRACE_DEBUG
+        tracing.start_trace(g.get("trace_id"), session_id=session_id)
+        try:
+            # 执行 LangGraph 流程
+            events = runnable.stream(inputs, config=config, stream_mode="values")
             
-            response_data = {
-                "message": final_answer,
-                "success": True,
-                "session_id": session_id
-            }
+            final_state = None
+            for event in events:
+                final_state = event
+        finally:
+            # 回合边界: 把本回合缓存的最终 checkpoint 写入存储
+            if isinstance(checkpointer, WriteBehindSaver):
+                checkpointer.flush(config)
+            trace = finish_chat_trace()
             
-            if error_message:
-                response_data["error"] = error_message
-                
-            return jsonify(response_data)
-        else:
-            return jsonify({
-                "message": "抱歉，没有收到有效响应。", 
-                "success": False,
-                "session_id": session_id
-            })
+        return jsonify(chat_response_data(final_state, session_id, trace, debug_trace))
                 
     except Exception as e:
-        app.logger.error(f"Chat endpoint error: {e}")
+        app.logger.error("Chat endpoint error: %s", e)
         return jsonify({
             "error": f"服务器处理错误: {str(e)}",
             "message": "抱歉，服务暂时不可用，请稍后再试。",
             "success": False
         }), 500
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream_with_langgraph():
+    """
+    /chat 的流式版本 (text/event-stream)，请求格式与 /chat 相同。
+    先推送 start，图执行过程中推送 node (节点完成)、token (回答节点的 LLM 输出) 和 answer (回答节点产出的完整回答)，
+    最后推送 done (内容与 /chat 的响应体相同)；出错时推送 error。
+    """
+    data = request.get_json(silent=True) or {}
+    user_query = data.get('message', '')
+    session_id = data.get('session_id', 'default_session')
+    if not user_query:
+        return jsonify({"error": "No message provided"}), 400
+    debug_trace = bool(data.get('debug')) or settings.TRACE_DEBUG
+    trace_id = g.get("trace_id")
+
+    def generate():
+        # 先回一个事件，前端不用等图跑完才拿到第一个字节
+        yield sse_event("start", {"session_id": session_id, "trace_id": trace_id})
+        try:
+            from langgraph_crud_app.graph.graph_builder import build_graph
+            from langgraph_crud_app.persistence.write_behind import WriteBehindSaver
+
+            checkpointer = get_langgraph_checkpointer()
+            get_session_manager().touch(session_id)
+            runnable = build_graph().compile(checkpointer=checkpointer)
+            config = {"configurable": {"thread_id": session_id}}
+
+            tracing.start_trace(trace_id, session_id=session_id)
+            final_state = None
+            try:
+                for mode, chunk in runnable.stream({"user_query": user_query}, config=config,
+                                                   stream_mode=CHAT_STREAM_MODES):
+                    if mode == "values":
+                        final_state = chunk
+                        continue
+                    event = chat_stream_event(mode, chunk)
+                    if event:
+                        yield event
+            finally:
+                if isinstance(checkpointer, WriteBehindSaver):
+                    checkpointer.flush(config)
+                trace = finish_chat_trace()
+            yield sse_event("done", chat_response_data(final_state, session_id, trace, debug_trace))
+        except Exception as e:
+            app.logger.error("Chat stream endpoint error: %s", e)
+            yield sse_event("error", {
+                "error": f"服务器处理错误: {str(e)}",
+                "message": "抱歉，服务暂时不可用，请稍后再试。",
+                "success": False
+            })
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream", headers=SSE_HEADERS)
+
 if __name__ == '__main__':
     # 注意：从环境变量加载配置或使用默认值
     flask_host = os.environ.get('FLASK_RUN_HOST', '0.0.0.0')
@@ -0,0 +1,226 @@
+# asgi.py: ASGI 入口，/chat 走异步执行路径，其余接口桥接到 Flask 应用。
+"""
+Flask 的 /chat 每个对话占一个线程: 一回合里大部分时间都在等 LLM 和 api_client 的 HTTP 响应，
+并发对话数受限于线程数。这里的 /chat 用 graph.astream 执行同一张图:
+- 查询 / 分析回合经过的节点 (主意图与子意图分类、生成 SQL、执行查询、格式化 / 分析结果) 有异步版本
+  (graph_builder 里用 add_node(..., afunc=...) 注册)，LLM 调用走 llm_policy.ainvoke，
+  api_client 走 httpx.AsyncClient，等待期间不占线程；节点里的本地阻塞操作 (SQLite 缓存等) 用 asyncio.to_thread；
+- 其余节点 (初始化、增删改、复合操作、确认流程) 还是同步函数，LangGraph 把它们放到线程池执行；
+- checkpointer 用异步存储 (AsyncSqliteSaver / AsyncPostgresSaver)，write-behind 缓冲与 Flask 入口共用。
+
+/chat/stream 是流式版本 (Server-Sent Events): 用 astream 的 updates / messages 模式推送节点进度、回答节点的 LLM token 和完整回答，
+事件格式与 Flask 的 /chat/stream 相同 (见 app.chat_stream_event)。
+
+其他路径 (/execute_query、/insert_record、/metrics、/admin/... 等，都是同步的 pymysql 访问)
+通过 a2wsgi 原样交给 Flask 应用。
+
+启动:
+    uvicorn asgi:app --host 0.0.0.0 --port 5003
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from a2wsgi import WSGIMiddleware
+
+import app as flask_module
+from langgraph_crud_app.config import settings
+from langgraph_crud_app.observability import tracing
+
+logger = logging.getLogger(__name__)
+
+_graph = None
+_graph_lock = asyncio.Lock()
+
+
+async def _get_graph() -> Tuple[Any, Any]:
+    """编译好的图只需要一份 (图结构不变，checkpointer 是进程级单例)。"""
+    global _graph
+    async with _graph_lock:
+        if _graph is None:
+            # 图和 langgraph 在第一个 /chat 请求时才导入，启动时只加载 Flask 部分
+            from langgraph_crud_app.graph.graph_builder import build_graph
+            checkpointer = await flask_module.get_async_checkpointer()
+            _graph = (build_graph().compile(checkpointer=checkpointer), checkpointer)
+        return _graph
+
+
+async def _touch_session(session_id: str) -> None:
+    """会话管理器是同步的 (可能访问 checkpointer 存储)，放到线程里执行。"""
+    await asyncio.to_thread(lambda: flask_module.get_session_manager().touch(session_id))
+
+
+async def achat(data: Dict[str, Any], trace_id: Optional[str] = None) -> Tuple[int, Dict[str, Any]]:
+    """/chat 的异步版本，请求 / 响应格式与 Flask 的 /chat 相同。返回 (状态码, 响应体)。"""
+    try:
+        user_query = data.get('message', '')
+        session_id = data.get('session_id', 'default_session')
+        if not user_query:
+            return 400, {"error": "No message provided"}
+        logger.debug("Received chat message: %s", user_query)
+
+        runnable, checkpointer = await _get_graph()
+        await _touch_session(session_id)
+        config = {"configurable": {"thread_id": session_id}}
+
+        debug_trace = bool(data.get('debug')) or settings.TRACE_DEBUG
+        tracing.start_trace(trace_id, session_id=session_id)
+        final_state = None
+        try:
+            async for event in runnable.astream({"user_query": user_query}, config=config, stream_mode="values"):
+                final_state = event
+        finally:
+            if hasattr(checkpointer, "aflush"):
+                await checkpointer.aflush(config)
+            trace = flask_module.finish_chat_trace()
+        return 200, flask_module.chat_response_data(final_state, session_id, trace, debug_trace)
+    except Exception as e:
+        logger.error("Chat endpoint error: %s", e)
+        return 500, {
+            "error": f"服务器处理错误: {str(e)}",
+            "message": "抱歉，服务暂时不可用，请稍后再试。",
+            "success": False
+        }
+
+
+
+async def achat_stream(data: Dict[str, Any], trace_id: Optional[str] = None) -> AsyncIterator[str]:
+    """/chat/stream 的异步版本，逐条产出 SSE 消息: start -> node / token / answer ... -> done (或 error)。"""
+    session_id = data.get('session_id', 'default_session')
+    yield flask_module.sse_event("start", {"session_id": session_id, "trace_id": trace_id})
+    try:
+        runnable, checkpointer = await _get_graph()
+        await _touch_session(session_id)
+        config = {"configurable": {"thread_id": session_id}}
+
+        debug_trace = bool(data.get('debug')) or settings.TRACE_DEBUG
+        tracing.start_trace(trace_id, session_id=session_id)
+        final_state = None
+        try:
+            async for mode, chunk in runnable.astream({"user_query": data['message']}, config=config,
+                                                      stream_mode=flask_module.CHAT_STREAM_MODES):
+                if mode == "values":
+                    final_state = chunk
+                    continue
+                event = flask_module.chat_stream_event(mode, chunk)
+                if event:
+                    yield event
+        finally:
+            if hasattr(checkpointer, "aflush"):
+                await checkpointer.aflush(config)
+            trace = flask_module.finish_chat_trace()
+        yield flask_module.sse_event("done", flask_module.chat_response_data(final_state, session_id, trace, debug_trace))
+    except Exception as e:
+        logger.error("Chat stream endpoint error: %s", e)
+        yield flask_module.sse_event("error", {
+            "error": f"服务器处理错误: {str(e)}",
+            "message": "抱歉，服务暂时不可用，请稍后再试。",
+            "success": False
+        })
+
+# --- ASGI ---
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def _send_response(send, status: int, headers: List[Tuple[bytes, bytes]], body: bytes) -> None:
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _chat_endpoint(scope, receive, send) -> None:
+    start = time.perf_counter()
+    route = "/chat"
+    flask_module.HTTP_IN_FLIGHT.inc(route=route)
+    status = 500
+    try:
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        trace_id = tracing.sanitize_trace_id(headers.get(tracing.TRACE_HEADER.lower())) or tracing.new_trace_id()
+        try:
+            data = json.loads(await _read_body(receive) or b"null")
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            status, payload = 400, {"error": "No message provided"}
+        else:
+            status, payload = await achat(data, trace_id)
+        app_ms = (time.perf_counter() - start) * 1000
+        await _send_response(send, status, [
+            (b"content-type", b"application/json"),
+            (tracing.TRACE_HEADER.lower().encode(), trace_id.encode()),
+            (b"server-timing", f"app;dur={app_ms:.2f}".encode()),
+        ], json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+    finally:
+        flask_module.HTTP_IN_FLIGHT.dec(route=route)
+        flask_module.HTTP_REQUEST_LATENCY.observe(time.perf_counter() - start, route=route, method="POST",
+                                                  status=status)
+
+
+
+async def _chat_stream_endpoint(scope, receive, send) -> None:
+    start = time.perf_counter()
+    route = "/chat/stream"
+    flask_module.HTTP_IN_FLIGHT.inc(route=route)
+    status = 500
+    try:
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        trace_id = tracing.sanitize_trace_id(headers.get(tracing.TRACE_HEADER.lower())) or tracing.new_trace_id()
+        try:
+            data = json.loads(await _read_body(receive) or b"null")
+        except ValueError:
+            data = None
+        if not isinstance(data, dict) or not data.get('message'):
+            status = 400
+            await _send_response(send, status, [(b"content-type", b"application/json")],
+                                 json.dumps({"error": "No message provided"}).encode("utf-8"))
+            return
+        status = 200
+        await send({"type": "http.response.start", "status": status, "headers": [
+            (b"content-type", b"text/event-stream; charset=utf-8"),
+            (tracing.TRACE_HEADER.lower().encode(), trace_id.encode()),
+        ] + [(k.lower().encode(), v.encode()) for k, v in flask_module.SSE_HEADERS.items()]})
+        async for event in achat_stream(data, trace_id):
+            await send({"type": "http.response.body", "body": event.encode("utf-8"), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        flask_module.HTTP_IN_FLIGHT.dec(route=route)
+        flask_module.HTTP_REQUEST_LATENCY.observe(time.perf_counter() - start, route=route, method="POST",
+                                                  status=status)
+
+# 其余路径交给 Flask (a2wsgi 在它自己的线程池里执行 WSGI 应用)
+_flask_asgi = WSGIMiddleware(flask_module.app)
+
+
+async def _lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            # 关闭前把 write-behind 缓冲落盘
+            if _graph is not None and hasattr(_graph[1], "aflush"):
+                await _graph[1].aflush()
+            if _graph is not None:
+                from langgraph_crud_app.services import api_client
+                await api_client.aclose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send) -> None:
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+    elif scope["type"] == "http" and scope["path"] == "/chat" and scope["method"] == "POST":
+        await _chat_endpoint(scope, receive, send)
+    elif scope["type"] == "http" and scope["path"] == "/chat/stream" and scope["method"] == "POST":
+        await _chat_stream_endpoint(scope, receive, send)
+    elif scope["type"] == "http":
+        await _flask_asgi(scope, receive, send)
@@ -0,0 +1,242 @@
+# logging_config.py: 统一的日志配置，替代各模块中的 print() 和 basicConfig(DEBUG)。
+"""
+结构化日志子系统。
+
+使用方式与标准库一致，各模块只需:
+
+    logger = logging.getLogger(__name__)
+    logger.debug("查询结果: %s", result)   # 使用 % 占位符，只有真正输出时才格式化
+
+入口 (app.py / main.py) 调用一次 setup_logging() 即可。特性:
+- 惰性格式化：参数在记录被处理器实际输出时才转成字符串。
+- 按子系统设置级别：settings.LOG_LEVELS，例如 "langgraph_crud_app.services=DEBUG"。
+- 载荷截断：超长参数 / 消息按 settings.LOG_MAX_PAYLOAD 截断。
+- 采样：DEBUG 记录按调用点采样 (settings.LOG_DEBUG_SAMPLE_RATE)。
+- 非阻塞：业务线程只把记录放进队列，由 QueueListener 后台线程负责格式化和写出。
+
+注意：参数是在后台线程里才格式化的，传入之后又被修改的可变对象 (dict/list)
+会按修改后的内容输出，需要精确快照时请自行传入副本或字符串。
+"""
+
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from typing import Any, Dict, Optional
+
+from langgraph_crud_app.config import settings
+
+_setup_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+# shutdown_logging 只需要在退出时注册一次 (force=True 重新配置时不重复注册)
+_atexit_registered = False
+
+# 这些第三方库在 DEBUG 下非常啰嗦，默认压到 WARNING，可通过 LOG_LEVELS 覆盖
+_NOISY_LOGGERS = ("httpx", "httpcore", "openai", "urllib3")
+
+
+def truncate(value: Any, limit: Optional[int] = None) -> str:
+    """把任意值转成字符串并按上限截断，截断时注明原始长度。"""
+    if limit is None:
+        limit = settings.LOG_MAX_PAYLOAD
+    text = value if isinstance(value, str) else str(value)
+    if limit and len(text) > limit:
+        return f"{text[:limit]}...<截断, 共 {len(text)} 字符>"
+    return text
+
+
+class LazyJson:
+    """
+    延迟序列化的 JSON 参数包装。
+
+    logger.debug("状态: %s", LazyJson(state)) 只有在记录真正输出时才执行 json.dumps，
+    级别被过滤或被采样丢弃时没有任何序列化开销。
+    """
+
+    __slots__ = ("obj", "kwargs")
+
+    def __init__(self, obj: Any, **kwargs):
+        self.obj = obj
+        kwargs.setdefault("ensure_ascii", False)
+        kwargs.setdefault("default", str)
+        self.kwargs = kwargs
+
+    def __str__(self) -> str:
+        try:
+            return json.dumps(self.obj, **self.kwargs)
+        except (TypeError, ValueError, RuntimeError):
+            # RuntimeError: 后台线程序列化时对象正被业务线程修改
+            return str(self.obj)
+
+
+class DebugSamplingFilter(logging.Filter):
+    """按调用点 (logger 名 + 行号) 对 DEBUG 记录做确定性采样，INFO 及以上全部放行。"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        rate = max(0.0, min(1.0, rate))
+        self.every = 0 if rate <= 0 else max(1, round(1 / rate))
+        self._counters: Dict[tuple, Any] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.every == 1:
+            return True
+        if self.every == 0:
+            return False
+        key = (record.name, record.lineno)
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters.setdefault(key, itertools.count())
+        return next(counter) % self.every == 0
+
+
+class TruncatingFormatter(logging.Formatter):
+    """在输出时才截断参数和最终消息，保证格式化开销只发生在后台线程。"""
+
+    def __init__(self, fmt: Optional[str] = None, max_payload: int = 0):
+        super().__init__(fmt)
+        self.max_payload = max_payload
+
+    def _message(self, record: logging.LogRecord) -> str:
+        args = record.args
+        msg = str(record.msg)
+        try:
+            if self.max_payload and args:
+                if isinstance(args, dict):
+                    args = {k: truncate(v, self.max_payload) for k, v in args.items()}
+                else:
+                    args = tuple(
+                        v if isinstance(v, (int, float)) else truncate(v, self.max_payload)
+                        for v in args
+                    )
+            if args:
+                msg = msg % args
+        except Exception as e:
+            # 参数在后台线程格式化时可能正被业务线程修改，不能因此丢掉整条日志
+            msg = f"{msg} <参数格式化失败: {e!r}>"
+        # 消息本身 (比如 f-string 拼好的) 也限制总长度，留出参数的空间
+        return truncate(msg, self.max_payload * 4) if self.max_payload else msg
+
+    def format(self, record: logging.LogRecord) -> str:
+        record.message = self._message(record)
+        record.asctime = self.formatTime(record, self.datefmt)
+        text = self.formatMessage(record)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            text = f"{text}\n{record.exc_text}"
+        return text
+
+
+class JsonFormatter(TruncatingFormatter):
+    """每条记录输出为一行 JSON，便于日志采集系统解析。"""
+
+    # LogRecord 自带的属性，不作为额外字段输出
+    _RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": self._message(record),
+        }
+        # logger.info("...", extra={"session_id": ...}) 传入的结构化字段
+        for key, value in record.__dict__.items():
+            if key in self._RESERVED or key.startswith("_"):
+                continue
+            if isinstance(value, (int, float, bool)) or value is None:
+                payload[key] = value
+            else:
+                payload[key] = truncate(value, self.max_payload)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def _parse_levels(spec: str) -> Dict[str, int]:
+    """解析 "name=LEVEL,name2=LEVEL" 形式的子系统级别配置，忽略无法识别的条目。"""
+    levels = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        name, level = (part.strip() for part in item.split("=", 1))
+        level_no = logging.getLevelName(level.upper())
+        if name and isinstance(level_no, int):
+            levels[name] = level_no
+    return levels
+
+
+def setup_logging(force: bool = False) -> None:
+    """
+    配置根 logger：QueueHandler -> 后台 QueueListener -> StreamHandler。
+    重复调用是安全的 (只配置一次)，force=True 时重新配置。
+    """
+    global _listener, _atexit_registered
+    with _setup_lock:
+        if _listener is not None and not force:
+            return
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+        if settings.LOG_FORMAT.lower() == "json":
+            formatter: logging.Formatter = JsonFormatter(max_payload=settings.LOG_MAX_PAYLOAD)
+        else:
+            formatter = TruncatingFormatter(
+                "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+                max_payload=settings.LOG_MAX_PAYLOAD,
+            )
+        stream_handler = logging.StreamHandler(sys.stderr)
+        stream_handler.setFormatter(formatter)
+
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        queue_handler = _DeferredQueueHandler(log_queue)
+        queue_handler.addFilter(DebugSamplingFilter(settings.LOG_DEBUG_SAMPLE_RATE))
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root_level = logging.getLevelName(settings.LOG_LEVEL.upper())
+        root.setLevel(root_level if isinstance(root_level, int) else logging.INFO)
+
+        for name in _NOISY_LOGGERS:
+            logging.getLogger(name).setLevel(logging.WARNING)
+        for name, level in _parse_levels(settings.LOG_LEVELS).items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        if not _atexit_registered:
+            atexit.register(shutdown_logging)
+            _atexit_registered = True
+
+
+def shutdown_logging() -> None:
+    """停止后台线程并刷新队列中剩余的日志。"""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    标准 QueueHandler.prepare() 会在业务线程里先格式化消息，这里改为原样入队，
+    把 % 格式化、截断和序列化全部留给后台线程。
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            # 异常对象可能引用大量栈帧，先在当前线程渲染成文本再释放
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
@@ -1,10 +1,13 @@
 # graph_builder.py: 构建 LangGraph 图，定义节点和边。
 
+import logging
 from langgraph.graph import StateGraph, END
-from typing import Dict, Any, Literal
+from typing import Dict, Any, List, Literal, Optional, Union
 
 # 导入状态定义和节点函数
+from langgraph_crud_app.config import settings
 from langgraph_crud_app.graph.state import GraphState
+from langgraph_crud_app.observability.tracing import traced_node
 # 修改导入: 从 nodes 下的 actions 和 routers 子目录导入
 from langgraph_crud_app.nodes.routers import initialization_router, main_router, query_analysis_router, confirmation_router
 # 从 nodes.actions 导入需要的 *函数* 而不是模块
@@ -26,6 +29,11 @@ from langgraph_crud_app.nodes.actions import (
     handle_clarify_analysis_action,
     format_query_result_action,
     analyze_analysis_result_action,
+    agenerate_select_sql_action,
+    agenerate_analysis_sql_action,
+    aexecute_sql_query_action,
+    aformat_query_result_action,
+    aanalyze_analysis_result_action,
     # Modify
     generate_modify_context_sql_action,
     execute_modify_context_sql_action,
@@ -81,6 +89,8 @@ from langgraph_crud_app.nodes.actions.delete_actions import (
     finalize_delete_response,
 )
 
+logger = logging.getLogger(__name__)
+
 # --- 内部路由逻辑函数 ---
 def _route_after_validation(state: GraphState) -> Literal["handle_modify_error_action", "provide_modify_feedback_action"]:
     """根据验证结果路由到错误处理或用户反馈。"""
@@ -107,24 +117,24 @@ def _route_after_context_sql_execution(state: GraphState) -> Literal["parse_modi
 
 def _route_add_flow_on_error(state: GraphState) -> Literal["handle_add_error", "continue"]:
     """检查新增流程步骤中的错误状态。"""
-    print("--- Debug: Routing Add Flow - State received by router ---")
+    logger.debug("--- Debug: Routing Add Flow - State received by router ---")
     parse_error = state.get("add_parse_error")
     process_error = state.get("add_error_message")
     if parse_error or process_error:
-        print(f"--- Routing Add Flow to Error Handler. ParseError: {parse_error}, ProcessError: {process_error} ---")
+        logger.error("--- Routing Add Flow to Error Handler. ParseError: %s, ProcessError: %s ---", parse_error, process_error)
         return "handle_add_error"
     else:
         # 检查 temp_add_llm_data 是否存在，如果不存在也应报错
         if state.get("temp_add_llm_data") is None and not parse_error:
-             print("--- Routing Add Flow to Error Handler. temp_add_llm_data is None but no parse_error reported. ---")
+             logger.error("--- Routing Add Flow to Error Handler. temp_add_llm_data is None but no parse_error reported. ---")
              return "handle_add_error"
-        print("--- Routing Add Flow to Continue ---")
+        logger.debug("--- Routing Add Flow to Continue ---")
         return "continue"
 
 # 新增：删除流程错误路由
 def _route_delete_flow_on_error(state: GraphState) -> Literal["handle_delete_error_action", "continue"]:
     """检查删除流程步骤中的错误状态或 LLM 提示。"""
-    print("--- Debug: Routing Delete Flow - State received by router ---")
+    logger.debug("--- Debug: Routing Delete Flow - State received by router ---")
     error_message = state.get("delete_error_message")
     # 检查 generate_sql 步骤是否直接返回了 final_answer (表示 LLM 返回了提示)
     final_answer_at_start = state.get("final_answer") 
@@ -132,30 +142,39 @@ def _route_delete_flow_on_error(state: GraphState) -> Literal["handle_delete_err
     preview_sql = state.get("delete_preview_sql")
 
     if error_message:
-        print(f"--- Routing Delete Flow to Error Handler. Error: {error_message} ---")
+        logger.error("--- Routing Delete Flow to Error Handler. Error: %s ---", error_message)
         return "handle_delete_error_action"
     # 如果 generate_sql 设置了 final_answer，说明 LLM 没生成 SQL，流程应停止
     elif final_answer_at_start:
-        print(f"--- Routing Delete Flow to End (via final_answer): {final_answer_at_start} ---")
+        logger.debug("--- Routing Delete Flow to End (via final_answer): %s ---", final_answer_at_start)
         # 这里直接路由到 handle_delete_error，让它设置 error_flag 并结束
         # 或者可以创建一个专门的"停止"节点
         return "handle_delete_error_action"
     elif preview_sql is None and not error_message and not final_answer_at_start:
         # SQL 为空，且没有明确的错误或提示，也视为错误
-         print("--- Routing Delete Flow to Error Handler. delete_preview_sql is None without reported error. ---")
+         logger.error("--- Routing Delete Flow to Error Handler. delete_preview_sql is None without reported error. ---")
          return "handle_delete_error_action"
     else:
-        print("--- Routing Delete Flow to Continue ---")
+        logger.debug("--- Routing Delete Flow to Continue ---")
         return "continue"
 
 # 新增：初始化流程中每一步后的错误检查路由
 def _route_init_step_on_error(state: GraphState) -> Literal["handle_init_error", "continue"]:
     """如果当前状态中存在 error_message, 则路由到错误处理，否则继续。"""
     if state.get("error_message"):
-        print(f"--- 初始化步骤中检测到错误: {state.get('error_message')}, 路由到 handle_init_error ---")
+        logger.error("--- 初始化步骤中检测到错误: %s, 路由到 handle_init_error ---", state.get('error_message'))
         return "handle_init_error"
     return "continue"
 
+# --- 并行分支的路由 (settings.GRAPH_PARALLEL_BRANCHES) ---
+# 路由函数返回节点列表时 LangGraph 在下一步同时执行这些节点 (同步节点放在线程池里执行，invoke / ainvoke 都一样)。
+# 同一步的节点不能写同一个状态键 (error_message 除外，见 state._latest)，所以分支里的节点只写自己的键。
+def _route_after_fetch_schema(state: GraphState) -> Union[Literal["handle_init_error"], List[str]]:
+    """获取 Schema 后: 格式化 Schema 和 提取表名 -> 获取数据示例 只依赖原始 Schema，同时开始。"""
+    if _route_init_step_on_error(state) == "handle_init_error":
+        return "handle_init_error"
+    return ["format_schema", "extract_table_names"]
+
 def _route_after_sql_generation(state: GraphState) -> Literal["continue_to_clean_sql", "clarify_query", "clarify_analysis"]:
     """
     在 SQL 生成后进行路由。
@@ -167,29 +186,51 @@ def _route_after_sql_generation(state: GraphState) -> Literal["continue_to_clean
 
     # 首先检查 sql_generated_value 是否为字符串并且是 CLARIFY:
     if isinstance(sql_generated_value, str) and sql_generated_value.strip().upper().startswith("CLARIFY:"):
-        print(f"---路由逻辑: _route_after_sql_generation - 检测到澄清请求: {sql_generated_value[:100]}... ---")
+        logger.debug("---路由逻辑: _route_after_sql_generation - 检测到澄清请求: %s... ---", sql_generated_value[:100])
         if query_analysis_intent == "analysis":
-            print("---路由决策: 返回 'clarify_analysis' (因为是澄清且意图是 analysis)---")
+            logger.info("---路由决策: 返回 'clarify_analysis' (因为是澄清且意图是 analysis)---")
             return "clarify_analysis"
         else: # 默认为 query 或其他情况
-            print("---路由决策: 返回 'clarify_query' (因为是澄清且意图是 query/default)---")
+            logger.info("---路由决策: 返回 'clarify_query' (因为是澄清且意图是 query/default)---")
             return "clarify_query"
     # 其次，检查 sql_generated_value 是否是一个非空字符串 (表示正常的SQL)
     elif isinstance(sql_generated_value, str) and sql_generated_value.strip(): # 确保它不只是空字符串
-        print(f"---路由逻辑: _route_after_sql_generation - SQL生成正常，继续清理: {sql_generated_value[:100]}... ---")
-        print("---路由决策: 返回 'continue_to_clean_sql'---")
+        logger.debug("---路由逻辑: _route_after_sql_generation - SQL生成正常，继续清理: %s... ---", sql_generated_value[:100])
+        logger.info("---路由决策: 返回 'continue_to_clean_sql'---")
         return "continue_to_clean_sql"
     else:
         # 如果 sql_generated_value 是 None, 空字符串, 或者其他非CLARIFY、非有效SQL的情况
         # 打印时进行安全处理
-        print(f"---路由逻辑: _route_after_sql_generation - SQL生成值不是澄清，也不是有效SQL字符串 (可能是None或错误指示): '{str(sql_generated_value)[:200]}...' ---")
-        print("---路由决策: 返回 'continue_to_clean_sql' (后续节点如 clean_sql 应能处理 None/空值)---")
+        logger.error("---路由逻辑: _route_after_sql_generation - SQL生成值不是澄清，也不是有效SQL字符串 (可能是None或错误指示): '%s...' ---", str(sql_generated_value)[:200])
+        logger.info("---路由决策: 返回 'continue_to_clean_sql' (后续节点如 clean_sql 应能处理 None/空值)---")
         return "continue_to_clean_sql"
 
+class TracedStateGraph(StateGraph):
+    """
+    所有通过 add_node 注册的节点都自动包上 span 计时 (见 observability.tracing)。
+    afunc 为节点的异步版本: 同步调用 (invoke/stream) 走 action，异步调用 (ainvoke/astream) 走 afunc。
+    """
+
+    def add_node(self, node, action=None, *, afunc=None, **kwargs):
+        if isinstance(node, str) and action is not None:
+            action = traced_node(node, action)
+            if afunc is not None:
+                # 延迟导入: app / asgi 导入时不加载 langchain_core (见 test_lazy_imports)
+                from langchain_core.runnables import RunnableLambda
+                action = RunnableLambda(action, afunc=traced_node(node, afunc), name=node)
+        return super().add_node(node, action, **kwargs)
+
+
 # --- 构建图 ---
-def build_graph() -> StateGraph:
-    """构建并返回 LangGraph 应用的图实例。"""
-    graph = StateGraph(GraphState)
+def build_graph(parallel: Optional[bool] = None) -> StateGraph:
+    """
+    构建并返回 LangGraph 应用的图实例。
+    parallel 默认取 settings.GRAPH_PARALLEL_BRANCHES: 为 True 时初始化、复合预览中互不依赖的步骤
+    作为并行分支执行，本轮的关键路径只取分支中较慢的一条 (scripts/bench_graph_parallel.py 对比两种结构)。
+    """
+    if parallel is None:
+        parallel = settings.GRAPH_PARALLEL_BRANCHES
+    graph = TracedStateGraph(GraphState)
 
     # --- 添加节点 ---
     # 初始化流程节点
@@ -200,12 +241,14 @@ def build_graph() -> StateGraph:
     graph.add_node("format_schema", format_schema_action) # LLM 格式化 Schema
     graph.add_node("fetch_sample_data", fetch_sample_data_action) # 调用 API 获取数据示例
     graph.add_node("handle_init_error", lambda state: {"final_answer": f"初始化错误: {state.get('error_message', '未知错误')}"}) # 处理初始化错误
+    if parallel:
+        graph.add_node("join_initialization", lambda state: {}) # 等两条初始化分支都完成后统一检查错误
 
     # 主流程路由节点
-    graph.add_node("classify_main_intent_node", main_router.classify_main_intent_node) # LLM 分类用户主意图
+    graph.add_node("classify_main_intent_node", main_router.classify_main_intent_node, afunc=main_router.aclassify_main_intent_node) # LLM 分类用户主意图
 
     # 查询/分析 路由节点
-    graph.add_node("classify_query_analysis_node", query_analysis_router.classify_query_analysis_node) # LLM 分类查询/分析子意图
+    graph.add_node("classify_query_analysis_node", query_analysis_router.classify_query_analysis_node, afunc=query_analysis_router.aclassify_query_analysis_node) # LLM 分类查询/分析子意图
     graph.add_node("route_after_query_execution", query_analysis_router.route_after_query_execution_node) # SQL 执行后路由决策点
 
     # 主流程控制动作节点 (从 actions.flow_control_actions 导入)
@@ -214,12 +257,12 @@ def build_graph() -> StateGraph:
     graph.add_node("handle_delete_intent", handle_delete_intent_action) # (占位符/未使用?)
 
     # 查询/分析 动作节点
-    graph.add_node("generate_select_sql", generate_select_sql_action) # LLM 生成 SELECT SQL
-    graph.add_node("generate_analysis_sql", generate_analysis_sql_action) # LLM 生成分析 SQL
+    graph.add_node("generate_select_sql", generate_select_sql_action, afunc=agenerate_select_sql_action) # LLM 生成 SELECT SQL
+    graph.add_node("generate_analysis_sql", generate_analysis_sql_action, afunc=agenerate_analysis_sql_action) # LLM 生成分析 SQL
     graph.add_node("clean_sql", clean_sql_action) # 清理 SQL 语句
-    graph.add_node("execute_sql_query", execute_sql_query_action) # 调用 API 执行 SQL 查询
-    graph.add_node("format_query_result", format_query_result_action) # LLM 格式化查询结果
-    graph.add_node("analyze_analysis_result", analyze_analysis_result_action) # LLM 分析结果
+    graph.add_node("execute_sql_query", execute_sql_query_action, afunc=aexecute_sql_query_action) # 调用 API 执行 SQL 查询
+    graph.add_node("format_query_result", format_query_result_action, afunc=aformat_query_result_action) # LLM 格式化查询结果
+    graph.add_node("analyze_analysis_result", analyze_analysis_result_action, afunc=aanalyze_analysis_result_action) # LLM 分析结果
     graph.add_node("handle_clarify_query", handle_clarify_query_action) # 处理查询需澄清
     graph.add_node("handle_clarify_analysis", handle_clarify_analysis_action) # 处理分析需澄清
     graph.add_node("handle_query_not_found", handle_query_not_found_action) # 处理查询无结果
@@ -297,15 +340,27 @@ def build_graph() -> StateGraph:
         }
     )
 
-    # 初始化流程顺序边 - 修改为条件边以处理每一步的错误
-    graph.add_conditional_edges(
-        "fetch_schema",
-        _route_init_step_on_error,
-        {
-            "continue": "extract_table_names",
-            "handle_init_error": "handle_init_error"
-        }
-    )
+    # 初始化流程 - 每一步后用条件边检查错误
+    if parallel:
+        # 并行: fetch_schema -> [format_schema | extract_table_names -> process_table_names -> fetch_sample_data] -> join
+        graph.add_conditional_edges(
+            "fetch_schema",
+            _route_after_fetch_schema,
+            {
+                "format_schema": "format_schema",
+                "extract_table_names": "extract_table_names",
+                "handle_init_error": "handle_init_error"
+            }
+        )
+    else:
+        graph.add_conditional_edges(
+            "fetch_schema",
+            _route_init_step_on_error,
+            {
+                "continue": "extract_table_names",
+                "handle_init_error": "handle_init_error"
+            }
+        )
     graph.add_conditional_edges(
         "extract_table_names",
         _route_init_step_on_error,
@@ -318,26 +373,38 @@ def build_graph() -> StateGraph:
         "process_table_names",
         _route_init_step_on_error,
         {
-            "continue": "format_schema",
-            "handle_init_error": "handle_init_error"
-        }
-    )
-    graph.add_conditional_edges(
-        "format_schema",
-        _route_init_step_on_error,
-        {
-            "continue": "fetch_sample_data",
-            "handle_init_error": "handle_init_error"
-        }
-    )
-    graph.add_conditional_edges(
-        "fetch_sample_data",
-        _route_init_step_on_error, # 检查 fetch_sample_data 自身执行期间是否出错
-        {
-            "continue": "classify_main_intent_node", # 成功则进入主流程
+            "continue": "fetch_sample_data" if parallel else "format_schema",
             "handle_init_error": "handle_init_error"
         }
     )
+    if parallel:
+        # 两条分支都完成后才进入 join_initialization (分支长度不同也会等待)
+        graph.add_edge(["format_schema", "fetch_sample_data"], "join_initialization")
+        graph.add_conditional_edges(
+            "join_initialization",
+            _route_init_step_on_error, # 任一分支出错都会写入 error_message
+            {
+                "continue": "classify_main_intent_node", # 成功则进入主流程
+                "handle_init_error": "handle_init_error"
+            }
+        )
+    else:
+        graph.add_conditional_edges(
+            "format_schema",
+            _route_init_step_on_error,
+            {
+                "continue": "fetch_sample_data",
+                "handle_init_error": "handle_init_error"
+            }
+        )
+        graph.add_conditional_edges(
+            "fetch_sample_data",
+            _route_init_step_on_error, # 检查 fetch_sample_data 自身执行期间是否出错
+            {
+                "continue": "classify_main_intent_node", # 成功则进入主流程
+                "handle_init_error": "handle_init_error"
+            }
+        )
 
     # 主意图路由 (修改 modify 指向)
     graph.add_conditional_edges(
@@ -533,10 +600,16 @@ def build_graph() -> StateGraph:
     graph.add_edge("handle_add_error", END)
 
     # 新增：复合流程边
-    # 解析后 -> 处理占位符 -> 格式化预览 -> 确认入口
-    graph.add_edge("parse_combined_request", "process_composite_placeholders")
-    graph.add_edge("process_composite_placeholders", "format_combined_preview")
-    graph.add_edge("format_combined_preview", "route_confirmation_entry")
+    if parallel:
+        # 预览只用原始计划 (带占位符)，和占位符处理同时执行，两者都完成后进入确认入口
+        graph.add_edge("parse_combined_request", "process_composite_placeholders")
+        graph.add_edge("parse_combined_request", "format_combined_preview")
+        graph.add_edge(["process_composite_placeholders", "format_combined_preview"], "route_confirmation_entry")
+    else:
+        # 解析后 -> 处理占位符 -> 格式化预览 -> 确认入口
+        graph.add_edge("parse_combined_request", "process_composite_placeholders")
+        graph.add_edge("process_composite_placeholders", "format_combined_preview")
+        graph.add_edge("format_combined_preview", "route_confirmation_entry")
 
     # 确认流程动作序列 (使用重命名后的节点)
     graph.add_edge("execute_operation_action", "reset_after_operation_action")
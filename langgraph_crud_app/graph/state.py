@@ -1,17 +1,29 @@
 # state.py: 定义 LangGraph 应用的状态 TypedDict。
 
-from typing import List, TypedDict, Optional, Any, Dict, Literal
+from typing import Annotated, List, TypedDict, Optional, Any, Dict, Literal
 # 尝试从 typing_extensions 导入
 try:
     from typing import NotRequired
 except ImportError:
     from typing_extensions import NotRequired
 
+
+def _latest(current: Optional[str], update: Optional[str]) -> Optional[str]:
+    """
+    error_message 的合并函数: 和默认一样取最新写入的值。
+    区别在于并行分支 (见 graph_builder) 同一步都出错时不会因为多次写入抛 InvalidUpdateError；
+    这些分支成功时不写 error_message，不会用 None 覆盖另一个分支的错误。
+    """
+    return update
+
+
 class GraphState(TypedDict):
     """
     表示 LangGraph 应用的状态，映射 Dify 的 conversation 变量并包含必要的工作流字段。
     """
     # --- 核心 Dify conversation 变量 (镜像) ---
+    # 注意: biaojiegou_save / data_sample / raw_schema_result 较大时保存的是内容寻址引用 "cas:sha256:..."，
+    #       读取时用 persistence.artifact_store.resolve() 还原 (小内容仍直接内联)
     biaojiegou_save: Optional[str]       # 格式化后的 Schema JSON 字符串 (来自 Dify 节点 '1742268574820')
     table_names: Optional[List[str]]     # 从 Schema 中提取的表名列表 (来自 Dify 节点 '1743382507830')
     data_sample: Optional[str]           # 数据示例 JSON 字符串 (来自 Dify 节点 '1742695585674')
@@ -30,10 +42,10 @@ class GraphState(TypedDict):
     # query: str                           # 用户的输入查询 (来自 Dify 'sys.query')
     user_query: str                      # 用户的输入查询 (修正键名)
     final_answer: Optional[str]          # 给用户的最终回复 (由 Dify 中的 Answer 节点生成)
-    error_message: Optional[str]         # 存储执行期间的错误信息 (捕获来自 Code 节点或 API 调用的错误)
+    error_message: Annotated[Optional[str], _latest] # 存储执行期间的错误信息 (捕获来自 Code 节点或 API 调用的错误)
 
     # --- 初始化过程的中间状态 ---
-    raw_schema_result: Optional[List[str]] = None # 来自 /get_schema API 的原始结果 (Dify 节点 '1742268541036' 的输出)
+    raw_schema_result: Optional[str] = None # 来自 /get_schema API 的原始 Schema JSON 字符串 (或其内容寻址引用) (Dify 节点 '1742268541036' 的输出)
     raw_table_names_str: Optional[str] = None   # 来自 LLM 的原始表名字符串 (Dify 节点 '1742697648839' 的输出)
 
     # --- 查询/分析 过程的中间状态 ---
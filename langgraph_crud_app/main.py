@@ -3,14 +3,10 @@
 
 import sys
 import os
-import logging # 新增导入
 # Correct import path after installing langgraph-checkpoint-sqlite
 from langgraph.checkpoint.sqlite import SqliteSaver # 用于持久化状态
 import traceback # 导入 traceback
 
-# 新增：配置日志级别为 DEBUG
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-
 # 确保证项目根目录在 Python 路径中，以便绝对导入能够工作
 # project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '.'))
 # Add the parent directory (DifyLang) to sys.path instead
@@ -18,6 +14,10 @@ project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
+# 日志配置统一由 logging_config 处理，级别等通过环境变量 LOG_LEVEL / LOG_LEVELS 调整
+from langgraph_crud_app.config.logging_config import setup_logging
+setup_logging()
+
 from langgraph_crud_app.graph.graph_builder import build_graph
 # GraphState 导入不再直接需要，因为我们不手动创建它了
 # from langgraph_crud_app.graph.state import GraphState
@@ -19,6 +19,11 @@ from .query_actions import (
     handle_clarify_analysis_action,
     format_query_result_action,
     analyze_analysis_result_action,
+    agenerate_select_sql_action,
+    agenerate_analysis_sql_action,
+    aexecute_sql_query_action,
+    aformat_query_result_action,
+    aanalyze_analysis_result_action,
 )
 from .modify_actions import (
     generate_modify_context_sql_action,
@@ -1,17 +1,21 @@
+import logging
 import json
 from typing import Dict, Any
 
 from langgraph_crud_app.graph.state import GraphState
+from langgraph_crud_app.persistence import artifact_store
 from langgraph_crud_app.services import llm_add_service, data_processor
+
+logger = logging.getLogger(__name__)
 # from langgraph_crud_app.services import api_client # data_processor 内部会导入和使用
 
 def parse_add_request_action(state: GraphState) -> Dict[str, Any]:
     """动作节点：使用 LLM 解析用户的新增请求。"""
-    print("--- 动作: 解析新增请求 ---")
+    logger.info("--- 动作: 解析新增请求 ---")
     try:
         user_query = state["user_query"]
-        schema_info = state["biaojiegou_save"]
-        sample_data = state["data_sample"]
+        schema_info = artifact_store.resolve(state["biaojiegou_save"])
+        sample_data = artifact_store.resolve(state["data_sample"])
 
         if not user_query or not schema_info or not sample_data:
             missing = []
@@ -33,7 +37,7 @@ def parse_add_request_action(state: GraphState) -> Dict[str, Any]:
         return {"temp_add_llm_data": llm_output}
 
     except Exception as e:
-        print(f"ERROR in parse_add_request_action: {e}")
+        logger.error("ERROR in parse_add_request_action: %s", e)
         # 错误路径: 只返回更新
         # 将 temp_add_llm_data 设为 None
         updates = {"add_parse_error": str(e), "temp_add_llm_data": None}
@@ -41,15 +45,15 @@ def parse_add_request_action(state: GraphState) -> Dict[str, Any]:
 
 def process_add_llm_output_action(state: GraphState) -> Dict[str, Any]:
     """动作节点：清理和结构化新增请求的原始 LLM 输出。"""
-    print("--- 动作: 处理新增 LLM 输出 ---")
+    logger.info("--- 动作: 处理新增 LLM 输出 ---")
     # 使用新的键名读取状态
     raw_output = state.get("temp_add_llm_data")
     # 如果上一步解析失败，直接返回
     if state.get("add_parse_error"):
-        print("--- 跳过处理 LLM 输出，因为上一步解析失败 ---")
+        logger.debug("--- 跳过处理 LLM 输出，因为上一步解析失败 ---")
         return {}
     if not raw_output:
-        print("警告：没有原始 LLM 输出可供处理，但上一步未报告错误。")
+        logger.warning("警告：没有原始 LLM 输出可供处理，但上一步未报告错误。")
         # 将其视为一种错误状态
         return {"add_error_message": "无法处理空的 LLM 输出。"}
 
@@ -65,16 +69,16 @@ def process_add_llm_output_action(state: GraphState) -> Dict[str, Any]:
         except TypeError as te:
             raise ValueError(f"无法将结构化记录序列化为 JSON: {te}")
 
-        print(f"--- 结构化记录 (JSON String): {records_json_str} ---")
+        logger.debug("--- 结构化记录 (JSON String): %s ---", records_json_str)
         # 将 JSON 字符串存入 state，清除旧错误
         return {"add_structured_records_str": records_json_str, "add_error_message": None}
 
     except ValueError as ve:
-         print(f"ERROR in process_add_llm_output_action (ValueError): {ve}")
+         logger.error("ERROR in process_add_llm_output_action (ValueError): %s", ve)
          # 出错时，清空字符串状态
          return {"add_error_message": str(ve), "add_structured_records_str": None}
     except Exception as e:
-        print(f"ERROR in process_add_llm_output_action: {e}")
+        logger.error("ERROR in process_add_llm_output_action: %s", e)
         # 出错时，清空字符串状态
         return {"add_error_message": f"处理LLM输出失败: {str(e)}", "add_structured_records_str": None}
 
@@ -89,14 +93,14 @@ def process_placeholders_action(state: GraphState) -> Dict[str, Any]:
     Returns:
         包含处理后记录的字典。
     """
-    print("--- 节点: 处理占位符 ({{...}} format) ---")
+    logger.info("--- 节点: 处理占位符 ({{...}} format) ---")
     # --- 新增：打印完整状态 ---
-    print(f"节点入口接收到的完整状态: {state}")
+    logger.debug("节点入口接收到的完整状态: %s", state)
     # --- END 新增 ---
 
     # 检查前序步骤是否有错误
     if state.get("add_parse_error") or state.get("add_error_message"):
-        print("--- 跳过处理占位符，因为前序步骤出错 ---")
+        logger.warning("--- 跳过处理占位符，因为前序步骤出错 ---")
         return {}
 
     # 读取 JSON 字符串状态
@@ -110,31 +114,31 @@ def process_placeholders_action(state: GraphState) -> Dict[str, Any]:
             structured_records = json.loads(records_json_str)
             if not isinstance(structured_records, list):
                 raise ValueError("解析后的结构化记录不是列表。")
-            print(f"--- 从 JSON 字符串成功解析结构化记录: {structured_records} ---")
+            logger.debug("--- 从 JSON 字符串成功解析结构化记录: %s ---", structured_records)
         except json.JSONDecodeError as e:
-            print(f"--- 无法解析结构化记录 JSON 字符串: {e} --- JSON: '{records_json_str}'")
+            logger.error("--- 无法解析结构化记录 JSON 字符串: %s --- JSON: '%s'", e, records_json_str)
             return {"add_error_message": f"无法解析结构化记录 JSON 字符串: {e}"}
         except ValueError as ve:
-             print(f"--- 解析后的结构化记录格式错误: {ve} --- JSON: '{records_json_str}'")
+             logger.error("--- 解析后的结构化记录格式错误: %s --- JSON: '%s'", ve, records_json_str)
              return {"add_error_message": f"解析后的结构化记录格式错误: {ve}"}
 
     # 检查解析结果或原始字符串是否存在
     if structured_records is None:
-         print("--- 无法处理占位符：结构化记录 JSON 字符串为空或解析失败 ---")
+         logger.error("--- 无法处理占位符：结构化记录 JSON 字符串为空或解析失败 ---")
          # 如果 records_json_str 为空，之前的步骤就应该设置 error_message 了
          # 如果解析失败，上面已经返回了错误
          # 这里理论上不应该到达，除非 state 被意外修改
          return {"add_error_message": "结构化记录丢失或无效，无法处理占位符。"}
     elif not structured_records: # 列表为空的情况
-         print("--- 无结构化记录需要处理占位符 (列表为空) ---")
+         logger.warning("--- 无结构化记录需要处理占位符 (列表为空) ---")
          return {"add_processed_records": []}
 
-    print(f"--- 待处理占位符的记录: {structured_records} ---")
+    logger.debug("--- 待处理占位符的记录: %s ---", structured_records)
 
     try:
         # 调用 data_processor 处理占位符 (现在使用解析后的 structured_records)
         processed_records = data_processor.process_placeholders(structured_records)
-        print(f"--- 占位符处理完成: {processed_records} ---")
+        logger.debug("--- 占位符处理完成: %s ---", processed_records)
 
         # 将最终处理后的记录序列化为 JSON 字符串并存入状态
         try:
@@ -146,11 +150,11 @@ def process_placeholders_action(state: GraphState) -> Dict[str, Any]:
         return {"add_processed_records_str": processed_records_json_str, "add_error_message": None}
 
     except ValueError as ve:
-        print(f"ERROR in process_placeholders_action (ValueError): {ve}")
+        logger.error("ERROR in process_placeholders_action (ValueError): %s", ve)
         # 出错时，清空字符串状态
         return {"add_error_message": str(ve), "add_processed_records_str": None}
     except Exception as e:
-        print(f"ERROR in process_placeholders_action: {e}")
+        logger.error("ERROR in process_placeholders_action: %s", e)
         # 出错时，清空字符串状态
         return {"add_error_message": f"处理占位符时发生意外错误: {str(e)}", "add_processed_records_str": None}
 
@@ -164,11 +168,11 @@ def format_add_preview_action(state: GraphState) -> Dict[str, Any]:
     Returns:
         一个字典，包含生成的预览文本。
     """
-    print("--- 节点: 格式化新增预览文本 ---")
+    logger.info("--- 节点: 格式化新增预览文本 ---")
     # 检查前序步骤是否有错误
     current_error = state.get("add_parse_error") or state.get("add_error_message")
     if current_error:
-        print(f"--- 跳过格式化预览，因为前序步骤出错: {current_error} ---")
+        logger.warning("--- 跳过格式化预览，因为前序步骤出错: %s ---", current_error)
         return {}
 
     # 从 _str 字段读取状态
@@ -181,34 +185,34 @@ def format_add_preview_action(state: GraphState) -> Dict[str, Any]:
             processed_records = json.loads(processed_records_json_str)
             if not isinstance(processed_records, list):
                  raise ValueError("解析后的已处理记录不是列表。")
-            print(f"--- 从 JSON 字符串成功解析已处理记录: {processed_records} ---")
+            logger.debug("--- 从 JSON 字符串成功解析已处理记录: %s ---", processed_records)
         except json.JSONDecodeError as e:
-            print(f"--- 无法解析已处理记录 JSON 字符串: {e} --- JSON: '{processed_records_json_str}'")
+            logger.error("--- 无法解析已处理记录 JSON 字符串: %s --- JSON: '%s'", e, processed_records_json_str)
             return {"add_error_message": f"无法解析已处理记录 JSON 字符串: {e}"}
         except ValueError as ve:
-            print(f"--- 解析后的已处理记录格式错误: {ve} --- JSON: '{processed_records_json_str}'")
+            logger.error("--- 解析后的已处理记录格式错误: %s --- JSON: '%s'", ve, processed_records_json_str)
             return {"add_error_message": f"解析后的已处理记录格式错误: {ve}"}
 
     # 检查解析结果
     if processed_records is None:
-         print(f"--- 无法生成预览：已处理记录 JSON 字符串为空或解析失败 ---")
+         logger.error("--- 无法生成预览：已处理记录 JSON 字符串为空或解析失败 ---")
          return {"add_error_message": "已处理记录丢失或无效，无法生成预览。"}
     elif not processed_records:
-         print("--- 没有处理后的记录可供预览 (列表为空) ---")
+         logger.warning("--- 没有处理后的记录可供预览 (列表为空) ---")
          return {"add_preview_text": "根据您的输入，没有解析到需要新增的数据。"}
 
     # --- 后续逻辑使用解析后的 processed_records ---
     query = state["user_query"]
     # schema = state["db_schema"] # db_schema 似乎未在 state 中定义，暂时使用 biaojiegou_save
-    schema_str = state.get("biaojiegou_save")
+    schema_str = artifact_store.resolve(state.get("biaojiegou_save"))
     if not schema_str:
-         print("--- 无法生成预览：数据库 Schema 信息丢失。 ---")
+         logger.error("--- 无法生成预览：数据库 Schema 信息丢失。 ---")
          return {"add_error_message": "数据库 Schema 信息丢失，无法生成预览。"}
 
     # 从处理后的记录中提取涉及的表名
     involved_tables = list(set(record.get("table_name", "unknown") for record in processed_records))
 
-    print(f"--- 格式化预览输入 - Tables: {involved_tables}, Records: {processed_records} ---")
+    logger.debug("--- 格式化预览输入 - Tables: %s, Records: %s ---", involved_tables, processed_records)
 
     # 调用 LLM 服务生成预览 (使用解析后的 processed_records)
     try:
@@ -221,7 +225,7 @@ def format_add_preview_action(state: GraphState) -> Dict[str, Any]:
                 records_by_table[table_name].append(record.get("fields", {}))
 
         if not records_by_table:
-             print("--- 警告：处理后的记录无法按表分组进行预览 ---")
+             logger.warning("--- 警告：处理后的记录无法按表分组进行预览 ---")
              # 提供基于原始列表的预览
              preview_text = f"准备新增以下记录（无法按表分组）：\n{json.dumps(processed_records, ensure_ascii=False, indent=2)}"
         else:
@@ -241,7 +245,7 @@ def format_add_preview_action(state: GraphState) -> Dict[str, Any]:
             "pending_confirmation_type": "add" # 设置待确认类型
         }
     except Exception as e:
-        print(f"--- 调用 format_add_preview 时出错: {e} ---")
+        logger.error("--- 调用 format_add_preview 时出错: %s ---", e)
         # 出错时，也要确保存储了回退预览文本，并清空 content_new 和 lastest_content_production
         try:
              fallback_preview = f"无法生成格式化预览 ({e})。将尝试新增以下数据：\n{json.dumps(processed_records, ensure_ascii=False, indent=2)}"
@@ -258,7 +262,7 @@ def format_add_preview_action(state: GraphState) -> Dict[str, Any]:
 
 def provide_add_feedback_action(state: GraphState) -> Dict[str, Any]:
     """动作节点：向用户提供生成的新增预览或错误信息。"""
-    print("--- 动作: 提供新增反馈 ---")
+    logger.info("--- 动作: 提供新增反馈 ---")
     # 检查所有可能的错误状态
     parse_error = state.get("add_parse_error")
     processing_error = state.get("add_error_message")
@@ -281,7 +285,7 @@ def provide_add_feedback_action(state: GraphState) -> Dict[str, Any]:
 
 def handle_add_error_action(state: GraphState) -> Dict[str, Any]:
     """通用错误处理节点，在路由检测到错误时进入。"""
-    print("--- 动作: 处理新增错误 (通用) ---")
+    logger.info("--- 动作: 处理新增错误 (通用) ---")
     # 优先使用 add_error_message，如果不存在，再使用 add_parse_error
     error_to_report = state.get("add_error_message")
     if not error_to_report:
@@ -289,13 +293,13 @@ def handle_add_error_action(state: GraphState) -> Dict[str, Any]:
 
     # 构建友好的错误消息
     final_answer_value = f"抱歉，处理您的新增请求时出错：{error_to_report}"
-    print(f"DEBUG: handle_add_error_action set final_answer_value to: {final_answer_value}")
+    logger.debug("DEBUG: handle_add_error_action set final_answer_value to: %s", final_answer_value)
     return {"final_answer": final_answer_value, "error_flag": True} # 确保也设置 error_flag
 
 # --- 新增：用于确保 final_answer 被包含在最终状态的节点 ---
 def finalize_add_response(state: GraphState) -> Dict[str, Any]:
     """空节点，确保 provide_add_feedback 的输出被合并到最终状态。"""
-    print("--- 节点: 结束新增反馈流程 ---")
+    logger.info("--- 节点: 结束新增反馈流程 ---")
     # 这个节点本身不需要做任何事情或返回任何更新
     return {}
 
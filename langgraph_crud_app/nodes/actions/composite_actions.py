@@ -11,6 +11,7 @@ import uuid
 import re # 确保导入 re
 
 from langgraph_crud_app.graph.state import GraphState
+from langgraph_crud_app.persistence import artifact_store
 from langgraph_crud_app.services.llm import llm_composite_service
 from langgraph_crud_app.services.llm import llm_error_service  # 新增：导入错误处理服务
 from langgraph_crud_app.services import api_client # 需要 API Client
@@ -25,9 +26,9 @@ def parse_combined_request_action(state: GraphState) -> Dict[str, Any]:
     """
     logger.info("---节点: 解析复合请求---")
     user_query = state.get("user_query", "")
-    schema_info = state.get("biaojiegou_save", "")
+    schema_info = artifact_store.resolve(state.get("biaojiegou_save", ""))
     table_names = state.get("table_names", [])
-    sample_data = state.get("data_sample", "")
+    sample_data = artifact_store.resolve(state.get("data_sample", ""))
 
     if not user_query:
         logger.warning("用户查询为空，无法解析复合请求。")
@@ -163,7 +164,8 @@ def process_composite_placeholders_action(state: GraphState) -> Dict[str, Any]:
     logger.info("---节点: 处理复合操作占位符---")
     plan_to_process = state.get("lastest_content_production")
 
-    if not plan_to_process:
+    # 本轮没有解析出计划时 lastest_content_production 由并行的预览节点清空，这里不再写
+    if not plan_to_process or not state.get("combined_operation_plan"):
         logger.warning("用于执行的操作计划为空，无需处理占位符。")
         return {} # 返回空字典，表示没有更新
 
@@ -263,12 +265,14 @@ def process_composite_placeholders_action(state: GraphState) -> Dict[str, Any]:
         logger.info(f"{interim_plan_count - final_plan_count} 个插入操作因字段值为列表而被省略。")
 
     logger.debug(f"最终可执行计划 (用于API): {final_executable_plan}")
-    return {"lastest_content_production": final_executable_plan, "error_message": None}
+    # 和 format_combined_preview_action 并行执行 (见 graph_builder)，成功时不写 error_message
+    return {"lastest_content_production": final_executable_plan}
 
 def format_combined_preview_action(state: GraphState) -> Dict[str, Any]:
     """
     节点动作：调用 LLM 服务将结构化的复合操作计划格式化为用户友好的预览文本。
     现在读取 combined_operation_plan (原始计划带占位符) 用于预览。
+    预览不依赖占位符的处理结果，和 process_composite_placeholders_action 并行执行 (见 graph_builder)。
     """
     logger.info("---节点: 格式化复合操作预览---")
     user_query = state.get("user_query", "")
@@ -306,9 +310,9 @@ def format_combined_preview_action(state: GraphState) -> Dict[str, Any]:
             # actual_executable_plan=processed_plan_for_context
         )
         logger.info(f"生成复合操作预览文本: {preview_text}")
+        # 成功时不写 error_message，以免覆盖并行的占位符处理节点报告的错误
         return {
             "content_combined": preview_text, 
-            "error_message": None,
             "pending_confirmation_type": "composite" # 设置待确认类型
         }
 
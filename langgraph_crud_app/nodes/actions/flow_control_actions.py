@@ -1,10 +1,12 @@
 # nodes/flow_control_actions.py: 包含主要流程控制相关的动作节点。
 
+import logging
 from typing import Dict, Any, List, Optional
 import json # 新增导入
 
 # 导入状态定义
 from langgraph_crud_app.graph.state import GraphState
+from langgraph_crud_app.persistence import artifact_store
 # 导入服务
 from langgraph_crud_app.services import api_client # 新增导入
 from langgraph_crud_app.services.llm import llm_flow_control_service # 新增导入
@@ -13,6 +15,8 @@ from langgraph_crud_app.services.llm import llm_delete_service
 # 新增导入错误处理 LLM 服务
 from langgraph_crud_app.services.llm import llm_error_service
 
+logger = logging.getLogger(__name__)
+
 # --- 主流程占位符/简单动作节点 ---
 
 def handle_reset_action(state: GraphState) -> Dict[str, Any]:
@@ -20,7 +24,7 @@ def handle_reset_action(state: GraphState) -> Dict[str, Any]:
     节点动作：处理重置意图。
     对应 Dify 节点: '1742436161345' (重置检索结果)
     """
-    print("---节点: 处理重置意图---")
+    logger.info("---节点: 处理重置意图---")
     # 同时也清空新增和删除相关状态
     return {
         "content_modify": None,
@@ -43,22 +47,22 @@ def handle_reset_action(state: GraphState) -> Dict[str, Any]:
 
 def handle_modify_intent_action(state: GraphState) -> Dict[str, Any]:
     """节点动作：处理修改意图 (占位符)。"""
-    print("---节点: 处理修改意图 (占位符)---")
+    logger.info("---节点: 处理修改意图 (占位符)---")
     return {"final_answer": "收到修改请求 (功能待实现)。"}
 
 def handle_add_intent_action(state: GraphState) -> Dict[str, Any]:
     """节点动作：处理新增意图 (占位符)。"""
-    print("---节点: 处理新增意图 (占位符)---")
+    logger.info("---节点: 处理新增意图 (占位符)---")
     return {"final_answer": "收到新增请求 (功能待实现)。"}
 
 def handle_delete_intent_action(state: GraphState) -> Dict[str, Any]:
     """节点动作：处理删除意图 (占位符)。"""
-    print("---节点: 处理删除意图 (占位符)---")
+    logger.info("---节点: 处理删除意图 (占位符)---")
     return {"final_answer": "收到删除请求 (功能待实现)。"}
 
 def handle_confirm_other_action(state: GraphState) -> Dict[str, Any]:
     """节点动作：处理确认或其他意图 (占位符)。"""
-    print("---节点: 处理确认/其他意图 (占位符)---")
+    logger.info("---节点: 处理确认/其他意图 (占位符)---")
     return {"final_answer": "收到确认或其他请求 (功能待实现)。"}
 
 """
@@ -74,12 +78,12 @@ def stage_modify_action(state: GraphState) -> Dict[str, Any]:
     节点动作：暂存【修改】操作，并向用户请求确认。
     对应 Dify 节点: '1742272935164' (赋值) + '1742272958774' (回复)
     """
-    print("---节点: 暂存修改操作---")
+    logger.info("---节点: 暂存修改操作---")
     content_to_modify = state.get("content_modify", "")
     lastest_content_production = state.get("lastest_content_production")
     
     if not content_to_modify or not lastest_content_production:
-         print("错误：无法暂存修改，缺少预览内容或待生产数据。")
+         logger.error("错误：无法暂存修改，缺少预览内容或待生产数据。")
          # 可以路由到 handle_nothing_to_stage 或设置错误
          return {"error_message": "无法暂存修改操作，缺少必要内容。"}
          
@@ -97,12 +101,12 @@ def stage_add_action(state: GraphState) -> Dict[str, Any]:
     节点动作：暂存【新增】操作，并向用户请求确认。
     对应 Dify 节点: '1742438351562' (赋值) + '1742438384982' (赋值) + '1742438414307' (回复)
     """
-    print("---节点: 暂存新增操作---")
+    logger.info("---节点: 暂存新增操作---")
     content_to_add = state.get("content_new") # 用户预览文本
     lastest_content_production = state.get("lastest_content_production") # 待提交API的数据
 
     if not content_to_add or not lastest_content_production:
-        print("错误：无法暂存新增，缺少预览内容或待生产数据。")
+        logger.error("错误：无法暂存新增，缺少预览内容或待生产数据。")
         return {"error_message": "无法暂存新增操作，缺少必要内容。"}
 
     confirmation_message = f"以下是即将【新增】的信息，请确认，并回复'是'/'否'\n\n{content_to_add}"
@@ -116,16 +120,16 @@ def stage_combined_action(state: GraphState) -> Dict[str, Any]:
     """
     节点动作：暂存【复合】操作（可能包含修改、新增等），并向用户请求确认。
     """
-    print("---节点: 暂存复合操作---")
+    logger.info("---节点: 暂存复合操作---")
     content_to_confirm = state.get("content_combined") # 获取复合预览文本
     operation_plan = state.get("lastest_content_production") # 获取复合操作计划列表
 
     if not content_to_confirm or not operation_plan:
-        print("错误：无法暂存复合操作，缺少预览内容或操作计划。")
+        logger.error("错误：无法暂存复合操作，缺少预览内容或操作计划。")
         return {"error_message": "无法暂存复合操作，缺少必要内容。"}
     
     if not isinstance(operation_plan, list):
-         print(f"错误：无法暂存复合操作，操作计划格式不正确（应为列表，实际为 {type(operation_plan)}）。")
+         logger.error("错误：无法暂存复合操作，操作计划格式不正确（应为列表，实际为 %s）。", type(operation_plan))
          return {"error_message": "无法暂存复合操作，操作计划格式错误。"}
 
     confirmation_message = f"以下是即将执行的【复合操作】，请确认，并回复'是'/'否'\n\n{content_to_confirm}"
@@ -146,7 +150,7 @@ def handle_nothing_to_stage_action(state: GraphState) -> Dict[str, Any]:
     """
     节点动作：处理无法确定要暂存哪个操作的情况。
     """
-    print("---节点: 处理无法暂存操作---")
+    logger.info("---节点: 处理无法暂存操作---")
     return {
         "final_answer": "抱歉，当前没有可以保存或确认的操作。请先进行修改、新增或删除操作。"
     }
@@ -155,7 +159,7 @@ def handle_invalid_save_state_action(state: GraphState) -> Dict[str, Any]:
     """
     节点动作：处理 save_content 与实际状态不符的情况。
     """
-    print("---节点: 处理无效保存状态---")
+    logger.info("---节点: 处理无效保存状态---")
     # 清理可能不一致的状态
     return {
         "save_content": None,
@@ -166,7 +170,7 @@ def cancel_save_action(state: GraphState) -> Dict[str, Any]:
     """
     节点动作：用户取消保存/确认操作。
     """
-    print("---节点: 取消保存操作---")
+    logger.info("---节点: 取消保存操作---")
     
     save_content_value = state.get("save_content")
     
@@ -211,7 +215,7 @@ def cancel_save_action(state: GraphState) -> Dict[str, Any]:
     updates = {key: None for key in keys_to_clear_on_cancel}
     updates["final_answer"] = final_answer_message
     
-    print(f"取消操作后，清除的状态键: {list(updates.keys())}")
+    logger.debug("取消操作后，清除的状态键: %s", list(updates.keys()))
     
     return updates
 
@@ -224,7 +228,7 @@ def execute_operation_action(state: GraphState) -> Dict[str, Any]:
     error_message = None
     updates: Dict[str, Any] = {} # 用于收集所有状态更新
 
-    print(f"---节点: 执行操作 (类型: {save_content})---")
+    logger.info("---节点: 执行操作 (类型: %s)---", save_content)
 
     try: # 将所有操作包裹在一个 try 中，简化错误处理
         if save_content == "修改路径":
@@ -235,9 +239,9 @@ def execute_operation_action(state: GraphState) -> Dict[str, Any]:
             if not isinstance(latest_production, list):
                 raise ValueError("执行修改失败：待处理的负载数据格式不正确（应为列表）。")
 
-            print(f"调用 API /update_record, payload: {latest_production}")
+            logger.debug("调用 API /update_record, payload: %s", latest_production)
             api_call_result = api_client.update_record(latest_production)
-            print(f"API 调用结果: {api_call_result}")
+            logger.debug("API 调用结果: %s", api_call_result)
             # 检查 API 返回错误 (通用化处理移到 try 块末尾)
 
         elif save_content == "新增路径":
@@ -250,9 +254,9 @@ def execute_operation_action(state: GraphState) -> Dict[str, Any]:
             if not latest_production:
                 raise ValueError("执行新增失败：没有需要新增的记录 (lastest_content_production is empty)。")
 
-            print(f"调用 API /insert_record, payload: {latest_production}")
+            logger.debug("调用 API /insert_record, payload: %s", latest_production)
             api_call_result = api_client.insert_record(latest_production)
-            print(f"API 调用结果: {api_call_result}")
+            logger.debug("API 调用结果: %s", api_call_result)
 
         elif save_content == "复合路径":
             # --- 执行复合操作 ---
@@ -262,21 +266,21 @@ def execute_operation_action(state: GraphState) -> Dict[str, Any]:
             if not isinstance(latest_production, list):
                  raise ValueError("执行复合操作失败：操作计划格式不正确（应为列表）。")
 
-            print(f"调用 API /execute_batch_operations, payload: {latest_production}")
+            logger.debug("调用 API /execute_batch_operations, payload: %s", latest_production)
             api_call_result = api_client.execute_batch_operations(latest_production) # 调用批量接口
-            print(f"API 调用结果: {api_call_result}")
+            logger.debug("API 调用结果: %s", api_call_result)
 
         elif save_content == "删除路径":
             # --- 执行删除 ---
-            print("--- 执行: 删除操作 ---")
+            logger.info("--- 执行: 删除操作 ---")
             delete_show_json = state.get("delete_show")
-            schema_info = state.get("biaojiegou_save")
+            schema_info = artifact_store.resolve(state.get("biaojiegou_save"))
             table_names = state.get("table_names")
             
             # 检查是否已经在预览步骤中确认没有找到记录
             content_delete = state.get("content_delete")
             if content_delete == "未找到需要删除的记录。":
-                print("--- 预览已确认没有记录需要删除，跳过删除操作 ---")
+                logger.warning("--- 预览已确认没有记录需要删除，跳过删除操作 ---")
                 api_call_result = {"message": "未找到需要删除的记录。"}
                 updates["api_call_result"] = api_call_result
                 updates["delete_api_result"] = api_call_result
@@ -287,7 +291,7 @@ def execute_operation_action(state: GraphState) -> Dict[str, Any]:
 
             # 检查是否为空结果
             if delete_show_json.strip() == '[]':
-                print("--- 删除预览为空列表，无需执行删除操作 ---")
+                logger.warning("--- 删除预览为空列表，无需执行删除操作 ---")
                 api_call_result = {"message": "未找到需要删除的记录。"}
                 updates["api_call_result"] = api_call_result
                 updates["delete_api_result"] = api_call_result
@@ -313,12 +317,13 @@ def execute_operation_action(state: GraphState) -> Dict[str, Any]:
             # 3. 准备并执行 API 调用
             api_results_list = [] # 重命名以避免与外层变量冲突
             if not structured_ids_dict:
-                print("--- 解析后无 ID 需要删除 ---")
+                logger.debug("--- 解析后无 ID 需要删除 ---")
                 api_call_result = {"message": "没有需要删除的记录。"} # 认为无操作是成功
             else:
-                print(f"--- 准备删除以下 ID: {structured_ids_dict} ---")
+                logger.debug("--- 准备删除以下 ID: %s ---", structured_ids_dict)
                 try:
-                     schema_dict = json.loads(schema_info)
+                     # 按内容缓存的解析结果，同一份 Schema 不重复解析 (只读，不要修改)
+                     schema_dict = artifact_store.load_json(schema_info)
                 except json.JSONDecodeError:
                      raise ValueError("无法解析 Schema 信息以获取主键")
 
@@ -341,7 +346,7 @@ def execute_operation_action(state: GraphState) -> Dict[str, Any]:
 
                 # 执行删除 (逐条)
                 if delete_payloads:
-                    print(f"开始逐条删除 {len(delete_payloads)} 条记录...")
+                    logger.debug("开始逐条删除 %s 条记录...", len(delete_payloads))
                     for payload in delete_payloads:
                             try:
                                 result = api_client.delete_record(
@@ -351,9 +356,9 @@ def execute_operation_action(state: GraphState) -> Dict[str, Any]:
                                 )
                                 api_results_list.append({"table": payload["table_name"], "id": payload["primary_value"], **result})
                             except Exception as api_err:
-                                print(f"API delete error for {payload['table_name']} ID {payload['primary_value']}: {api_err}")
+                                logger.error("API delete error for %s ID %s: %s", payload['table_name'], payload['primary_value'], api_err)
                                 api_results_list.append({"table": payload["table_name"], "id": payload["primary_value"], "error": str(api_err)})
-                    print("--- 逐条删除完成 ---")
+                    logger.debug("--- 逐条删除完成 ---")
                     api_call_result = api_results_list # 将列表作为结果
                 else:
                     # 如果解析后发现没有有效载荷（可能因为主键错误等）
@@ -365,7 +370,7 @@ def execute_operation_action(state: GraphState) -> Dict[str, Any]:
 
         else:
             error_message = f"未知的操作类型: {save_content}"
-            print(error_message)
+            logger.error("%s", error_message)
             updates["error_message"] = error_message
             updates["api_call_result"] = None # 明确设为 None
             return updates # 直接返回错误状态
@@ -382,13 +387,13 @@ def execute_operation_action(state: GraphState) -> Dict[str, Any]:
                 error_message = f"API 操作失败: {api_call_result['error']}"
 
             if error_message:
-                 print(f"API 调用报告错误: {error_message}")
+                 logger.error("API 调用报告错误: %s", error_message)
                  updates["error_message"] = error_message # 记录错误
 
         else: # 如果前面某个分支没有设置 api_call_result
              if not updates.get("error_message"): # 且没有明确错误
                  error_message = f"操作 '{save_content}' 未产生 API 调用结果。"
-                 print(error_message)
+                 logger.error("%s", error_message)
                  updates["error_message"] = error_message
 
 
@@ -397,7 +402,7 @@ def execute_operation_action(state: GraphState) -> Dict[str, Any]:
         if isinstance(e, ValueError) and str(e).startswith("API错误:"):
             # 提取Flask的具体错误信息
             flask_error = str(e).replace("API错误:", "").strip()
-            print(f"检测到Flask错误，调用LLM错误处理服务进行转换: {flask_error}")
+            logger.error("检测到Flask错误，调用LLM错误处理服务进行转换: %s", flask_error)
             
             # 构建操作上下文
             operation_context = {
@@ -416,18 +421,18 @@ def execute_operation_action(state: GraphState) -> Dict[str, Any]:
                 friendly_error = llm_error_service.translate_flask_error(
                     error_info=flask_error,
                     operation_context=operation_context,
-                    schema_info=state.get("biaojiegou_save")  # 传递schema信息以获得更好的错误解释
+                    schema_info=artifact_store.resolve(state.get("biaojiegou_save"))  # 传递schema信息以获得更好的错误解释
                 )
                 error_message = friendly_error
-                print(f"LLM转换后的友好错误信息: {friendly_error}")
+                logger.debug("LLM转换后的友好错误信息: %s", friendly_error)
             except Exception as llm_error:
-                print(f"LLM错误转换失败: {llm_error}")
+                logger.error("LLM错误转换失败: %s", llm_error)
                 # 回退到原始错误信息
                 error_message = f"操作失败: {flask_error}"
         else:
             # 其他类型的异常，使用原有逻辑
             error_message = f"执行操作 '{save_content}' 时发生意外错误: {e}"
-            print(error_message)
+            logger.error("%s", error_message)
         
         updates["error_message"] = error_message
         updates["api_call_result"] = None # 发生异常时清空结果
@@ -439,7 +444,7 @@ def reset_after_operation_action(state: GraphState) -> Dict[str, Any]:
     """
     节点动作：在成功执行操作（或即使失败，只要流程继续）后，清空相关的暂存和预览状态。
     """
-    print("---节点: 操作后重置状态---")
+    logger.info("---节点: 操作后重置状态---")
 
     keys_to_reset: List[str] = [
         "save_content", # <--- 确保 save_content 在这里被重置
@@ -487,14 +492,14 @@ def reset_after_operation_action(state: GraphState) -> Dict[str, Any]:
     if "save_content" not in updates:
         updates["save_content"] = None
         
-    print(f"重置状态键: {list(updates.keys())}")
+    logger.debug("重置状态键: %s", list(updates.keys()))
     return updates
 
 def format_operation_response_action(state: GraphState) -> Dict[str, Any]:
     """
     节点动作：调用 LLM 格式化 API 调用结果（成功或失败）为最终回复。
     """
-    print("---节点: 格式化操作响应---")
+    logger.info("---节点: 格式化操作响应---")
     
     # 首先检查通用结果，然后检查特定删除结果
     api_result_data = state.get("api_call_result")
@@ -503,16 +508,16 @@ def format_operation_response_action(state: GraphState) -> Dict[str, Any]:
     # 如果通用结果为空但存在删除结果，则使用删除结果
     if api_result_data is None and delete_api_result is not None:
         api_result_data = delete_api_result
-        print(f"使用删除特定API结果: {api_result_data}")
+        logger.debug("使用删除特定API结果: %s", api_result_data)
     
     error_message_from_execution = state.get("error_message") # 通用执行错误
     user_query = state.get("user_query", "用户操作")
     save_content = state.get("save_content") # 获取操作类型标记
 
     # 日志输出
-    print(f"操作类型: {save_content}")
-    print(f"API结果: {api_result_data}")
-    print(f"执行错误: {error_message_from_execution}")
+    logger.debug("操作类型: %s", save_content)
+    logger.debug("API结果: %s", api_result_data)
+    logger.debug("执行错误: %s", error_message_from_execution)
 
     # 映射 save_content 到用户友好的操作类型字符串
     op_type_str = {
@@ -527,7 +532,7 @@ def format_operation_response_action(state: GraphState) -> Dict[str, Any]:
     try:
         # 修正参数传递
         if error_message_from_execution: # 如果执行层捕获了顶层错误
-            print(f"格式化执行层错误信息: {error_message_from_execution}")
+            logger.error("格式化执行层错误信息: %s", error_message_from_execution)
             # 如果错误信息已经是LLM转换过的友好信息，直接使用
             # 检查是否包含典型的技术错误标识符
             if any(tech_indicator in error_message_from_execution for tech_indicator in 
@@ -546,7 +551,7 @@ def format_operation_response_action(state: GraphState) -> Dict[str, Any]:
                 final_answer = error_message_from_execution
 
         elif api_result_data is not None: # 如果有 API 结果
-            print(f"格式化 API 结果: {api_result_data}")
+            logger.debug("格式化 API 结果: %s", api_result_data)
             final_answer = llm_flow_control_service.format_api_result(
                 result=api_result_data, # 传递 API 结果
                 original_query=user_query,
@@ -560,14 +565,14 @@ def format_operation_response_action(state: GraphState) -> Dict[str, Any]:
                     if "未知" in final_answer:  # 如果LLM格式化失败了
                         final_answer = f"成功删除了 {successful_count} 条记录。"
         else:
-            print("警告: 无法格式化响应，既无 API 结果也无错误信息。")
+            logger.warning("警告: 无法格式化响应，既无 API 结果也无错误信息。")
             if op_type_str == "删除":
                 final_answer = "删除操作已执行，但无法获取具体结果。请检查数据以确认。"
             else:
                 final_answer = f"{op_type_str}操作状态未知，请检查系统日志。"
 
     except Exception as e:
-        print(f"ERROR in format_operation_response_action: {e}")
+        logger.error("ERROR in format_operation_response_action: %s", e)
         if op_type_str == "删除":
             final_answer = "删除操作已执行，但格式化响应时出错。请检查数据以确认删除结果。"
         else:
@@ -9,6 +9,7 @@ import re  # 导入正则表达式模块
 
 # 导入状态定义和服务
 from langgraph_crud_app.graph.state import GraphState
+from langgraph_crud_app.persistence import artifact_store
 from langgraph_crud_app.services.llm import llm_modify_service
 from langgraph_crud_app.services import api_client
 
@@ -58,9 +59,9 @@ def generate_modify_context_sql_action(state: GraphState) -> Dict[str, Any]:
     # --- 检查结束 ---
 
     logger.info("---节点: 生成修改上下文查询 SQL---")
-    biaojiegou_save = state.get('biaojiegou_save')
+    biaojiegou_save = artifact_store.resolve(state.get("biaojiegou_save"))
     tables = state.get("table_names")
-    sample = state.get("data_sample")
+    sample = artifact_store.resolve(state.get("data_sample"))
 
     # 检查必需的元数据是否存在
     if not all([biaojiegou_save, tables, sample]):
@@ -153,9 +154,9 @@ def parse_modify_request_action(state: GraphState) -> Dict[str, Any]:
     """
     logger.info("---节点: 解析修改请求---")
     query = state.get("user_query", "")
-    schema = state.get("biaojiegou_save")
+    schema = artifact_store.resolve(state.get("biaojiegou_save"))
     tables = state.get("table_names")
-    sample = state.get("data_sample")
+    sample = artifact_store.resolve(state.get("data_sample"))
     # 新增：获取上下文查询结果
     context_result = state.get("modify_context_result")
     error_message = state.get("error_message") # 保留上一步可能设置的错误
@@ -1,7 +1,11 @@
 # initialization_router.py: 包含初始化流程的路由逻辑。
 
+import logging
 from typing import Literal, Dict, Any
 from langgraph_crud_app.graph.state import GraphState
+from langgraph_crud_app.persistence import artifact_store
+
+logger = logging.getLogger(__name__)
 
 # --- 初始化流程路由逻辑 ---
 
@@ -26,9 +30,10 @@ def _get_initialization_route(state: GraphState) -> Literal["start_initializatio
     if error_message_from_current_init_flow:
         return "handle_error"
 
-    biaojiegou_save = state.get("biaojiegou_save")
+    # 引用指向的内容丢失 (resolve 返回 None) 时视为未初始化，重新走初始化流程
+    biaojiegou_save = artifact_store.resolve(state.get("biaojiegou_save"))
     table_names = state.get("table_names")
-    data_sample = state.get("data_sample")
+    data_sample = artifact_store.resolve(state.get("data_sample"))
 
     if biaojiegou_save and biaojiegou_save != "{}" and table_names and data_sample and data_sample != "{}":
         return "continue_to_main_flow"
@@ -40,11 +45,11 @@ def route_initialization_node(state: GraphState) -> Dict[str, Any]:
     路由节点：图的入口。检查状态、打印信息，并重置处理新请求前应被清除的通用反馈状态字段。
     Staging content for multi-turn operations (like content_modify, delete_show) are NOT reset here.
     """
-    print("---路由节点: 检查初始化状态 (打印信息)---")
+    logger.info("---路由节点: 检查初始化状态 (打印信息)---")
     # 打印检查信息 (可以保留或根据需要调整)
-    biaojiegou_save = state.get("biaojiegou_save")
+    biaojiegou_save = artifact_store.resolve(state.get("biaojiegou_save"))
     table_names = state.get("table_names")
-    data_sample = state.get("data_sample")
+    data_sample = artifact_store.resolve(state.get("data_sample"))
     # error_message 在这里读取的是上一轮可能残留的值，之后会被重置
     error_message_before_reset = state.get("error_message") 
 
@@ -57,14 +62,14 @@ def route_initialization_node(state: GraphState) -> Dict[str, Any]:
         missing_data.append("Data Sample (data_sample)")
 
     if missing_data:
-        print(f"状态检查：缺少数据: {', '.join(missing_data)}")
+        logger.debug("状态检查：缺少数据: %s", ', '.join(missing_data))
     else:
-        print("状态检查：必需的元数据 (Schema, Tables, Sample) 存在。")
+        logger.debug("状态检查：必需的元数据 (Schema, Tables, Sample) 存在。")
 
     if error_message_before_reset:
-        print(f"状态检查：检测到来自上一轮的错误消息: {error_message_before_reset}")
+        logger.error("状态检查：检测到来自上一轮的错误消息: %s", error_message_before_reset)
     else:
-        print("状态检查：未检测到来自上一轮的错误消息。")
+        logger.debug("状态检查：未检测到来自上一轮的错误消息。")
 
     # Reset per-turn feedback/error states.
     # Crucially, DO NOT reset fields involved in staging multi-turn operations
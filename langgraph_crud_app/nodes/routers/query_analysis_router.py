@@ -1,33 +1,59 @@
 # query_analysis_router.py: 包含查询/分析子流程的路由逻辑。
 
+import logging
 from typing import Literal, Dict, Any
 from langgraph_crud_app.graph.state import GraphState
 from langgraph_crud_app.services import data_processor
 from langgraph_crud_app.services.llm import llm_query_service
 
+logger = logging.getLogger(__name__)
+
 # --- 查询/分析 子意图路由 ---
 
 def classify_query_analysis_node(state: GraphState) -> Dict[str, Any]:
     """
     路由节点：调用 LLM 服务对用户查询进行子意图分类 (query/analysis)。
     LLM 服务预期直接返回 "query" 或 "analysis" 字符串。
+    主意图联合分类已经给出子意图时 (classify_main_intent_node 写入本回合的 query_analysis_intent) 直接使用。
     """
-    print("---路由节点: 查询/分析子意图分类---")
+    logger.info("---路由节点: 查询/分析子意图分类---")
     query = state.get("user_query", "")
+    preset = state.get("query_analysis_intent")
+    if preset in ("query", "analysis"):
+        logger.debug("主意图分类已给出子意图: %s，跳过单独分类", preset)
+        return {"query_analysis_intent": preset, "error_message": None}
     try:
         # llm_query_service.classify_query_analysis_intent 预期返回 "query" 或 "analysis" 字符串
-        sub_intent_str = llm_query_service.classify_query_analysis_intent(query)
-        print(f"查询/分析 子意图分类结果 (直接字符串): {sub_intent_str}")
-        # 确保存储的是字符串
-        if sub_intent_str not in ["query", "analysis"]:
-            print(f"警告: LLM服务 classify_query_analysis_intent 返回了非预期的值 '{sub_intent_str}', 将默认为 'query'")
-            sub_intent_str = "query" # 安全回退
-        return {"query_analysis_intent": sub_intent_str, "error_message": None}
+        return _sub_intent_update(llm_query_service.classify_query_analysis_intent(query))
     except Exception as e:
-        error_msg = f"查询/分析子意图分类失败: {e}"
-        print(error_msg)
-        # 分类失败，默认按查询处理 (字符串)
-        return {"query_analysis_intent": "query", "error_message": error_msg}
+        return _sub_intent_failure(e)
+
+async def aclassify_query_analysis_node(state: GraphState) -> Dict[str, Any]:
+    """classify_query_analysis_node 的异步版本。"""
+    logger.info("---路由节点: 查询/分析子意图分类---")
+    query = state.get("user_query", "")
+    preset = state.get("query_analysis_intent")
+    if preset in ("query", "analysis"):
+        logger.debug("主意图分类已给出子意图: %s，跳过单独分类", preset)
+        return {"query_analysis_intent": preset, "error_message": None}
+    try:
+        return _sub_intent_update(await llm_query_service.aclassify_query_analysis_intent(query))
+    except Exception as e:
+        return _sub_intent_failure(e)
+
+def _sub_intent_update(sub_intent_str: str) -> Dict[str, Any]:
+    logger.debug("查询/分析 子意图分类结果 (直接字符串): %s", sub_intent_str)
+    # 确保存储的是字符串
+    if sub_intent_str not in ["query", "analysis"]:
+        logger.warning("警告: LLM服务 classify_query_analysis_intent 返回了非预期的值 '%s', 将默认为 'query'", sub_intent_str)
+        sub_intent_str = "query" # 安全回退
+    return {"query_analysis_intent": sub_intent_str, "error_message": None}
+
+def _sub_intent_failure(e: Exception) -> Dict[str, Any]:
+    error_msg = f"查询/分析子意图分类失败: {e}"
+    logger.error("%s", error_msg)
+    # 分类失败，默认按查询处理 (字符串)
+    return {"query_analysis_intent": "query", "error_message": error_msg}
 
 def _route_query_or_analysis(state: GraphState) -> Literal[
     "query",
@@ -38,12 +64,12 @@ def _route_query_or_analysis(state: GraphState) -> Literal[
     预期 state.get("query_analysis_intent") 直接是 "query" 或 "analysis" 字符串。
     """
     actual_intent_str = state.get("query_analysis_intent", "query") # 直接获取，它应该是字符串 "query" 或 "analysis"
-    print(f"---路由逻辑: _route_query_or_analysis - 接收到的 actual_intent_str: '{actual_intent_str}'---")
+    logger.debug("---路由逻辑: _route_query_or_analysis - 接收到的 actual_intent_str: '%s'---", actual_intent_str)
     if actual_intent_str == "analysis":
-        print(f"---路由决策: 返回 'analysis'---")
+        logger.info("---路由决策: 返回 'analysis'---")
         return "analysis"
     else: # "query" 或任何其他情况 (包括None，但classify_node会给默认值 "query")
-        print(f"---路由决策: 返回 'query' (因为 actual_intent_str is '{actual_intent_str}')---")
+        logger.debug("---路由决策: 返回 'query' (因为 actual_intent_str is '%s')---", actual_intent_str)
         return "query"
 
 # --- 查询后路由 ---
@@ -53,11 +79,11 @@ def route_after_query_execution_node(state: GraphState) -> Dict[str, Any]:
     路由节点：在 SQL 执行后准备进行路由决策。
     本身不执行路由，仅用于连接。
     """
-    print("---路由节点: 准备根据 SQL 执行结果路由---")
+    logger.info("---路由节点: 准备根据 SQL 执行结果路由---")
     error_msg = state.get("error_message")
     sql_result = state.get("sql_result")
-    print(f"  错误信息: {error_msg}")
-    print(f"  SQL 结果: {sql_result}")
+    logger.error("  错误信息: %s", error_msg)
+    logger.debug("  SQL 结果: %s", sql_result)
     return {} # 路由逻辑在条件边处理
 
 def _route_after_query_execution(state: GraphState) -> Literal[
@@ -77,25 +103,25 @@ def _route_after_query_execution(state: GraphState) -> Literal[
     
     actual_intent_str = state.get("query_analysis_intent", "query") # 直接获取，默认为"query"
 
-    print(f"---路由逻辑: _route_after_query_execution - 接收到的 actual_intent_str: '{actual_intent_str}'---")
+    logger.debug("---路由逻辑: _route_after_query_execution - 接收到的 actual_intent_str: '%s'---", actual_intent_str)
 
     if error_message:
-        print(f"检测到执行错误: {error_message}")
+        logger.error("检测到执行错误: %s", error_message)
         if actual_intent_str == "analysis":
             return "handle_clarify_analysis"
         else:
             return "handle_clarify_query"
     elif data_processor.is_query_result_empty(sql_result):
-        print("SQL 执行成功，但结果为空。")
+        logger.warning("SQL 执行成功，但结果为空。")
         if actual_intent_str == "analysis":
             return "handle_analysis_no_data"
         else:
             return "handle_query_not_found"
     else:
-        print("SQL 执行成功且有结果。")
+        logger.debug("SQL 执行成功且有结果。")
         if actual_intent_str == "analysis":
-            print(f"---路由决策: 返回 'analyze_analysis_result' (因为 actual_intent_str == 'analysis')---")
+            logger.info("---路由决策: 返回 'analyze_analysis_result' (因为 actual_intent_str == 'analysis')---")
             return "analyze_analysis_result"
         else:
-            print(f"---路由决策: 返回 'format_query_result' (因为 actual_intent_str is '{actual_intent_str}')---")
+            logger.debug("---路由决策: 返回 'format_query_result' (因为 actual_intent_str is '%s')---", actual_intent_str)
             return "format_query_result" 
\ No newline at end of file
@@ -0,0 +1 @@
+# __init__.py: 初始化 observability 模块 (指标 / 追踪 / 遥测)。
@@ -0,0 +1,261 @@
+# llm_telemetry.py: LLM 调用的延迟 / token / 成本统计。
+"""
+以 LangChain 回调的形式挂在每个 ChatOpenAI 实例上 (callbacks=llm_telemetry.callbacks("query"))，
+每次调用记录: 模型、prompt / completion / 缓存 token、耗时、重试次数、估算成本，
+并打上流程 (query/add/modify/delete/composite/...)、图节点和会话 id 标签。
+通过 llm_factory.get_chain 组装的链还带提示词名 (metadata["prompt"])，按提示词记录输入 token 和其中
+provider 前缀缓存命中的部分 (llm_prompt_tokens_total{type=cached} / {type=input})，用来确认提示词前缀确实被复用。
+
+数据去向:
+- metrics.registry: llm_* 指标，按 flow / node / model 聚合，由 /metrics 导出。
+- 当前 trace: 追加一个 kind="llm" 的 span，在 /chat 调试瀑布图里能看到每次调用。
+- 进程内按会话聚合 (session_summary)，最多保留 _MAX_SESSIONS 个会话。
+
+节点和会话优先取 LangGraph 注入的回调 metadata (langgraph_node / thread_id)，
+拿不到时 (比如在图外直接调用服务函数) 退回到 tracing 的当前节点 / 当前 trace。
+
+重试次数: 由调用策略 (llm_policy) 标记。策略层的每次额外请求 (重试、对冲请求，含重试时换成的降级模型)
+都是一次独立的模型调用，发出前在 contextvar (extra_attempt) 里打上标记，这里把该调用记为 1 次重试，
+所以按节点 / 会话 / 流程聚合的 retries 就是额外请求数，并发的调用 (线程池 / 事件循环上) 各记各的。
+调用策略关闭时 (LLM_POLICY_ENABLED=false) 重试由 openai SDK 在内部完成，对回调不可见，不计数。
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from langgraph_crud_app.observability import tracing
+from langgraph_crud_app.observability.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# 每百万 token 的美元价格: (输入, 输出, 缓存命中的输入)。
+# 可通过环境变量 LLM_PRICING_JSON 覆盖或补充，例如 '{"gpt-4.1": [2.0, 8.0, 0.5]}'
+DEFAULT_PRICING: Dict[str, tuple] = {
+    "gpt-4.1-nano": (0.10, 0.40, 0.025),
+    "gpt-4.1-mini": (0.40, 1.60, 0.10),
+    "gpt-4.1": (2.00, 8.00, 0.50),
+    "gpt-4o-mini": (0.15, 0.60, 0.075),
+    "gpt-4o": (2.50, 10.00, 1.25),
+}
+
+_MAX_SESSIONS = 1000
+
+# 当前这次模型调用是不是策略层的额外请求 (重试 / 对冲)，由 llm_policy 在发请求前设置。
+# 用 contextvar: 线程池任务和 asyncio 任务各有一份上下文，并发的请求互不影响
+extra_attempt: "contextvars.ContextVar[bool]" = contextvars.ContextVar("llm_extra_attempt", default=False)
+
+LLM_CALLS = registry.counter("llm_calls_total", "LLM 调用次数", ["flow", "node", "model", "status"])
+LLM_LATENCY = registry.histogram("llm_call_duration_seconds", "LLM 单次调用耗时", ["flow", "node", "model"])
+LLM_TOKENS = registry.counter("llm_tokens_total", "LLM token 用量", ["flow", "model", "type"])
+LLM_COST = registry.counter("llm_cost_usd_total", "LLM 估算成本 (美元)", ["flow", "model"])
+LLM_RETRIES = registry.counter("llm_retries_total", "LLM 额外请求次数 (调用策略的重试 / 对冲)", ["flow", "model"])
+LLM_PROMPT_TOKENS = registry.counter("llm_prompt_tokens_total", "按提示词统计的输入 token (input 全部 / cached 前缀缓存命中)",
+                                     ["prompt", "type"])
+
+
+def _load_pricing() -> Dict[str, tuple]:
+    pricing = dict(DEFAULT_PRICING)
+    override = os.getenv("LLM_PRICING_JSON", "")
+    if override:
+        try:
+            for model, prices in json.loads(override).items():
+                prices = list(prices) + [prices[0]] * (3 - len(prices))
+                pricing[model] = tuple(float(p) for p in prices[:3])
+        except (ValueError, TypeError, IndexError) as e:
+            logger.warning("LLM_PRICING_JSON 解析失败，使用默认价格: %s", e)
+    return pricing
+
+
+PRICING = _load_pricing()
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """
+    按价格表估算一次调用的美元成本。模型名按最长前缀匹配
+    (API 返回的 "gpt-4o-2024-08-06" 匹配 "gpt-4o")，未知模型返回 0。
+    """
+    key = max((k for k in PRICING if model.startswith(k)), key=len, default=None)
+    if key is None:
+        return 0.0
+    price_in, price_out, price_cached = PRICING[key]
+    uncached = max(prompt_tokens - cached_tokens, 0)
+    return (uncached * price_in + cached_tokens * price_cached + completion_tokens * price_out) / 1_000_000
+
+
+# --- 按会话聚合 ---
+_sessions_lock = threading.Lock()
+_sessions: "OrderedDict[str, Dict[str, Dict[str, float]]]" = OrderedDict()
+
+
+def _empty_stats() -> Dict[str, float]:
+    return {"calls": 0, "errors": 0, "retries": 0, "prompt_tokens": 0, "completion_tokens": 0,
+            "cached_tokens": 0, "cost_usd": 0.0, "latency_ms": 0.0}
+
+
+def _record_session(session_id: str, flow: str, node: str, call: Dict[str, Any], prompt: str = "none") -> None:
+    with _sessions_lock:
+        per_session = _sessions.get(session_id)
+        if per_session is None:
+            per_session = _sessions[session_id] = {}
+            while len(_sessions) > _MAX_SESSIONS:
+                _sessions.popitem(last=False)
+        else:
+            _sessions.move_to_end(session_id)
+        for key in (f"flow:{flow}", f"node:{node}", f"prompt:{prompt}", "total"):
+            stats = per_session.setdefault(key, _empty_stats())
+            stats["calls"] += 1
+            stats["errors"] += 1 if call["status"] == "error" else 0
+            for field in ("retries", "prompt_tokens", "completion_tokens", "cached_tokens", "cost_usd", "latency_ms"):
+                stats[field] += call[field]
+
+
+def session_summary(session_id: str) -> Dict[str, Any]:
+    """返回某个会话的累计用量: {"total": {...}, "flows": {flow: {...}}, "nodes": {node: {...}}, "prompts": {prompt: {...}}}。"""
+    with _sessions_lock:
+        per_session = {k: dict(v) for k, v in _sessions.get(session_id, {}).items()}
+    summary: Dict[str, Any] = {"total": per_session.get("total", _empty_stats()), "flows": {}, "nodes": {}, "prompts": {}}
+    for key, stats in per_session.items():
+        if key.startswith("flow:"):
+            summary["flows"][key[5:]] = stats
+        elif key.startswith("node:"):
+            summary["nodes"][key[5:]] = stats
+        elif key.startswith("prompt:"):
+            summary["prompts"][key[7:]] = stats
+    for stats in [summary["total"], *summary["flows"].values(), *summary["nodes"].values(), *summary["prompts"].values()]:
+        stats["cost_usd"] = round(stats["cost_usd"], 6)
+        stats["latency_ms"] = round(stats["latency_ms"], 1)
+    return summary
+
+
+def forget_session(session_id: str) -> None:
+    """丢弃某个会话的聚合数据 (会话过期时调用)。"""
+    with _sessions_lock:
+        _sessions.pop(session_id, None)
+
+
+def reset_sessions() -> None:
+    """清空会话聚合数据 (测试用)。"""
+    with _sessions_lock:
+        _sessions.clear()
+
+
+# --- 回调 ---
+def _extract_usage(response: LLMResult) -> Dict[str, int]:
+    """优先读 message.usage_metadata (LangChain 标准字段)，其次读 llm_output["token_usage"]。"""
+    usage = {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+    for generations in response.generations or []:
+        for gen in generations:
+            metadata = getattr(getattr(gen, "message", None), "usage_metadata", None)
+            if metadata:
+                usage["prompt_tokens"] += metadata.get("input_tokens", 0) or 0
+                usage["completion_tokens"] += metadata.get("output_tokens", 0) or 0
+                details = metadata.get("input_token_details") or {}
+                usage["cached_tokens"] += details.get("cache_read", 0) or 0
+    if usage["prompt_tokens"] or usage["completion_tokens"]:
+        return usage
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    usage["prompt_tokens"] = token_usage.get("prompt_tokens", 0) or 0
+    usage["completion_tokens"] = token_usage.get("completion_tokens", 0) or 0
+    usage["cached_tokens"] = ((token_usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0)) or 0
+    return usage
+
+
+class LLMTelemetryHandler(BaseCallbackHandler):
+    """记录单个服务 (flow) 下所有 LLM 调用的回调处理器。"""
+
+    # 回调里的异常不应影响业务调用
+    raise_error = False
+    # 异步调用时也在调用方的上下文里直接执行 (不放到线程池)，_start 才能读到这次请求的 extra_attempt 标记
+    run_inline = True
+
+    def __init__(self, flow: str):
+        self.flow = flow
+        self._runs: Dict[UUID, Dict[str, Any]] = {}
+
+    def _start(self, run_id: UUID, metadata: Optional[Dict[str, Any]], kwargs: Dict[str, Any]) -> None:
+        metadata = metadata or {}
+        params = kwargs.get("invocation_params") or {}
+        trace = tracing.current_trace()
+        self._runs[run_id] = {
+            "start": time.perf_counter(),
+            "start_ms": tracing.trace_offset_ms(),
+            "retries": 1 if extra_attempt.get() else 0,
+            "model": params.get("model_name") or params.get("model") or metadata.get("ls_model_name") or "unknown",
+            "node": metadata.get("langgraph_node") or tracing.current_node() or "none",
+            "prompt": metadata.get("prompt") or "none",
+            "session": metadata.get("thread_id") or (trace.attrs.get("session_id") if trace else None) or "none",
+            "parent_span": tracing.current_span_id(),
+        }
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, metadata=None, **kwargs: Any) -> None:
+        self._start(run_id, metadata, kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, metadata=None, **kwargs: Any) -> None:
+        self._start(run_id, metadata, kwargs)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        # 实际响应里的模型名更准确 (带版本后缀)
+        model = (response.llm_output or {}).get("model_name") or run["model"]
+        self._finish(run, model, "ok", _extract_usage(response))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        self._finish(run, run["model"], "error", {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0},
+                     error=f"{type(error).__name__}: {error}"[:200])
+
+    def _finish(self, run: Dict[str, Any], model: str, status: str, usage: Dict[str, int],
+                error: Optional[str] = None) -> None:
+        elapsed = time.perf_counter() - run["start"]
+        retries = run["retries"]
+        cost = estimate_cost(model, usage["prompt_tokens"], usage["completion_tokens"], usage["cached_tokens"])
+        flow, node, prompt = self.flow, run["node"], run["prompt"]
+        call = {"status": status, "retries": retries, "cost_usd": cost, "latency_ms": elapsed * 1000, **usage}
+
+        LLM_CALLS.inc(flow=flow, node=node, model=model, status=status)
+        LLM_LATENCY.observe(elapsed, flow=flow, node=node, model=model)
+        LLM_TOKENS.inc(usage["prompt_tokens"], flow=flow, model=model, type="prompt")
+        LLM_TOKENS.inc(usage["completion_tokens"], flow=flow, model=model, type="completion")
+        LLM_TOKENS.inc(usage["cached_tokens"], flow=flow, model=model, type="cached")
+        LLM_COST.inc(cost, flow=flow, model=model)
+        if retries:
+            LLM_RETRIES.inc(retries, flow=flow, model=model)
+        LLM_PROMPT_TOKENS.inc(usage["prompt_tokens"], prompt=prompt, type="input")
+        LLM_PROMPT_TOKENS.inc(usage["cached_tokens"], prompt=prompt, type="cached")
+        _record_session(run["session"], flow, node, call, prompt)
+
+        attrs = {"flow": flow, "prompt": prompt, "model": model, "retries": retries, "cost_usd": round(cost, 6), **usage}
+        if error:
+            attrs["error"] = error
+        tracing.add_span(f"llm {model}", "llm", run["start_ms"], elapsed * 1000, attrs,
+                         parent_id=run["parent_span"], status=status)
+        logger.debug("LLM 调用完成 flow=%s node=%s prompt=%s model=%s status=%s %.0fms tokens=%s/%s (cached %s) "
+                     "cost=$%.6f retries=%s", flow, node, prompt, model, status, elapsed * 1000, usage["prompt_tokens"],
+                     usage["completion_tokens"], usage["cached_tokens"], cost, retries)
+
+
+_handlers: Dict[str, LLMTelemetryHandler] = {}
+_handlers_lock = threading.Lock()
+
+
+def callbacks(flow: str) -> List[BaseCallbackHandler]:
+    """返回给 ChatOpenAI(callbacks=...) 使用的回调列表，同一个 flow 复用同一个处理器。"""
+    handler = _handlers.get(flow)
+    if handler is None:
+        with _handlers_lock:
+            handler = _handlers.setdefault(flow, LLMTelemetryHandler(flow))
+    return [handler]
@@ -0,0 +1,249 @@
+# metrics.py: 轻量的 Prometheus 风格指标注册表 (Counter / Gauge / Histogram)。
+"""
+不依赖 prometheus_client，输出 text exposition 格式 (0.0.4)。
+
+为了不让指标采集本身成为并发瓶颈，写入路径不加锁:
+- 每个线程持有自己的分片 (threading.local)，inc / observe 只修改本线程的字典。
+- 只有新线程首次写入 (注册分片) 和 /metrics 抓取 (汇总分片) 时才拿全局锁。
+- Flask 开发服务器每个请求一个线程，已结束线程的分片会在汇总或注册时
+  合并进 _retired 分片后丢弃，分片列表不会无限增长。
+
+用法:
+    REQUEST_LATENCY = registry.histogram("http_request_duration_seconds", "...", ["route"])
+    REQUEST_LATENCY.observe(0.12, route="/chat")
+"""
+
+import bisect
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 默认直方图分桶 (秒)，覆盖毫秒级 SQL 到数十秒的 LLM 回合
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# 超过这个数量的分片时，在注册新分片时顺便回收已结束线程的分片
+_MAX_LIVE_SHARDS = 256
+
+
+class _Shard:
+    """单个线程的指标数据。counters 兼作 gauge (允许负增量)。"""
+
+    __slots__ = ("counters", "histograms")
+
+    def __init__(self):
+        # (metric_name, label_values) -> float
+        self.counters: Dict[Tuple[str, Tuple[str, ...]], float] = {}
+        # (metric_name, label_values) -> [bucket_counts..., sum, count]
+        self.histograms: Dict[Tuple[str, Tuple[str, ...]], List[float]] = {}
+
+    def copy(self) -> "_Shard":
+        """
+        拷贝当前数据 (汇总其他线程的分片用)。dict.copy() / list() 是一次 C 调用，
+        拷贝期间所属线程写入导致字典扩容时可能抛 RuntimeError，由调用方重试；失败不会留下半份数据。
+        """
+        clone = _Shard()
+        clone.counters = self.counters.copy()
+        clone.histograms = {key: list(values) for key, values in self.histograms.copy().items()}
+        return clone
+
+    def merge_into(self, target: "_Shard") -> None:
+        for key, value in list(self.counters.items()):
+            target.counters[key] = target.counters.get(key, 0.0) + value
+        for key, values in list(self.histograms.items()):
+            existing = target.histograms.get(key)
+            if existing is None:
+                target.histograms[key] = list(values)
+            else:
+                for i, v in enumerate(values):
+                    existing[i] += v
+
+
+class _Metric:
+    def __init__(self, registry: "MetricsRegistry", name: str, help_text: str,
+                 labelnames: Sequence[str], kind: str):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, Tuple[str, ...]]:
+        return self.name, tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+
+class Counter(_Metric):
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        counters = self.registry._shard().counters
+        key = self._key(labels)
+        counters[key] = counters.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """
+    以增量方式维护的 Gauge (例如进行中的请求数)。
+    inc / dec 可以发生在不同线程，汇总时各分片相加即为当前值。
+    """
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        counters = self.registry._shard().counters
+        key = self._key(labels)
+        counters[key] = counters.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    def __init__(self, registry, name, help_text, labelnames, buckets: Sequence[float]):
+        super().__init__(registry, name, help_text, labelnames, "histogram")
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        histograms = self.registry._shard().histograms
+        key = self._key(labels)
+        slots = histograms.get(key)
+        if slots is None:
+            # 每个桶一个计数 + 一个 +Inf 桶 + sum + count
+            slots = histograms[key] = [0.0] * (len(self.buckets) + 3)
+        # 非累积计数，输出时再累加，写入只需一次二分查找
+        slots[bisect.bisect_left(self.buckets, value)] += 1
+        slots[-2] += value
+        slots[-1] += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: List[Tuple[threading.Thread, _Shard]] = []
+        self._retired = _Shard()
+
+    # --- 注册 ---
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # 模块被重复导入时返回同一个指标对象
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(self, name, help_text, tuple(labelnames), "counter"))
+
+    def gauge(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(self, name, help_text, tuple(labelnames), "gauge"))
+
+    def histogram(self, name: str, help_text: str, labelnames: Iterable[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, help_text, tuple(labelnames), buckets))
+
+    # --- 分片 ---
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = _Shard()
+            self._local.shard = shard
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+                if len(self._shards) > _MAX_LIVE_SHARDS:
+                    self._retire_dead_shards()
+        return shard
+
+    def _retire_dead_shards(self) -> None:
+        """调用方需持有 self._lock。把已结束线程的分片合并到 _retired。"""
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                shard.merge_into(self._retired)
+        self._shards = alive
+
+    def _snapshot(self) -> _Shard:
+        total = _Shard()
+        with self._lock:
+            self._retire_dead_shards()
+            self._retired.merge_into(total)
+            shards = [shard for _, shard in self._shards]
+        for shard in shards:
+            # 其他线程可能正在写自己的分片: 先拷贝 (只在拷贝失败时重试，不会重复累加或丢掉分片)，再合并拷贝
+            while True:
+                try:
+                    copied = shard.copy()
+                    break
+                except RuntimeError:
+                    continue
+            copied.merge_into(total)
+        return total
+
+    def reset(self) -> None:
+        """清空所有已采集的数据 (测试用)，指标定义保留。"""
+        with self._lock:
+            self._shards = []
+            self._retired = _Shard()
+            self._local = threading.local()
+
+    # --- 读取 ---
+    def get_value(self, name: str, **labels) -> Optional[float]:
+        """读取 counter / gauge 的当前汇总值，或 histogram 的观测次数。"""
+        metric = self._metrics.get(name)
+        if metric is None:
+            return None
+        key = metric._key(labels)
+        snapshot = self._snapshot()
+        if isinstance(metric, Histogram):
+            slots = snapshot.histograms.get(key)
+            return slots[-1] if slots else 0.0
+        return snapshot.counters.get(key, 0.0)
+
+    def render(self) -> str:
+        """生成 Prometheus text exposition 格式的文本。"""
+        snapshot = self._snapshot()
+        lines: List[str] = []
+        for metric in sorted(self._metrics.values(), key=lambda m: m.name):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if isinstance(metric, Histogram):
+                for (name, label_values), slots in sorted(snapshot.histograms.items()):
+                    if name != metric.name:
+                        continue
+                    base = _format_labels(metric.labelnames, label_values)
+                    cumulative = 0.0
+                    for bound, count in zip(metric.buckets + (float("inf"),), slots[:-2]):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else _format_number(bound)
+                        le_label = 'le="' + le + '"'
+                        lines.append(f"{name}_bucket{_join_labels(base, le_label)} {_format_number(cumulative)}")
+                    lines.append(f"{name}_sum{_join_labels(base)} {_format_number(slots[-2])}")
+                    lines.append(f"{name}_count{_join_labels(base)} {_format_number(slots[-1])}")
+            else:
+                for (name, label_values), value in sorted(snapshot.counters.items()):
+                    if name != metric.name:
+                        continue
+                    base = _format_labels(metric.labelnames, label_values)
+                    lines.append(f"{name}{_join_labels(base)} {_format_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    return ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+
+
+def _join_labels(base: str, extra: str = "") -> str:
+    parts = [p for p in (base, extra) if p]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_number(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+# 进程级默认注册表，Flask API / LangGraph / LLM 遥测共用
+registry = MetricsRegistry()
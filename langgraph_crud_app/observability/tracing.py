@@ -0,0 +1,249 @@
+# tracing.py: 单轮对话内的 span 计时与 trace id 传播。
+"""
+一次 /chat 回合 = 一个 Trace，图里每个节点、api_client 的每次 HTTP 调用都是其中的一个 Span。
+
+传播链路:
+    /chat (start_trace) -> 图节点 (traced_node) -> api_client (HTTP 头 X-Trace-Id)
+    -> Flask 端点 (g.trace_id) -> SQL 注释 /* trace_id=... */
+
+当前 Trace 存在 contextvars 里，LangGraph 在线程池里并行执行节点时会复制上下文，
+所以并行分支也能记录到同一个 Trace。没有活动 Trace 时 span() 几乎没有开销。
+"""
+
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# HTTP 头名称，api_client 发送、Flask 端点读取并回显
+TRACE_HEADER = "X-Trace-Id"
+
+# trace id 只允许这些字符，保证可以安全地拼进 SQL 注释
+_TRACE_ID_PATTERN = re.compile(r"^[A-Za-z0-9\-]{1,64}$")
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("current_trace", default=None)
+_current_span: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("current_span", default=None)
+# 当前正在执行的图节点名，不依赖活动 trace (LLM 遥测按节点打标签时用)
+_current_node: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_node", default=None)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+def sanitize_trace_id(value: Optional[str]) -> Optional[str]:
+    """校验外部传入的 trace id，不合法时返回 None。"""
+    if value and _TRACE_ID_PATTERN.match(value):
+        return value
+    return None
+
+
+class Trace:
+    """一次回合内收集到的所有 span。spans 只追加，GIL 下多线程追加是安全的。"""
+
+    def __init__(self, trace_id: Optional[str] = None, **attrs):
+        self.trace_id = sanitize_trace_id(trace_id) or new_trace_id()
+        self.attrs = attrs
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.spans: List[Dict[str, Any]] = []
+        self._ids = iter(range(1, 1 << 62))
+        self._id_lock = threading.Lock()
+
+    def _next_id(self) -> int:
+        with self._id_lock:
+            return next(self._ids)
+
+    def finish(self) -> None:
+        self.duration_ms = round((time.perf_counter() - self._t0) * 1000, 3)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "attrs": self.attrs,
+            "spans": sorted(self.spans, key=lambda s: s["start_ms"]),
+        }
+
+    def waterfall(self, width: int = 40) -> str:
+        """把 span 渲染成文本瀑布图，调试模式下直接放进响应里查看。"""
+        total = self.duration_ms or max((s["start_ms"] + s["duration_ms"] for s in self.spans), default=0.0)
+        scale = width / total if total else 0
+        depth: Dict[int, int] = {}
+        lines = [f"trace {self.trace_id}  total {total:.1f}ms"]
+        for s in sorted(self.spans, key=lambda s: s["start_ms"]):
+            level = depth.get(s["parent_id"], -1) + 1 if s["parent_id"] else 0
+            depth[s["id"]] = level
+            offset = int(s["start_ms"] * scale)
+            bar = "█" * max(1, int(s["duration_ms"] * scale))
+            label = ("  " * level + s["name"])[:38]
+            status = "" if s["status"] == "ok" else f" [{s['status']}]"
+            lines.append(f"{label:<38} {' ' * offset}{bar} {s['duration_ms']:.1f}ms{status}")
+        return "\n".join(lines)
+
+
+def start_trace(trace_id: Optional[str] = None, **attrs) -> Trace:
+    """开始一个新 Trace 并设为当前上下文的活动 Trace。"""
+    trace = Trace(trace_id, **attrs)
+    _current_trace.set(trace)
+    _current_span.set(None)
+    return trace
+
+
+def end_trace() -> Optional[Trace]:
+    """结束当前 Trace 并清除上下文，返回结束的 Trace。"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.finish()
+    _current_trace.set(None)
+    _current_span.set(None)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def current_trace_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.trace_id if trace is not None else None
+
+
+def current_node() -> Optional[str]:
+    return _current_node.get()
+
+
+def current_span_id() -> Optional[int]:
+    return _current_span.get()
+
+
+def trace_offset_ms() -> float:
+    """当前时刻相对活动 trace 开始的毫秒数，没有活动 trace 时返回 0。"""
+    trace = _current_trace.get()
+    if trace is None:
+        return 0.0
+    return round((time.perf_counter() - trace._t0) * 1000, 3)
+
+
+def add_span(name: str, kind: str, start_ms: float, duration_ms: float, attrs: Dict[str, Any],
+             parent_id: Optional[int] = None, status: str = "ok") -> None:
+    """
+    直接追加一个已完成的 span，给基于回调 (开始 / 结束分属两个函数) 的场景使用，
+    例如 LLM 回调。没有活动 trace 时忽略。
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    trace.spans.append({
+        "id": trace._next_id(),
+        "parent_id": parent_id,
+        "name": name,
+        "kind": kind,
+        "start_ms": start_ms,
+        "duration_ms": round(duration_ms, 3),
+        "status": status,
+        "attrs": attrs,
+    })
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attrs) -> Iterator[Optional[Dict[str, Any]]]:
+    """
+    记录一个 span。yield 出的字典可以在块内追加属性 (record["attrs"][...] = ...)。
+    没有活动 Trace 时 yield None，不做任何记录。
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    record = {
+        "id": trace._next_id(),
+        "parent_id": _current_span.get(),
+        "name": name,
+        "kind": kind,
+        "start_ms": round((time.perf_counter() - trace._t0) * 1000, 3),
+        "duration_ms": 0.0,
+        "status": "ok",
+        "attrs": attrs,
+    }
+    token = _current_span.set(record["id"])
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record["status"] = "error"
+        record["attrs"]["error"] = f"{type(e).__name__}: {e}"[:200]
+        raise
+    finally:
+        record["duration_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        _current_span.reset(token)
+        trace.spans.append(record)
+
+
+def traced_node(name: str, func: Callable) -> Callable:
+    """
+    包装图节点函数，每次执行记录一个 kind="node" 的 span。
+    functools.wraps 保留原签名，LangGraph 据此决定是否注入 config 等参数。
+    协程函数 (异步节点) 包成协程，span 覆盖整个 await 过程。
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            token = _current_node.set(name)
+            try:
+                with span(name, kind="node"):
+                    return await func(*args, **kwargs)
+            finally:
+                _current_node.reset(token)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _current_node.set(name)
+        try:
+            with span(name, kind="node"):
+                return func(*args, **kwargs)
+        finally:
+            _current_node.reset(token)
+    return wrapper
+
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    """解析 Server-Timing 头 (例如 "db;dur=12.3, app;dur=20.1")，返回 {名称: 毫秒}。"""
+    result: Dict[str, float] = {}
+    for item in (header or "").split(","):
+        parts = [p.strip() for p in item.split(";")]
+        if not parts or not parts[0]:
+            continue
+        for p in parts[1:]:
+            if p.startswith("dur="):
+                try:
+                    result[parts[0]] = float(p[4:])
+                except ValueError:
+                    pass
+    return result
+
+
+_export_lock = threading.Lock()
+
+
+def export_trace(trace: Trace, path: str) -> None:
+    """把 Trace 追加写入本地 JSON Lines 文件 (每行一个 Trace)，失败只记日志不影响请求。"""
+    try:
+        line = json.dumps(trace.to_dict(), ensure_ascii=False, default=str)
+        with _export_lock:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+    except OSError as e:
+        logger.warning("写入 trace 文件 %s 失败: %s", path, e)
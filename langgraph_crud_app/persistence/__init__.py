@@ -0,0 +1 @@
+# __init__.py: 初始化 persistence 模块 (LangGraph checkpoint 存储的维护)。
@@ -0,0 +1,193 @@
+# artifact_store.py: 大块不可变数据 (Schema / 数据示例) 的内容寻址存储。
+"""
+GraphState 里的 biaojiegou_save / raw_schema_result / data_sample 都是几 KB 到几十 KB
+的 JSON 字符串，初始化后基本不变，但 SqliteSaver 每个图步骤都会把它们完整序列化一次，
+节点里还会反复 json.loads 同一份字符串。
+
+这里把它们按 sha256 存进独立的 SQLite 表，GraphState 只保存引用 "cas:sha256:<hex>":
+- put(text): 写入并返回引用；小于 ARTIFACT_INLINE_LIMIT 的内容 (例如 "{}") 原样返回，
+  这样 "{}" 之类的判断和旧的 checkpoint 都不受影响。
+- resolve(value): 引用 -> 原文；不是引用的值原样返回；内容丢失时返回 None
+  (初始化路由会把它当成缺失数据，重新走初始化流程)。
+- load_json(value): 进程级解析缓存，同一份内容只 json.loads 一次。
+  返回的是共享对象，调用方不要原地修改。
+
+用法:
+    from langgraph_crud_app.persistence import artifact_store
+    return {"biaojiegou_save": artifact_store.put(formatted_schema)}
+    schema = artifact_store.resolve(state.get("biaojiegou_save"))
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from langgraph_crud_app.config import settings
+
+logger = logging.getLogger(__name__)
+
+REF_PREFIX = "cas:sha256:"
+
+# 同一份内容在进程内最多每隔这么久刷新一次 last_used，供 purge 判断是否仍在使用
+_TOUCH_INTERVAL = 3600
+
+
+def is_ref(value: Any) -> bool:
+    return isinstance(value, str) and value.startswith(REF_PREFIX)
+
+
+class ArtifactStore:
+    def __init__(self, db_path: str = settings.ARTIFACT_STORE_PATH,
+                 inline_limit: int = settings.ARTIFACT_INLINE_LIMIT,
+                 cache_size: int = settings.ARTIFACT_CACHE_SIZE):
+        self.db_path = db_path
+        self.inline_limit = inline_limit
+        self.cache_size = cache_size
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        # digest -> 原文；digest 或内联原文 -> 解析后的对象
+        self._texts: "OrderedDict[str, str]" = OrderedDict()
+        self._parsed: "OrderedDict[str, Any]" = OrderedDict()
+        self._touched: dict = {}
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """首次真正读写存储时才打开数据库 (只处理内联内容时不会创建文件)。调用方需持有 self._lock。"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS artifacts ("
+                " digest TEXT PRIMARY KEY, content TEXT NOT NULL,"
+                " size INTEGER NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)")
+            self._conn.commit()
+        return self._conn
+
+    # --- 缓存 ---
+    def _remember(self, cache: OrderedDict, key: str, value: Any) -> None:
+        with self._lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > self.cache_size:
+                cache.popitem(last=False)
+
+    def _touch(self, digest: str) -> None:
+        now = time.time()
+        if now - self._touched.get(digest, 0) < _TOUCH_INTERVAL:
+            return
+        self._touched[digest] = now
+        with self._lock:
+            self.conn.execute("UPDATE artifacts SET last_used = ? WHERE digest = ?", (now, digest))
+            self.conn.commit()
+
+    # --- 读写 ---
+    def put(self, text: Optional[str]) -> Optional[str]:
+        """保存内容并返回引用。None、非字符串、已是引用或不超过内联阈值的内容原样返回。"""
+        if not isinstance(text, str) or is_ref(text) or len(text) <= self.inline_limit:
+            return text
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        if digest not in self._texts:
+            now = time.time()
+            with self._lock:
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO artifacts (digest, content, size, created_at, last_used)"
+                    " VALUES (?, ?, ?, ?, ?)", (digest, text, len(text), now, now))
+                self.conn.commit()
+            self._touched[digest] = now
+            self._remember(self._texts, digest, text)
+        return REF_PREFIX + digest
+
+    def resolve(self, value: Any) -> Any:
+        """把引用还原成原文。非引用原样返回；存储里找不到时返回 None。"""
+        if not is_ref(value):
+            return value
+        digest = value[len(REF_PREFIX):]
+        text = self._texts.get(digest)
+        if text is None:
+            with self._lock:
+                row = self.conn.execute("SELECT content FROM artifacts WHERE digest = ?", (digest,)).fetchone()
+            if row is None:
+                logger.warning("内容寻址存储中找不到 %s，按缺失数据处理", value)
+                return None
+            text = row[0]
+            self._remember(self._texts, digest, text)
+        self._touch(digest)
+        return text
+
+    def load_json(self, value: Any) -> Any:
+        """
+        解析引用或 JSON 字符串，同一份内容只解析一次。
+        解析失败时抛出 json.JSONDecodeError (与 json.loads 一致)，失败结果不缓存。
+        """
+        key = value[len(REF_PREFIX):] if is_ref(value) else value
+        if not isinstance(key, str):
+            raise TypeError(f"load_json 需要字符串，收到 {type(value).__name__}")
+        try:
+            parsed = self._parsed[key]
+        except KeyError:
+            text = self.resolve(value)
+            if text is None:
+                raise json.JSONDecodeError("内容寻址存储中找不到该内容", str(value), 0)
+            parsed = json.loads(text)
+            self._remember(self._parsed, key, parsed)
+        return parsed
+
+    def purge(self, max_idle_seconds: float) -> int:
+        """删除超过 max_idle_seconds 没有被使用过的内容，返回删除条数。"""
+        if max_idle_seconds <= 0:
+            return 0
+        cutoff = time.time() - max_idle_seconds
+        with self._lock:
+            digests = [row[0] for row in self.conn.execute(
+                "SELECT digest FROM artifacts WHERE last_used < ?", (cutoff,))]
+            self.conn.executemany("DELETE FROM artifacts WHERE digest = ?", [(d,) for d in digests])
+            self.conn.commit()
+            for digest in digests:
+                self._texts.pop(digest, None)
+                self._parsed.pop(digest, None)
+                self._touched.pop(digest, None)
+        return len(digests)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_store: Optional[ArtifactStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ArtifactStore:
+    """进程级默认存储，首次使用时按 settings 创建。"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ArtifactStore()
+    return _store
+
+
+def set_store(store: Optional[ArtifactStore]) -> None:
+    """替换默认存储 (测试或自定义路径时使用)。"""
+    global _store
+    with _store_lock:
+        _store = store
+
+
+def put(text: Optional[str]) -> Optional[str]:
+    return get_store().put(text)
+
+
+def resolve(value: Any) -> Any:
+    return get_store().resolve(value)
+
+
+def load_json(value: Any) -> Any:
+    return get_store().load_json(value)
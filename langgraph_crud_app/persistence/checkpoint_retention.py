@@ -0,0 +1,301 @@
+# checkpoint_retention.py: langgraph_sessions.db 的保留策略、压缩和 VACUUM。
+"""
+SqliteSaver 默认永久保留每个会话的每个 checkpoint，而每个 checkpoint 都带着完整的
+schema / 数据样本 / 查询结果，库文件和 WAL 会一直增长。这里提供:
+
+- 保留策略: 每个会话 (thread_id + checkpoint_ns) 只保留最近 N 个 checkpoint；
+  超过 TTL 没有新 checkpoint 的会话整个删除。
+- 压缩: 删除后执行 PRAGMA wal_checkpoint(TRUNCATE)，把 WAL 写回主库并截断。
+- VACUUM: 按间隔定期执行，回收删除留下的空闲页。
+- CheckpointCompactor: 后台线程定期执行以上步骤，并在日志中报告前后的库大小。
+
+所有操作都通过 saver.cursor() 进行，与 SqliteSaver 自身的读写共用同一把锁；
+删除分批进行，每批提交一次，避免长时间阻塞正在进行的对话。
+
+checkpoint_id 是 uuid6，字符串按时间排序，所以 TTL 判断可以直接比较字符串，
+不需要反序列化 checkpoint。
+
+命令行:
+    python -m langgraph_crud_app.persistence.checkpoint_retention langgraph_sessions.db --vacuum
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from langgraph_crud_app.config import settings
+from langgraph_crud_app.observability.metrics import registry
+from langgraph_crud_app.persistence import artifact_store
+
+logger = logging.getLogger(__name__)
+
+# 每批最多删除的行数，批与批之间释放锁让对话请求插队
+DELETE_BATCH_SIZE = 500
+
+# uuid 时间戳起点 (1582-10-15) 到 Unix 纪元之间的 100ns 间隔数
+_UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+CHECKPOINTS_PRUNED = registry.counter(
+    "crud_checkpoints_pruned_total", "保留策略删除的 checkpoint 数", ["reason"])
+COMPACTION_RUNS = registry.counter(
+    "crud_checkpoint_compactions_total", "checkpoint 压缩执行次数", ["status"])
+
+
+def checkpoint_id_for_time(timestamp: float) -> str:
+    """构造某个时刻对应的最小 uuid6 字符串，用作按时间比较 checkpoint_id 的下界。"""
+    ts = int(timestamp * 10_000_000) + _UUID_EPOCH_OFFSET
+    value = ((ts >> 12) & 0xFFFFFFFFFFFF) << 80
+    value |= (0x6000 | (ts & 0x0FFF)) << 64
+    return str(UUID(int=value))
+
+
+def checkpoint_timestamp(checkpoint_id: str) -> Optional[float]:
+    """从 uuid6 的 checkpoint_id 中取出创建时间 (Unix 秒)，格式不对时返回 None。"""
+    try:
+        value = UUID(checkpoint_id).int
+    except (ValueError, TypeError, AttributeError):
+        return None
+    ts = (((value >> 80) & 0xFFFFFFFFFFFF) << 12) | ((value >> 64) & 0x0FFF)
+    return (ts - _UUID_EPOCH_OFFSET) / 10_000_000
+
+
+def db_size_report(saver: SqliteSaver, db_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    返回库的大小信息: 主库 / WAL 文件字节数、页数、空闲页数、会话数、checkpoint 和 writes 行数。
+    db_path 为空或 ":memory:" 时文件大小记为 0。
+    """
+    with saver.cursor(transaction=False) as cur:
+        page_size = cur.execute("PRAGMA page_size").fetchone()[0]
+        page_count = cur.execute("PRAGMA page_count").fetchone()[0]
+        freelist = cur.execute("PRAGMA freelist_count").fetchone()[0]
+        threads = cur.execute("SELECT COUNT(DISTINCT thread_id) FROM checkpoints").fetchone()[0]
+        checkpoints = cur.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+        writes = cur.execute("SELECT COUNT(*) FROM writes").fetchone()[0]
+
+    def file_size(path: str) -> int:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    on_disk = db_path and db_path != ":memory:"
+    return {
+        "db_bytes": file_size(db_path) if on_disk else 0,
+        "wal_bytes": file_size(db_path + "-wal") if on_disk else 0,
+        "page_size": page_size,
+        "page_count": page_count,
+        "freelist_pages": freelist,
+        "threads": threads,
+        "checkpoints": checkpoints,
+        "writes": writes,
+    }
+
+
+def _delete_in_batches(saver: SqliteSaver, select_sql: str, params: tuple, table: str) -> int:
+    """反复选出一批 rowid 并删除，直到没有匹配的行。返回删除总数。"""
+    total = 0
+    while True:
+        with saver.cursor() as cur:
+            rowids = [row[0] for row in cur.execute(f"{select_sql} LIMIT {DELETE_BATCH_SIZE}", params)]
+            if not rowids:
+                return total
+            placeholders = ",".join("?" * len(rowids))
+            cur.execute(f"DELETE FROM {table} WHERE rowid IN ({placeholders})", rowids)
+            total += len(rowids)
+
+
+def expire_idle_threads(saver: SqliteSaver, ttl_seconds: float, now: Optional[float] = None) -> int:
+    """删除最近一个 checkpoint 早于 now - ttl_seconds 的会话，返回删除的会话数。"""
+    if ttl_seconds <= 0:
+        return 0
+    cutoff = checkpoint_id_for_time((now if now is not None else time.time()) - ttl_seconds)
+    with saver.cursor(transaction=False) as cur:
+        expired = [row[0] for row in cur.execute(
+            "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(checkpoint_id) < ?", (cutoff,))]
+    deleted = 0
+    for thread_id in expired:
+        with saver.cursor() as cur:
+            # 加锁后再确认一次，期间会话可能刚好又有了新的 checkpoint
+            latest = cur.execute("SELECT MAX(checkpoint_id) FROM checkpoints WHERE thread_id = ?",
+                                 (thread_id,)).fetchone()[0]
+            if latest is None or latest >= cutoff:
+                continue
+            count = cur.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,)).rowcount
+            cur.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+        CHECKPOINTS_PRUNED.inc(count, reason="ttl")
+        deleted += 1
+    return deleted
+
+
+def prune_checkpoints(saver: SqliteSaver, keep_last: int) -> Dict[str, int]:
+    """
+    每个 (thread_id, checkpoint_ns) 只保留 checkpoint_id 最大的 keep_last 个，
+    并删除不再对应任何 checkpoint 的 writes。keep_last <= 0 表示不限制。
+    """
+    if keep_last <= 0:
+        return {"checkpoints": 0, "writes": 0}
+    checkpoints = _delete_in_batches(
+        saver,
+        """
+        SELECT rowid FROM (
+            SELECT rowid, ROW_NUMBER() OVER (
+                PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC
+            ) AS rn FROM checkpoints
+        ) WHERE rn > ?
+        """,
+        (keep_last,),
+        "checkpoints",
+    )
+    writes = _delete_in_batches(
+        saver,
+        """
+        SELECT w.rowid FROM writes w WHERE NOT EXISTS (
+            SELECT 1 FROM checkpoints c
+            WHERE c.thread_id = w.thread_id AND c.checkpoint_ns = w.checkpoint_ns
+              AND c.checkpoint_id = w.checkpoint_id
+        )
+        """,
+        (),
+        "writes",
+    )
+    if checkpoints:
+        CHECKPOINTS_PRUNED.inc(checkpoints, reason="keep_last")
+    return {"checkpoints": checkpoints, "writes": writes}
+
+
+def checkpoint_wal(saver: SqliteSaver) -> Optional[tuple]:
+    """把 WAL 内容写回主库并截断 WAL 文件，返回 (busy, wal 页数, 已写回页数)。"""
+    with saver.cursor(transaction=False) as cur:
+        return cur.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+
+
+def vacuum(saver: SqliteSaver) -> None:
+    """重建数据库文件回收空闲页。VACUUM 不能在事务中执行，先提交未完成的事务。"""
+    with saver.cursor(transaction=False) as cur:
+        if saver.conn.in_transaction:
+            saver.conn.commit()
+        cur.execute("VACUUM")
+
+
+def compact(saver: SqliteSaver, db_path: Optional[str] = None, keep_last: int = 0,
+            ttl_seconds: float = 0, run_vacuum: bool = False) -> Dict[str, Any]:
+    """执行一次完整的维护: TTL 过期 -> 保留最近 N 个 -> WAL checkpoint -> (可选) VACUUM。"""
+    started = time.perf_counter()
+    before = db_size_report(saver, db_path)
+    expired = expire_idle_threads(saver, ttl_seconds)
+    pruned = prune_checkpoints(saver, keep_last)
+    checkpoint_wal(saver)
+    if run_vacuum:
+        vacuum(saver)
+        # VACUUM 在 WAL 模式下会把新页写进 WAL，再截断一次
+        checkpoint_wal(saver)
+    after = db_size_report(saver, db_path)
+    return {
+        "expired_threads": expired,
+        "pruned_checkpoints": pruned["checkpoints"],
+        "pruned_writes": pruned["writes"],
+        "vacuumed": run_vacuum,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        "before": before,
+        "after": after,
+    }
+
+
+class CheckpointCompactor:
+    """
+    后台定期执行 compact()，每 vacuum_interval 秒附带一次 VACUUM。
+    传入 sessions (SessionManager) 时，空闲会话改由它过期 (先归档、再清理内存缓存)，
+    compact() 本身不再按 TTL 删除。
+    """
+
+    def __init__(self, saver: SqliteSaver, db_path: Optional[str],
+                 interval: float = settings.CHECKPOINT_COMPACTION_INTERVAL,
+                 keep_last: int = settings.CHECKPOINT_KEEP_LAST,
+                 ttl_seconds: float = settings.CHECKPOINT_THREAD_TTL,
+                 vacuum_interval: float = settings.CHECKPOINT_VACUUM_INTERVAL,
+                 sessions=None):
+        self.saver = saver
+        self.sessions = sessions
+        self.db_path = db_path
+        self.interval = interval
+        self.keep_last = keep_last
+        self.ttl_seconds = ttl_seconds
+        self.vacuum_interval = vacuum_interval
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._last_vacuum = time.monotonic()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self, force_vacuum: bool = False) -> Optional[Dict[str, Any]]:
+        run_vacuum = force_vacuum or (
+            self.vacuum_interval > 0 and time.monotonic() - self._last_vacuum >= self.vacuum_interval)
+        try:
+            expired = self.sessions.expire_idle() if self.sessions is not None else 0
+            report = compact(self.saver, self.db_path, self.keep_last,
+                             0 if self.sessions is not None else self.ttl_seconds, run_vacuum)
+        except sqlite3.Error as e:
+            COMPACTION_RUNS.inc(status="error")
+            logger.error("checkpoint 压缩失败: %s", e)
+            return None
+        if run_vacuum:
+            self._last_vacuum = time.monotonic()
+        report["expired_threads"] += expired
+        if self.sessions is not None and self.sessions.archive is not None:
+            report["purged_archives"] = self.sessions.archive.purge(settings.SESSION_ARCHIVE_RETENTION)
+        # 空闲超过会话 TTL 的 Schema / 数据示例内容不会再被任何存活的会话引用
+        report["purged_artifacts"] = artifact_store.get_store().purge(self.ttl_seconds) if self.ttl_seconds > 0 else 0
+        COMPACTION_RUNS.inc(status="ok")
+        before, after = report["before"], report["after"]
+        logger.info(
+            "checkpoint 压缩完成 (%.0fms): 过期会话 %s, 删除 checkpoint %s / writes %s, vacuum=%s, "
+            "db %s -> %s 字节, wal %s -> %s 字节",
+            report["duration_ms"], report["expired_threads"], report["pruned_checkpoints"],
+            report["pruned_writes"], run_vacuum, before["db_bytes"], after["db_bytes"],
+            before["wal_bytes"], after["wal_bytes"])
+        self.last_report = report
+        return report
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+    def start(self) -> None:
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="checkpoint-compactor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+def _main() -> None:
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="压缩 LangGraph checkpoint 数据库并报告前后大小")
+    parser.add_argument("db_path", nargs="?", default="langgraph_sessions.db")
+    parser.add_argument("--keep-last", type=int, default=settings.CHECKPOINT_KEEP_LAST)
+    parser.add_argument("--ttl-hours", type=float, default=settings.CHECKPOINT_THREAD_TTL / 3600)
+    parser.add_argument("--vacuum", action="store_true", help="同时执行 VACUUM")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db_path, check_same_thread=False)
+    try:
+        report = compact(SqliteSaver(conn), args.db_path, args.keep_last, args.ttl_hours * 3600, args.vacuum)
+    finally:
+        conn.close()
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,239 @@
+# checkpointer.py: 可插拔的 LangGraph checkpointer 后端 (多连接 SQLite / 单连接 SQLite / Postgres / 内存)。
+"""
+原来的 get_langgraph_checkpointer() 让所有 Flask 线程共用一个 sqlite3 连接，
+SqliteSaver 内部一把锁把所有会话的读写都串行化了。
+
+PooledSqliteSaver:
+- 连接池: 每次 cursor() 从池里借一个连接，用完归还；同一线程内嵌套调用复用同一个连接。
+  池空时新建连接，归还时超过 pool_size 的空闲连接直接关闭，不会因为 Flask 每请求一个线程而泄漏。
+- WAL + synchronous=NORMAL + busy_timeout: 读不阻塞写、写不阻塞读，
+  进程间 (多个 worker) 的写锁竞争交给 busy_timeout 等待，而不是直接报 "database is locked"。
+- 写入串行化: 写事务 (transaction=True) 在进程内先拿 _write_lock，避免同进程的多个写者
+  在 SQLite 层面互相 busy 重试；只读游标 (transaction=False) 不拿锁，多个会话可以并行读。
+
+create_checkpointer(backend, url) 按名字创建后端，register_backend() 可以注册新的后端；
+多节点部署时用 "postgres" (需要安装 langgraph-checkpoint-postgres 和 psycopg-pool)。
+
+create_async_checkpointer() 是 ASGI 入口 (graph.astream) 用的异步版本:
+sqlite 用 aiosqlite 连接 + AsyncSqliteSaver (同样开 WAL)，postgres 用 AsyncPostgresSaver + 异步连接池；
+register_async_backend() 注册新的异步后端，没有异步版本的后端返回 None，由调用方继续使用同步 checkpointer。
+"""
+
+import logging
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Iterator, Optional
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from langgraph_crud_app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PooledSqliteSaver(SqliteSaver):
+    """连接池版 SqliteSaver，接口与 SqliteSaver 完全一致。"""
+
+    def __init__(self, db_path: str, *, pool_size: int = settings.CHECKPOINT_POOL_SIZE,
+                 busy_timeout_ms: int = settings.CHECKPOINT_BUSY_TIMEOUT_MS,
+                 synchronous: str = settings.CHECKPOINT_SYNCHRONOUS, serde=None):
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.synchronous = synchronous
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        # 基类 __init__ 会赋值 self.conn；这个连接只用于 setup 和游标之外的直接访问
+        super().__init__(self._connect(), serde=serde)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=self.busy_timeout_ms / 1000)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        return conn
+
+    # 基类直接使用 self.conn (setup / list 的第二个游标)，这里返回当前线程借到的连接
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        return self._setup_conn
+
+    @conn.setter
+    def conn(self, value: sqlite3.Connection) -> None:
+        self._setup_conn = value
+
+    @contextmanager
+    def _borrow(self) -> Iterator[sqlite3.Connection]:
+        """借一个连接并绑定到当前线程；嵌套调用复用外层借到的连接。"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        self._local.conn, self._local.depth = conn, 0
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            if self._idle.qsize() < self.pool_size:
+                self._idle.put(conn)
+            else:
+                conn.close()
+
+    @contextmanager
+    def cursor(self, transaction: bool = True) -> Iterator[sqlite3.Cursor]:
+        if not self.is_setup:
+            with self.lock:
+                self.setup()
+        with self._borrow() as conn:
+            if not transaction:
+                cur = conn.cursor()
+                try:
+                    yield cur
+                finally:
+                    cur.close()
+                return
+            with self._write_lock:
+                cur = conn.cursor()
+                try:
+                    yield cur
+                    conn.commit()
+                except BaseException:
+                    conn.rollback()
+                    raise
+                finally:
+                    cur.close()
+
+    def close(self) -> None:
+        """关闭池里的空闲连接 (正在使用的连接归还时会被关闭)。"""
+        self.pool_size = 0
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        self._setup_conn.close()
+
+
+# --- 后端注册表 ---
+BackendFactory = Callable[[str], BaseCheckpointSaver]
+_BACKENDS: Dict[str, BackendFactory] = {}
+
+
+def register_backend(name: str, factory: BackendFactory) -> None:
+    """注册一个 checkpointer 后端。factory 接收连接串 / 文件路径，返回 BaseCheckpointSaver。"""
+    _BACKENDS[name] = factory
+
+
+def _sqlite_single(url: str) -> BaseCheckpointSaver:
+    # 旧行为: 单个连接 + SqliteSaver 自带的全局锁
+    return SqliteSaver(sqlite3.connect(url, check_same_thread=False))
+
+
+def _postgres(url: str) -> BaseCheckpointSaver:
+    try:
+        from langgraph.checkpoint.postgres import PostgresSaver
+        from psycopg.rows import dict_row
+        from psycopg_pool import ConnectionPool
+    except ImportError as e:
+        raise ImportError(
+            "postgres 后端需要安装 langgraph-checkpoint-postgres 和 psycopg[pool]: "
+            "pip install langgraph-checkpoint-postgres 'psycopg[binary,pool]'") from e
+    pool = ConnectionPool(url, max_size=settings.CHECKPOINT_POOL_SIZE, open=True,
+                          kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row})
+    saver = PostgresSaver(pool)
+    saver.setup()
+    return saver
+
+
+register_backend("sqlite", PooledSqliteSaver)
+register_backend("sqlite_single", _sqlite_single)
+register_backend("postgres", _postgres)
+# 进程内存，重启即丢失，只用于本地调试和测试
+register_backend("memory", lambda url: InMemorySaver())
+
+
+def create_checkpointer(backend: Optional[str] = None, url: Optional[str] = None) -> BaseCheckpointSaver:
+    """按名字创建 checkpointer，默认取 settings.CHECKPOINT_BACKEND / CHECKPOINT_DB_URL。"""
+    backend = backend or settings.CHECKPOINT_BACKEND
+    url = url or settings.CHECKPOINT_DB_URL
+    factory = _BACKENDS.get(backend)
+    if factory is None:
+        raise ValueError(f"未知的 checkpointer 后端: {backend} (可选: {', '.join(sorted(_BACKENDS))})")
+    logger.info("创建 checkpointer: backend=%s", backend)
+    return factory(url)
+
+
+# --- 异步后端注册表 ---
+AsyncBackendFactory = Callable[[str], Awaitable[BaseCheckpointSaver]]
+_ASYNC_BACKENDS: Dict[str, AsyncBackendFactory] = {}
+
+
+def register_async_backend(name: str, factory: AsyncBackendFactory) -> None:
+    """注册一个异步 checkpointer 后端。factory 是协程函数，接收连接串 / 文件路径。"""
+    _ASYNC_BACKENDS[name] = factory
+
+
+async def _async_sqlite(url: str) -> BaseCheckpointSaver:
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    conn = await aiosqlite.connect(url, timeout=settings.CHECKPOINT_BUSY_TIMEOUT_MS / 1000)
+    await conn.execute("PRAGMA journal_mode=WAL")
+    await conn.execute(f"PRAGMA synchronous={settings.CHECKPOINT_SYNCHRONOUS}")
+    await conn.execute(f"PRAGMA busy_timeout={int(settings.CHECKPOINT_BUSY_TIMEOUT_MS)}")
+    saver = AsyncSqliteSaver(conn)
+    await saver.setup()
+    return saver
+
+
+async def _async_postgres(url: str) -> BaseCheckpointSaver:
+    try:
+        from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+        from psycopg.rows import dict_row
+        from psycopg_pool import AsyncConnectionPool
+    except ImportError as e:
+        raise ImportError(
+            "postgres 后端需要安装 langgraph-checkpoint-postgres 和 psycopg[pool]: "
+            "pip install langgraph-checkpoint-postgres 'psycopg[binary,pool]'") from e
+    pool = AsyncConnectionPool(url, max_size=settings.CHECKPOINT_POOL_SIZE, open=False,
+                               kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row})
+    await pool.open()
+    saver = AsyncPostgresSaver(pool)
+    await saver.setup()
+    return saver
+
+
+# AsyncSqliteSaver 只有一个 aiosqlite 连接，但连接上的操作在它自己的线程里排队执行，不占用事件循环
+register_async_backend("sqlite", _async_sqlite)
+register_async_backend("sqlite_single", _async_sqlite)
+register_async_backend("postgres", _async_postgres)
+
+
+async def create_async_checkpointer(backend: Optional[str] = None,
+                                    url: Optional[str] = None) -> Optional[BaseCheckpointSaver]:
+    """按名字创建异步 checkpointer；该后端没有异步版本时返回 None (例如 memory，同步实例本身就支持异步接口)。"""
+    backend = backend or settings.CHECKPOINT_BACKEND
+    url = url or settings.CHECKPOINT_DB_URL
+    factory = _ASYNC_BACKENDS.get(backend)
+    if factory is None:
+        if backend not in _BACKENDS:
+            raise ValueError(f"未知的 checkpointer 后端: {backend} (可选: {', '.join(sorted(_BACKENDS))})")
+        return None
+    logger.info("创建异步 checkpointer: backend=%s", backend)
+    return await factory(url)
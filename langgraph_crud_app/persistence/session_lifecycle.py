@@ -0,0 +1,250 @@
+# session_lifecycle.py: 会话 (thread_id) 的活跃时间跟踪、空闲过期、归档和内存缓存清理。
+"""
+/chat 以 session_id 作为 thread_id，会话状态一直留在 checkpointer 里；
+用户放弃的会话会带着暂存的待确认操作 (save_content / lastest_content_production 等)
+和各种按会话缓存的内存数据永久存在。
+
+SessionManager:
+- touch(session_id): /chat 每回合调用，记录进程内的最近活跃时间；
+  重启后以最新 checkpoint 的时间 (uuid6 checkpoint_id) 为准。
+- list_sessions(): 列出存活会话及其占用 (checkpoint 数、字节数；要求时附带暂存操作)，供管理接口使用。
+- expire_idle(): 空闲超过 TTL 的会话先把最终状态压缩归档到 SessionArchive，
+  再从 checkpointer 删除 (包括 write-behind 缓冲)，并清理按会话缓存的内存数据
+  (LLM 用量聚合，以及通过 register_eviction_hook 注册的其他缓存)。
+- expire(session_id): 立即过期单个会话。
+
+SessionArchive 是单独的 SQLite 文件，每个会话一行: 最终状态用 checkpointer 的 serde 序列化后 zlib 压缩；
+超过保留期的归档在 purge() 时删除。
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from langgraph_crud_app.config import settings
+from langgraph_crud_app.observability import llm_telemetry
+from langgraph_crud_app.observability.metrics import registry
+from langgraph_crud_app.persistence.checkpoint_retention import checkpoint_id_for_time, checkpoint_timestamp
+
+logger = logging.getLogger(__name__)
+
+SESSIONS_EXPIRED = registry.counter(
+    "crud_sessions_expired_total", "过期删除的会话数", ["reason"])
+SESSIONS_ARCHIVED_BYTES = registry.counter(
+    "crud_session_archive_bytes_total", "写入归档的压缩后字节数")
+
+# 会话过期时调用的清理函数，参数为 session_id
+_eviction_hooks: List[Callable[[str], None]] = [llm_telemetry.forget_session]
+
+
+def register_eviction_hook(hook: Callable[[str], None]) -> None:
+    """注册一个会话过期时的清理函数 (例如按 session_id 缓存数据的模块)。"""
+    if hook not in _eviction_hooks:
+        _eviction_hooks.append(hook)
+
+
+def _sqlite_saver(saver: BaseCheckpointSaver) -> Optional[SqliteSaver]:
+    """取出 (可能被 WriteBehindSaver 包装的) 底层 SqliteSaver，用于直接 SQL 统计。"""
+    inner = getattr(saver, "inner", saver)
+    return inner if isinstance(inner, SqliteSaver) else None
+
+
+class SessionArchive:
+    """过期会话最终状态的压缩归档。"""
+
+    def __init__(self, db_path: str = settings.SESSION_ARCHIVE_PATH):
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # 首次使用时才建库，避免只 import 就在工作目录下生成文件
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS session_archive ("
+                "thread_id TEXT PRIMARY KEY, archived_at REAL NOT NULL, last_activity REAL, "
+                "type TEXT NOT NULL, state BLOB NOT NULL, raw_bytes INTEGER NOT NULL)")
+            self._conn.commit()
+        return self._conn
+
+    def save(self, thread_id: str, last_activity: Optional[float], type_: str, data: bytes) -> int:
+        """压缩并保存会话最终状态，返回压缩后字节数。同一会话再次归档时覆盖。"""
+        blob = zlib.compress(data, 6)
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO session_archive VALUES (?, ?, ?, ?, ?, ?)",
+                (thread_id, time.time(), last_activity, type_, blob, len(data)))
+            self.conn.commit()
+        return len(blob)
+
+    def load(self, thread_id: str, serde) -> Optional[Dict[str, Any]]:
+        """还原归档的最终状态 (channel_values)，没有归档时返回 None。"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT type, state FROM session_archive WHERE thread_id = ?", (thread_id,)).fetchone()
+        if row is None:
+            return None
+        return serde.loads_typed((row[0], zlib.decompress(row[1])))
+
+    def purge(self, retention_seconds: float) -> int:
+        """删除归档时间早于 retention_seconds 之前的归档，返回删除条数。"""
+        if retention_seconds <= 0:
+            return 0
+        with self._lock:
+            count = self.conn.execute("DELETE FROM session_archive WHERE archived_at < ?",
+                                      (time.time() - retention_seconds,)).rowcount
+            self.conn.commit()
+        return count
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class SessionManager:
+    def __init__(self, saver: BaseCheckpointSaver, archive: Optional[SessionArchive] = None,
+                 ttl_seconds: float = settings.CHECKPOINT_THREAD_TTL):
+        self.saver = saver
+        self.archive = archive
+        self.ttl_seconds = ttl_seconds
+        self._last_seen: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def touch(self, session_id: str, now: Optional[float] = None) -> None:
+        with self._lock:
+            self._last_seen[str(session_id)] = now if now is not None else time.time()
+
+    # --- 统计 ---
+    def _stored_sessions(self) -> Dict[str, Dict[str, Any]]:
+        """checkpointer 中的会话: {thread_id: {"last_activity", "checkpoints", "bytes"}}。"""
+        sessions: Dict[str, Dict[str, Any]] = {}
+        sqlite_saver = _sqlite_saver(self.saver)
+        if sqlite_saver is not None:
+            with sqlite_saver.cursor(transaction=False) as cur:
+                for thread_id, count, latest, size in cur.execute(
+                        "SELECT thread_id, COUNT(*), MAX(checkpoint_id), "
+                        "SUM(LENGTH(checkpoint) + LENGTH(metadata)) FROM checkpoints GROUP BY thread_id"):
+                    sessions[thread_id] = {"last_activity": checkpoint_timestamp(latest),
+                                           "checkpoints": count, "bytes": size or 0}
+                for thread_id, size in cur.execute(
+                        "SELECT thread_id, SUM(LENGTH(value)) FROM writes GROUP BY thread_id"):
+                    if thread_id in sessions:
+                        sessions[thread_id]["bytes"] += size or 0
+            return sessions
+        # 其他后端: 逐个遍历 checkpoint (会反序列化，只适合内存后端 / 小规模)
+        for tup in self.saver.list(None):
+            thread_id = tup.config["configurable"]["thread_id"]
+            info = sessions.setdefault(thread_id, {"last_activity": None, "checkpoints": 0, "bytes": 0})
+            info["checkpoints"] += 1
+            ts = checkpoint_timestamp(tup.checkpoint["id"])
+            if ts is not None and (info["last_activity"] is None or ts > info["last_activity"]):
+                info["last_activity"] = ts
+        return sessions
+
+    def list_sessions(self, now: Optional[float] = None, limit: Optional[int] = None,
+                      include_staged: bool = False) -> List[Dict[str, Any]]:
+        """
+        存活会话列表，按最近活跃时间倒序，最多 limit 条 (默认 settings.SESSION_LIST_LIMIT)。
+        先排序截断再组装每一行；include_staged 时才读取 (反序列化) 各会话最新 checkpoint 里的暂存操作。
+        """
+        now = now if now is not None else time.time()
+        limit = settings.SESSION_LIST_LIMIT if limit is None else limit
+        sessions = self._stored_sessions()
+        with self._lock:
+            last_seen = dict(self._last_seen)
+        latest = {}
+        for thread_id in set(sessions) | set(last_seen):
+            stored = sessions.get(thread_id, {}).get("last_activity")
+            latest[thread_id] = max(filter(None, (stored, last_seen.get(thread_id))), default=None)
+        kept = sorted(latest, key=lambda tid: latest[tid] or 0, reverse=True)[:max(limit, 0)]
+        buffered = {key[0] for key in list(getattr(self.saver, "_pending", {}))}
+        result = []
+        for thread_id in kept:
+            info = sessions.get(thread_id, {"checkpoints": 0, "bytes": 0})
+            last = latest[thread_id]
+            item = {
+                "session_id": thread_id,
+                "last_activity": last,
+                "idle_seconds": round(now - last, 1) if last is not None else None,
+                "checkpoints": info["checkpoints"],
+                "bytes": info["bytes"],
+                "buffered": thread_id in buffered,
+                "llm_calls": llm_telemetry.session_summary(thread_id)["total"]["calls"],
+            }
+            if include_staged:
+                item["staged_operation"] = self._staged_operation(thread_id)
+            result.append(item)
+        return result
+
+    def _staged_operation(self, thread_id: str) -> Optional[str]:
+        tup = self.saver.get_tuple({"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}})
+        if tup is None:
+            return None
+        return tup.checkpoint["channel_values"].get("save_content")
+
+    # --- 过期 ---
+    def _idle_candidates(self, now: float) -> List[str]:
+        cutoff = now - self.ttl_seconds
+        with self._lock:
+            last_seen = dict(self._last_seen)
+        sqlite_saver = _sqlite_saver(self.saver)
+        if sqlite_saver is not None:
+            with sqlite_saver.cursor(transaction=False) as cur:
+                stored = [row[0] for row in cur.execute(
+                    "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(checkpoint_id) < ?",
+                    (checkpoint_id_for_time(cutoff),))]
+        else:
+            stored = [tid for tid, info in self._stored_sessions().items()
+                      if info["last_activity"] is not None and info["last_activity"] < cutoff]
+        # 进程内最近访问过的会话即使 checkpoint 较旧也不过期 (例如 write-behind 尚未落盘)
+        candidates = {tid for tid in stored if last_seen.get(tid, 0) < cutoff}
+        candidates |= {tid for tid, ts in last_seen.items() if ts < cutoff}
+        return sorted(candidates)
+
+    def expire(self, session_id: str, reason: str = "manual", last_activity: Optional[float] = None) -> bool:
+        """归档并删除一个会话，清理它的内存缓存。会话不存在时返回 False。"""
+        session_id = str(session_id)
+        tup = self.saver.get_tuple({"configurable": {"thread_id": session_id, "checkpoint_ns": ""}})
+        if tup is not None and self.archive is not None:
+            type_, data = self.saver.serde.dumps_typed(tup.checkpoint["channel_values"])
+            size = self.archive.save(session_id, last_activity or checkpoint_timestamp(tup.checkpoint["id"]),
+                                     type_, data)
+            SESSIONS_ARCHIVED_BYTES.inc(size)
+        self.saver.delete_thread(session_id)
+        with self._lock:
+            known = self._last_seen.pop(session_id, None) is not None
+        for hook in _eviction_hooks:
+            try:
+                hook(session_id)
+            except Exception as e:
+                logger.warning("会话 %s 的缓存清理失败: %s", session_id, e)
+        if tup is None and not known:
+            return False
+        SESSIONS_EXPIRED.inc(reason=reason)
+        logger.info("会话已过期并删除: session_id=%s, reason=%s, archived=%s",
+                    session_id, reason, tup is not None and self.archive is not None)
+        return True
+
+    def expire_idle(self, now: Optional[float] = None) -> int:
+        """过期所有空闲超过 TTL 的会话，返回过期的会话数。ttl_seconds <= 0 时不做任何事。"""
+        if self.ttl_seconds <= 0:
+            return 0
+        now = now if now is not None else time.time()
+        expired = 0
+        for session_id in self._idle_candidates(now):
+            # 再确认一次，期间会话可能刚好有新的请求
+            with self._lock:
+                if self._last_seen.get(session_id, 0) >= now - self.ttl_seconds:
+                    continue
+            if self.expire(session_id, reason="ttl"):
+                expired += 1
+        return expired
@@ -0,0 +1,299 @@
+# write_behind.py: 只在回合边界落盘的 checkpointer 包装器。
+"""
+/chat 用 stream_mode="values" 跑图时，每个节点 (superstep) 结束都会 put 一次完整状态；
+新增 / 复合流程一回合经过 6~10 个节点，一条用户消息就是 6~10 次整状态写入。
+
+WriteBehindSaver 包在任意 checkpointer 外面:
+- put / put_writes 先缓存在内存里，同一会话只保留最新的 checkpoint 及其 pending writes，
+  被后续 checkpoint 覆盖的中间状态直接丢弃 (效果等同于 LangGraph 的 durability="exit")。
+- 读 (get_tuple) 优先返回缓存中的最新 checkpoint，图内和 /chat 看到的状态与逐步落盘时一致。
+- 以下情况立即落盘 (flush):
+  1. 本步改变了暂存确认相关字段的值 (save_content / lastest_content_production / content_* 等)，
+     保证 "已暂存待确认" 和 "已执行并清空暂存" 这两个转变不会因为进程崩溃而丢失或重放；
+  2. 写入了中断 (__interrupt__) 或错误 (__error__)；
+  3. 回合结束时调用方显式调用 flush(config) (/chat 在 finally 里调用)；
+  4. 进程正常退出时 (atexit)。
+- 进程在回合中途崩溃时，丢失的只是本回合尚未落盘的中间步骤，会话回到上一个已落盘的状态。
+
+异步接口 (aput / aget_tuple / aflush ...，graph.astream 使用) 共用同一份缓冲，落盘走 ainner:
+默认就是 inner，ASGI 入口会把指向同一个库的异步存储 (AsyncSqliteSaver 等) 挂到 ainner 上。
+
+不支持 DeltaChannel 类型的通道 (本项目的 GraphState 只用普通的 LastValue 通道)。
+"""
+
+import atexit
+import logging
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver, ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple, copy_checkpoint,
+)
+
+from langgraph_crud_app.observability.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# 修改了这些通道的 checkpoint 立即落盘 (两阶段确认流程的暂存数据)
+STAGED_CHANNELS = frozenset({
+    "save_content",
+    "lastest_content_production",
+    "content_modify",
+    "content_new",
+    "content_delete",
+    "content_combined",
+    "delete_array",
+    "delete_show",
+    "pending_confirmation_type",
+})
+
+# 写入这些通道 (中断 / 节点异常) 时立即落盘，便于恢复和排查
+_FLUSH_WRITE_CHANNELS = frozenset({"__interrupt__", "__error__"})
+
+CHECKPOINT_PUTS = registry.counter(
+    "crud_checkpoint_puts_total", "图步骤产生的 checkpoint 数 (按是否真正落盘区分)", ["result"])
+CHECKPOINT_FLUSH_LATENCY = registry.histogram(
+    "crud_checkpoint_flush_duration_seconds", "write-behind 落盘耗时", ["reason"])
+
+
+class _Pending:
+    """一个 (thread_id, checkpoint_ns) 上尚未落盘的最新 checkpoint。"""
+
+    __slots__ = ("parent_config", "config", "checkpoint", "metadata", "new_versions", "writes")
+
+    def __init__(self, parent_config: RunnableConfig):
+        # 第一个被缓存的 put 的 config，指向最后一个已落盘的 checkpoint，落盘时作为父节点
+        self.parent_config = parent_config
+        self.config: RunnableConfig = parent_config
+        self.checkpoint: Optional[Checkpoint] = None
+        self.metadata: Optional[CheckpointMetadata] = None
+        self.new_versions: Dict[str, Any] = {}
+        # (task_id, writes, task_path)，只属于当前缓存的 checkpoint
+        self.writes: List[Tuple[str, Sequence[Tuple[str, Any]], str]] = []
+
+
+def _key(config: RunnableConfig) -> Tuple[str, str]:
+    configurable = config["configurable"]
+    return str(configurable["thread_id"]), configurable.get("checkpoint_ns", "")
+
+
+class WriteBehindSaver(BaseCheckpointSaver):
+    def __init__(self, inner: BaseCheckpointSaver, staged_channels=STAGED_CHANNELS,
+                 ainner: Optional[BaseCheckpointSaver] = None):
+        super().__init__(serde=inner.serde)
+        self.inner = inner
+        # 异步接口落盘 / 读取用的存储，需要和 inner 指向同一份数据
+        self.ainner = ainner or inner
+        self.staged_channels = frozenset(staged_channels)
+        self._pending: Dict[Tuple[str, str], _Pending] = {}
+        # 每个会话最近一次落盘时暂存字段的值；节点把 None 再写成 None 之类的写入不触发落盘
+        self._staged_values: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    @property
+    def config_specs(self) -> list:
+        return self.inner.config_specs
+
+    def get_next_version(self, current, channel):
+        return self.inner.get_next_version(current, channel)
+
+    # --- 缓冲 (同步 / 异步接口共用) ---
+    def _buffer_put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                    new_versions: ChannelVersions) -> Tuple[Tuple[str, str], bool]:
+        """缓存 checkpoint，返回 (key, 是否需要立即落盘)。"""
+        key = _key(config)
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = _Pending(config)
+            pending.config = config
+            pending.checkpoint = copy_checkpoint(checkpoint)
+            pending.metadata = metadata
+            pending.new_versions.update(new_versions)
+            pending.writes = []
+            staged_changed = self._staged_changed(key, checkpoint, new_versions)
+        CHECKPOINT_PUTS.inc(result="buffered")
+        return key, staged_changed
+
+    def _buffer_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                       task_path: str) -> bool:
+        """写入属于缓存中的 checkpoint 时缓存下来并返回 True，否则返回 False (由调用方透传)。"""
+        key = _key(config)
+        checkpoint_id = config["configurable"].get("checkpoint_id")
+        with self._lock:
+            pending = self._pending.get(key)
+            buffered = pending is not None and pending.checkpoint is not None and pending.checkpoint["id"] == checkpoint_id
+            if buffered:
+                pending.writes.append((task_id, list(writes), task_path))
+        return buffered
+
+    @staticmethod
+    def _saved_config(key: Tuple[str, str], checkpoint: Checkpoint) -> RunnableConfig:
+        return {"configurable": {"thread_id": key[0], "checkpoint_ns": key[1], "checkpoint_id": checkpoint["id"]}}
+
+    # --- 写 ---
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        key, staged_changed = self._buffer_put(config, checkpoint, metadata, new_versions)
+        if staged_changed:
+            self._flush_key(key, "staged")
+        return self._saved_config(key, checkpoint)
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        if not self._buffer_writes(config, writes, task_id, task_path):
+            # 针对已落盘 checkpoint 的写入直接透传
+            self.inner.put_writes(config, writes, task_id, task_path)
+        elif any(channel in _FLUSH_WRITE_CHANNELS for channel, _ in writes):
+            self._flush_key(_key(config), "interrupt")
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        key, staged_changed = self._buffer_put(config, checkpoint, metadata, new_versions)
+        if staged_changed:
+            await self._aflush_key(key, "staged")
+        return self._saved_config(key, checkpoint)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        if not self._buffer_writes(config, writes, task_id, task_path):
+            await self.ainner.aput_writes(config, writes, task_id, task_path)
+        elif any(channel in _FLUSH_WRITE_CHANNELS for channel, _ in writes):
+            await self._aflush_key(_key(config), "interrupt")
+
+    def _staged_changed(self, key: Tuple[str, str], checkpoint: Checkpoint, new_versions: ChannelVersions) -> bool:
+        touched = self.staged_channels.intersection(new_versions)
+        if not touched:
+            return False
+        last = self._staged_values.get(key)
+        if last is None:
+            # 不知道已落盘的值 (例如进程重启后的第一次写入)，保守地落盘
+            return True
+        values = checkpoint["channel_values"]
+        return any(values.get(channel) != last.get(channel) for channel in touched)
+
+    # --- 落盘 ---
+    def _take(self, key: Tuple[str, str]) -> Optional[_Pending]:
+        with self._lock:
+            pending = self._pending.pop(key, None)
+        if pending is None or pending.checkpoint is None:
+            return None
+        return pending
+
+    def _flushed(self, key: Tuple[str, str], pending: _Pending, reason: str, start: float) -> None:
+        values = pending.checkpoint["channel_values"]
+        with self._lock:
+            self._staged_values[key] = {channel: values.get(channel) for channel in self.staged_channels}
+        CHECKPOINT_PUTS.inc(result="flushed")
+        CHECKPOINT_FLUSH_LATENCY.observe(time.perf_counter() - start, reason=reason)
+
+    def _flush_key(self, key: Tuple[str, str], reason: str) -> None:
+        pending = self._take(key)
+        if pending is None:
+            return
+        start = time.perf_counter()
+        saved_config = self.inner.put(pending.parent_config, pending.checkpoint, pending.metadata,
+                                      pending.new_versions)
+        for task_id, writes, task_path in pending.writes:
+            self.inner.put_writes(saved_config, writes, task_id, task_path)
+        self._flushed(key, pending, reason, start)
+
+    async def _aflush_key(self, key: Tuple[str, str], reason: str) -> None:
+        pending = self._take(key)
+        if pending is None:
+            return
+        start = time.perf_counter()
+        saved_config = await self.ainner.aput(pending.parent_config, pending.checkpoint, pending.metadata,
+                                              pending.new_versions)
+        for task_id, writes, task_path in pending.writes:
+            await self.ainner.aput_writes(saved_config, writes, task_id, task_path)
+        self._flushed(key, pending, reason, start)
+
+    def _flush_keys(self, config: Optional[RunnableConfig]) -> List[Tuple[str, str]]:
+        with self._lock:
+            if config is None:
+                return list(self._pending)
+            thread_id = str(config["configurable"]["thread_id"])
+            return [k for k in self._pending if k[0] == thread_id]
+
+    def flush(self, config: Optional[RunnableConfig] = None) -> None:
+        """把某个会话 (config 为 None 时为全部会话) 缓存的 checkpoint 写入底层存储。"""
+        for key in self._flush_keys(config):
+            try:
+                self._flush_key(key, "turn_end" if config is not None else "all")
+            except Exception as e:
+                logger.error("checkpoint 落盘失败 (thread_id=%s): %s", key[0], e)
+                if config is not None:
+                    raise
+
+    async def aflush(self, config: Optional[RunnableConfig] = None) -> None:
+        """flush 的异步版本，通过 ainner 落盘。"""
+        for key in self._flush_keys(config):
+            try:
+                await self._aflush_key(key, "turn_end" if config is not None else "all")
+            except Exception as e:
+                logger.error("checkpoint 落盘失败 (thread_id=%s): %s", key[0], e)
+                if config is not None:
+                    raise
+
+    # --- 读 ---
+    def _buffered_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        key = _key(config)
+        checkpoint_id = config["configurable"].get("checkpoint_id")
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None or pending.checkpoint is None or checkpoint_id not in (None, pending.checkpoint["id"]):
+                return None
+            parent_id = pending.parent_config["configurable"].get("checkpoint_id")
+            return CheckpointTuple(
+                config=self._saved_config(key, pending.checkpoint),
+                checkpoint=copy_checkpoint(pending.checkpoint),
+                metadata=pending.metadata,
+                parent_config=({"configurable": {"thread_id": key[0], "checkpoint_ns": key[1],
+                                                 "checkpoint_id": parent_id}} if parent_id else None),
+                pending_writes=[(task_id, channel, value)
+                                for task_id, writes, _ in pending.writes for channel, value in writes],
+            )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        buffered = self._buffered_tuple(config)
+        return buffered if buffered is not None else self.inner.get_tuple(config)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        buffered = self._buffered_tuple(config)
+        return buffered if buffered is not None else await self.ainner.aget_tuple(config)
+
+    @staticmethod
+    def _thread_config(config: Optional[RunnableConfig]) -> Optional[RunnableConfig]:
+        return config if config and "thread_id" in config.get("configurable", {}) else None
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        # 历史查询很少，先落盘再交给底层存储
+        self.flush(self._thread_config(config))
+        return self.inner.list(config, filter=filter, before=before, limit=limit)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None,
+                    limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        await self.aflush(self._thread_config(config))
+        async for tup in self.ainner.alist(config, filter=filter, before=before, limit=limit):
+            yield tup
+
+    def _forget_thread(self, thread_id: str) -> None:
+        with self._lock:
+            for key in [k for k in self._pending if k[0] == str(thread_id)]:
+                del self._pending[key]
+            for key in [k for k in self._staged_values if k[0] == str(thread_id)]:
+                del self._staged_values[key]
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._forget_thread(thread_id)
+        self.inner.delete_thread(thread_id)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self._forget_thread(thread_id)
+        await self.ainner.adelete_thread(thread_id)
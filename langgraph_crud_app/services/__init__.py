@@ -1,13 +1,14 @@
 # __init__.py: 初始化 services 模块。
+# 子模块在首次访问时才导入 (PEP 562)，例如 app.py 只用到 api_client 时不会加载 LLM 服务。
 
-from . import api_client
-from . import data_processor
-from . import llm # 导入 llm 子模块
+import importlib
 
 # 明确导出，以便可以直接从 services 导入
 __all__ = [
+    "analysis_digest",
     "api_client",
     "data_processor",
+    "intent_rules",
     "llm", # 导出 llm 模块本身
     # 也可以直接导出 llm 子模块中的具体服务，如果常用
     "llm_add_service",
@@ -15,14 +16,28 @@ __all__ = [
     "llm_modify_service",
     "llm_preprocessing_service",
     "llm_query_service",
+    "result_renderer",
+    "schema_index",
+    "schema_notation",
 ]
 
-# 为了能够直接使用 services.llm_add_service 导入
-# 需要从 llm 子模块中导入具体服务
-from .llm import (
-    llm_add_service,
-    llm_flow_control_service,
-    llm_modify_service,
-    llm_preprocessing_service,
-    llm_query_service,
-) 
\ No newline at end of file
+# 为了能够直接使用 services.llm_add_service 导入，这些名字转到 llm 子模块
+_LLM_SERVICES = {
+    "llm_add_service",
+    "llm_flow_control_service",
+    "llm_modify_service",
+    "llm_preprocessing_service",
+    "llm_query_service",
+}
+
+
+def __getattr__(name):
+    if name in _LLM_SERVICES:
+        return importlib.import_module(f"{__name__}.llm.{name}")
+    if name in __all__:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
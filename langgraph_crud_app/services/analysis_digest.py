@@ -0,0 +1,192 @@
+# analysis_digest.py: 分析结果的本地统计摘要，analyze_analysis_result 把它代替原始行发给 LLM。
+"""
+analyze_analysis_result 原来把完整的 sql_result 发给 LLM 找趋势和异常，结果行数一多 token 和耗时都线性增长，
+还可能超出上下文。这里先在本地按列计算统计，LLM 只拿到一份大小基本固定的摘要:
+
+- 按列一次取出所有值 (列式)，判断列类型: 数值 (含 Decimal 序列化成的数字字符串) / 日期 (ISO 或 Flask jsonify 的 RFC 1123 格式) / 分类
+- 数值列: count / nulls / sum / mean / std / min / max / p25 / p50 / p75 / p90；值都非负时给出占总和最多的 top-k (按标签列)；
+  IQR 规则 (超出 [Q1 - 1.5·IQR, Q3 + 1.5·IQR]) 标记异常值
+- 分类列: 不同取值数和出现次数最多的 top-k 及占比
+- 日期列: 时间范围；对每个数值列按日期排序做最小二乘，给出每天的斜率和首尾变化率
+- 前 settings.ANALYSIS_DIGEST_SAMPLE_ROWS 行原始数据 (结果较小时就是全部数据)
+
+标签列是第一个分类列 (GROUP BY 的维度)，没有时用第一个日期列，再没有就用行号。
+依赖只有标准库 (statistics / datetime)；分析结果通常是聚合后的几十到几千行，纯 Python 列式计算在毫秒级。
+"""
+
+import json
+import math
+import re
+import statistics
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional
+
+from langgraph_crud_app.config import settings
+
+_NUMBER = re.compile(r"^[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?$")
+_ISO_DATE = re.compile(r"^\d{4}-\d{1,2}(-\d{1,2})?([ T]\d{1,2}:\d{2}(:\d{2}(\.\d+)?)?)?$")
+_RFC_DATE = re.compile(r"^[A-Z][a-z]{2}, \d{1,2} [A-Z][a-z]{2} \d{4} \d{2}:\d{2}:\d{2}")
+
+
+def _as_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) if math.isfinite(value) else None
+    if isinstance(value, str) and _NUMBER.match(value.strip()):
+        return float(value)
+    return None
+
+
+def _as_date(value: Any) -> Optional[datetime]:
+    if not isinstance(value, str):
+        return None
+    text = value.strip()
+    try:
+        if _ISO_DATE.match(text):
+            if len(text.split("-")) == 2:  # "2024-05" 按月初
+                text += "-01"
+            return datetime.fromisoformat(text)
+        if _RFC_DATE.match(text):
+            return parsedate_to_datetime(text).replace(tzinfo=None)
+    except ValueError:
+        return None
+    return None
+
+
+def _round(value: float) -> float:
+    return round(value, 4)
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """线性插值分位数 (与 numpy.percentile 默认方法一致)。"""
+    pos = (len(sorted_values) - 1) * q
+    low = math.floor(pos)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (pos - low)
+
+
+def _column_kind(values: List[Any]) -> str:
+    present = [v for v in values if v is not None and v != ""]
+    if not present:
+        return "empty"
+    if all(_as_number(v) is not None for v in present):
+        return "numeric"
+    if all(_as_date(v) is not None for v in present):
+        return "date"
+    return "category"
+
+
+def _numeric_stats(values: List[Optional[float]], labels: List[str], top_k: int) -> Dict[str, Any]:
+    pairs = [(label, v) for label, v in zip(labels, values) if v is not None]
+    nums = sorted(v for _, v in pairs)
+    total = math.fsum(nums)
+    q1, q3 = _percentile(nums, 0.25), _percentile(nums, 0.75)
+    stats = {
+        "kind": "numeric", "count": len(nums), "nulls": len(values) - len(nums),
+        "sum": _round(total), "mean": _round(total / len(nums)),
+        "std": _round(statistics.pstdev(nums)) if len(nums) > 1 else 0.0,
+        "min": _round(nums[0]), "max": _round(nums[-1]),
+        "p25": _round(q1), "p50": _round(_percentile(nums, 0.5)), "p75": _round(q3),
+        "p90": _round(_percentile(nums, 0.9)),
+    }
+    if total > 0 and nums[0] >= 0:
+        ranked = sorted(pairs, key=lambda p: p[1], reverse=True)[:top_k]
+        stats["top_shares"] = [{"label": label, "value": _round(v), "share": _round(v / total)} for label, v in ranked]
+    # 至少 4 个值时才用 IQR 判断异常
+    if len(nums) >= 4:
+        iqr = q3 - q1
+        low, high = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+        flagged = [(label, v) for label, v in pairs if v < low or v > high]
+        if flagged:
+            flagged.sort(key=lambda p: max(low - p[1], p[1] - high), reverse=True)
+            stats["outliers"] = {
+                "count": len(flagged), "bounds": [_round(low), _round(high)],
+                "items": [{"label": label, "value": _round(v), "direction": "high" if v > high else "low"}
+                          for label, v in flagged[:top_k]],
+            }
+    return stats
+
+
+def _category_stats(values: List[Any], top_k: int) -> Dict[str, Any]:
+    present = [str(v) for v in values if v is not None and v != ""]
+    counts: Dict[str, int] = {}
+    for v in present:
+        counts[v] = counts.get(v, 0) + 1
+    ranked = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    return {
+        "kind": "category", "count": len(present), "nulls": len(values) - len(present), "distinct": len(counts),
+        "top_values": [{"value": v, "count": c, "share": _round(c / len(present))} for v, c in ranked],
+    }
+
+
+def _trend(dates: List[Optional[datetime]], values: List[Optional[float]]) -> Optional[Dict[str, Any]]:
+    """按日期排序后做最小二乘，返回每天的斜率和首尾变化；有效点少于 3 个或日期都相同时返回 None。"""
+    points = sorted((d, v) for d, v in zip(dates, values) if d is not None and v is not None)
+    if len(points) < 3:
+        return None
+    origin = points[0][0]
+    xs = [(d - origin).total_seconds() / 86400 for d, _ in points]
+    ys = [v for _, v in points]
+    mean_x, mean_y = math.fsum(xs) / len(xs), math.fsum(ys) / len(ys)
+    var_x = math.fsum((x - mean_x) ** 2 for x in xs)
+    if var_x == 0:
+        return None
+    slope = math.fsum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x
+    first, last = ys[0], ys[-1]
+    return {
+        "points": len(points), "from": points[0][0].date().isoformat(), "to": points[-1][0].date().isoformat(),
+        "slope_per_day": _round(slope), "first": _round(first), "last": _round(last),
+        "change_pct": _round((last - first) / abs(first)) if first else None,
+    }
+
+
+def build_digest(rows: List[Dict[str, Any]], sample_rows: Optional[int] = None,
+                 top_k: Optional[int] = None) -> Dict[str, Any]:
+    """对象列表 -> 统计摘要 (可直接 json.dumps)。"""
+    sample_rows = settings.ANALYSIS_DIGEST_SAMPLE_ROWS if sample_rows is None else sample_rows
+    top_k = settings.ANALYSIS_DIGEST_TOP_K if top_k is None else top_k
+    names = list(dict.fromkeys(key for row in rows for key in row))
+    columns = {name: [row.get(name) for row in rows] for name in names}
+    kinds = {name: _column_kind(values) for name, values in columns.items()}
+
+    label_column = next((n for n in names if kinds[n] == "category"), None) \
+        or next((n for n in names if kinds[n] == "date"), None)
+    labels = [str(v) for v in columns[label_column]] if label_column else [f"#{i}" for i in range(1, len(rows) + 1)]
+
+    stats: Dict[str, Any] = {}
+    numeric: Dict[str, List[Optional[float]]] = {}
+    dates: Dict[str, List[Optional[datetime]]] = {}
+    for name in names:
+        values, kind = columns[name], kinds[name]
+        if kind == "numeric":
+            numeric[name] = [_as_number(v) for v in values]
+            stats[name] = _numeric_stats(numeric[name], labels, top_k)
+        elif kind == "date":
+            dates[name] = [_as_date(v) for v in values]
+            present = [d for d in dates[name] if d is not None]
+            stats[name] = {"kind": "date", "count": len(present), "nulls": len(values) - len(present),
+                           "min": min(present).isoformat(), "max": max(present).isoformat()}
+        elif kind == "category":
+            stats[name] = _category_stats(values, top_k)
+        else:
+            stats[name] = {"kind": "empty", "count": 0, "nulls": len(values)}
+
+    trends: List[Dict[str, Any]] = []
+    for date_name, date_values in dates.items():
+        for value_name, values in numeric.items():
+            trend = _trend(date_values, values)
+            if trend is not None:
+                trends.append({"date_column": date_name, "value_column": value_name, **trend})
+
+    digest = {"row_count": len(rows), "label_column": label_column, "columns": stats}
+    if trends:
+        digest["trends"] = trends
+    digest["sample_rows"] = rows[:sample_rows] if sample_rows > 0 else []
+    digest["sample_truncated"] = len(digest["sample_rows"]) < len(rows)
+    return digest
+
+
+def digest_json(rows: List[Dict[str, Any]]) -> str:
+    return json.dumps(build_digest(rows), ensure_ascii=False, default=str)
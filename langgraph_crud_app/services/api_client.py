@@ -1,8 +1,17 @@
 # api_client.py: 封装了向后端 Flask API 发送 HTTP 请求的逻辑。
 
+import asyncio
+import logging
+import weakref
+import httpx
 import requests
 import json
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+
+from langgraph_crud_app.config.logging_config import LazyJson
+from langgraph_crud_app.observability import tracing
+
+logger = logging.getLogger(__name__)
 
 # --- 配置 ---
 # TODO: 后续将此 URL 移至 config/settings.py 以进行更好的管理
@@ -10,7 +19,82 @@ BASE_API_URL = "http://127.0.0.1:5003"  # 修改为本地主机地址，确保
 HEADERS = {"Content-Type": "application/json"}
 TIMEOUT = 10 # 默认请求超时时间（秒）
 
+
+def _send(method: str, api_url: str, **kwargs) -> requests.Response:
+    """
+    统一的 HTTP 发送入口：附带当前 trace id 请求头，并把这次调用记录为一个 span。
+    Flask 端通过 Server-Timing 头回传服务端 / 数据库耗时，一并记入 span 属性。
+    """
+    headers = dict(HEADERS)
+    trace_id = tracing.current_trace_id()
+    if trace_id:
+        headers[tracing.TRACE_HEADER] = trace_id
+    path = api_url[len(BASE_API_URL):] if api_url.startswith(BASE_API_URL) else api_url
+    with tracing.span(f"http {method} {path}", kind="http") as record:
+        response = requests.request(method, api_url, headers=headers, **kwargs)
+        if record is not None:
+            record["attrs"]["status"] = response.status_code
+            for name, duration in tracing.parse_server_timing(response.headers.get("Server-Timing")).items():
+                record["attrs"][f"server_{name}_ms"] = duration
+        return response
+
+
+# 每个事件循环一个 AsyncClient (连接池绑定在创建它的事件循环上)
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def _async_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = httpx.AsyncClient()
+    return client
+
+
+async def aclose() -> None:
+    """关闭当前事件循环上的 AsyncClient (ASGI 应用关闭时调用)。"""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def _to_requests_response(resp: httpx.Response) -> requests.Response:
+    """把 httpx 响应转成 requests.Response，同步 / 异步版本共用下面的响应处理 (raise_for_status、json 等)。"""
+    response = requests.Response()
+    response.status_code = resp.status_code
+    response._content = resp.content
+    response.headers = requests.structures.CaseInsensitiveDict(resp.headers)
+    response.url = str(resp.url)
+    response.encoding = resp.encoding
+    response.reason = resp.reason_phrase
+    return response
+
+
+async def _asend(method: str, api_url: str, **kwargs) -> requests.Response:
+    """_send 的异步版本 (httpx.AsyncClient)，传输层异常转换成对应的 requests 异常。"""
+    headers = dict(HEADERS)
+    trace_id = tracing.current_trace_id()
+    if trace_id:
+        headers[tracing.TRACE_HEADER] = trace_id
+    path = api_url[len(BASE_API_URL):] if api_url.startswith(BASE_API_URL) else api_url
+    with tracing.span(f"http {method} {path}", kind="http") as record:
+        try:
+            resp = await _async_client().request(method, api_url, headers=headers, **kwargs)
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e)) from e
+        except httpx.ConnectError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+        except httpx.HTTPError as e:
+            raise requests.exceptions.RequestException(str(e)) from e
+        response = _to_requests_response(resp)
+        if record is not None:
+            record["attrs"]["status"] = response.status_code
+            for name, duration in tracing.parse_server_timing(response.headers.get("Server-Timing")).items():
+                record["attrs"][f"server_{name}_ms"] = duration
+        return response
+
 # --- API 调用函数 ---
+# 查询路径上的读接口另有异步版本 (aget_schema / aexecute_query)，供 ASGI 入口的异步节点使用
 
 def get_schema() -> List[str]:
     """
@@ -27,28 +111,44 @@ def get_schema() -> List[str]:
     """
     api_url = f"{BASE_API_URL}/get_schema"
     try:
-        response = requests.get(api_url, headers=HEADERS, timeout=TIMEOUT)
-        response.raise_for_status() # 对错误的 HTTP 状态码 (4xx 或 5xx) 抛出异常
-        data = response.json()
-        # Dify 节点期望一个包含 JSON 字符串的列表
-        if isinstance(data, dict) and "result" in data and isinstance(data["result"], list):
-             # Flask API 在 'result' 键中包装了 schema 字典的列表
-             # 我们需要按原样返回这个列表，因为 Dify 节点期望 array[string]
-             return data["result"]
-        elif isinstance(data, dict): # 如果 API 响应格式改变，处理直接返回字典的情况
-             # 将字典包装在列表中的 JSON 字符串中，以匹配 Dify 的期望
-             return [json.dumps(data, ensure_ascii=False)]
-        else:
-            # 如果格式不符合预期，抛出错误
-            raise ValueError(f"来自 {api_url} 的响应格式不符合预期: {data}")
+        return _schema_from_response(_send("GET", api_url, timeout=TIMEOUT), api_url)
+    except requests.exceptions.RequestException as e:
+        logger.error("调用 get_schema API 时出错: %s", e)
+        raise
+    except (json.JSONDecodeError, ValueError) as e:
+        logger.error("处理 get_schema 响应时出错: %s", e)
+        raise ValueError(f"来自 {api_url} 的无效响应")
+
+
+async def aget_schema() -> List[str]:
+    """get_schema 的异步版本。"""
+    api_url = f"{BASE_API_URL}/get_schema"
+    try:
+        return _schema_from_response(await _asend("GET", api_url, timeout=TIMEOUT), api_url)
     except requests.exceptions.RequestException as e:
-        print(f"调用 get_schema API 时出错: {e}")
+        logger.error("调用 get_schema API 时出错: %s", e)
         raise
     except (json.JSONDecodeError, ValueError) as e:
-        print(f"处理 get_schema 响应时出错: {e}")
+        logger.error("处理 get_schema 响应时出错: %s", e)
         raise ValueError(f"来自 {api_url} 的无效响应")
 
 
+def _schema_from_response(response: requests.Response, api_url: str) -> List[str]:
+    response.raise_for_status() # 对错误的 HTTP 状态码 (4xx 或 5xx) 抛出异常
+    data = response.json()
+    # Dify 节点期望一个包含 JSON 字符串的列表
+    if isinstance(data, dict) and "result" in data and isinstance(data["result"], list):
+         # Flask API 在 'result' 键中包装了 schema 字典的列表
+         # 我们需要按原样返回这个列表，因为 Dify 节点期望 array[string]
+         return data["result"]
+    elif isinstance(data, dict): # 如果 API 响应格式改变，处理直接返回字典的情况
+         # 将字典包装在列表中的 JSON 字符串中，以匹配 Dify 的期望
+         return [json.dumps(data, ensure_ascii=False)]
+    else:
+        # 如果格式不符合预期，抛出错误
+        raise ValueError(f"来自 {api_url} 的响应格式不符合预期: {data}")
+
+
 def execute_query(sql_query: str) -> str:
     """
     调用 Flask API 端点以执行 SELECT SQL 查询。
@@ -65,22 +165,60 @@ def execute_query(sql_query: str) -> str:
         ValueError: 如果响应不是有效的 JSON或者SQL存在语法错误。
     """
     api_url = f"{BASE_API_URL}/execute_query"
+    sql_query, has_semicolon = _prepare_select(sql_query)
+    payload = {"sql_query": sql_query}
+    
+    try:
+        return _query_result_json(_send("POST", api_url, json=payload, timeout=TIMEOUT))
+    
+    except requests.exceptions.RequestException as e:
+        logger.error("调用 execute_query API 时出错: %s", e)
+        fixed_sql = _sql_to_retry(e, sql_query, has_semicolon)
+        if fixed_sql:
+            return execute_query(fixed_sql)  # 递归调用自身，尝试修复后的SQL
+        # 未能提取API具体错误，则重新抛出原始异常
+        raise
     
+    except json.JSONDecodeError as e:
+        logger.error("解码 execute_query 的 JSON 响应时出错: %s", e)
+        raise ValueError(f"来自 {api_url} 的无效 JSON 响应")
+
+
+async def aexecute_query(sql_query: str) -> str:
+    """execute_query 的异步版本 (参数、返回值和异常相同)。"""
+    api_url = f"{BASE_API_URL}/execute_query"
+    sql_query, has_semicolon = _prepare_select(sql_query)
+    payload = {"sql_query": sql_query}
+    try:
+        return _query_result_json(await _asend("POST", api_url, json=payload, timeout=TIMEOUT))
+    except requests.exceptions.RequestException as e:
+        logger.error("调用 execute_query API 时出错: %s", e)
+        fixed_sql = _sql_to_retry(e, sql_query, has_semicolon)
+        if fixed_sql:
+            return await aexecute_query(fixed_sql)
+        raise
+    except json.JSONDecodeError as e:
+        logger.error("解码 execute_query 的 JSON 响应时出错: %s", e)
+        raise ValueError(f"来自 {api_url} 的无效 JSON 响应")
+
+
+def _prepare_select(sql_query: str) -> Tuple[str, bool]:
+    """检查并清理要执行的 SELECT 语句，返回 (去掉尾部分号的 SQL, 原来是否带分号)。"""
     # 记录原始SQL信息
     sql_length = len(sql_query) if sql_query else 0
-    print(f"--- API客户端: 准备执行SQL查询 (长度: {sql_length}) ---")
+    logger.debug("--- API客户端: 准备执行SQL查询 (长度: %s) ---", sql_length)
     if sql_length > 200:
-        print(f"SQL前200字符: {sql_query[:200]}...")
-        print(f"SQL后200字符: ...{sql_query[-200:]}")
+        logger.debug("SQL前200字符: %s...", sql_query[:200])
+        logger.debug("SQL后200字符: ...%s", sql_query[-200:])
     
     # 前置检查
     if not sql_query or not sql_query.strip():
-        print("错误: 空的SQL查询")
+        logger.error("错误: 空的SQL查询")
         raise ValueError("空的SQL查询")
         
     # 确保SQL是SELECT语句
     if not sql_query.strip().upper().startswith("SELECT"):
-        print(f"错误: 非SELECT查询: {sql_query}")
+        logger.error("错误: 非SELECT查询: %s", sql_query)
         raise ValueError(f"查询必须以SELECT开头: {sql_query}")
     
     # 清理SQL：移除尾部分号（API会自己处理）
@@ -91,78 +229,77 @@ def execute_query(sql_query: str) -> str:
     
     # 再次检查清理后的SQL
     if not sql_query:
-        print("错误: 清理后SQL为空")
+        logger.error("错误: 清理后SQL为空")
         raise ValueError("清理后SQL为空")
     
     # 检查是否包含UNION ALL
     if " UNION ALL " in sql_query.upper():
         parts = sql_query.upper().split(" UNION ALL ")
-        print(f"检测到SQL包含{len(parts)}个UNION ALL部分")
+        logger.debug("检测到SQL包含%s个UNION ALL部分", len(parts))
         for i, part in enumerate(parts):
             if not part.strip().startswith("SELECT"):
-                print(f"警告: UNION ALL部分{i+1}不是有效的SELECT语句")
+                logger.warning("警告: UNION ALL部分%s不是有效的SELECT语句", i+1)
     
-    print(f"发送查询到API (长度: {len(sql_query)})...")
-    payload = {"sql_query": sql_query}
+    logger.debug("发送查询到API (长度: %s)...", len(sql_query))
+    return sql_query, has_semicolon
+
+
+def _query_result_json(response: requests.Response) -> str:
+    """/execute_query 的响应 -> 结果 JSON 字符串；错误响应里带 error 时抛出 ValueError。"""
+    # 记录API响应，帮助调试
+    logger.debug("API响应状态码: %s", response.status_code)
     
-    try:
-        response = requests.post(api_url, headers=HEADERS, json=payload, timeout=TIMEOUT)
-        
-        # 记录API响应，帮助调试
-        print(f"API响应状态码: {response.status_code}")
-        
-        # 如果是错误响应，尝试从响应内容提取有用信息
-        if response.status_code != 200:
-            try:
-                error_data = response.json()
-                if isinstance(error_data, dict) and "error" in error_data:
-                    error_message = error_data["error"]
-                    print(f"API错误详情: {error_message}")
-                    # 将API返回的错误消息抛出，保留完整信息
-                    raise ValueError(f"API错误: {error_message}")
-            except json.JSONDecodeError:
-                # 如果无法解析JSON错误响应，使用原始内容
-                error_content = response.text[:200] + ("..." if len(response.text) > 200 else "")
-                print(f"API返回非JSON错误响应: {error_content}")
-        
-        # 正常处理响应
-        response.raise_for_status()
-        result_data = response.json()
-        # 检查响应结果
-        response_json = json.dumps(result_data, ensure_ascii=False)
-        print(f"SQL查询成功，结果长度: {len(response_json)}")
-        if len(response_json) > 100:
-            print(f"结果预览: {response_json[:100]}...")
-        
-        return response_json
+    # 如果是错误响应，尝试从响应内容提取有用信息
+    if response.status_code != 200:
+        try:
+            error_data = response.json()
+            if isinstance(error_data, dict) and "error" in error_data:
+                error_message = error_data["error"]
+                logger.error("API错误详情: %s", error_message)
+                # 将API返回的错误消息抛出，保留完整信息
+                raise ValueError(f"API错误: {error_message}")
+        except json.JSONDecodeError:
+            # 如果无法解析JSON错误响应，使用原始内容
+            error_content = response.text[:200] + ("..." if len(response.text) > 200 else "")
+            logger.error("API返回非JSON错误响应: %s", error_content)
     
-    except requests.exceptions.RequestException as e:
-        print(f"调用 execute_query API 时出错: {e}")
-        # 检查是否有API返回的错误信息
-        if hasattr(e, 'response') and e.response is not None:
-            try:
-                error_data = e.response.json()
-                if isinstance(error_data, dict) and "error" in error_data:
-                    # 提取API返回的具体错误信息
-                    error_detail = error_data['error']
-                    # 检查是否是SQL语法错误
-                    if isinstance(error_detail, tuple) and len(error_detail) == 2 and "1064" in str(error_detail[0]):
-                        # 重新尝试修复SQL (针对MySQL 1064错误)
-                        print("检测到MySQL 1064语法错误，尝试修复...")
-                        if has_semicolon:
-                            # 如果本来有分号但被去掉了，试着加回来
-                            fixed_sql = sql_query + ";"
-                            print(f"添加分号后重新尝试执行SQL: {fixed_sql[:100]}...")
-                            return execute_query(fixed_sql)  # 递归调用自身，尝试修复后的SQL
-                    raise ValueError(f"API错误: {error_data['error']}")
-            except (json.JSONDecodeError, KeyError):
-                pass  # 如果无法解析API错误，使用默认异常
-        # 未能提取API具体错误，则重新抛出原始异常
-        raise
+    # 正常处理响应
+    response.raise_for_status()
+    result_data = response.json()
+    # 检查响应结果
+    response_json = json.dumps(result_data, ensure_ascii=False)
+    logger.debug("SQL查询成功，结果长度: %s", len(response_json))
+    if len(response_json) > 100:
+        logger.debug("结果预览: %s...", response_json[:100])
     
-    except json.JSONDecodeError as e:
-        print(f"解码 execute_query 的 JSON 响应时出错: {e}")
-        raise ValueError(f"来自 {api_url} 的无效 JSON 响应")
+    return response_json
+
+
+def _sql_to_retry(e: requests.exceptions.RequestException, sql_query: str, has_semicolon: bool) -> Optional[str]:
+    """
+    请求失败时检查 API 返回的错误: MySQL 1064 且原 SQL 带分号时返回加回分号的 SQL 供重试；
+    其他 API 错误抛出 ValueError；取不到具体错误时返回 None (调用方重新抛出原始异常)。
+    """
+    # 检查是否有API返回的错误信息
+    if hasattr(e, 'response') and e.response is not None:
+        try:
+            error_data = e.response.json()
+            if isinstance(error_data, dict) and "error" in error_data:
+                # 提取API返回的具体错误信息
+                error_detail = error_data['error']
+                # 检查是否是SQL语法错误
+                if isinstance(error_detail, tuple) and len(error_detail) == 2 and "1064" in str(error_detail[0]):
+                    # 重新尝试修复SQL (针对MySQL 1064错误)
+                    logger.error("检测到MySQL 1064语法错误，尝试修复...")
+                    if has_semicolon:
+                        # 如果本来有分号但被去掉了，试着加回来
+                        fixed_sql = sql_query + ";"
+                        logger.debug("添加分号后重新尝试执行SQL: %s...", fixed_sql[:100])
+                        return fixed_sql
+                raise ValueError(f"API错误: {error_data['error']}")
+        except (json.JSONDecodeError, KeyError):
+            pass  # 如果无法解析API错误，使用默认异常
+    return None
 
 
 def update_record(update_payload: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -183,15 +320,15 @@ def update_record(update_payload: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
     api_url = f"{BASE_API_URL}/update_record"
     try:
-        print(f"调试: 发送更新负载: {json.dumps(update_payload, ensure_ascii=False)}") # 类似 Dify code 中的调试行
-        response = requests.post(api_url, headers=HEADERS, json=update_payload, timeout=TIMEOUT)
+        logger.debug("调试: 发送更新负载: %s", LazyJson(update_payload)) # 类似 Dify code 中的调试行
+        response = _send("POST", api_url, json=update_payload, timeout=TIMEOUT)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
-        print(f"调用 update_record API 时出错: {e}")
+        logger.error("调用 update_record API 时出错: %s", e)
         raise
     except json.JSONDecodeError as e:
-        print(f"解码 update_record 的 JSON 响应时出错: {e}")
+        logger.error("解码 update_record 的 JSON 响应时出错: %s", e)
         raise ValueError(f"来自 {api_url} 的无效 JSON 响应")
 
 
@@ -213,30 +350,30 @@ def insert_record(insert_payload: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
     api_url = f"{BASE_API_URL}/insert_record"
     try:
-        print(f"调试: 发送插入负载: {json.dumps(insert_payload, ensure_ascii=False)}") # 类似 Dify code 中的调试行
-        response = requests.post(api_url, headers=HEADERS, json=insert_payload, timeout=TIMEOUT)
+        logger.debug("调试: 发送插入负载: %s", LazyJson(insert_payload)) # 类似 Dify code 中的调试行
+        response = _send("POST", api_url, json=insert_payload, timeout=TIMEOUT)
         
         # 记录API响应，帮助调试
-        print(f"插入记录API响应状态码: {response.status_code}")
-        print(f"插入记录API响应内容: {response.text[:500]}...")
+        logger.debug("插入记录API响应状态码: %s", response.status_code)
+        logger.debug("插入记录API响应内容: %s...", response.text[:500])
         
         # 如果是错误响应，尝试从响应内容提取有用信息
         if response.status_code != 200:
             try:
                 error_data = response.json()
-                print(f"解析到的错误数据: {error_data}")
+                logger.error("解析到的错误数据: %s", error_data)
                 if isinstance(error_data, dict) and "error" in error_data:
                     error_message = error_data["error"]
-                    print(f"API错误详情: {error_message}")
+                    logger.error("API错误详情: %s", error_message)
                     # 将API返回的错误消息抛出，保留完整信息
                     raise ValueError(f"API错误: {error_message}")
                 else:
-                    print(f"错误响应格式异常: {error_data}")
+                    logger.error("错误响应格式异常: %s", error_data)
                     raise ValueError(f"API错误: 未知错误格式")
             except json.JSONDecodeError as json_err:
                 # 如果无法解析JSON错误响应，使用原始内容
                 error_content = response.text[:200] + ("..." if len(response.text) > 200 else "")
-                print(f"API返回非JSON错误响应: {error_content}")
+                logger.error("API返回非JSON错误响应: %s", error_content)
                 raise ValueError(f"API错误: 无法解析错误响应 - {error_content}")
         
         # 正常处理响应
@@ -244,33 +381,33 @@ def insert_record(insert_payload: List[Dict[str, Any]]) -> Dict[str, Any]:
         return response.json()
         
     except requests.exceptions.RequestException as e:
-        print(f"调用 insert_record API 时出错: {e}")
-        print(f"异常类型: {type(e)}")
+        logger.error("调用 insert_record API 时出错: %s", e)
+        logger.error("异常类型: %s", type(e))
         # 检查是否有API返回的错误信息
         if hasattr(e, 'response') and e.response is not None:
-            print(f"异常中的响应状态码: {e.response.status_code}")
-            print(f"异常中的响应内容: {e.response.text[:500]}...")
+            logger.error("异常中的响应状态码: %s", e.response.status_code)
+            logger.error("异常中的响应内容: %s...", e.response.text[:500])
             try:
                 error_data = e.response.json()
-                print(f"从异常响应中解析到的错误数据: {error_data}")
+                logger.error("从异常响应中解析到的错误数据: %s", error_data)
                 if isinstance(error_data, dict) and "error" in error_data:
                     # 提取API返回的具体错误信息
                     error_detail = error_data['error']
-                    print(f"提取到Flask具体错误信息: {error_detail}")
+                    logger.error("提取到Flask具体错误信息: %s", error_detail)
                     raise ValueError(f"API错误: {error_detail}")
                 else:
-                    print(f"异常响应格式异常: {error_data}")
+                    logger.error("异常响应格式异常: %s", error_data)
                     raise ValueError(f"API错误: {error_data}")
             except (json.JSONDecodeError, KeyError) as parse_err:
-                print(f"解析异常响应时出错: {parse_err}")
+                logger.error("解析异常响应时出错: %s", parse_err)
                 # 如果无法解析API错误，使用原始异常信息
                 raw_content = e.response.text[:200] + ("..." if len(e.response.text) > 200 else "")
                 raise ValueError(f"API错误: 无法解析异常响应 - {raw_content}")
         # 未能提取API具体错误，则重新抛出原始异常
-        print("异常中没有响应信息，重新抛出原始异常")
+        logger.error("异常中没有响应信息，重新抛出原始异常")
         raise
     except json.JSONDecodeError as e:
-        print(f"解码 insert_record 的 JSON 响应时出错: {e}")
+        logger.error("解码 insert_record 的 JSON 响应时出错: %s", e)
         raise ValueError(f"来自 {api_url} 的无效 JSON 响应")
 
 def delete_record(table_name: str, primary_key: str, primary_value: Any) -> Dict[str, Any]:
@@ -297,10 +434,10 @@ def delete_record(table_name: str, primary_key: str, primary_value: Any) -> Dict
         "primary_value": primary_value
     }
     try:
-        response = requests.post(api_url, headers=HEADERS, json=payload, timeout=TIMEOUT)
+        response = _send("POST", api_url, json=payload, timeout=TIMEOUT)
         
         # 记录更详细的响应信息，帮助调试
-        print(f"删除记录API响应: 状态码={response.status_code}, 内容={response.text[:100]}...")
+        logger.debug("删除记录API响应: 状态码=%s, 内容=%s...", response.status_code, response.text[:100])
         
         # 检查是否是404错误（记录不存在），如果是，继续处理而不抛出异常
         if response.status_code == 404:
@@ -308,7 +445,7 @@ def delete_record(table_name: str, primary_key: str, primary_value: Any) -> Dict
                 error_data = response.json()
                 if "error" in error_data and "No record found" in error_data["error"]:
                     # 这是记录不存在的情况，不是错误
-                    print(f"表 {table_name} 中没有找到主键值为 {primary_value} 的记录，但操作完成")
+                    logger.debug("表 %s 中没有找到主键值为 %s 的记录，但操作完成", table_name, primary_value)
                     return {"message": f"Record with {primary_key}={primary_value} not found, but operation completed"}
             except (json.JSONDecodeError, KeyError):
                 # 如果无法解析响应JSON，可能是真正的端点不存在问题
@@ -318,15 +455,15 @@ def delete_record(table_name: str, primary_key: str, primary_value: Any) -> Dict
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
-        print(f"调用 delete_record API 时出错 (表: {table_name}, 主键值: {primary_value}): {e}")
+        logger.error("调用 delete_record API 时出错 (表: %s, 主键值: %s): %s", table_name, primary_value, e)
         # 增加错误处理逻辑，检查是否是端点不可用的问题
         if "404" in str(e) or "Not Found" in str(e):
-            print(f"警告: 删除端点404错误。这可能是因为记录不存在或API端点问题。")
+            logger.warning("警告: 删除端点404错误。这可能是因为记录不存在或API端点问题。")
             # 我们返回一个模拟的成功响应，以避免中断整个删除流程
             return {"message": f"Record with {primary_key}={primary_value} possibly deleted, endpoint returned 404"}
         raise
     except json.JSONDecodeError as e:
-        print(f"解码 delete_record 的 JSON 响应时出错: {e}")
+        logger.error("解码 delete_record 的 JSON 响应时出错: %s", e)
         raise ValueError(f"来自 {api_url} 的无效 JSON 响应")
 
 # === 新增：批量操作 API 调用 ===
@@ -352,12 +489,12 @@ def execute_batch_operations(operations: List[Dict[str, Any]]) -> Dict[str, Any]
     """
     api_url = f"{BASE_API_URL}/execute_batch_operations" # 新的端点 URL
     try:
-        print(f"调试: 发送批量操作负载: {json.dumps(operations, ensure_ascii=False)}")
+        logger.debug("调试: 发送批量操作负载: %s", LazyJson(operations))
         # 注意：超时时间可能需要根据操作复杂性调整
-        response = requests.post(api_url, headers=HEADERS, json=operations, timeout=TIMEOUT * 3) # 稍微延长超时
+        response = _send("POST", api_url, json=operations, timeout=TIMEOUT * 3) # 稍微延长超时
         
         # 记录API响应，帮助调试
-        print(f"批量操作API响应状态码: {response.status_code}")
+        logger.debug("批量操作API响应状态码: %s", response.status_code)
         
         # 如果是错误响应，尝试从响应内容提取有用信息
         if response.status_code != 200:
@@ -384,23 +521,23 @@ def execute_batch_operations(operations: List[Dict[str, Any]]) -> Dict[str, Any]
                                 operation_index = error_detail.get("failed_operation_index", "")
                                 detailed_message = f"批量操作第{operation_index}步失败: 表{table_name}的{key_name}字段值'{conflicting_value}'已存在"
                             
-                            print(f"API详细错误信息: {detailed_message}")
+                            logger.error("API详细错误信息: %s", detailed_message)
                             raise ValueError(f"API错误: {detailed_message}")
                     
-                    print(f"API错误详情: {error_message}")
+                    logger.error("API错误详情: %s", error_message)
                     # 将API返回的错误消息抛出，保留完整信息
                     raise ValueError(f"API错误: {error_message}")
             except json.JSONDecodeError:
                 # 如果无法解析JSON错误响应，使用原始内容
                 error_content = response.text[:200] + ("..." if len(response.text) > 200 else "")
-                print(f"API返回非JSON错误响应: {error_content}")
+                logger.error("API返回非JSON错误响应: %s", error_content)
         
         # 正常处理响应
         response.raise_for_status()
         return response.json()
         
     except requests.exceptions.RequestException as e:
-        print(f"调用 execute_batch_operations API 时出错: {e}")
+        logger.error("调用 execute_batch_operations API 时出错: %s", e)
         # 检查是否有API返回的错误信息
         if hasattr(e, 'response') and e.response is not None:
             try:
@@ -408,12 +545,12 @@ def execute_batch_operations(operations: List[Dict[str, Any]]) -> Dict[str, Any]
                 if isinstance(error_data, dict) and "error" in error_data:
                     # 提取API返回的具体错误信息
                     error_detail = error_data['error']
-                    print(f"提取到Flask具体错误信息: {error_detail}")
+                    logger.error("提取到Flask具体错误信息: %s", error_detail)
                     raise ValueError(f"API错误: {error_data['error']}")
             except (json.JSONDecodeError, KeyError):
                 pass  # 如果无法解析API错误，使用默认异常
         # 未能提取API具体错误，则重新抛出原始异常
         raise
     except json.JSONDecodeError as e:
-        print(f"解码 execute_batch_operations 的 JSON 响应时出错: {e}")
+        logger.error("解码 execute_batch_operations 的 JSON 响应时出错: %s", e)
         raise ValueError(f"来自 {api_url} 的无效 JSON 响应") 
\ No newline at end of file
@@ -1,5 +1,6 @@
 # data_processor.py: 包含用于数据清理、转换和状态更新的工具函数。
 
+import logging
 from typing import List, Optional, Dict, Any, Set
 import re # Import re for cleaning
 import json # Import json
@@ -9,6 +10,8 @@ import uuid # Add uuid import for random UUID generation
 # Import API client for placeholder resolution
 from .api_client import execute_query
 
+logger = logging.getLogger(__name__)
+
 def is_sql_part_balanced(sql_part: str) -> bool:
     """
     检查SQL片段中的括号是否平衡。
@@ -67,7 +70,7 @@ def clean_sql_string(sql: str) -> str:
 
     # 记录原始SQL长度
     original_length = len(sql)
-    print(f"--- 清理SQL前长度: {original_length} ---")
+    logger.debug("--- 清理SQL前长度: %s ---", original_length)
 
     # 移除常见的 Markdown 代码块标记
     cleaned_sql = re.sub(r'^```sql\s*', '', sql, flags=re.IGNORECASE)
@@ -92,24 +95,24 @@ def clean_sql_string(sql: str) -> str:
     has_semicolon = cleaned_sql.endswith(';')
     if not has_semicolon:
         cleaned_sql = cleaned_sql + ';'
-        print("--- 为SQL添加了分号 ---")
+        logger.debug("--- 为SQL添加了分号 ---")
 
     # 检查括号是否平衡，但不修改SQL内容
     if not is_sql_part_balanced(cleaned_sql):
-        print("--- 警告: SQL括号不平衡，可能导致语法错误 ---")
+        logger.warning("--- 警告: SQL括号不平衡，可能导致语法错误 ---")
 
     # 最终检查：确保SQL是以SELECT开头，但不修改
     if not cleaned_sql.upper().strip().startswith('SELECT'):
-        print(f"--- 警告：清理后的SQL不是以SELECT开头: {cleaned_sql[:50]}... ---")
+        logger.warning("--- 警告：清理后的SQL不是以SELECT开头: %s... ---", cleaned_sql[:50])
 
     # 检查WHERE子句是否存在且看起来完整
     where_match = re.search(r'\bWHERE\b\s+([^)]{1,50})$', cleaned_sql, re.IGNORECASE)
     if where_match:
-        print(f"--- 警告: SQL可能在WHERE子句处不完整: '{where_match.group(0)}' ---")
+        logger.warning("--- 警告: SQL可能在WHERE子句处不完整: '%s' ---", where_match.group(0))
 
     # 记录清理后的长度变化
     final_length = len(cleaned_sql)
-    print(f"--- 清理SQL后长度: {final_length} (减少了 {original_length - final_length} 个字符) ---")
+    logger.debug("--- 清理SQL后长度: %s (减少了 %s 个字符) ---", final_length, original_length - final_length)
 
     return cleaned_sql
 
@@ -137,7 +140,7 @@ def is_query_result_empty(result_str: Optional[str]) -> bool:
             return True
     except json.JSONDecodeError:
         # 如果 JSON 无效，也视为空结果
-        print(f"警告：无法解析查询结果 JSON 字符串 '{result_str}'，视为空结果。")
+        logger.warning("警告：无法解析查询结果 JSON 字符串 '%s'，视为空结果。", result_str)
         return True
     return False
 
@@ -160,7 +163,7 @@ def clean_and_structure_llm_add_output(raw_output: str) -> List[Dict[str, Any]]:
         结构化的记录列表，统一格式为: `[{ "table_name": ..., "fields": ... }]`。
         如果解析失败或未找到有效内容，则返回空列表。
     """
-    print(f"--- 清理和结构化 LLM 新增输出 ---")
+    logger.debug("--- 清理和结构化 LLM 新增输出 ---")
     output_pattern = re.compile(r'<output>(.*?)</output>', re.DOTALL | re.IGNORECASE)
     json_match = output_pattern.search(raw_output)
 
@@ -170,13 +173,13 @@ def clean_and_structure_llm_add_output(raw_output: str) -> List[Dict[str, Any]]:
         content_to_parse = re.sub(r'^(json\s*)', '', content_to_parse, flags=re.IGNORECASE)
         content_to_parse = re.sub(r'```json\s*|```', '', content_to_parse, flags=re.IGNORECASE).strip()
     else:
-        print("警告：未找到 <output> 标签，尝试直接解析原始输出。")
+        logger.warning("警告：未找到 <output> 标签，尝试直接解析原始输出。")
         # 同样清理一下可能存在的 markdown
         content_to_parse = re.sub(r'```json\s*|```', '', raw_output.strip(), flags=re.IGNORECASE).strip()
 
 
     if not content_to_parse:
-        print("错误：清理后无内容可解析。")
+        logger.error("错误：清理后无内容可解析。")
         return []
 
     try:
@@ -186,7 +189,7 @@ def clean_and_structure_llm_add_output(raw_output: str) -> List[Dict[str, Any]]:
         if isinstance(parsed_data, list):
             # --- 处理直接列表输入 ---
             # 假设格式: [{ "table_name": ..., "fields": {...} }, ...]
-            print("检测到直接列表输入格式。")
+            logger.debug("检测到直接列表输入格式。")
             for item in parsed_data:
                 if isinstance(item, dict) and "table_name" in item and "fields" in item and isinstance(item["fields"], dict):
                     # 基本格式正确，直接添加
@@ -196,18 +199,18 @@ def clean_and_structure_llm_add_output(raw_output: str) -> List[Dict[str, Any]]:
                     })
                 else:
                     # 如果列表项格式不对，记录警告并跳过
-                    print(f"警告：列表中的项目格式无效（缺少'table_name'或'fields'，或'fields'不是字典），已跳过: {item}")
+                    logger.warning("警告：列表中的项目格式无效（缺少'table_name'或'fields'，或'fields'不是字典），已跳过: %s", item)
 
         elif isinstance(parsed_data, dict) and "result" in parsed_data:
             # --- 处理原始期望的字典输入 ---
             # 假设格式: {"result": {"table_name": [{...}, ...]}}
-            print("检测到 'result' 字典输入格式。")
+            logger.debug("检测到 'result' 字典输入格式。")
             result_dict = parsed_data.get("result", {}) # 使用 .get 以防 "result" 值为 null
             if isinstance(result_dict, dict):
                 for table_name, records in result_dict.items():
                     if not isinstance(records, list):
                         # 将单个记录包装成列表以便统一处理
-                        print(f"警告：表 '{table_name}' 的记录不是列表，尝试包装。")
+                        logger.warning("警告：表 '%s' 的记录不是列表，尝试包装。", table_name)
                         records = [records]
                     for record_fields in records:
                         if isinstance(record_fields, dict):
@@ -217,29 +220,29 @@ def clean_and_structure_llm_add_output(raw_output: str) -> List[Dict[str, Any]]:
                                 "fields": record_fields
                             })
                         else:
-                             print(f"警告：表 '{table_name}' 中的记录不是字典：{record_fields}")
+                             logger.warning("警告：表 '%s' 中的记录不是字典：%s", table_name, record_fields)
             else:
-                 print(f"错误：解析出的 'result' 的值不是字典：{result_dict}")
+                 logger.error("错误：解析出的 'result' 的值不是字典：%s", result_dict)
                  # 返回空列表，因为无法处理非字典的 result
                  return []
         else:
             # 如果顶层结构既不是列表也不是包含 'result' 的字典
-            print(f"错误：无法识别的顶层 JSON 结构。内容: '{content_to_parse[:100]}...'")
+            logger.error("错误：无法识别的顶层 JSON 结构。内容: '%s...'", content_to_parse[:100])
             return [] # 返回空列表
 
         # 处理完成后检查是否有有效记录
         if not structured_records:
-             print("警告：处理后未生成任何有效的结构化记录。")
+             logger.warning("警告：处理后未生成任何有效的结构化记录。")
 
-        print(f"结构化记录: {structured_records}")
+        logger.debug("结构化记录: %s", structured_records)
         return structured_records
 
     except json.JSONDecodeError as e:
-        print(f"JSON 解析错误: {e} - 内容: '{content_to_parse[:100]}...'")
+        logger.error("JSON 解析错误: %s - 内容: '%s...'", e, content_to_parse[:100])
         return []
     except Exception as e:
         # 捕获其他潜在错误，例如在处理字典/列表时发生意外
-        print(f"处理 LLM 输出时发生意外错误: {e}")
+        logger.error("处理 LLM 输出时发生意外错误: %s", e)
         return []
 
 def extract_placeholders(structured_records: List[Dict[str, Any]]) -> Set[str]:
@@ -266,7 +269,7 @@ def extract_placeholders(structured_records: List[Dict[str, Any]]) -> Set[str]:
                 for match in matches:
                     # match 现在是 {{...}} 内部的内容
                     placeholders.add(match.strip()) # 添加括号内的内容, 并去除前后空格
-    print(f"提取到的占位符内容: {placeholders}")
+    logger.debug("提取到的占位符内容: %s", placeholders)
     return placeholders
 
 def process_placeholders(structured_records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -284,14 +287,14 @@ def process_placeholders(structured_records: List[Dict[str, Any]]) -> List[Dict[
     Raises:
         ValueError: 如果遇到不支持的占位符类型或执行查询出错。
     """
-    print("--- 处理占位符替换 ({{...}} format) ---")
+    logger.debug("--- 处理占位符替换 ({{...}} format) ---")
     processed_records = []
     # 深拷贝以避免修改原始状态？或者假设调用者处理？暂时直接修改
 
     for record in structured_records:
         processed_fields = {}
         if not isinstance(record, dict) or "fields" not in record or not isinstance(record["fields"], dict):
-             print(f"警告：跳过格式不正确的记录（缺少 fields 或非字典）: {record}")
+             logger.warning("警告：跳过格式不正确的记录（缺少 fields 或非字典）: %s", record)
              processed_records.append(record) # 保留原始记录？或跳过？暂定保留
              continue
 
@@ -300,11 +303,11 @@ def process_placeholders(structured_records: List[Dict[str, Any]]) -> List[Dict[
                 match = PLACEHOLDER_PATTERN.search(value) # 使用 search 查找单个占位符
                 if match:
                     placeholder_content = match.group(1).strip()
-                    print(f"  正在解析占位符: '{placeholder_content}' for field '{field}'")
+                    logger.debug("  正在解析占位符: '%s' for field '%s'", placeholder_content, field)
 
                     # --- 新增：忽略 {{new(...)}} ---
                     if placeholder_content.lower().startswith("new("):
-                         print(f"    忽略占位符 new(): '{placeholder_content}'")
+                         logger.debug("    忽略占位符 new(): '%s'", placeholder_content)
                          processed_fields[field] = value # 保留原始值 {{new(...)}}
                          continue # 处理下一个字段
                     # --- 结束新增 ---
@@ -312,7 +315,7 @@ def process_placeholders(structured_records: List[Dict[str, Any]]) -> List[Dict[
                     # 处理 {{db(...)}}
                     if placeholder_content.lower().startswith("db(") and placeholder_content.endswith(")"):
                         query = placeholder_content[3:-1].strip()
-                        print(f"    占位符类型: db, 执行查询: '{query}'")
+                        logger.debug("    占位符类型: db, 执行查询: '%s'", query)
                         try:
                             query_result_str = execute_query(query)
                             query_result = json.loads(query_result_str)
@@ -321,26 +324,26 @@ def process_placeholders(structured_records: List[Dict[str, Any]]) -> List[Dict[
                                 first_row = query_result[0]
                                 if len(first_row) == 1:
                                     resolved_value = list(first_row.values())[0]
-                                    print(f"    查询结果 (单值): {resolved_value}")
+                                    logger.debug("    查询结果 (单值): %s", resolved_value)
                                     processed_fields[field] = resolved_value
                                 else:
                                     # 如果返回多列，可以选择返回整个字典或报错
-                                    print(f"    警告：db 查询 '{query}' 返回了多列，将使用整个字典。")
+                                    logger.warning("    警告：db 查询 '%s' 返回了多列，将使用整个字典。", query)
                                     processed_fields[field] = first_row # 或者抛出错误？
                             elif isinstance(query_result, list) and not query_result: # 空列表
-                                 print(f"    警告：db 查询 '{query}' 返回空结果。")
+                                 logger.warning("    警告：db 查询 '%s' 返回空结果。", query)
                                  # 抛出更友好的错误信息，指明查询没有找到结果
                                  raise ValueError(f"数据库查询 '{query}' 没有找到任何结果。请检查您的输入是否正确，或者该记录是否存在。")
                             else:
                                 raise ValueError(f"db 查询 '{query}' 的结果格式无法解析为单值: {query_result_str}")
                         except Exception as e:
-                            print(f"    错误：执行 db 查询 '{query}' 或处理结果失败: {e}")
+                            logger.error("    错误：执行 db 查询 '%s' 或处理结果失败: %s", query, e)
                             raise ValueError(f"处理 db 占位符失败: {e}")
 
                     # 处理 {{random(...)}}
                     elif placeholder_content.lower().startswith("random(") and placeholder_content.endswith(")"):
                         random_type = placeholder_content[7:-1].strip().lower()
-                        print(f"    占位符类型: random, 类型: '{random_type}'")
+                        logger.debug("    占位符类型: random, 类型: '%s'", random_type)
                         resolved_value = None
                         if random_type == "string":
                             resolved_value = ''.join(random.choices(string.ascii_letters + string.digits, k=10))
@@ -350,14 +353,14 @@ def process_placeholders(structured_records: List[Dict[str, Any]]) -> List[Dict[
                             resolved_value = str(uuid.uuid4())
                         # 可以添加更多随机类型，例如 email, phone 等
                         else:
-                            print(f"    错误：不支持的 random 类型 '{random_type}'")
+                            logger.error("    错误：不支持的 random 类型 '%s'", random_type)
                             raise ValueError(f"不支持的 random 类型: {random_type}")
-                        print(f"    生成随机值: {resolved_value}")
+                        logger.debug("    生成随机值: %s", resolved_value)
                         processed_fields[field] = resolved_value
 
                     else:
                         # 处理无法识别的占位符
-                        print(f"    错误：无法识别的占位符内容: '{placeholder_content}'")
+                        logger.error("    错误：无法识别的占位符内容: '%s'", placeholder_content)
                         raise ValueError(f"无法识别的占位符内容: {placeholder_content}")
                 else:
                     # 不是占位符，保留原始值
@@ -369,5 +372,5 @@ def process_placeholders(structured_records: List[Dict[str, Any]]) -> List[Dict[
         # 更新记录的 fields
         processed_records.append({"table_name": record["table_name"], "fields": processed_fields})
 
-    print(f"--- 占位符处理完成。处理后记录: {processed_records} ---")
+    logger.debug("--- 占位符处理完成。处理后记录: %s ---", processed_records)
     return processed_records
\ No newline at end of file
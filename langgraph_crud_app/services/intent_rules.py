@@ -0,0 +1,199 @@
+# intent_rules.py: 主意图的规则预分类 (关键词 + 句式，带置信度)，在 classify_main_intent 的 LLM 调用之前执行。
+"""
+"保存"、"是"、"重置"、"查询 X"、"删除 X" 这类输入没必要每回合都请求一次 LLM。
+这里用 classify_main_intent 提示词里已有的关键词分类做确定性判断:
+
+- 确认词整句匹配 (保存 / 是 / 好的 / 确定 ...) -> confirm_other
+- 重置词整句匹配 (重置 / 重新开始 / 清空 ...) -> reset
+- 以查询动词开头 (查询 / 查找 / 统计 ...) 或只有统计类疑问词，且没有任何写操作词 -> query_analysis
+- 以单一类别的写操作动词开头 (修改 / 新增 / 删除 ...)，没有其他写操作、查询动词、统计词和顺序连接词 -> modify / add / delete
+- 两种及以上写操作 -> composite (置信度低于默认阈值，只用于和 LLM 对比)
+- "取消"、"查找 X 并删除" 这类有歧义的输入不做判断 (返回 None)，交给 LLM
+
+确认回合的是 / 否 (classify_yes_no) 用词典判断 (match_yes_no): 全角、标点、表情、语气词、
+重复字和 "确定删除" / "不要了" 这类常见说法归一化后整句查词典，多个短句的结论一致才采用，其余交给 LLM。
+
+置信度 >= settings.INTENT_RULES_MIN_CONFIDENCE 时直接采用规则结果、跳过 LLM；
+否则 (或按 settings.INTENT_RULES_AUDIT_RATE 抽样) 仍然调用 LLM，并用 record() 记录规则和 LLM 是否一致，
+指标 crud_intent_rules_total{rule,outcome} 和日志 (不一致时 INFO) 用来调整规则。
+"""
+
+import logging
+import random
+import re
+import unicodedata
+from typing import NamedTuple, Optional
+
+from langgraph_crud_app.config import settings
+from langgraph_crud_app.observability.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+INTENT_RULES_TOTAL = registry.counter(
+    "crud_intent_rules_total",
+    "规则预分类结果 (主意图 / 是否确认；outcome: short_circuit / agree / disagree / no_match)", ["rule", "outcome"])
+
+
+class RuleMatch(NamedTuple):
+    intent: str
+    confidence: float
+    rule: str
+
+
+CONFIRM_WORDS = {"保存", "确认", "是", "是的", "好", "好的", "确定", "继续", "可以", "行", "对", "没问题",
+                 "否", "不", "不是", "不要", "不用了", "ok", "yes", "y", "no", "n"}
+RESET_WORDS = {"重置", "重新开始", "清空", "重来", "从头开始", "reset"}
+# 重置词后面常跟的补充说明，去掉后再整句匹配 ("重置所有数据" / "清空对话")
+_RESET_SUFFIX = re.compile(r"(一下|所有|全部|数据|会话|对话|记录|吧)+$")
+
+QUERY_VERBS = ("查询", "查找", "查看", "搜索", "查", "统计", "分析", "列出", "显示", "找出", "筛选", "看看", "获取")
+STAT_WORDS = ("多少", "总数", "几个", "几条", "数量", "平均", "最多", "最少", "排名", "占比")
+WRITE_VERBS = {
+    "modify": ("修改", "更改", "变更", "更新"),
+    "add": ("新增", "添加", "创建", "增加"),
+    "delete": ("删除", "移除"),
+}
+# "创建时间"、"更新人" 这类字段名里的动词不算写操作
+_FIELD_NAMES = re.compile(r"(创建|更新|修改|变更|新增|添加)(时间|日期|人|者)")
+# 表示多个操作有先后顺序的连接词，出现时交给 LLM 判断是否复合操作
+CONNECTORS = ("并且", "并", "然后", "同时", "再", "之后", "接着", "随后", "顺便", "以及", "另外", ";")
+# 句首的客套 / 主语，去掉后再看动词
+_PREFIX = re.compile(r"^(请你|请|帮我|帮忙|麻烦|我想要|我想|我要|给我|能否|能不能|可以)+")
+_TRAILING = re.compile(r"[\s?!.,~。？！，、…]+$")
+
+
+def _normalize(query: str) -> str:
+    text = unicodedata.normalize("NFKC", query or "").strip().lower()
+    return _TRAILING.sub("", text)
+
+
+def _write_categories(text: str):
+    text = _FIELD_NAMES.sub("", text)
+    return [intent for intent, verbs in WRITE_VERBS.items() if any(verb in text for verb in verbs)]
+
+
+def match_main_intent(query: str) -> Optional[RuleMatch]:
+    """规则判断主意图；没有规则适用 (或有歧义) 时返回 None。"""
+    text = _normalize(query)
+    if not text:
+        return None
+    if text in CONFIRM_WORDS:
+        return RuleMatch("confirm_other", 0.98, "confirm_word")
+    if text in RESET_WORDS or _RESET_SUFFIX.sub("", text) in RESET_WORDS:
+        return RuleMatch("reset", 0.97, "reset_word")
+
+    body = _PREFIX.sub("", text)
+    writes = _write_categories(body)
+    has_query_verb = any(verb in body for verb in QUERY_VERBS)
+    has_stat = any(word in body for word in STAT_WORDS)
+    has_connector = any(conn in body for conn in CONNECTORS)
+    # 长句更可能带有复杂条件，规则的把握小一些
+    penalty = 0.1 if len(body) > 60 else 0.0
+
+    if len(writes) >= 2:
+        return RuleMatch("composite", 0.8 - penalty, "multi_write")
+    if not writes:
+        if body.startswith(QUERY_VERBS):
+            return RuleMatch("query_analysis", 0.95 - penalty, "query_verb_start")
+        if has_stat:
+            return RuleMatch("query_analysis", 0.9 - penalty, "stat_question")
+        if has_query_verb:
+            return RuleMatch("query_analysis", 0.85 - penalty, "query_verb")
+        return None
+    intent = writes[0]
+    if has_query_verb or has_stat or has_connector:
+        # "查找 X 并删除"、"统计新增工单数" 等，交给 LLM
+        return None
+    if body.startswith(WRITE_VERBS[intent]):
+        return RuleMatch(intent, 0.95 - penalty, f"{intent}_verb_start")
+    return RuleMatch(intent, 0.85 - penalty, f"{intent}_verb")
+
+
+def is_confident(match: Optional[RuleMatch]) -> bool:
+    return match is not None and match.confidence >= settings.INTENT_RULES_MIN_CONFIDENCE
+
+
+def should_audit() -> bool:
+    """按抽样比例让有把握的规则结果也调用一次 LLM，用于统计一致率。"""
+    rate = settings.INTENT_RULES_AUDIT_RATE
+    return rate > 0 and random.random() < rate
+
+
+def record(match: Optional[RuleMatch], query: str, llm_intent: Optional[str] = None, rule: str = "none") -> None:
+    """
+    记录规则结果: llm_intent 为 None 表示直接采用了规则结果，否则记录与 LLM 是否一致。
+    没有规则适用时按 rule 计入 no_match。
+    """
+    if match is None:
+        INTENT_RULES_TOTAL.inc(rule=rule, outcome="no_match")
+        return
+    if llm_intent is None:
+        INTENT_RULES_TOTAL.inc(rule=match.rule, outcome="short_circuit")
+        logger.debug("规则预分类直接采用: %s (%s, %.2f)", match.intent, match.rule, match.confidence)
+        return
+    agree = match.intent == llm_intent
+    INTENT_RULES_TOTAL.inc(rule=match.rule, outcome="agree" if agree else "disagree")
+    if agree:
+        logger.debug("规则预分类与 LLM 一致: %s (%s, %.2f)", match.intent, match.rule, match.confidence)
+    else:
+        logger.info("规则预分类与 LLM 不一致: 规则=%s (%s, %.2f), LLM=%s, 输入=%r",
+                    match.intent, match.rule, match.confidence, llm_intent, query[:100])
+
+
+# --- 确认回合的是 / 否 ---
+
+YES_WORDS = {"是", "是的", "对", "对的", "好", "好的", "行", "可以", "确定", "确认", "同意", "没问题", "执行",
+             "继续", "嗯", "要", "需要", "就这样", "提交", "没错", "当然", "ok", "okay", "yes", "y", "yep", "sure"}
+NO_WORDS = {"否", "不", "不是", "不要", "不行", "不用", "不了", "算了", "取消", "放弃", "不同意", "别", "停",
+            "停止", "撤销", "不执行", "先不", "先不要", "不需要", "no", "n", "nope"}
+# 提示词约定 "保存" 等不是对确认问题的回答
+UNKNOWN_WORDS = {"保存"}
+_EMOJI_ANSWERS = {"👍": " 好 ", "👌": " 好 ", "✅": " 好 ", "✔": " 好 ", "👎": " 不 ", "❌": " 不 ", "✖": " 不 "}
+# 回答后面跟的操作词: "确定删除"、"取消修改"
+_OP_SUFFIX = re.compile(r"(删除|修改|新增|添加|更新|执行|提交|操作|这个|它)+$")
+_PARTICLE = re.compile(r"(吧|啊|呀|哈|啦|了|呢|哦|噢|的|谢谢|麻烦了)$")
+# 只有客套话的短句不影响结论: "不了，谢谢"
+_POLITE = {"谢谢", "谢谢你", "感谢", "麻烦了", "辛苦了", "thanks", "thx"}
+_SEGMENT_SPLIT = re.compile(r"[\s,.!?;:~，。！？；：、…～]+")
+
+
+def _lookup(word: str) -> Optional[str]:
+    if word in UNKNOWN_WORDS:
+        return "unknown"
+    if word in YES_WORDS:
+        return "yes"
+    if word in NO_WORDS:
+        return "no"
+    return None
+
+
+def _yes_no_word(segment: str) -> Optional[str]:
+    # "可以的" 本身就是回答，"请确认" 要先去掉句首客套
+    for word in dict.fromkeys((segment, _PREFIX.sub("", segment))):
+        # 逐个去掉句末语气词 ("算了吧" -> "算了")，每一步都试一下去掉操作词 / 重复字的形式
+        while word:
+            for candidate in (word, _OP_SUFFIX.sub("", word), re.sub(r"(.)\1+", r"\1", word)):
+                answer = _lookup(candidate)
+                if answer is not None:
+                    return answer
+            stripped = _PARTICLE.sub("", word)
+            if stripped == word:
+                break
+            word = stripped
+    return None
+
+
+def match_yes_no(query: str) -> Optional[RuleMatch]:
+    """确认回合的是 / 否词典判断；有任何一段不认识或多段结论不一致时返回 None。"""
+    text = unicodedata.normalize("NFKC", query or "").lower()
+    for emoji, word in _EMOJI_ANSWERS.items():
+        text = text.replace(emoji, word)
+    # 其余表情 / 符号 (So)、变体选择符和零宽连接符直接去掉
+    text = "".join(ch for ch in text if unicodedata.category(ch) not in ("So", "Sk", "Mn", "Cf"))
+    segments = [seg for seg in _SEGMENT_SPLIT.split(text) if seg and seg not in _POLITE]
+    if not segments or len(segments) > 4:
+        return None
+    answers = {_yes_no_word(seg) for seg in segments}
+    if len(answers) != 1 or None in answers:
+        return None
+    return RuleMatch(answers.pop(), 1.0, "yes_no_lexicon")
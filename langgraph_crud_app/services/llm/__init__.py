@@ -1,10 +1,5 @@
-from . import llm_preprocessing_service
-from . import llm_query_service
-from . import llm_flow_control_service
-from . import llm_modify_service
-from . import llm_add_service
-from . import llm_delete_service
-from . import llm_error_service
+# 各 LLM 服务模块在首次访问时才导入 (PEP 562)，import 本包不会加载 prompt / 客户端相关依赖。
+import importlib
 
 __all__ = [
     "llm_preprocessing_service",
@@ -14,4 +9,19 @@ __all__ = [
     "llm_add_service",
     "llm_delete_service",
     "llm_error_service",
-] 
\ No newline at end of file
+    "llm_composite_service",
+    "llm_factory",
+    "llm_cache",
+    "sql_cache",
+    "llm_policy",
+]
+
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,271 @@
+# llm_cache.py: 确定性 LLM 调用的持久化响应缓存 (SQLite，LRU + TTL)，默认关闭。
+"""
+意图分类、是否确认、复合请求解析、删除预览 SQL、新增解析这些调用温度为 0 ~ 0.1，
+同样的输入几乎总是得到同样的输出，而且重复率很高 (同一个用户反复问类似的问题、"是" / "否")。
+
+- 作为 LangChain 的 BaseCache 挂在 ChatOpenAI(cache=...) 上 (由 llm_factory 按流程和温度决定是否挂)，
+  键是 sha256(模型序列化参数 (含 model / temperature 等) + 渲染后的完整消息)，
+  模型、参数或 prompt 任一变化都不会命中旧结果。
+- 存储是单独的 SQLite 文件 (WAL)；超过 settings.LLM_CACHE_MAX_ENTRIES 条时按最近访问时间淘汰 (LRU)，
+  超过 settings.LLM_CACHE_TTL 秒的条目视为过期。
+- 按流程 (服务) 开启: settings.LLM_CACHE_FLOWS；温度高于 settings.LLM_CACHE_MAX_TEMPERATURE 的调用自动绕过。
+- 命中时返回的消息不带 usage，LLM 用量统计不会把缓存命中算成 token 花费。
+- 指标: crud_llm_cache_requests_total{flow,result}、crud_llm_cache_saved_seconds_total{flow}，
+  stats() 汇总命中率和节省的时间 (/admin/llm_cache)。节省的时间按该条目首次生成时的实际耗时计算。
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core.messages import messages_from_dict, messages_to_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+from langgraph_crud_app.config import settings
+from langgraph_crud_app.observability.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+CACHE_REQUESTS = registry.counter(
+    "crud_llm_cache_requests_total", "LLM 响应缓存查询次数", ["flow", "result"])
+CACHE_SAVED_SECONDS = registry.counter(
+    "crud_llm_cache_saved_seconds_total", "缓存命中节省的 LLM 调用时间 (按首次生成耗时估算)", ["flow"])
+
+
+def _key(prompt: str, llm_string: str) -> str:
+    return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+class LLMCacheStore:
+    """SQLite 存储，所有流程共用。"""
+
+    def __init__(self, db_path: str = settings.LLM_CACHE_PATH,
+                 max_entries: int = settings.LLM_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = settings.LLM_CACHE_TTL):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._count: Optional[int] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # 首次使用时才建库
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, flow TEXT NOT NULL, created REAL NOT NULL, last_access REAL NOT NULL, "
+                "hits INTEGER NOT NULL DEFAULT 0, latency_ms REAL NOT NULL DEFAULT 0, value TEXT NOT NULL)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache (last_access)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key: str, now: Optional[float] = None):
+        """返回 (value, latency_ms)；不存在返回 None，过期返回 "expired" 并删除。"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            row = self.conn.execute("SELECT value, created, latency_ms FROM llm_cache WHERE key = ?",
+                                    (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl_seconds > 0 and row[1] < now - self.ttl_seconds:
+                self.conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self.conn.commit()
+                if self._count is not None:
+                    self._count -= 1
+                return "expired"
+            self.conn.execute("UPDATE llm_cache SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            self.conn.commit()
+        return row[0], row[2]
+
+    def put(self, key: str, flow: str, value: str, latency_ms: float, now: Optional[float] = None) -> None:
+        now = now if now is not None else time.time()
+        with self._lock:
+            existed = self.conn.execute("SELECT 1 FROM llm_cache WHERE key = ?", (key,)).fetchone() is not None
+            # 覆盖已有条目时保留累计命中次数
+            self.conn.execute(
+                "INSERT INTO llm_cache (key, flow, created, last_access, hits, latency_ms, value) "
+                "VALUES (?, ?, ?, ?, 0, ?, ?) ON CONFLICT(key) DO UPDATE SET flow = excluded.flow, "
+                "created = excluded.created, last_access = excluded.last_access, "
+                "latency_ms = excluded.latency_ms, value = excluded.value", (key, flow, now, now, latency_ms, value))
+            if self._count is None:
+                self._count = self.conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            elif not existed:
+                self._count += 1
+            if self.max_entries > 0 and self._count > self.max_entries:
+                self._evict(now)
+            self.conn.commit()
+
+    def _evict(self, now: float) -> None:
+        """先删过期条目，仍然超限时按 last_access 淘汰到上限的 90%，避免每次写入都触发淘汰。"""
+        if self.ttl_seconds > 0:
+            self.conn.execute("DELETE FROM llm_cache WHERE created < ?", (now - self.ttl_seconds,))
+        count = self.conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        target = int(self.max_entries * 0.9)
+        if count > target:
+            self.conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_access LIMIT ?)",
+                (count - target,))
+            logger.debug("LLM 缓存淘汰 %s 条 (上限 %s)", count - target, self.max_entries)
+            count = target
+        self._count = count
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            deleted = self.conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,)).rowcount > 0
+            self.conn.commit()
+            if deleted and self._count is not None:
+                self._count -= 1
+        return deleted
+
+    def clear(self, flow: Optional[str] = None) -> None:
+        with self._lock:
+            if flow is None:
+                self.conn.execute("DELETE FROM llm_cache")
+            else:
+                self.conn.execute("DELETE FROM llm_cache WHERE flow = ?", (flow,))
+            self.conn.commit()
+            self._count = None
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """按流程统计条目数、存储字节数和累计命中次数。"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT flow, COUNT(*), SUM(LENGTH(value)), SUM(hits) FROM llm_cache GROUP BY flow").fetchall()
+        return {flow: {"entries": count, "bytes": size or 0, "stored_hits": hits or 0}
+                for flow, count, size, hits in rows}
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class LLMCache(BaseCache):
+    """某个流程的缓存视图 (共用同一个 LLMCacheStore)，按流程记录命中率。"""
+
+    def __init__(self, store: LLMCacheStore, flow: str):
+        self.store = store
+        self.flow = flow
+        # 未命中 -> 写入之间的耗时就是这次 LLM 调用的耗时，用来估算以后命中时节省的时间
+        self._misses: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        key = _key(prompt, llm_string)
+        try:
+            found = self.store.get(key)
+        except sqlite3.Error as e:
+            logger.warning("LLM 缓存读取失败，直接调用模型: %s", e)
+            return None
+        if found is None or found == "expired":
+            CACHE_REQUESTS.inc(flow=self.flow, result="miss" if found is None else "expired")
+            _stats.record(self.flow, hit=False)
+            with self._lock:
+                self._misses[key] = time.perf_counter()
+                while len(self._misses) > 1000:
+                    self._misses.popitem(last=False)
+            return None
+        value, latency_ms = found
+        CACHE_REQUESTS.inc(flow=self.flow, result="hit")
+        CACHE_SAVED_SECONDS.inc(latency_ms / 1000, flow=self.flow)
+        _stats.record(self.flow, hit=True, saved_ms=latency_ms)
+        # 命中不产生 token 花费: 去掉原响应的 usage
+        return [ChatGeneration(message=message.model_copy(update={"usage_metadata": None, "response_metadata": {}}))
+                for message in messages_from_dict(json.loads(value))]
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        messages = [gen.message for gen in return_val if isinstance(gen, ChatGeneration)]
+        if len(messages) != len(return_val):
+            return
+        key = _key(prompt, llm_string)
+        with self._lock:
+            started = self._misses.pop(key, None)
+        latency_ms = (time.perf_counter() - started) * 1000 if started is not None else 0.0
+        try:
+            self.store.put(key, self.flow, json.dumps(messages_to_dict(messages), ensure_ascii=False), latency_ms)
+        except sqlite3.Error as e:
+            logger.warning("LLM 缓存写入失败: %s", e)
+
+    def clear(self, **kwargs: Any) -> None:
+        self.store.clear(self.flow)
+
+
+class _Stats:
+    """进程内的命中统计 (指标之外的便捷汇总)。"""
+
+    def __init__(self):
+        self._flows: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, flow: str, hit: bool, saved_ms: float = 0.0) -> None:
+        with self._lock:
+            item = self._flows.setdefault(flow, {"hits": 0, "misses": 0, "saved_ms": 0.0})
+            item["hits" if hit else "misses"] += 1
+            item["saved_ms"] += saved_ms
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {flow: dict(item) for flow, item in self._flows.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._flows.clear()
+
+
+_stats = _Stats()
+_store: Optional[LLMCacheStore] = None
+_caches: Dict[str, LLMCache] = {}
+_caches_lock = threading.Lock()
+
+
+def _enabled_flows() -> set:
+    return {flow.strip() for flow in settings.LLM_CACHE_FLOWS.split(",") if flow.strip()}
+
+
+def cache_for(flow: str, temperature: float) -> Optional[LLMCache]:
+    """该流程 / 温度的调用应该使用的缓存；未开启、流程未列出或温度过高时返回 None。"""
+    global _store
+    if not settings.LLM_CACHE_ENABLED or temperature > settings.LLM_CACHE_MAX_TEMPERATURE:
+        return None
+    if flow not in _enabled_flows():
+        return None
+    with _caches_lock:
+        cache = _caches.get(flow)
+        if cache is None:
+            if _store is None:
+                _store = LLMCacheStore()
+            cache = _caches[flow] = LLMCache(_store, flow)
+    return cache
+
+
+def stats() -> Dict[str, Any]:
+    """各流程的命中率、节省的时间 (本进程) 和存储占用。"""
+    flows = {}
+    for flow, item in _stats.snapshot().items():
+        total = item["hits"] + item["misses"]
+        flows[flow] = {
+            "hits": int(item["hits"]),
+            "misses": int(item["misses"]),
+            "hit_rate": round(item["hits"] / total, 4) if total else 0.0,
+            "saved_ms": round(item["saved_ms"], 1),
+        }
+    hits = sum(f["hits"] for f in flows.values())
+    total = hits + sum(f["misses"] for f in flows.values())
+    return {
+        "enabled": settings.LLM_CACHE_ENABLED,
+        "flows": flows,
+        "total": {"hits": hits, "misses": total - hits, "hit_rate": round(hits / total, 4) if total else 0.0,
+                  "saved_ms": round(sum(f["saved_ms"] for f in flows.values()), 1)},
+        "storage": _store.summary() if _store is not None else {},
+    }
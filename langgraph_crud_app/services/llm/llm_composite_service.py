@@ -2,51 +2,25 @@
 封装处理复合操作请求（如同时修改和新增）的 LLM 调用逻辑。
 """
 
+import logging
 import json
 from typing import Dict, Any, List, Optional
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
 import re
 
 from langgraph_crud_app.config import settings
+from langgraph_crud_app.services import schema_index, schema_notation
+from langgraph_crud_app.services.llm import llm_factory, llm_policy
 
-# === 核心函数 ===
-
-def parse_combined_request(
-    user_query: str,
-    schema_info: str,
-    table_names: List[str],
-    sample_data: str
-) -> List[Dict[str, Any]]:
-    """
-    使用 LLM 解析用户的复合请求（可能包含修改、新增、删除等），
-    并生成一个结构化的操作列表。
-    (已更新 Prompt 以处理隐式查找和改进依赖处理)
-
-    Args:
-        user_query: 用户的原始自然语言请求。
-        schema_info: 数据库 Schema 的 JSON 字符串。
-        table_names: 数据库中的表名列表。
-        sample_data: 数据示例的 JSON 字符串。
-
-    Returns:
-        一个操作字典的列表，每个字典描述一个数据库操作。
-        如果解析失败或无有效操作，则返回空列表。
+logger = logging.getLogger(__name__)
 
-    Raises:
-        ValueError: 如果 LLM 调用失败或返回格式严重错误。
-    """
-    print(f"--- LLM 服务: 解析复合请求 (增强 Prompt): {user_query[:100]}... ---")
+# === 核心函数 ===
 
-    # --- Prompt 设计 (对齐单一流程, 处理复合操作, 增强查找和依赖) ---
-    prompt_template = """
+# --- Prompt 设计 (对齐单一流程, 处理复合操作, 增强查找和依赖) ---
+# 规则和示例在前 (每次请求都不变，可以命中提供方的前缀缓存)，Schema / 数据示例 / 用户请求放在最后
+PARSE_COMBINED_REQUEST_PROMPT = """
 你是一个强大的数据库操作规划器。你的任务是仔细分析用户的自然语言请求，该请求可能包含多个步骤，涉及对数据库的修改(UPDATE)、新增(INSERT)或删除(DELETE)操作。你需要将用户的请求分解为一系列按顺序执行的原子数据库操作，并以 JSON 列表的格式输出。
 
-可用信息:
-- 用户请求: {query}
-- 数据库 Schema (JSON): {schema}
-- 表名列表: {tables}
-- 数据示例 (JSON): {sample}
+可用信息 (数据库 Schema、表名列表、数据示例和用户请求见最后)。
 
 **核心规则:**
 
@@ -202,25 +176,55 @@ def parse_combined_request(
     ]
     ```
 
+数据库 Schema: {schema}
+表名列表: {tables}
+数据示例 (JSON): {sample}
+
 请根据上述规则，将以下用户请求转换为操作列表:
 用户请求: {query}
 """
-    # --- Prompt 设计结束 ---
+
+
+def parse_combined_request(
+    user_query: str,
+    schema_info: str,
+    table_names: List[str],
+    sample_data: str
+) -> List[Dict[str, Any]]:
+    """
+    使用 LLM 解析用户的复合请求（可能包含修改、新增、删除等），
+    并生成一个结构化的操作列表。
+    (已更新 Prompt 以处理隐式查找和改进依赖处理)
+
+    Args:
+        user_query: 用户的原始自然语言请求。
+        schema_info: 数据库 Schema 的 JSON 字符串。
+        table_names: 数据库中的表名列表。
+        sample_data: 数据示例的 JSON 字符串。
+
+    Returns:
+        一个操作字典的列表，每个字典描述一个数据库操作。
+        如果解析失败或无有效操作，则返回空列表。
+
+    Raises:
+        ValueError: 如果 LLM 调用失败或返回格式严重错误。
+    """
+    logger.debug("--- LLM 服务: 解析复合请求 (增强 Prompt): %s... ---", user_query[:100])
+    schema_info, table_names, sample_data = schema_index.narrow(user_query, schema_info, table_names, sample_data)
 
     try:
-        prompt = ChatPromptTemplate.from_template(prompt_template)
-        llm = ChatOpenAI(model="gpt-4o", temperature=0.0) # 保持低温度以获得确定性输出
-        chain = prompt | llm
+        llm = llm_factory.get_chat_model("composite", temperature=0.0, model=llm_factory.model_for_flow("composite_parse")) # 保持低温度以获得确定性输出
+        chain = llm_factory.get_chain("parse_combined_request", PARSE_COMBINED_REQUEST_PROMPT, llm)
 
-        response = chain.invoke({
+        response = llm_policy.invoke(chain, {
             "query": user_query,
-            "schema": schema_info,
+            "schema": schema_notation.for_prompt(schema_info),
             "tables": table_names,
             "sample": sample_data
         })
 
         llm_output = response.content.strip()
-        print(f"--- LLM 解析复合请求原始输出:\n{llm_output}\n---")
+        logger.debug("--- LLM 解析复合请求原始输出:\n%s\n---", llm_output)
 
         # 清理 Markdown
         if llm_output.startswith("```json"):
@@ -248,18 +252,18 @@ def parse_combined_request(
         # 在解析前再次 strip 以移除可能的前导/尾随空白
         llm_output = llm_output.strip()
 
-        print(f"--- LLM 解析复合请求 (清理后):\n{llm_output}\n---")
+        logger.debug("--- LLM 解析复合请求 (清理后):\n%s\n---", llm_output)
 
 
         # 解析 JSON 列表
         # 添加额外的检查，防止解析空的或无效的字符串
         if not llm_output or llm_output == "[]":
-            print("错误: 清理后的 LLM 输出为空或无效，返回空列表。")
+            logger.error("错误: 清理后的 LLM 输出为空或无效，返回空列表。")
             return []
 
         parsed_plan = json.loads(llm_output)
         if not isinstance(parsed_plan, list):
-            print("错误: LLM 输出不是有效的 JSON 列表。")
+            logger.error("错误: LLM 输出不是有效的 JSON 列表。")
             return []
 
         # === 新增：基本逻辑校验 ===
@@ -267,46 +271,26 @@ def parse_combined_request(
             depends_on = op.get("depends_on_index")
             if depends_on is not None:
                 if not isinstance(depends_on, int) or depends_on < 0 or depends_on >= i:
-                    print(f"错误: 解析后的计划包含无效依赖 (操作 {i} 依赖于 {depends_on})。")
+                    logger.error("错误: 解析后的计划包含无效依赖 (操作 %s 依赖于 %s)。", i, depends_on)
                     # 可以选择返回空列表或抛出异常
                     return [] # 返回空列表表示计划无效
         # === 校验结束 ===
 
-        print(f"--- LLM 解析复合请求成功，生成操作计划: {parsed_plan} ---")
+        logger.debug("--- LLM 解析复合请求成功，生成操作计划: %s ---", parsed_plan)
         return parsed_plan
 
     except json.JSONDecodeError as e:
-        print(f"错误: 解析 LLM 输出的 JSON 列表失败: {e}\n清理后输出: {llm_output}")
+        logger.error("错误: 解析 LLM 输出的 JSON 列表失败: %s\n清理后输出: %s", e, llm_output)
         return []
     except Exception as e:
-        print(f"错误: 调用 LLM 解析复合请求时发生错误: {e}")
+        logger.error("错误: 调用 LLM 解析复合请求时发生错误: %s", e)
         raise ValueError(f"LLM call for combined request failed: {e}") from e
 
-def format_combined_preview(
-    user_query: str,
-    combined_operation_plan: List[Dict[str, Any]]
-) -> str:
-    """
-    使用 LLM 将结构化的复合操作计划格式化为用户友好的预览文本。
-
-    Args:
-        user_query: 用户的原始查询（供 LLM 参考）。
-        combined_operation_plan: 由 parse_combined_request 生成的操作列表。
-
-    Returns:
-        用户友好的复合操作文本预览。
-    """
-    print(f"--- 调用 LLM 格式化复合操作预览 ---")
-
-    # --- Prompt 设计 --- 
-    # 目标：清晰地向用户展示将要执行的所有步骤
-    prompt_template = """
+# --- Prompt 设计 ---
+# 目标：清晰地向用户展示将要执行的所有步骤 (用户请求和操作计划放在最后)
+FORMAT_COMBINED_PREVIEW_PROMPT = """
     你是一个清晰简洁的沟通助手。用户的请求已被解析为一系列数据库操作步骤。请将这些步骤用自然语言清晰地展示给用户，以便用户确认。
 
-    参考信息:
-    - 用户原始请求: {query}
-    - 将要执行的操作计划 (JSON 列表): {plan}
-
     预览要求:
     1.  **概述**: 首先简单说明将要执行一个包含多个步骤的操作。
     2.  **分步**: 使用有序列表（1., 2., ...）清晰列出每个操作。
@@ -331,29 +315,45 @@ def format_combined_preview(
 
     现在，请根据以下信息生成预览文本:
     用户原始请求: {query}
-    操作计划:
+    将要执行的操作计划 (JSON 列表):
     {plan}
     """
-    # --- Prompt 设计结束 ---
+
+
+def format_combined_preview(
+    user_query: str,
+    combined_operation_plan: List[Dict[str, Any]]
+) -> str:
+    """
+    使用 LLM 将结构化的复合操作计划格式化为用户友好的预览文本。
+
+    Args:
+        user_query: 用户的原始查询（供 LLM 参考）。
+        combined_operation_plan: 由 parse_combined_request 生成的操作列表。
+
+    Returns:
+        用户友好的复合操作文本预览。
+    """
+    logger.debug("--- 调用 LLM 格式化复合操作预览 ---")
+
 
     try:
-        prompt = ChatPromptTemplate.from_template(prompt_template)
-        llm = ChatOpenAI(model=settings.OPENAI_MODEL_NAME, temperature=0.2)
-        chain = prompt | llm
+        llm = llm_factory.get_chat_model("composite", temperature=0.2)
+        chain = llm_factory.get_chain("format_combined_preview", FORMAT_COMBINED_PREVIEW_PROMPT, llm)
 
         # 将操作计划序列化为 JSON 字符串
         plan_json = json.dumps(combined_operation_plan, ensure_ascii=False, indent=2)
 
-        response = chain.invoke({
+        response = llm_policy.invoke(chain, {
             "query": user_query,
             "plan": plan_json
         })
         preview_text = response.content.strip()
-        print(f"--- LLM 格式化复合预览结果: {preview_text} ---")
+        logger.debug("--- LLM 格式化复合预览结果: %s ---", preview_text)
         return preview_text
 
     except Exception as e:
-        print(f"--- LLM 格式化复合预览出错: {e} ---")
+        logger.error("--- LLM 格式化复合预览出错: %s ---", e)
         # 返回一个通用的错误或默认预览
         plan_str_fallback = json.dumps(combined_operation_plan, ensure_ascii=False, indent=2)
         return f"无法生成清晰的预览。将尝试执行以下操作计划，请谨慎确认：\n{plan_str_fallback}" 
\ No newline at end of file
@@ -1,12 +1,14 @@
 # langgraph_crud_app/services/llm/llm_delete_service.py
 
+import logging
 import json
 from typing import List, Dict, Any
 
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
-
 from langgraph_crud_app.config import settings
+from langgraph_crud_app.services import schema_index, schema_notation
+from langgraph_crud_app.services.llm import llm_factory, llm_policy
+
+logger = logging.getLogger(__name__)
 
 # --- 新增：辅助函数：转义 JSON 字符串中的花括号 ---
 def _escape_json_for_prompt(json_str: str) -> str:
@@ -25,12 +27,7 @@ def _escape_json_for_prompt(json_str: str) -> str:
 # Note: Removed Dify specific variable syntax like {{#...#}}
 GENERATE_DELETE_PREVIEW_SQL_PROMPT = """
 你是一个数据库助手。根据用户输入和表结构，生成合法的 MySQL SELECT 语句，查询待删除的记录，仅用于预览或检查，不生成 DELETE 语句。
-
-用户输入：
-{user_query}
-表结构：{schema_info}
-表名：{table_names_str}
-数据示例：{sample_data}
+(表结构、表名、数据示例和用户输入见最后)
 
 **核心要求：生成符合要求的完整SQL语句，确保语法正确且括号匹配，查询结果准确**
 
@@ -44,7 +41,7 @@ GENERATE_DELETE_PREVIEW_SQL_PROMPT = """
 3. 生成SQL：
    - 格式：SELECT '[表名]' AS table_name, [主键] AS id, [字段1], [字段2], NULL AS extra1 FROM [表名] WHERE [条件]。
    - 可以使用任何必要的SQL语法（JOIN, 子查询, IN, EXISTS等）以满足查询需求。
-   - 主键从表结构提取（"PRI"标记）。
+   - 主键从表结构提取（"PRI" 或 PK 标记）。
 4. 关联表：
    - 如查询涉及多个表的关联关系，使用UNION ALL连接多个SELECT语句。
    - 可以在每个SELECT中使用必要的子查询、JOIN等。
@@ -99,17 +96,18 @@ GENERATE_DELETE_PREVIEW_SQL_PROMPT = """
     WHERE t.provider = 'OpenAI' AND t2.id IS NULL
     AND EXISTS (SELECT 1 FROM prompts p WHERE p.user_id = u.id AND p.category = 'writing')
   );
+
+表结构：{schema_info}
+表名：{table_names_str}
+数据示例：{sample_data}
+
+用户输入：
+{user_query}
 """
 
 # Prompt for Formatting Delete Preview (Based on Dify LLM 11 Goal)
 FORMAT_DELETE_PREVIEW_PROMPT = """
-System: 你是一个信息整理助手。将以下 JSON 格式的查询结果整理成用户易于阅读的文本列表，说明将要删除哪些记录。
-
-Input JSON Data (查询结果):
-{delete_show_json}
-
-Database Schema (参考):
-{schema_info}
+System: 你是一个信息整理助手。将最后给出的 JSON 格式的查询结果整理成用户易于阅读的文本列表，说明将要删除哪些记录。
 
 规则:
 1.  **检查空数据**: 如果输入 JSON 数据为空列表 (`[]`) 或无效，直接输出 "未找到需要删除的记录。"
@@ -137,6 +135,12 @@ Database Schema (参考):
  - id: 1
  - info: 登录操作
 
+Database Schema (参考):
+{schema_info}
+
+Input JSON Data (查询结果):
+{delete_show_json}
+
 现在，请根据提供的 JSON 数据和 Schema 整理预览文本。
 """
 
@@ -158,7 +162,7 @@ System: 你是一个数据提取助手。根据以下查询返回的数据（JSO
 1.  **输出格式**: 严格输出单一的 JSON 对象 `{{...}}`。此对象必须包含一个键 `"result"`，其值是一个字典，其中键是表名 (字符串)，值是对应表的主键值列表 (字符串列表，即使主键是数字也输出为字符串)。确保 JSON 格式有效，键和字符串值使用双引号。**输出纯 JSON 对象，不要包含任何其他文本或 Markdown 标记。**
 2.  **解析输入**: 输入的 `delete_show_json` 是一个 JSON 数组，每个对象代表一条待删除的记录，包含 `table_name` 和其他字段。
 3.  **分组**: 严格按照每个记录的 `table_name` 字段进行分组。
-4.  **提取主键**: 对于每个表，根据 `schema_info` 确定其主键字段名（查找 "key": "PRI" 的字段）。然后从该表对应的所有记录中提取此主键字段的值。
+4.  **提取主键**: 对于每个表，根据 `schema_info` 确定其主键字段名（查找 "key": "PRI" 或标记为 PK 的字段）。然后从该表对应的所有记录中提取此主键字段的值。
 5.  **空/无效输入**: 如果输入的 `delete_show_json` 为空数组 `[]` 或无法解析，或者解析后没有任何有效记录，返回空结果对象 `{{"result": {{}}}}`。
 
 示例：
@@ -194,26 +198,26 @@ def generate_delete_preview_sql(user_query: str, schema_info: str, table_names:
     """
     使用 LLM 根据用户输入生成用于预览待删除记录的 SELECT SQL。
     """
-    print("--- LLM 服务: 生成删除预览 SQL ---")
+    logger.debug("--- LLM 服务: 生成删除预览 SQL ---")
+    schema_info, table_names, sample_data = schema_index.narrow(user_query, schema_info, table_names, sample_data)
     try:
-        prompt = ChatPromptTemplate.from_template(GENERATE_DELETE_PREVIEW_SQL_PROMPT)
         # 使用较低温度保证 SQL 格式一致性
-        llm = ChatOpenAI(model=settings.OPENAI_MODEL_NAME, temperature=0.1)
-        chain = prompt | llm
+        llm = llm_factory.get_chat_model("delete", temperature=0.1)
+        chain = llm_factory.get_chain("generate_delete_preview_sql", GENERATE_DELETE_PREVIEW_SQL_PROMPT, llm)
 
         table_names_str = ", ".join(table_names) if table_names else "无"
 
-        response = chain.invoke({
+        response = llm_policy.invoke(chain, {
             "user_query": user_query,
-            "schema_info": schema_info,
+            "schema_info": schema_notation.for_prompt(schema_info),
             "table_names_str": table_names_str,
             "sample_data": sample_data
         })
 
         sql_output = response.content.strip()
-        print(f"--- LLM 生成的 SQL (长度: {len(sql_output)}) ---")
-        print(f"--- SQL前100个字符: {sql_output[:100]}... ---")
-        print(f"--- SQL最后100个字符: ...{sql_output[-100:]} ---")
+        logger.debug("--- LLM 生成的 SQL (长度: %s) ---", len(sql_output))
+        logger.debug("--- SQL前100个字符: %s... ---", sql_output[:100])
+        logger.debug("--- SQL最后100个字符: ...%s ---", sql_output[-100:])
 
         # 清理可能的 Markdown 代码块标记 (例如 ```sql ... ```)
         if sql_output.startswith("```sql"):
@@ -227,12 +231,12 @@ def generate_delete_preview_sql(user_query: str, schema_info: str, table_names:
 
         # 基本检查：是否返回了提示信息而不是 SQL
         if sql_output.startswith("请提供有效") or sql_output == "":
-             print("--- LLM 返回提示信息，非有效 SQL ---")
+             logger.debug("--- LLM 返回提示信息，非有效 SQL ---")
              # 将提示信息返回给 action node 处理
              return sql_output
         # 确保SQL是SELECT语句
         elif not sql_output.upper().strip().startswith("SELECT"):
-             print("--- LLM 输出似乎不是有效的 SELECT 语句 ---")
+             logger.debug("--- LLM 输出似乎不是有效的 SELECT 语句 ---")
              # 同样返回给 action node 处理
              return f"错误：LLM 未生成有效的 SELECT 语句。返回内容：{sql_output[:100]}..."
 
@@ -244,26 +248,26 @@ def generate_delete_preview_sql(user_query: str, schema_info: str, table_names:
             parts = sql_output.upper().split(" UNION ALL ")
             for i, part in enumerate(parts):
                 if not part.strip().startswith("SELECT"):
-                    print(f"--- 警告：UNION ALL第{i+1}部分不是有效的SELECT语句 ---")
+                    logger.warning("--- 警告：UNION ALL第%s部分不是有效的SELECT语句 ---", i+1)
                     # 可能需要二次生成修复
-            print(f"--- 检测到包含{len(parts)}个UNION ALL连接的查询 ---")
+            logger.debug("--- 检测到包含%s个UNION ALL连接的查询 ---", len(parts))
 
         # 检查SQL是否以分号结尾，如果没有则添加
         if not sql_output.endswith(';'):
             sql_output = sql_output + ';'
-            print("--- 为SQL添加了分号 ---")
+            logger.debug("--- 为SQL添加了分号 ---")
         
         # 安全性检查：确保SQL中不包含多条语句（防止SQL注入）
         if sql_output.count(';') > 1:
-            print("--- 警告：SQL包含多个语句，可能存在安全风险 ---")
+            logger.warning("--- 警告：SQL包含多个语句，可能存在安全风险 ---")
             # 只保留第一条语句
             sql_output = sql_output.split(';')[0] + ';'
-            print(f"--- 清理后的SQL: {sql_output[:100]}... ---")
+            logger.debug("--- 清理后的SQL: %s... ---", sql_output[:100])
 
         return sql_output
 
     except Exception as e:
-        print(f"--- 调用 generate_delete_preview_sql 时出错: {e} ---")
+        logger.error("--- 调用 generate_delete_preview_sql 时出错: %s ---", e)
         # 向上抛出异常，由 action node 捕获并存入 delete_error_message
         raise ValueError(f"生成删除预览 SQL 失败: {e}") from e
 
@@ -272,26 +276,25 @@ def format_delete_preview(delete_show_json: str, schema_info: str) -> str:
     """
     使用 LLM 将查询到的待删除记录 (JSON 字符串) 格式化为用户友好的文本。
     """
-    print("--- LLM 服务: 格式化删除预览 ---")
+    logger.debug("--- LLM 服务: 格式化删除预览 ---")
     try:
         # 预检查输入是否为空列表的 JSON 字符串
         if delete_show_json.strip() == '[]':
             return "未找到需要删除的记录。"
 
-        prompt = ChatPromptTemplate.from_template(FORMAT_DELETE_PREVIEW_PROMPT)
-        llm = ChatOpenAI(model=settings.OPENAI_MODEL_NAME, temperature=0.2)
-        chain = prompt | llm
+        llm = llm_factory.get_chat_model("delete", temperature=0.2)
+        chain = llm_factory.get_chain("format_delete_preview", FORMAT_DELETE_PREVIEW_PROMPT, llm)
 
-        response = chain.invoke({
+        response = llm_policy.invoke(chain, {
             "delete_show_json": delete_show_json,
-            "schema_info": schema_info
+            "schema_info": schema_notation.for_prompt(schema_info)
         })
         preview_text = response.content.strip()
-        print(f"--- LLM 格式化预览结果: ---\n{preview_text}\n---------------------")
+        logger.debug("--- LLM 格式化预览结果: ---\n%s\n---------------------", preview_text)
         return preview_text
 
     except Exception as e:
-        print(f"--- 调用 format_delete_preview 时出错: {e} ---")
+        logger.error("--- 调用 format_delete_preview 时出错: %s ---", e)
         # 提供回退预览
         try:
             # 尝试解析原始 JSON 以提供一些信息
@@ -306,27 +309,25 @@ def parse_delete_ids(delete_show_json: str, schema_info: str, table_names: List[
     使用 LLM 从预览数据 (JSON 字符串) 中解析出待删除记录的 ID，按表分组。
     返回包含 {{"result": {{"table": ["id1", ...], ...}}}} 的 JSON 字符串。
     """
-    print("--- LLM 服务: 解析待删除 ID ---")
+    logger.debug("--- LLM 服务: 解析待删除 ID ---")
     if delete_show_json.strip() == '[]':
-        print("--- 输入 delete_show_json 为空列表，返回空结果 JSON ---")
+        logger.warning("--- 输入 delete_show_json 为空列表，返回空结果 JSON ---")
         return '{{"result": {{}}}}'
     try:
         # --- 恢复：使用默认的模板创建方式，移除 format 和变量检查 ---
-        prompt = ChatPromptTemplate.from_template(PARSE_DELETE_IDS_PROMPT)
-
-        llm = ChatOpenAI(model=settings.OPENAI_MODEL_NAME, temperature=0.1)
-        chain = prompt | llm
+        llm = llm_factory.get_chat_model("delete", temperature=0.1)
+        chain = llm_factory.get_chain("parse_delete_ids", PARSE_DELETE_IDS_PROMPT, llm)
 
         table_names_str = ", ".join(table_names) if table_names else "无"
 
         # 保持原始调用
-        response = chain.invoke({
+        response = llm_policy.invoke(chain, {
             "delete_show_json": delete_show_json,
-            "schema_info": schema_info,
+            "schema_info": schema_notation.for_prompt(schema_info),
             "table_names_str": table_names_str
         })
         llm_output = response.content.strip()
-        print(f"--- LLM 解析 ID 原始输出: ---\n{llm_output}\n------------------------")
+        logger.debug("--- LLM 解析 ID 原始输出: ---\n%s\n------------------------", llm_output)
 
         # 清理可能的 Markdown 代码块标记
         if llm_output.startswith("```json"):
@@ -346,14 +347,14 @@ def parse_delete_ids(delete_show_json: str, schema_info: str, table_names: List[
             # 返回清理后的 JSON 字符串
             return llm_output
         except (json.JSONDecodeError, ValueError) as e:
-            print(f"--- LLM 输出的 JSON 格式无效或结构错误: {{e}} ---")
+            logger.error("--- LLM 输出的 JSON 格式无效或结构错误: %s ---", e)
             # 向上抛出异常，让 action node 处理
             raise ValueError(f"LLM未能按要求格式生成待删除 ID 的 JSON: {{e}}") from e
 
     except Exception as e:
-        print(f"--- 调用 parse_delete_ids 时出错: {{e}} ---")
+        logger.error("--- 调用 parse_delete_ids 时出错: %s ---", e)
         if "in format string" in str(e) or "missing variables" in str(e):
-             print("--- 检测到 Prompt 模板格式错误。请再次检查 PARSE_DELETE_IDS_PROMPT 中的大括号转义。 ---")
+             logger.error("--- 检测到 Prompt 模板格式错误。请再次检查 PARSE_DELETE_IDS_PROMPT 中的大括号转义。 ---")
         raise ValueError(f"解析待删除 ID 失败: {{e}}") from e 
 
 def parse_delete_ids_direct(delete_show_json: str, schema_info: str, table_names: List[str]) -> str:
@@ -369,11 +370,11 @@ def parse_delete_ids_direct(delete_show_json: str, schema_info: str, table_names
     Returns:
         JSON字符串，格式为 {"result": {"table_name": ["id1", "id2"], ...}}
     """
-    print("--- 服务: 直接解析待删除ID ---")
+    logger.debug("--- 服务: 直接解析待删除ID ---")
     
     # 处理空输入
     if not delete_show_json or delete_show_json.strip() == '[]' or delete_show_json.strip() == '{}':
-        print("--- 输入delete_show_json为空或为空列表/空对象，返回空结果JSON ---")
+        logger.warning("--- 输入delete_show_json为空或为空列表/空对象，返回空结果JSON ---")
         return '{"result": {}}'
     
     try:
@@ -382,7 +383,7 @@ def parse_delete_ids_direct(delete_show_json: str, schema_info: str, table_names
         
         # 检查解析后的结果是否为空列表
         if not records or (isinstance(records, list) and len(records) == 0):
-            print("--- 解析后的数据为空，返回空结果JSON ---")
+            logger.warning("--- 解析后的数据为空，返回空结果JSON ---")
             return '{"result": {}}'
             
         result = {}
@@ -391,13 +392,13 @@ def parse_delete_ids_direct(delete_show_json: str, schema_info: str, table_names
         for record in records:
             table_name = record.get("table_name")
             if not table_name:
-                print(f"--- 警告: 记录缺少table_name字段: {record} ---")
+                logger.warning("--- 警告: 记录缺少table_name字段: %s ---", record)
                 continue
                 
             # 查找ID字段（通常是"id"）
             id_value = record.get("id")
             if not id_value:
-                print(f"--- 警告: 记录缺少id字段: {record} ---")
+                logger.warning("--- 警告: 记录缺少id字段: %s ---", record)
                 continue
                 
             # 添加到结果
@@ -408,15 +409,15 @@ def parse_delete_ids_direct(delete_show_json: str, schema_info: str, table_names
         
         # 检查结果是否为空
         if not result:
-            print("--- 未能从记录中提取任何有效ID，返回空结果JSON ---")
+            logger.debug("--- 未能从记录中提取任何有效ID，返回空结果JSON ---")
             return '{"result": {}}'
             
-        print(f"--- 成功提取待删除ID: {result} ---")
+        logger.debug("--- 成功提取待删除ID: %s ---", result)
         # 返回符合格式的JSON
         return json.dumps({"result": result}, ensure_ascii=False)
     except json.JSONDecodeError as e:
-        print(f"--- 解析JSON失败: {e} ---")
+        logger.error("--- 解析JSON失败: %s ---", e)
         raise ValueError(f"解析待删除记录JSON失败: {e}")
     except Exception as e:
-        print(f"--- 解析待删除ID时出错: {e} ---")
+        logger.error("--- 解析待删除ID时出错: %s ---", e)
         raise ValueError(f"解析待删除ID失败: {e}") 
\ No newline at end of file
@@ -2,40 +2,19 @@
 错误处理LLM服务 - 将技术性错误转换为用户友好信息
 """
 
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
+import logging
 from typing import Dict, Any, Optional
 import json
 import re
 
 from langgraph_crud_app.config import settings
+from langgraph_crud_app.services.llm import llm_factory, llm_policy
 
-def translate_flask_error(
-    error_info: str, 
-    operation_context: Dict[str, Any],
-    schema_info: Optional[str] = None
-) -> str:
-    """
-    将Flask技术错误转换为用户友好的错误信息
-    
-    Args:
-        error_info: Flask返回的原始错误信息
-        operation_context: 操作上下文，包含用户查询、操作类型、涉及的表等
-        schema_info: 可选的数据库结构信息，用于更准确的错误解释
-    
-    Returns:
-        用户友好的错误信息
-    """
-    print(f"---LLM 错误服务: 转换Flask错误---")
-    print(f"原始错误: {error_info}")
-    print(f"操作上下文: {operation_context}")
-    
-    # 分析错误类型
-    error_type = _analyze_error_type(error_info)
-    
-    # 构建提示词
-    prompt_template = ChatPromptTemplate.from_messages([
-        ("system", """你是一个友好的数据库助手。你的任务是将技术性的错误信息转换为普通用户能理解的友好提示。
+logger = logging.getLogger(__name__)
+
+# 提示词: 固定的说明在 system 消息里，每次请求不同的用户请求 / 错误信息只出现在最后的 user 消息里
+TRANSLATE_FLASK_ERROR_PROMPT = [
+    ("system", """你是一个友好的数据库助手。你的任务是将技术性的错误信息转换为普通用户能理解的友好提示。
 
 请重点关注以下错误类型的精准处理：
 
@@ -80,9 +59,7 @@ def translate_flask_error(
 - 直接提取具体值和字段名  
 - 不要解释、不要建议、不要客套话
 - 如果是复合操作，说明具体在哪一步失败"""),
-
-        
-        ("user", """请分析以下错误信息，提供精准的用户友好提示：
+    ("user", """请分析以下错误信息，提供精准的用户友好提示：
 
 **用户原始请求**: {user_query}
 **操作类型**: {operation_type}
@@ -94,7 +71,30 @@ def translate_flask_error(
 - 如果是批量操作错误，请说明在第几步失败了什么操作
 
 直接输出用户友好的错误信息，不要包含技术术语。""")
-    ])
+]
+
+def translate_flask_error(
+    error_info: str, 
+    operation_context: Dict[str, Any],
+    schema_info: Optional[str] = None
+) -> str:
+    """
+    将Flask技术错误转换为用户友好的错误信息
+    
+    Args:
+        error_info: Flask返回的原始错误信息
+        operation_context: 操作上下文，包含用户查询、操作类型、涉及的表等
+        schema_info: 可选的数据库结构信息，用于更准确的错误解释
+    
+    Returns:
+        用户友好的错误信息
+    """
+    logger.info("---LLM 错误服务: 转换Flask错误---")
+    logger.error("原始错误: %s", error_info)
+    logger.debug("操作上下文: %s", operation_context)
+    
+    # 分析错误类型
+    error_type = _analyze_error_type(error_info)
     
     # 构建上下文
     context = {
@@ -104,19 +104,42 @@ def translate_flask_error(
     }
     
     try:
-        llm = ChatOpenAI(model=settings.OPENAI_MODEL_NAME, temperature=0.3)
-        chain = prompt_template | llm
+        llm = llm_factory.get_chat_model("error", temperature=0.3)
+        chain = llm_factory.get_chain("translate_flask_error", TRANSLATE_FLASK_ERROR_PROMPT, llm)
         
-        response = chain.invoke(context)
+        response = llm_policy.invoke(chain, context)
         friendly_error = response.content.strip()
 
-        print(f"LLM转换后的友好错误: {friendly_error}")
+        logger.debug("LLM转换后的友好错误: %s", friendly_error)
         return friendly_error
         
     except Exception as e:
-        print(f"LLM错误转换失败: {e}")
+        logger.error("LLM错误转换失败: %s", e)
         # 提供基于规则的回退处理
         return _fallback_error_translation(error_info, operation_context)
+
+
+async def atranslate_flask_error(
+    error_info: str,
+    operation_context: Dict[str, Any],
+    schema_info: Optional[str] = None
+) -> str:
+    """translate_flask_error 的异步版本 (查询流程的异步节点使用)。"""
+    logger.info("---LLM 错误服务: 转换Flask错误---")
+    logger.error("原始错误: %s", error_info)
+    context = {
+        "user_query": operation_context.get("user_query", "未知操作"),
+        "operation_type": operation_context.get("operation_type", "数据操作"),
+        "error_info": error_info
+    }
+    try:
+        llm = llm_factory.get_chat_model("error", temperature=0.3)
+        chain = llm_factory.get_chain("translate_flask_error", TRANSLATE_FLASK_ERROR_PROMPT, llm)
+        response = await llm_policy.ainvoke(chain, context)
+        return response.content.strip()
+    except Exception as e:
+        logger.error("LLM错误转换失败: %s", e)
+        return _fallback_error_translation(error_info, operation_context)
         
                
 def _analyze_error_type(error_info: str) -> str:
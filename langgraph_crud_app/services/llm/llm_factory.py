@@ -0,0 +1,156 @@
+# llm_factory.py: 全局共享的 ChatOpenAI 客户端注册表。
+"""
+各服务原来在每次调用时 new 一个 ChatOpenAI (新增 / 删除 / 修改 / 复合 / 错误 / 流程控制)，
+或者在 import 时就建好 (查询 / 初始化)。这里统一成按需创建、进程内复用:
+
+- get_chat_model(flow, temperature, model=None, **params)
+  按 (model, temperature, params) 缓存一个 ChatOpenAI；同一配置的所有流程共用它的
+  openai 客户端和底层 HTTP 连接池 (langchain-openai 按 base_url / timeout 复用 httpx 连接池)，
+  TLS 会话和 keep-alive 连接在调用之间、线程之间保留。
+  每个 flow 再缓存一个浅拷贝，只替换 callbacks (LLM 用量统计按 flow 聚合)，不会新建客户端。
+- 模型默认按 settings.LLM_FLOW_MODELS 取该流程配置的模型，未配置的流程用 settings.OPENAI_MODEL_NAME；
+  超时 / 重试次数取 settings.LLM_REQUEST_TIMEOUT / LLM_MAX_RETRIES。开启调用策略 (llm_policy) 时
+  SDK 自带的重试关掉，由策略统一重试。
+- 低温度的流程副本同时挂上持久化响应缓存 (llm_cache.cache_for，默认关闭)。
+- 首次使用时才创建，langchain_openai / openai (import 本身约 0.7s) 也在首次创建时才导入，
+  import 服务模块和 build_graph() 都不会加载它们。
+- get_chain(name, prompt, llm, text=False)
+  服务函数的 prompt | llm [| StrOutputParser] 链按提示词名缓存: 模板只解析一次，链只组装一次
+  (模型实例变了才重新组装，例如测试里替换了模型)。链带 run_name / metadata {"prompt": name}，
+  LLM 用量统计据此按提示词记录输入 token 和 provider 前缀缓存命中的 token。
+"""
+
+import logging
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Optional, Sequence, Tuple, Union
+
+from langgraph_crud_app.config import settings
+from langgraph_crud_app.observability import llm_telemetry
+
+if TYPE_CHECKING:
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.runnables import Runnable
+    from langchain_openai import ChatOpenAI
+
+logger = logging.getLogger(__name__)
+
+_Key = Tuple[str, float, Tuple[Tuple[str, Any], ...]]
+
+# (model, temperature, params) -> 共享客户端的 ChatOpenAI
+_models: Dict[_Key, "ChatOpenAI"] = {}
+# ((model, temperature, params), flow) -> 带该流程回调的浅拷贝
+_flow_models: Dict[Tuple[_Key, str], "ChatOpenAI"] = {}
+# 提示词名 -> 解析好的模板 / (组装时用的模型, 链)
+_prompts: Dict[str, "ChatPromptTemplate"] = {}
+_chains: Dict[str, Tuple[Any, "Runnable"]] = {}
+_lock = threading.Lock()
+
+
+def _parse_flow_models(value: str) -> Dict[str, str]:
+    """解析 "流程=模型,流程=模型" 格式的配置。"""
+    result = {}
+    for item in value.split(","):
+        if "=" in item:
+            flow, model = item.split("=", 1)
+            if flow.strip() and model.strip():
+                result[flow.strip()] = model.strip()
+    return result
+
+
+_FLOW_MODELS = _parse_flow_models(settings.LLM_FLOW_MODELS)
+
+
+def model_for_flow(flow: str) -> str:
+    """某个流程默认使用的模型。"""
+    return _FLOW_MODELS.get(flow, settings.OPENAI_MODEL_NAME)
+
+
+def _freeze(value: Any) -> Any:
+    # 参数值里可能有 dict / list (例如 model_kwargs)，转成可哈希的形式作为缓存键
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _build(model: str, temperature: float, params: Dict[str, Any]) -> "ChatOpenAI":
+    from langchain_openai import ChatOpenAI
+
+    if not _models:
+        key = settings.OPENAI_API_KEY
+        logger.debug("从 settings 读取 API Key: %s", '*' * (len(key) - 8) + key[-4:] if key else None)  # 脱敏
+    # 流式 /chat 的 messages 模式下模型改走流式输出，stream_usage 让最后一个片段带上 token 用量 (LLM 用量统计需要)
+    kwargs: Dict[str, Any] = {"max_retries": 0 if settings.LLM_POLICY_ENABLED else settings.LLM_MAX_RETRIES,
+                              "stream_usage": True}
+    if settings.LLM_REQUEST_TIMEOUT > 0:
+        kwargs["timeout"] = settings.LLM_REQUEST_TIMEOUT
+    kwargs.update(params)
+    logger.debug("创建 ChatOpenAI 客户端: model=%s, temperature=%s, params=%s", model, temperature, params)
+    return ChatOpenAI(model=model, temperature=temperature, **kwargs)
+
+
+def get_chat_model(flow: str, temperature: float = 0.0, model: Optional[str] = None, **params) -> "ChatOpenAI":
+    """
+    取 (或首次创建) 一个 ChatOpenAI。
+    flow 是 LLM 用量统计的流程名 (query / add / modify ...)，同时决定默认模型。
+    """
+    model = model or model_for_flow(flow)
+    key = (model, float(temperature), _freeze(params))
+    flow_key = (key, flow)
+    llm = _flow_models.get(flow_key)
+    if llm is not None:
+        return llm
+    with _lock:
+        llm = _flow_models.get(flow_key)
+        if llm is None:
+            base = _models.get(key)
+            if base is None:
+                base = _models[key] = _build(model, temperature, params)
+            from langgraph_crud_app.services.llm import llm_cache
+
+            # 浅拷贝共享 root_client / client，只替换回调和响应缓存
+            llm = _flow_models[flow_key] = base.model_copy(update={
+                "callbacks": llm_telemetry.callbacks(flow),
+                "cache": llm_cache.cache_for(flow, temperature),
+            })
+    return llm
+
+
+def get_chain(name: str, prompt: Union[str, Sequence[Tuple[str, str]]], llm: Any, text: bool = False) -> "Runnable":
+    """
+    取 (或首次组装) 提示词 name 的链: prompt | llm，text=True 时再接 StrOutputParser。
+    prompt 是静态模板 (字符串用 from_template，(role, 模板) 列表用 from_messages)，同名只在第一次解析；
+    请求相关的内容都要作为模板变量传入，不能拼进 prompt。
+    """
+    entry = _chains.get(name)
+    if entry is not None and entry[0] is llm:
+        return entry[1]
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import ChatPromptTemplate
+
+    with _lock:
+        template = _prompts.get(name)
+        if template is None:
+            template = _prompts[name] = (ChatPromptTemplate.from_template(prompt) if isinstance(prompt, str)
+                                         else ChatPromptTemplate.from_messages(list(prompt)))
+        chain = template | llm
+        if text:
+            chain = chain | StrOutputParser()
+        chain = chain.with_config(run_name=name, metadata={"prompt": name})
+        _chains[name] = (llm, chain)
+    return chain
+
+
+def stats() -> Dict[str, int]:
+    """当前缓存的客户端数 (按配置 / 按配置 + 流程)。"""
+    return {"clients": len(_models), "flow_bindings": len(_flow_models)}
+
+
+def clear() -> None:
+    """清空缓存 (测试或修改配置后使用)，下次调用时重新创建。"""
+    with _lock:
+        _models.clear()
+        _flow_models.clear()
+        _prompts.clear()
+        _chains.clear()
@@ -0,0 +1,454 @@
+# llm_policy.py: LLM 调用的时限 / 重试 / 对冲 / 降级策略。
+"""
+服务函数里的 LLM 调用都写成 llm_policy.invoke(chain, input) (不替换 chain.invoke)，这里加一层策略，
+按服务 (流程) 取 settings.LLM_CALL_POLICIES (+ LLM_CALL_POLICIES_JSON 覆盖):
+
+- deadline: 一次服务调用的总时限 (一个节点通常只有一次 LLM 调用)，超过后抛 LLMDeadlineExceeded，
+  服务函数原有的 except 照常把它变成错误信息，不会让整轮一直挂着
+- attempt_timeout / max_tokens: 通过 .bind() 作为单次请求的 timeout / max_tokens 传给 openai SDK；
+  openai SDK 自带的重试关掉 (max_retries=0)，统一由这里重试
+- retries / backoff: 单次超时或可重试错误 (限流 / 连接 / 408 / 5xx) 后退避重试，退避带随机抖动 (full jitter)
+- hedge: 列出的提示词在首个请求超过最近延迟的 p95 (不足 _MIN_SAMPLES 个样本时用 hedge_after) 仍未返回时
+  再发一个相同请求，取先成功的；另一个同步时在后台跑完丢弃，异步时取消
+- fallback_model: 剩余时间不足 fallback_within 秒或上一次请求超时时，把链里的模型换成更快的模型
+  (llm_factory.get_chat_model 同流程同温度)
+
+模型 (ChatModel) 的流程取自挂在它上面的 LLM 用量统计回调，提示词名取自 get_chain 的 metadata["prompt"]；
+认不出模型的 runnable (测试里的假链等) 直接调用。同步调用在线程池里执行 (复制 contextvars，
+LangGraph 的回调配置和追踪的当前节点都会带过去)，这样超时的请求不会卡住调用方。
+
+重试 / 对冲发出的额外请求在 LLM 用量统计里记为重试 (llm_telemetry.extra_attempt)，
+按节点 / 会话聚合的 retries 和 llm_retries_total 都来自这里 (SDK 自带的重试已关掉)。
+
+指标:
+- llm_policy_calls_total{flow,path}: 最终结果来自哪条路径 primary / retry / hedge / fallback / failed
+- llm_policy_events_total{flow,event}: attempt_timeout / retry / hedge / fallback / deadline_exceeded 的触发次数
+"""
+
+import asyncio
+import concurrent.futures
+import contextvars
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, Optional, Tuple
+
+from langgraph_crud_app.config import settings
+from langgraph_crud_app.observability.metrics import registry
+
+if TYPE_CHECKING:
+    from langchain_core.runnables import Runnable
+
+logger = logging.getLogger(__name__)
+
+LLM_POLICY_CALLS = registry.counter(
+    "llm_policy_calls_total", "LLM 调用最终结果的来源 (primary/retry/hedge/fallback/failed)", ["flow", "path"])
+LLM_POLICY_EVENTS = registry.counter(
+    "llm_policy_events_total", "LLM 调用策略的触发次数 (attempt_timeout/retry/hedge/fallback/deadline_exceeded)",
+    ["flow", "event"])
+
+# 估算 p95 用的最近延迟样本数 / 开始按 p95 对冲需要的最少样本数
+_LATENCY_WINDOW = 200
+_MIN_SAMPLES = 20
+# 对冲最早在这么多秒之后才发，避免 p95 很小时几乎每次都发两个请求
+_MIN_HEDGE_DELAY = 0.2
+_RETRYABLE_STATUS = {408, 409, 429}
+_RETRYABLE_ERRORS = {"APITimeoutError", "APIConnectionError", "RateLimitError", "InternalServerError"}
+_MAX_PREPARED = 256
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """一次服务调用在 deadline 内没有拿到结果。"""
+
+
+class _AttemptTimeout(TimeoutError):
+    """单次请求 (含对冲) 超过 attempt_timeout 或剩余时间。"""
+
+
+class Policy:
+    """一个流程的调用策略 (字段含义见 settings.LLM_CALL_POLICIES)。"""
+
+    __slots__ = ("deadline", "attempt_timeout", "max_tokens", "retries", "backoff",
+                 "hedge", "hedge_after", "fallback_model", "fallback_within")
+
+    def __init__(self, values: Dict[str, Any]):
+        self.deadline = float(values.get("deadline") or 0)
+        self.attempt_timeout = float(values.get("attempt_timeout") or 0)
+        self.max_tokens = int(values.get("max_tokens") or 0)
+        self.retries = max(int(values.get("retries") or 0), 0)
+        self.backoff = float(values.get("backoff") or 0)
+        self.hedge = frozenset(values.get("hedge") or ())
+        self.hedge_after = float(values.get("hedge_after") or 0)
+        self.fallback_model = str(values.get("fallback_model") or "")
+        self.fallback_within = float(values.get("fallback_within") or 0)
+
+    def bind_kwargs(self) -> Dict[str, Any]:
+        """绑定到模型上的单次请求参数。"""
+        kwargs: Dict[str, Any] = {}
+        if self.attempt_timeout > 0:
+            kwargs["timeout"] = self.attempt_timeout
+        if self.max_tokens > 0:
+            kwargs["max_tokens"] = self.max_tokens
+        return kwargs
+
+
+_policies: Dict[str, Policy] = {}
+_prepared: Dict[Tuple[int, str], Tuple[Any, Any]] = {}
+_latencies: Dict[Tuple[str, str], Deque[float]] = {}
+_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def _load_policies() -> Dict[str, Dict[str, Any]]:
+    merged = {flow: dict(values) for flow, values in settings.LLM_CALL_POLICIES.items()}
+    if settings.LLM_CALL_POLICIES_JSON:
+        try:
+            for flow, values in json.loads(settings.LLM_CALL_POLICIES_JSON).items():
+                merged.setdefault(flow, {}).update(values)
+        except (ValueError, AttributeError) as e:
+            logger.warning("LLM_CALL_POLICIES_JSON 解析失败，使用默认策略: %s", e)
+    return merged
+
+
+def policy_for(flow: str) -> Policy:
+    """流程的调用策略 (default 合并流程自己的字段)。"""
+    policy = _policies.get(flow)
+    if policy is None:
+        configured = _load_policies()
+        policy = _policies[flow] = Policy({**configured.get("default", {}), **configured.get(flow, {})})
+    return policy
+
+
+# --- 在链里找到 / 替换模型 ---
+
+def _swap_model(runnable: Any, replace: Callable[[Any], Any]) -> Any:
+    """返回把 runnable 里的 ChatModel 换成 replace(模型) 的副本；没有 ChatModel 时原样返回。"""
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.runnables import RunnableBinding, RunnableSequence
+
+    if isinstance(runnable, BaseChatModel):
+        return replace(runnable)
+    if isinstance(runnable, RunnableSequence):
+        steps = [_swap_model(step, replace) for step in runnable.steps]
+        if all(new is old for new, old in zip(steps, runnable.steps)):
+            return runnable
+        return RunnableSequence(*steps, name=runnable.name)
+    if isinstance(runnable, RunnableBinding):
+        bound = _swap_model(runnable.bound, replace)
+        return runnable if bound is runnable.bound else runnable.model_copy(update={"bound": bound})
+    return runnable
+
+
+def _find_model(runnable: Any) -> Optional[Any]:
+    found = []
+
+    def _record(model):
+        found.append(model)
+        return model
+
+    _swap_model(runnable, _record)
+    return found[0] if found else None
+
+
+def _flow_of(model: Any) -> Optional[str]:
+    for handler in getattr(model, "callbacks", None) or []:
+        flow = getattr(handler, "flow", None)
+        if isinstance(flow, str):
+            return flow
+    return None
+
+
+def _prompt_of(runnable: Any) -> str:
+    metadata = (getattr(runnable, "config", None) or {}).get("metadata") or {}
+    return str(metadata.get("prompt") or "model")
+
+
+def _prepare(runnable: "Runnable", policy: Policy, flow: str, model: Optional[str]) -> "Runnable":
+    """套上单次请求参数 (并按需换成降级模型) 的链，按 (链, 模型) 缓存。"""
+    key = (id(runnable), model or "")
+    entry = _prepared.get(key)
+    if entry is not None and entry[0] is runnable:
+        return entry[1]
+    bind_kwargs = policy.bind_kwargs()
+
+    def _replace(chat_model):
+        if model:
+            from langgraph_crud_app.services.llm import llm_factory
+
+            temperature = getattr(chat_model, "temperature", None) or 0.0
+            chat_model = llm_factory.get_chat_model(flow, temperature=temperature, model=model)
+        return chat_model.bind(**bind_kwargs) if bind_kwargs else chat_model
+
+    prepared = _swap_model(runnable, _replace)
+    with _lock:
+        if len(_prepared) >= _MAX_PREPARED:
+            _prepared.clear()
+        _prepared[key] = (runnable, prepared)
+    return prepared
+
+
+# --- 延迟统计 / 判断 ---
+
+def _record_latency(flow: str, prompt: str, seconds: float) -> None:
+    samples = _latencies.get((flow, prompt))
+    if samples is None:
+        with _lock:
+            samples = _latencies.setdefault((flow, prompt), deque(maxlen=_LATENCY_WINDOW))
+    samples.append(seconds)
+
+
+def hedge_delay(flow: str, prompt: str, policy: Policy) -> Optional[float]:
+    """该提示词发对冲请求前等待的秒数；不对冲时返回 None。"""
+    if prompt not in policy.hedge:
+        return None
+    samples = sorted(_latencies.get((flow, prompt)) or ())
+    if len(samples) < _MIN_SAMPLES:
+        return policy.hedge_after or None
+    return max(samples[int(0.95 * (len(samples) - 1))], _MIN_HEDGE_DELAY)
+
+
+def _retryable(error: BaseException) -> bool:
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in _RETRYABLE_ERRORS:
+        return True
+    status = getattr(error, "status_code", None)
+    return isinstance(status, int) and (status in _RETRYABLE_STATUS or status >= 500)
+
+
+class _Call:
+    """一次服务调用的策略状态: 剩余时间、选哪个模型、最后记到哪条路径。"""
+
+    def __init__(self, runnable: "Runnable", flow: str, policy: Policy):
+        self.runnable = runnable
+        self.flow = flow
+        self.policy = policy
+        self.prompt = _prompt_of(runnable)
+        self.started = time.monotonic()
+
+    def remaining(self) -> Optional[float]:
+        if self.policy.deadline <= 0:
+            return None
+        return self.policy.deadline - (time.monotonic() - self.started)
+
+    def attempt_timeout(self, remaining: Optional[float]) -> Optional[float]:
+        limits = [t for t in (self.policy.attempt_timeout or None, remaining) if t is not None]
+        return min(limits) if limits else None
+
+    def model_for(self, remaining: Optional[float], last_error: Optional[BaseException]) -> Optional[str]:
+        """这次请求用的降级模型；用原模型时返回 None。"""
+        if not self.policy.fallback_model:
+            return None
+        near_deadline = remaining is not None and remaining < self.policy.fallback_within
+        if near_deadline or isinstance(last_error, _AttemptTimeout):
+            self.event("fallback")
+            return self.policy.fallback_model
+        return None
+
+    def backoff(self, attempt: int, remaining: Optional[float]) -> float:
+        delay = random.uniform(0, self.policy.backoff * (2 ** attempt)) if self.policy.backoff > 0 else 0.0
+        return max(min(delay, remaining - 0.05), 0.0) if remaining is not None else delay
+
+    def event(self, event: str) -> None:
+        LLM_POLICY_EVENTS.inc(flow=self.flow, event=event)
+
+    def succeeded(self, attempt: int, model: Optional[str], hedged: bool, elapsed: float) -> None:
+        if model:
+            path = "fallback"
+        else:
+            path = "hedge" if hedged else ("retry" if attempt else "primary")
+            _record_latency(self.flow, self.prompt, elapsed)
+        LLM_POLICY_CALLS.inc(flow=self.flow, path=path)
+
+    def failed(self, last_error: Optional[BaseException]) -> BaseException:
+        """记录失败，返回要抛给服务函数的异常 (超时统一成 LLMDeadlineExceeded，其他错误原样)。"""
+        LLM_POLICY_CALLS.inc(flow=self.flow, path="failed")
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0.05:
+            self.event("deadline_exceeded")
+            logger.warning("LLM 调用超过时限: flow=%s, prompt=%s, deadline=%.1fs",
+                           self.flow, self.prompt, self.policy.deadline)
+        if last_error is None or isinstance(last_error, _AttemptTimeout):
+            limit = self.policy.deadline if remaining is not None and remaining <= 0.05 else self.policy.attempt_timeout
+            return LLMDeadlineExceeded(f"LLM 调用超过 {limit:g} 秒仍未返回 ({self.prompt})")
+        return last_error
+
+
+def _start(runnable: Any) -> Optional[_Call]:
+    if not settings.LLM_POLICY_ENABLED:
+        return None
+    model = _find_model(runnable)
+    flow = _flow_of(model) if model is not None else None
+    if flow is None:
+        return None
+    return _Call(runnable, flow, policy_for(flow))
+
+
+def _mark_extra(extra: bool) -> None:
+    """在当前上下文 (线程池任务 / asyncio 任务各自的副本) 里标记这次请求是否为额外请求。"""
+    from langgraph_crud_app.observability.llm_telemetry import extra_attempt
+    extra_attempt.set(extra)
+
+
+# --- 同步 ---
+
+def _marked(func: Callable[[], Any], extra: bool) -> Callable[[], Any]:
+    def run():
+        _mark_extra(extra)
+        return func()
+    return run
+
+
+def _submit(func: Callable[[], Any]) -> concurrent.futures.Future:
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=settings.LLM_POLICY_MAX_WORKERS, thread_name_prefix="llm-policy")
+    # 每个任务一份上下文副本 (同一个 Context 不能在两个线程里同时 run)
+    return _executor.submit(contextvars.copy_context().run, func)
+
+
+def _race(call: _Call, func: Callable[[], Any], timeout: Optional[float],
+          hedge_after: Optional[float], extra: bool = False) -> Tuple[Any, bool]:
+    """
+    执行 func；超过 hedge_after 秒未返回时再执行一次，取先成功的。返回 (结果, 是否来自对冲请求)。
+    extra: 这次是重试 (不是第一次请求)；对冲请求总是额外请求。
+    """
+    started = time.monotonic()
+    futures = [_submit(_marked(func, extra))]
+    pending = set(futures)
+    error: Optional[BaseException] = None
+    hedge_after = hedge_after if hedge_after is not None and (timeout is None or hedge_after < timeout) else None
+    while pending:
+        hedge_due = hedge_after is not None and len(futures) == 1
+        until = hedge_after if hedge_due else timeout
+        wait = None if until is None else max(started + until - time.monotonic(), 0)
+        done, pending = concurrent.futures.wait(pending, timeout=wait, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result(), future is not futures[0]
+            error = future.exception()
+        if not done:
+            if not hedge_due:
+                raise _AttemptTimeout(f"单次请求超过 {timeout:.1f} 秒")
+            call.event("hedge")
+            futures.append(_submit(_marked(func, True)))
+            pending.add(futures[-1])
+    raise error
+
+
+def invoke(runnable: "Runnable", input: Any, **kwargs) -> Any:
+    """按流程的策略执行 runnable.invoke(input)。"""
+    call = _start(runnable)
+    if call is None:
+        return runnable.invoke(input, **kwargs)
+    last_error: Optional[BaseException] = None
+    for attempt in range(call.policy.retries + 1):
+        remaining = call.remaining()
+        if remaining is not None and remaining <= 0:
+            break
+        model = call.model_for(remaining, last_error)
+        target = _prepare(runnable, call.policy, call.flow, model)
+        hedge_after = None if model else hedge_delay(call.flow, call.prompt, call.policy)
+        started = time.monotonic()
+        try:
+            result, hedged = _race(call, lambda: target.invoke(input, **kwargs),
+                                   call.attempt_timeout(remaining), hedge_after, extra=attempt > 0)
+        except Exception as e:
+            last_error = e
+            if isinstance(e, _AttemptTimeout):
+                call.event("attempt_timeout")
+            if not _retryable(e) or attempt == call.policy.retries:
+                break
+            call.event("retry")
+            logger.info("LLM 请求失败，准备重试: flow=%s, prompt=%s, 第 %d 次, %s: %s",
+                        call.flow, call.prompt, attempt + 1, type(e).__name__, e)
+            time.sleep(call.backoff(attempt, call.remaining()))
+            continue
+        call.succeeded(attempt, model, hedged, time.monotonic() - started)
+        return result
+    raise call.failed(last_error)
+
+
+# --- 异步 ---
+
+async def _amarked(make: Callable[[], Any], extra: bool) -> Any:
+    _mark_extra(extra)
+    return await make()
+
+
+async def _arace(call: _Call, make: Callable[[], Any], timeout: Optional[float],
+                 hedge_after: Optional[float], extra: bool = False) -> Tuple[Any, bool]:
+    """_race 的异步版本，结束时取消还没完成的请求。"""
+    started = time.monotonic()
+    tasks = [asyncio.ensure_future(_amarked(make, extra))]
+    pending = set(tasks)
+    error: Optional[BaseException] = None
+    hedge_after = hedge_after if hedge_after is not None and (timeout is None or hedge_after < timeout) else None
+    try:
+        while pending:
+            hedge_due = hedge_after is not None and len(tasks) == 1
+            until = hedge_after if hedge_due else timeout
+            wait = None if until is None else max(started + until - time.monotonic(), 0)
+            done, pending = await asyncio.wait(pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), task is not tasks[0]
+                error = task.exception()
+            if not done:
+                if not hedge_due:
+                    raise _AttemptTimeout(f"单次请求超过 {timeout:.1f} 秒")
+                call.event("hedge")
+                tasks.append(asyncio.ensure_future(_amarked(make, True)))
+                pending.add(tasks[-1])
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def ainvoke(runnable: "Runnable", input: Any, **kwargs) -> Any:
+    """invoke 的异步版本。"""
+    call = _start(runnable)
+    if call is None:
+        return await runnable.ainvoke(input, **kwargs)
+    last_error: Optional[BaseException] = None
+    for attempt in range(call.policy.retries + 1):
+        remaining = call.remaining()
+        if remaining is not None and remaining <= 0:
+            break
+        model = call.model_for(remaining, last_error)
+        target = _prepare(runnable, call.policy, call.flow, model)
+        hedge_after = None if model else hedge_delay(call.flow, call.prompt, call.policy)
+        started = time.monotonic()
+        try:
+            result, hedged = await _arace(call, lambda: target.ainvoke(input, **kwargs),
+                                          call.attempt_timeout(remaining), hedge_after, extra=attempt > 0)
+        except Exception as e:
+            last_error = e
+            if isinstance(e, _AttemptTimeout):
+                call.event("attempt_timeout")
+            if not _retryable(e) or attempt == call.policy.retries:
+                break
+            call.event("retry")
+            logger.info("LLM 请求失败，准备重试: flow=%s, prompt=%s, 第 %d 次, %s: %s",
+                        call.flow, call.prompt, attempt + 1, type(e).__name__, e)
+            await asyncio.sleep(call.backoff(attempt, call.remaining()))
+            continue
+        call.succeeded(attempt, model, hedged, time.monotonic() - started)
+        return result
+    raise call.failed(last_error)
+
+
+def clear() -> None:
+    """清空策略、包装好的链和延迟样本 (测试或修改配置后使用)。"""
+    with _lock:
+        _policies.clear()
+        _prepared.clear()
+        _latencies.clear()
@@ -1,21 +1,31 @@
 # llm_preprocessing_service.py: 提供前置初始化流程相关的 LLM 服务。
 
+import logging
 from typing import List, Optional
-from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_openai import ChatOpenAI
 import os
 import re
 import json
 from langgraph_crud_app.config import settings # 导入配置
+from langgraph_crud_app.services.llm import llm_factory, llm_policy
+
+logger = logging.getLogger(__name__)
 
 # --- LLM 初始化 ---
-print(f"--- Debug: 从 settings 读取 API Key: {'*' * (len(settings.OPENAI_API_KEY) - 8) + settings.OPENAI_API_KEY[-4:] if settings.OPENAI_API_KEY else None} ---") # 打印脱敏密钥
-llm_gpt4_1 = ChatOpenAI(
-    model="gpt-4.1",
-    temperature=0.7, # Keep temperature consistent for now
-    
-)
+# 首次调用时才创建，同一配置的客户端在各服务之间共享 (见 llm_factory)
+def _llm():
+    return llm_factory.get_chat_model("init", temperature=0.7)
+
+# --- 提示词 ---
+# 模板在模块加载时就是固定的，链由 llm_factory.get_chain 按名字缓存
+
+EXTRACT_TABLE_NAMES_PROMPT = [
+    ("system", "你的任务是从给定的 JSON 字符串中提取所有顶级键。这些顶级键代表数据库表名。"),
+    ("user", "这是 JSON 字符串: \n{context}\n请提取所有顶级键（表名），每行一个，只输出纯文本表名，不要任何其他文字或标记。"),
+]
+
+# 固定的说明放在前面，Schema 放在最后
+FORMAT_SCHEMA_PROMPT = """请将最后给出的 JSON 字符串原样输出，确保它是一个有效的 JSON 对象。不要添加任何其他文字或标记。如果输入无效或无法处理，输出空 JSON 对象字符串 {{}}。
+输入是一个 JSON 字符串: {context}"""
 
 # --- 服务函数 ---
 
@@ -31,20 +41,16 @@ def extract_table_names(schema_json_array: List[str]) -> str:
     if not schema_json_array:
         return ""
     context = schema_json_array[0] if schema_json_array else "{}"
-    prompt_template = ChatPromptTemplate.from_messages([
-        ("system", "你的任务是从给定的 JSON 字符串中提取所有顶级键。这些顶级键代表数据库表名。"),
-        ("user", "这是 JSON 字符串: \n{context}\n请提取所有顶级键（表名），每行一个，只输出纯文本表名，不要任何其他文字或标记。")
-    ])
-    chain = prompt_template | llm_gpt4_1 | StrOutputParser()
+    chain = llm_factory.get_chain("extract_table_names", EXTRACT_TABLE_NAMES_PROMPT, _llm(), text=True)
     try:
-        result = chain.invoke({"context": context})
+        result = llm_policy.invoke(chain, {"context": context})
         cleaned_result = "\n".join([line.strip() for line in result.strip().split('\n')])
         if "抱歉" in cleaned_result or "无法" in cleaned_result or not cleaned_result:
-             print(f"警告: LLM extract_table_names 未能提取有效表名，返回: {cleaned_result}")
+             logger.warning("警告: LLM extract_table_names 未能提取有效表名，返回: %s", cleaned_result)
              return ""
         return cleaned_result
     except Exception as e:
-        print(f"调用 LLM 进行 extract_table_names 时出错: {e}")
+        logger.error("调用 LLM 进行 extract_table_names 时出错: %s", e)
         return ""
 
 def format_schema(schema_json_array: List[str]) -> str:
@@ -59,12 +65,9 @@ def format_schema(schema_json_array: List[str]) -> str:
     if not schema_json_array:
         return "{}"
     context = schema_json_array[0] if schema_json_array else "{}"
-    template = """输入是一个 JSON 字符串: {context}
-请将这个输入的 JSON 字符串原样输出，确保它是一个有效的 JSON 对象。不要添加任何其他文字或标记。如果输入无效或无法处理，输出空 JSON 对象字符串 {{}}。"""
-    prompt_template = PromptTemplate.from_template(template)
-    chain = prompt_template | llm_gpt4_1 | StrOutputParser()
+    chain = llm_factory.get_chain("format_schema", FORMAT_SCHEMA_PROMPT, _llm(), text=True)
     try:
-        result = chain.invoke({"context": context})
+        result = llm_policy.invoke(chain, {"context": context})
         cleaned_result = result.strip()
         if cleaned_result.startswith("```json"):
             cleaned_result = cleaned_result[7:]
@@ -74,9 +77,9 @@ def format_schema(schema_json_array: List[str]) -> str:
             cleaned_result = cleaned_result[:-3]
         cleaned_result = cleaned_result.strip()
         if not (cleaned_result.startswith("{") and cleaned_result.endswith("}")):
-            print(f"警告: LLM 为 format_schema 的输出看起来不像 JSON: {result}")
+            logger.warning("警告: LLM 为 format_schema 的输出看起来不像 JSON: %s", result)
             return "{}"
         return cleaned_result
     except Exception as e:
-        print(f"调用 LLM 进行 format_schema 时出错: {e}")
+        logger.error("调用 LLM 进行 format_schema 时出错: %s", e)
         return "{}" 
\ No newline at end of file
@@ -1,38 +1,83 @@
 # llm_query_service.py: 提供查询/分析流程相关的 LLM 服务。
 
-from typing import List, Optional, Dict, Literal
-from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_openai import ChatOpenAI
+import asyncio
+import logging
+from typing import Any, List, Optional, Dict, Literal
 import os
 import re
 import json
 from langgraph_crud_app.services import data_processor
 from langgraph_crud_app.config import settings # 导入配置
+from langgraph_crud_app.persistence import artifact_store
+from langgraph_crud_app.services import analysis_digest, intent_rules, result_renderer, schema_index, schema_notation
+from langgraph_crud_app.services.llm import llm_factory, llm_policy
+
+logger = logging.getLogger(__name__)
 
 # --- LLM 初始化 ---
-print(f"--- Debug: 从 settings 读取 API Key: {'*' * (len(settings.OPENAI_API_KEY) - 8) + settings.OPENAI_API_KEY[-4:] if settings.OPENAI_API_KEY else None} ---") # 打印脱敏密钥
-llm_gpt4_1 = ChatOpenAI(
-    model="gpt-4.1",
-    temperature=0.7, # Keep temperature consistent for now
-    
-)
+# 首次调用时才创建，同一配置的客户端在各服务之间共享 (见 llm_factory)
+# flow 是用量统计 / 调用策略的流程名: 主意图分类每回合都会调用，不属于查询流程，记在 "intent" 下
+def _llm(temperature: float = 0.7, flow: str = "query"):
+    return llm_factory.get_chat_model(flow, temperature=temperature)
 
 # --- 服务函数 ---
+# 提示词都是模块级常量，模板和链由 llm_factory.get_chain 按名字缓存。消息里先放固定的说明和 Schema / 数据示例，
+# 用户问题等每次请求都不同的内容放在最后，provider 的提示词前缀缓存才能命中。
+# 查询 / 分析回合用到的函数另有 a 前缀的异步版本 (ASGI 入口的异步节点调用): LLM 请求用 llm_policy.ainvoke，
+# 拼提示词时的本地处理 (Schema 检索、内容寻址存储读取) 放到 asyncio.to_thread；前后处理与同步版本共用。
+
+_MAIN_INTENTS = ["query_analysis", "modify", "add", "delete", "composite", "confirm_other", "reset"]
 
-def classify_main_intent(query: str) -> str:
+def classify_main_intent(query: str) -> Dict[str, Optional[str]]:
     """
-    使用 LLM 对用户查询进行主意图分类。
+    对用户查询进行主意图分类；查询/分析类在同一次 LLM 调用里同时给出子意图 (query / analysis)。
     对应 Dify 节点: '1742268516158' (问题分类器)
     修改：增加了对复合操作意图的识别。
+    先走规则预分类 (intent_rules)，有把握时直接返回，不调用 LLM；否则调用 LLM 并记录规则与 LLM 是否一致。
     Args:
         query: 用户输入的查询字符串。
     Returns:
-        分类结果字符串。
+        {"intent": 主意图, "sub_intent": "query" / "analysis" / None, "source": "rules" / "llm"}。
+        sub_intent 为 None (规则直接判断或 LLM 没给出) 时由 classify_query_analysis_node 单独分类。
     """
-    print(f"---LLM 服务: 分类主意图 (Query: '{query}')---")
-    prompt_template = ChatPromptTemplate.from_messages([
-        ("system", """你是一个智能分类助手。根据用户输入，严格按照以下类别和规则进行分类，只输出最终的类别名称（英文标签）。
+    match = intent_rules.match_main_intent(query) if settings.INTENT_RULES_ENABLED else None
+    if intent_rules.is_confident(match) and not intent_rules.should_audit():
+        intent_rules.record(match, query)
+        return {"intent": match.intent, "sub_intent": None, "source": "rules"}
+    intent, sub_intent = _classify_main_intent_llm(query)
+    if settings.INTENT_RULES_ENABLED:
+        intent_rules.record(match, query, llm_intent=intent)
+    return {"intent": intent, "sub_intent": sub_intent, "source": "llm"}
+
+async def aclassify_main_intent(query: str) -> Dict[str, Optional[str]]:
+    """classify_main_intent 的异步版本。"""
+    match = intent_rules.match_main_intent(query) if settings.INTENT_RULES_ENABLED else None
+    if intent_rules.is_confident(match) and not intent_rules.should_audit():
+        intent_rules.record(match, query)
+        return {"intent": match.intent, "sub_intent": None, "source": "rules"}
+    intent, sub_intent = await _aclassify_main_intent_llm(query)
+    if settings.INTENT_RULES_ENABLED:
+        intent_rules.record(match, query, llm_intent=intent)
+    return {"intent": intent, "sub_intent": sub_intent, "source": "llm"}
+
+def _parse_joint_intent(result: str):
+    """解析 {"intent": ..., "sub_intent": ...}；输出不是 JSON 时按单个标签处理。返回 (主意图或 None, 子意图或 None)。"""
+    text = re.sub(r"^```(?:json)?|```$", "", result.strip()).strip()
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        data = None
+    if isinstance(data, dict):
+        intent = re.sub(r'[^\w_]', '', str(data.get("intent", "")).lower())
+        sub_intent = str(data.get("sub_intent") or "").strip().lower()
+    else:
+        intent, sub_intent = re.sub(r'[^\w_]', '', text.lower()), ""
+    if intent not in _MAIN_INTENTS:
+        return None, None
+    return intent, (sub_intent if intent == "query_analysis" and sub_intent in ("query", "analysis") else None)
+
+_MAIN_INTENT_PROMPT = [
+    ("system", """你是一个智能分类助手。根据用户输入，严格按照以下类别和规则进行分类，只输出 JSON 格式的分类结果。
 
 类别定义:
 1.  **查询/分析 (query_analysis)**: 检索记录或分析数据，含关键词：查询、搜索、查找、查、详情、状态、分析、统计、多少、总数等。示例："查询 TKT-2307-0001 状态""统计工单数量"
@@ -56,56 +101,71 @@ def classify_main_intent(query: str) -> str:
 - 如果用户指令可以被理解为对单一目标数据集执行单一主要写操作（新增、修改、删除），即使该操作的目标或条件需要通过用户描述中的查找条件来确定（例如，"查找X并删除X"，"找出Y并更新Y"），也应优先归类到对应的单一操作意图（`add`, `modify`, `delete`）。
 - 无法清晰判断，或仅包含确认/重置词语，按对应类别处理，最终默认为 **确认/其他 (confirm_other)**。
 
+查询/分析 (query_analysis) 的子意图 (sub_intent):
+- **query**: 检索、获取或列出一条或多条记录的具体信息 (全部字段或指定字段)，通常按条件筛选。示例："查询 TKT-2307-0001 的状态"，"列出所有2024年创建的工单及其负责人"。
+- **analysis**: 对数据进行统计、汇总、聚合或计算衍生指标 (COUNT / SUM / AVG / GROUP BY 等)，生成概括性数据而不是列出原始记录。示例："数据表中一共多少工单?"，"统计每个部门的工单数量"，"找出提示数量最多的前三个用户"。
+
 输出要求：
-仅输出分类结果对应的英文标签，例如：query_analysis, modify, add, delete, composite, confirm_other, reset。不要任何其他文字。"""),
-        ("user", "用户输入: {query}")
-    ])
-    chain = prompt_template | llm_gpt4_1 | StrOutputParser()
+只输出一个 JSON 对象，不要任何其他文字或 ``` 标记：{{"intent": "<英文标签>", "sub_intent": "<query 或 analysis>"}}
+- intent 取值：query_analysis, modify, add, delete, composite, confirm_other, reset。
+- 只有 intent 为 query_analysis 时才填写 sub_intent，其他意图 sub_intent 为 null。"""),
+    ("user", "用户输入: {query}")
+]
+
+def _main_intent_chain():
+    return llm_factory.get_chain("classify_main_intent", _MAIN_INTENT_PROMPT, _llm(temperature=0.0, flow="intent"),
+                                 text=True)
+
+def _classify_main_intent_llm(query: str):
+    """主意图 + 子意图的联合分类 (一次 LLM 调用)，返回 (intent, sub_intent)。"""
+    logger.debug("---LLM 服务: 分类主意图 (Query: '%s')---", query)
+    chain = _main_intent_chain()
     try:
-        result = chain.invoke({"query": query}).strip().lower()
-        valid_intents = ["query_analysis", "modify", "add", "delete", "composite", "confirm_other", "reset"] # 更新有效意图列表
-        cleaned_result = re.sub(r'[^\w_]', '', result)
-        if cleaned_result in valid_intents:
-            print(f"LLM 分类结果 (主意图): {cleaned_result}")
-            return cleaned_result
-        else:
-            print(f"警告: LLM 主意图分类输出不规范: '{result}'. 回退到默认。")
-            # 简单回退逻辑，优先匹配特定词
-            if "查询" in result or "分析" in result or "查" in result or "统计" in result: return "query_analysis"
-            if "重置" in result or "清空" in result: return "reset"
-            # 检查复合关键词 (如果存在多种操作类型关键词则更有可能是复合)
-            modify_kw = any(kw in result for kw in ["修改", "更改"])
-            add_kw = any(kw in result for kw in ["新增", "添加"])
-            delete_kw = any(kw in result for kw in ["删除", "移除"])
-            if sum([modify_kw, add_kw, delete_kw]) > 1: # 如果包含多种操作关键词
-                 return "composite"
-            if any(conn in result for conn in ["并", "然后", "同时"]) and sum([modify_kw, add_kw, delete_kw]) >= 1: # 或者包含连接词且至少一种操作
-                 # (这个回退逻辑比较粗糙，可能误判)
-                 # return "composite" # 暂时注释掉这个较弱的复合判断
-                 pass # 继续检查单一意图
-            
-            # 单一意图检查
-            if modify_kw: return "modify"
-            if add_kw: return "add"
-            if delete_kw: return "delete"
-            
-            return "confirm_other" # 默认
+        return _main_intent_from_output(llm_policy.invoke(chain, {"query": query}).strip().lower())
     except Exception as e:
-        print(f"调用 LLM 进行 classify_main_intent 时出错: {e}")
-        return "confirm_other"
+        logger.error("调用 LLM 进行 classify_main_intent 时出错: %s", e)
+        return "confirm_other", None
 
-def classify_query_analysis_intent(query: str) -> Literal["query", "analysis"]:
-    """
-    使用 LLM 对查询/分析意图进行子分类。
-    对应 Dify 节点: '1743298467743' (查询/分析分类)
-    Args:
-        query: 用户输入的查询字符串。
-    Returns:
-        分类结果字符串 ("query" 或 "analysis").
-    """
-    print(f"---LLM 服务: 分类查询/分析子意图 (Query: '{query}')---")
-    prompt_template = ChatPromptTemplate.from_messages([
-        ("system", """你是一个智能分类助手。根据用户输入的问题，严格按照以下规则将其分类为"查询 (query)"或"分析 (analysis)"，只输出最终的类别名称（英文标签）。
+async def _aclassify_main_intent_llm(query: str):
+    logger.debug("---LLM 服务: 分类主意图 (Query: '%s')---", query)
+    chain = _main_intent_chain()
+    try:
+        return _main_intent_from_output((await llm_policy.ainvoke(chain, {"query": query})).strip().lower())
+    except Exception as e:
+        logger.error("调用 LLM 进行 classify_main_intent 时出错: %s", e)
+        return "confirm_other", None
+
+def _main_intent_from_output(result: str):
+    """LLM 输出 (已小写) -> (intent, sub_intent)；输出不规范时按关键词回退。"""
+    intent, sub_intent = _parse_joint_intent(result)
+    if intent is not None:
+        logger.debug("LLM 分类结果 (主意图 / 子意图): %s / %s", intent, sub_intent)
+        return intent, sub_intent
+    else:
+        logger.warning("警告: LLM 主意图分类输出不规范: '%s'. 回退到默认。", result)
+        # 简单回退逻辑，优先匹配特定词
+        if "查询" in result or "分析" in result or "查" in result or "统计" in result: return "query_analysis", None
+        if "重置" in result or "清空" in result: return "reset", None
+        # 检查复合关键词 (如果存在多种操作类型关键词则更有可能是复合)
+        modify_kw = any(kw in result for kw in ["修改", "更改"])
+        add_kw = any(kw in result for kw in ["新增", "添加"])
+        delete_kw = any(kw in result for kw in ["删除", "移除"])
+        if sum([modify_kw, add_kw, delete_kw]) > 1: # 如果包含多种操作关键词
+             return "composite", None
+        if any(conn in result for conn in ["并", "然后", "同时"]) and sum([modify_kw, add_kw, delete_kw]) >= 1: # 或者包含连接词且至少一种操作
+             # (这个回退逻辑比较粗糙，可能误判)
+             # return "composite" # 暂时注释掉这个较弱的复合判断
+             pass # 继续检查单一意图
+
+        # 单一意图检查
+        if modify_kw: return "modify", None
+        if add_kw: return "add", None
+        if delete_kw: return "delete", None
+
+        return "confirm_other", None # 默认
+
+_QUERY_ANALYSIS_PROMPT = [
+    ("system", """你是一个智能分类助手。根据用户输入的问题，严格按照以下规则将其分类为"查询 (query)"或"分析 (analysis)"，只输出最终的类别名称（英文标签）。
 
 规则:
 1.  **查询 (query)**:
@@ -122,50 +182,60 @@ def classify_query_analysis_intent(query: str) -> Literal["query", "analysis"]:
 
 输出要求：
 仅输出分类结果对应的英文标签：query 或 analysis。不要任何其他文字。"""),
-        ("user", "用户输入: {query}")
-    ])
-    chain = prompt_template | llm_gpt4_1 | StrOutputParser()
-    try:
-        result = chain.invoke({"query": query}).strip().lower()
-        cleaned_result = re.sub(r'[^\w_]', '', result)
-        if cleaned_result == "analysis":
-            print("LLM 分类结果 (子意图): analysis")
-            return "analysis"
-        elif cleaned_result == "query":
-            print("LLM 分类结果 (子意图): query")
-            return "query"
-        else:
-            print(f"警告: LLM 查询/分析子意图分类输出不规范: '{result}'. 回退到默认 'query'。")
-            if "分析" in query or "统计" in query or "多少" in query or "总数" in query:
-                return "analysis"
-            return "query"
-    except Exception as e:
-        print(f"调用 LLM 进行 classify_query_analysis_intent 时出错: {e}")
-        return "query"
+    ("user", "用户输入: {query}")
+]
 
-def generate_select_sql(query: str, schema: str, table_names: List[str], data_sample: str) -> str:
+def classify_query_analysis_intent(query: str) -> Literal["query", "analysis"]:
     """
-    使用 LLM 根据用户问题和数据库元数据生成 SELECT SQL 查询。
-    对应 Dify 节点: '1742268678777' (mySQL SELECT 查询)
+    使用 LLM 对查询/分析意图进行子分类。
+    对应 Dify 节点: '1743298467743' (查询/分析分类)
     Args:
         query: 用户输入的查询字符串。
-        schema: 格式化的数据库 Schema JSON 字符串。
-        table_names: 数据库中的表名列表。
-        data_sample: 数据库表的数据示例 JSON 字符串。
     Returns:
-        生成的 SELECT SQL 查询语句，或者在无法生成时返回特定错误消息。
+        分类结果字符串 ("query" 或 "analysis").
     """
-    print(f"---LLM 服务: 生成 SELECT SQL (Query: '{query}')---")
-    prompt_template = ChatPromptTemplate.from_messages([
-         ("system", """你是一个数据库查询助手。根据用户问题、表结构、表名列表和数据示例生成一个合法的 MySQL SELECT 查询语句。
+    logger.debug("---LLM 服务: 分类查询/分析子意图 (Query: '%s')---", query)
+    chain = llm_factory.get_chain("classify_query_analysis_intent", _QUERY_ANALYSIS_PROMPT, _llm(temperature=0.0), text=True)
+    try:
+        return _sub_intent_from_output(llm_policy.invoke(chain, {"query": query}).strip().lower(), query)
+    except Exception as e:
+        logger.error("调用 LLM 进行 classify_query_analysis_intent 时出错: %s", e)
+        return "query"
+
+async def aclassify_query_analysis_intent(query: str) -> Literal["query", "analysis"]:
+    """classify_query_analysis_intent 的异步版本。"""
+    logger.debug("---LLM 服务: 分类查询/分析子意图 (Query: '%s')---", query)
+    chain = llm_factory.get_chain("classify_query_analysis_intent", _QUERY_ANALYSIS_PROMPT, _llm(temperature=0.0), text=True)
+    try:
+        return _sub_intent_from_output((await llm_policy.ainvoke(chain, {"query": query})).strip().lower(), query)
+    except Exception as e:
+        logger.error("调用 LLM 进行 classify_query_analysis_intent 时出错: %s", e)
+        return "query"
+
+def _sub_intent_from_output(result: str, query: str) -> Literal["query", "analysis"]:
+    cleaned_result = re.sub(r'[^\w_]', '', result)
+    if cleaned_result == "analysis":
+        logger.debug("LLM 分类结果 (子意图): analysis")
+        return "analysis"
+    elif cleaned_result == "query":
+        logger.debug("LLM 分类结果 (子意图): query")
+        return "query"
+    else:
+        logger.warning("警告: LLM 查询/分析子意图分类输出不规范: '%s'. 回退到默认 'query'。", result)
+        if "分析" in query or "统计" in query or "多少" in query or "总数" in query:
+            return "analysis"
+        return "query"
+
+_SELECT_SQL_PROMPT = [
+    ("system", """你是一个数据库查询助手。根据用户问题、表结构、表名列表和数据示例生成一个合法的 MySQL SELECT 查询语句。
 
 重要规则：
 1.  **表和字段**: 优先使用提供的表结构中的表和字段。如果用户明确提到不在可用表列表中的表名，仍然按用户意图生成SQL，让数据库处理错误。
 2.  **输出格式**: 只输出完整的、单行的 SQL 语句，不包含任何注释、换行符或 ```sql 标记。
 3.  **值引用**: 字符串值必须使用单引号包裹，数值不加引号。
-4.  **多表查询 (JOIN)**: 如果用户查询明显涉及多个实体（例如 \"员工和他们的工作经历\"），根据表结构中的外键关系（`foreign_keys` 字段）使用 `LEFT JOIN` 关联相关表。主表基于用户问题的主要实体确定。别名应简洁（例如 `e` 代表 `emp`, `d` 代表 `dept`）。
+4.  **多表查询 (JOIN)**: 如果用户查询明显涉及多个实体（例如 \"员工和他们的工作经历\"），根据表结构中的外键关系（`foreign_keys` 字段或 REFERENCES）使用 `LEFT JOIN` 关联相关表。主表基于用户问题的主要实体确定。别名应简洁（例如 `e` 代表 `emp`, `d` 代表 `dept`）。
 5.  **ID/编号处理**:
-    *   从表结构中动态识别主键字段（通常是第一个字段或标记为 '主键'）。注意其数据类型（例如 `varchar(9)` 或 `int`)。
+    *   从表结构中动态识别主键字段（通常是第一个字段，或标记为 PK / "PRI"）。注意其数据类型（例如 `varchar(9)` 或 `int`)。
     *   参考数据示例中的主键格式（例如前缀 'REP' 和总长度 9 -> 'REP000001'）。
     *   **精确匹配**: 如果用户输入完整的编号（例如 'REP000777'），直接在 `WHERE` 子句中使用该值进行精确匹配。
     *   **部分数字匹配**: 如果用户输入类似 \"第 X 号数据\" 或纯数字 X（例如 \"查询第 647 号数据\" 或 \"647\"）：
@@ -179,96 +249,151 @@ def generate_select_sql(query: str, schema: str, table_names: List[str], data_sa
 
 可用信息:
 -   表名列表: {table_names_str}
--   表结构 (JSON): {schema}
+-   表结构: {schema}
 -   数据示例 (JSON): {data_sample}"""),
-        ("user", "用户问题: {query}")
-    ])
-    chain = prompt_template | llm_gpt4_1 | StrOutputParser()
-    try:
-        table_names_str = ", ".join(table_names)
-        try: json.loads(schema)
-        except json.JSONDecodeError: schema = "{}"
-        try: json.loads(data_sample)
-        except json.JSONDecodeError: data_sample = "{}"
-        result = chain.invoke({
-            "query": query, "schema": schema,
-            "table_names_str": table_names_str, "data_sample": data_sample
-        }).strip()
-        if result == "ERROR: 请澄清你的查询条件，例如提供完整编号或指定具体字段。":
-            print("LLM 请求澄清查询条件。")
-            return result
-        elif "ERROR:" in result:
-             print(f"LLM 生成 SELECT SQL 时返回错误: {result}")
-             return "ERROR: 请澄清你的查询条件，例如提供完整编号或指定具体字段。"
-        if not result.upper().startswith("SELECT"):
-            print(f"警告: LLM 生成的 SELECT SQL 看起来无效: '{result}'. 请求澄清。")
-            return "ERROR: 请澄清你的查询条件，例如提供完整编号或指定具体字段。"
-        print(f"LLM 生成的 SELECT SQL: {result}")
-        return result
-    except Exception as e:
-        print(f"调用 LLM 进行 generate_select_sql 时出错: {e}")
-        return "ERROR: 请澄清你的查询条件，例如提供完整编号或指定具体字段。"
+    ("user", "用户问题: {query}")
+]
 
-def generate_analysis_sql(query: str, schema: str, table_names: List[str], data_sample: str) -> str:
+def generate_select_sql(query: str, schema: str, table_names: List[str], data_sample: str) -> str:
     """
-    使用 LLM 根据用户问题和数据库元数据生成分析 SQL 查询 (聚合, GROUP BY 等)。
-    对应 Dify 节点: '1743298593001' (Mysql 分析语句编辑)
+    使用 LLM 根据用户问题和数据库元数据生成 SELECT SQL 查询。
+    对应 Dify 节点: '1742268678777' (mySQL SELECT 查询)
     Args:
         query: 用户输入的查询字符串。
         schema: 格式化的数据库 Schema JSON 字符串。
         table_names: 数据库中的表名列表。
         data_sample: 数据库表的数据示例 JSON 字符串。
     Returns:
-        生成的分析 SQL 查询语句，或者在无法生成时返回特定错误消息。
+        生成的 SELECT SQL 查询语句，或者在无法生成时返回特定错误消息。
     """
-    print(f"---LLM 服务: 生成分析 SQL (Query: '{query}')---")
-    prompt_template = ChatPromptTemplate.from_messages([
-        ("system", """你是一个数据库分析助手。根据用户问题、表结构、表名列表和数据示例生成一个合法的 MySQL 分析语句（例如使用 COUNT, AVG, SUM, GROUP BY 等）。
+    logger.debug("---LLM 服务: 生成 SELECT SQL (Query: '%s')---", query)
+    chain = llm_factory.get_chain("generate_select_sql", _SELECT_SQL_PROMPT, _llm(), text=True)
+    try:
+        inputs = _sql_prompt_inputs(query, schema, table_names, data_sample)
+        return _check_select_sql(llm_policy.invoke(chain, inputs).strip())
+    except Exception as e:
+        logger.error("调用 LLM 进行 generate_select_sql 时出错: %s", e)
+        return "ERROR: 请澄清你的查询条件，例如提供完整编号或指定具体字段。"
+
+async def agenerate_select_sql(query: str, schema: str, table_names: List[str], data_sample: str) -> str:
+    """generate_select_sql 的异步版本。"""
+    logger.debug("---LLM 服务: 生成 SELECT SQL (Query: '%s')---", query)
+    chain = llm_factory.get_chain("generate_select_sql", _SELECT_SQL_PROMPT, _llm(), text=True)
+    try:
+        inputs = await asyncio.to_thread(_sql_prompt_inputs, query, schema, table_names, data_sample)
+        return _check_select_sql((await llm_policy.ainvoke(chain, inputs)).strip())
+    except Exception as e:
+        logger.error("调用 LLM 进行 generate_select_sql 时出错: %s", e)
+        return "ERROR: 请澄清你的查询条件，例如提供完整编号或指定具体字段。"
+
+def _sql_prompt_inputs(query: str, schema: str, table_names: List[str], data_sample: str) -> Dict[str, Any]:
+    """生成 SELECT / 分析 SQL 的提示词变量: 只保留相关的表，Schema 换成提示词写法，无法解析的 JSON 换成 "{}"。"""
+    schema, table_names, data_sample = schema_index.narrow(query, schema, table_names, data_sample)
+    table_names_str = ", ".join(table_names)
+    try: artifact_store.load_json(schema) # 按内容缓存解析结果，同一份 Schema 只解析一次
+    except json.JSONDecodeError: schema = "{}"
+    schema = schema_notation.for_prompt(schema)
+    try: artifact_store.load_json(data_sample)
+    except json.JSONDecodeError: data_sample = "{}"
+    return {"query": query, "schema": schema, "table_names_str": table_names_str, "data_sample": data_sample}
+
+def _check_select_sql(result: str) -> str:
+    if result == "ERROR: 请澄清你的查询条件，例如提供完整编号或指定具体字段。":
+        logger.debug("LLM 请求澄清查询条件。")
+        return result
+    elif "ERROR:" in result:
+         logger.error("LLM 生成 SELECT SQL 时返回错误: %s", result)
+         return "ERROR: 请澄清你的查询条件，例如提供完整编号或指定具体字段。"
+    if not result.upper().startswith("SELECT"):
+        logger.warning("警告: LLM 生成的 SELECT SQL 看起来无效: '%s'. 请求澄清。", result)
+        return "ERROR: 请澄清你的查询条件，例如提供完整编号或指定具体字段。"
+    logger.debug("LLM 生成的 SELECT SQL: %s", result)
+    return result
+
+_ANALYSIS_SQL_PROMPT = [
+    ("system", """你是一个数据库分析助手。根据用户问题、表结构、表名列表和数据示例生成一个合法的 MySQL 分析语句（例如使用 COUNT, AVG, SUM, GROUP BY 等）。
 
 重要规则：
 1.  **表和字段**: 严格使用提供的表结构中的表和字段。表名列表提供了所有可用表。
 2.  **输出格式**: 只输出完整的、单行的 SQL 语句，不包含任何注释、换行符或 ```sql 标记。
 3.  **分析重点**: 确保生成的 SQL 是用于分析或聚合的，而不是简单的记录检索。
-4.  **多表查询 (JOIN)**: 如果用户分析需求明显涉及多个实体（例如 \"统计每个部门的员工数\"），根据表结构中的外键关系（`foreign_keys` 字段）使用 `LEFT JOIN` 关联相关表。
+4.  **多表查询 (JOIN)**: 如果用户分析需求明显涉及多个实体（例如 \"统计每个部门的员工数\"），根据表结构中的外键关系（`foreign_keys` 字段或 REFERENCES）使用 `LEFT JOIN` 关联相关表。
 5.  **模糊或无效查询**: 如果用户输入无法明确对应到分析操作（例如只是简单问候），或者无法根据信息生成有效的分析 SQL，固定返回字符串：\"ERROR: 请澄清你的分析需求，例如'统计每个部门的员工数'。\"
 
 可用信息:
 -   表名列表: {table_names_str}
--   表结构 (JSON): {schema}
+-   表结构: {schema}
 -   数据示例 (JSON): {data_sample}"""),
-        ("user", "用户问题: {query}")
-    ])
-    chain = prompt_template | llm_gpt4_1 | StrOutputParser()
+    ("user", "用户问题: {query}")
+]
+
+def generate_analysis_sql(query: str, schema: str, table_names: List[str], data_sample: str) -> str:
+    """
+    使用 LLM 根据用户问题和数据库元数据生成分析 SQL 查询 (聚合, GROUP BY 等)。
+    对应 Dify 节点: '1743298593001' (Mysql 分析语句编辑)
+    Args:
+        query: 用户输入的查询字符串。
+        schema: 格式化的数据库 Schema JSON 字符串。
+        table_names: 数据库中的表名列表。
+        data_sample: 数据库表的数据示例 JSON 字符串。
+    Returns:
+        生成的分析 SQL 查询语句，或者在无法生成时返回特定错误消息。
+    """
+    logger.debug("---LLM 服务: 生成分析 SQL (Query: '%s')---", query)
+    chain = llm_factory.get_chain("generate_analysis_sql", _ANALYSIS_SQL_PROMPT, _llm(), text=True)
     try:
-        table_names_str = ", ".join(table_names)
-        try: json.loads(schema)
-        except json.JSONDecodeError: schema = "{}"
-        try: json.loads(data_sample)
-        except json.JSONDecodeError: data_sample = "{}"
-        result = chain.invoke({
-            "query": query, "schema": schema,
-            "table_names_str": table_names_str, "data_sample": data_sample
-        }).strip()
-        if result == "ERROR: 请澄清你的分析需求，例如'统计每个部门的员工数'。":
-            print("LLM 请求澄清分析需求。")
-            return result
-        elif "ERROR:" in result:
-             print(f"LLM 生成分析 SQL 时返回错误: {result}")
-             return "ERROR: 请澄清你的分析需求，例如'统计每个部门的员工数'。"
-        analysis_keywords = ["COUNT(", "AVG(", "SUM(", "MAX(", "MIN(", "GROUP BY"]
-        if not any(keyword in result.upper() for keyword in analysis_keywords):
-            print(f"警告: LLM 生成的分析 SQL 看起来不像分析语句: '{result}'. 请求澄清。")
-            return "ERROR: 请澄清你的分析需求，例如'统计每个部门的员工数'。"
-        print(f"LLM 生成的分析 SQL: {result}")
-        return result
+        inputs = _sql_prompt_inputs(query, schema, table_names, data_sample)
+        return _check_analysis_sql(llm_policy.invoke(chain, inputs).strip())
+    except Exception as e:
+        logger.error("调用 LLM 进行 generate_analysis_sql 时出错: %s", e)
+        return "ERROR: 请澄清你的分析需求，例如'统计每个部门的员工数'。"
+
+async def agenerate_analysis_sql(query: str, schema: str, table_names: List[str], data_sample: str) -> str:
+    """generate_analysis_sql 的异步版本。"""
+    logger.debug("---LLM 服务: 生成分析 SQL (Query: '%s')---", query)
+    chain = llm_factory.get_chain("generate_analysis_sql", _ANALYSIS_SQL_PROMPT, _llm(), text=True)
+    try:
+        inputs = await asyncio.to_thread(_sql_prompt_inputs, query, schema, table_names, data_sample)
+        return _check_analysis_sql((await llm_policy.ainvoke(chain, inputs)).strip())
     except Exception as e:
-        print(f"调用 LLM 进行 generate_analysis_sql 时出错: {e}")
+        logger.error("调用 LLM 进行 generate_analysis_sql 时出错: %s", e)
         return "ERROR: 请澄清你的分析需求，例如'统计每个部门的员工数'。"
 
+def _check_analysis_sql(result: str) -> str:
+    if result == "ERROR: 请澄清你的分析需求，例如'统计每个部门的员工数'。":
+        logger.debug("LLM 请求澄清分析需求。")
+        return result
+    elif "ERROR:" in result:
+         logger.error("LLM 生成分析 SQL 时返回错误: %s", result)
+         return "ERROR: 请澄清你的分析需求，例如'统计每个部门的员工数'。"
+    analysis_keywords = ["COUNT(", "AVG(", "SUM(", "MAX(", "MIN(", "GROUP BY"]
+    if not any(keyword in result.upper() for keyword in analysis_keywords):
+        logger.warning("警告: LLM 生成的分析 SQL 看起来不像分析语句: '%s'. 请求澄清。", result)
+        return "ERROR: 请澄清你的分析需求，例如'统计每个部门的员工数'。"
+    logger.debug("LLM 生成的分析 SQL: %s", result)
+    return result
+
+# Adapting Dify prompt for formatting query results
+_FORMAT_QUERY_RESULT_PROMPT = [
+    ("system", """你是一个结果展示助手。请将提供的 JSON 数据内容，针对用户的原始问题，整理成易于阅读的格式输出给用户。
+
+规则：
+1.  理解用户问题的意图，选择 JSON 数据中的相关字段进行展示。
+2.  如果结果包含多条记录 (JSON 数据是一个列表，包含多个对象)，按记录分段展示，每段以 \"记录 X:\" 开头（X 为序号，从 1 开始）。
+3.  对于单条记录或每条记录内部，使用 \"字段名: 字段值\" 的格式清晰展示，每对占一行。
+4.  避免输出原始 JSON 格式或任何代码标记。
+5.  如果数据为空或无效 (例如输入是空列表 \"[]\" 或空字符串)，返回："根据您的查询，没有找到具体数据。"。
+6.  输出为纯文本。"""),
+    ("user", "原始问题: {query}\n查询结果 (JSON String): {sql_result}")
+]
+
 def format_query_result(query: str, sql_result_str: str) -> str:
     """
-    使用 LLM 将 SQL 查询结果 (JSON 字符串) 格式化为面向用户的友好回复。
+    将 SQL 查询结果 (JSON 字符串) 格式化为面向用户的友好回复。
     对应 Dify 节点: '1742434616785' (LLM 6)
+    默认 (settings.QUERY_RESULT_RENDERER == "template") 用 result_renderer 在本地按 "记录 X:" / "字段名: 字段值" 渲染，
+    不把记录发给 LLM；开启 QUERY_RESULT_SUMMARY 时前面加一句只基于列名和行数的 LLM 总结。
+    QUERY_RESULT_RENDERER == "llm" 或结果不是对象列表时走原来的 LLM 格式化。
 
     Args:
         query: 原始用户查询。
@@ -277,58 +402,101 @@ def format_query_result(query: str, sql_result_str: str) -> str:
     Returns:
         格式化后的用户回复字符串。
     """
-    print(f"---LLM 服务: 格式化查询结果 (Query: '{query}')---")
-    # Adapting Dify prompt for formatting query results
-    prompt_template = ChatPromptTemplate.from_messages([
-        ("system", """你是一个结果展示助手。请将提供的 JSON 数据内容，针对用户的原始问题，整理成易于阅读的格式输出给用户。
-
-规则：
-1.  理解用户问题的意图，选择 JSON 数据中的相关字段进行展示。
-2.  如果结果包含多条记录 (JSON 数据是一个列表，包含多个对象)，按记录分段展示，每段以 \"记录 X:\" 开头（X 为序号，从 1 开始）。
-3.  对于单条记录或每条记录内部，使用 \"字段名: 字段值\" 的格式清晰展示，每对占一行。
-4.  避免输出原始 JSON 格式或任何代码标记。
-5.  如果数据为空或无效 (例如输入是空列表 \"[]\" 或空字符串)，返回："根据您的查询，没有找到具体数据。"。
-6.  输出为纯文本。"""),
-        ("user", "原始问题: {query}\n查询结果 (JSON String): {sql_result}")
-    ])
+    logger.debug("---LLM 服务: 格式化查询结果 (Query: '%s')---", query)
+    # Basic check if input string represents an empty list JSON
+    if data_processor.is_query_result_empty(sql_result_str):
+        return "根据您的查询，没有找到具体数据。"
+
+    rendered = _render_query_result(query, sql_result_str)
+    if rendered is not None:
+        rows, columns, result = rendered
+        if settings.QUERY_RESULT_SUMMARY:
+            summary = _summarize_query_result(query, columns, len(rows))
+            if summary:
+                result = f"{summary}\n\n{result}"
+        logger.debug("模板渲染的查询结果 (%d 条记录):\n%s", len(rows), result)
+        return result
 
-    chain = prompt_template | llm_gpt4_1 | StrOutputParser()
+    chain = llm_factory.get_chain("format_query_result", _FORMAT_QUERY_RESULT_PROMPT, _llm(), text=True)
 
     try:
-        # Basic check if input string represents an empty list JSON
-        if data_processor.is_query_result_empty(sql_result_str):
-             return "根据您的查询，没有找到具体数据。"
-
-        result = chain.invoke({
+        result = llm_policy.invoke(chain, {
             "query": query,
             "sql_result": sql_result_str
         }).strip()
-        print(f"LLM 格式化后的查询结果:\n{result}")
+        logger.debug("LLM 格式化后的查询结果:\n%s", result)
         return result
     except Exception as e:
-        print(f"调用 LLM 进行 format_query_result 时出错: {e}")
+        logger.error("调用 LLM 进行 format_query_result 时出错: %s", e)
         # Fallback message if formatting fails
         return f"查询成功，但格式化结果时遇到问题。原始结果: {sql_result_str}"
 
+async def aformat_query_result(query: str, sql_result_str: str) -> str:
+    """format_query_result 的异步版本。"""
+    logger.debug("---LLM 服务: 格式化查询结果 (Query: '%s')---", query)
+    if data_processor.is_query_result_empty(sql_result_str):
+        return "根据您的查询，没有找到具体数据。"
+
+    rendered = _render_query_result(query, sql_result_str)
+    if rendered is not None:
+        rows, columns, result = rendered
+        if settings.QUERY_RESULT_SUMMARY:
+            summary = await _asummarize_query_result(query, columns, len(rows))
+            if summary:
+                result = f"{summary}\n\n{result}"
+        logger.debug("模板渲染的查询结果 (%d 条记录):\n%s", len(rows), result)
+        return result
 
-def analyze_analysis_result(query: str, sql_result_str: str, schema: str, table_names: List[str]) -> str:
-    """
-    使用 LLM 分析 SQL 分析查询的结果 (JSON 字符串)，并生成包含洞察和建议的报告。
-    对应 Dify 节点: '1743298860520' (结果分析)
+    chain = llm_factory.get_chain("format_query_result", _FORMAT_QUERY_RESULT_PROMPT, _llm(), text=True)
+    try:
+        result = (await llm_policy.ainvoke(chain, {"query": query, "sql_result": sql_result_str})).strip()
+        logger.debug("LLM 格式化后的查询结果:\n%s", result)
+        return result
+    except Exception as e:
+        logger.error("调用 LLM 进行 format_query_result 时出错: %s", e)
+        return f"查询成功，但格式化结果时遇到问题。原始结果: {sql_result_str}"
 
-    Args:
-        query: 原始用户查询。
-        sql_result_str: 来自 API 的 SQL 分析结果 (JSON 字符串)。
-        schema: 格式化的数据库 Schema JSON 字符串。
-        table_names: 数据库中的表名列表。
+def _render_query_result(query: str, sql_result_str: str):
+    """模板渲染 (QUERY_RESULT_RENDERER == "template" 且结果是对象列表) 时返回 (rows, columns, 渲染文本)，否则返回 None。"""
+    rows = result_renderer.parse_rows(sql_result_str) if settings.QUERY_RESULT_RENDERER == "template" else None
+    if rows is None:
+        return None
+    columns = result_renderer.select_columns(query, result_renderer.result_columns(rows))
+    return rows, columns, result_renderer.render_rows(rows, columns)
+
+_SUMMARIZE_QUERY_RESULT_PROMPT = [
+    ("system", "你是一个结果展示助手。根据用户的问题、查询结果的字段和记录数，用一句简短的中文概括查到了什么 (例如\"共找到 3 条符合条件的工单记录。\")。"
+               "不要编造具体的字段值，只输出这一句话。"),
+    ("user", "原始问题: {query}\n结果字段: {columns}\n记录数: {row_count}")
+]
+
+def _summarize_query_result(query: str, columns: List[str], row_count: int) -> str:
+    """一句话总结查询结果；只把列名和行数发给 LLM。失败时返回空字符串 (只展示渲染结果)。"""
+    chain = llm_factory.get_chain("summarize_query_result", _SUMMARIZE_QUERY_RESULT_PROMPT, _llm(temperature=0.0), text=True)
+    try:
+        return llm_policy.invoke(chain, {"query": query, "columns": ", ".join(columns), "row_count": row_count}).strip()
+    except Exception as e:
+        logger.error("调用 LLM 生成查询结果总结时出错: %s", e)
+        return ""
 
-    Returns:
-        包含分析、洞察和建议的用户回复字符串。
-    """
-    print(f"---LLM 服务: 分析分析结果 (Query: '{query}')---")
-     # Adapting Dify prompt for analyzing analysis results
-    prompt_template = ChatPromptTemplate.from_messages([
-        ("system", """你是一个数据分析报告助手。根据用户问题、分析型 SQL 的查询结果 (JSON 格式)、数据库表结构和表名，生成一份简洁易懂的分析报告。
+async def _asummarize_query_result(query: str, columns: List[str], row_count: int) -> str:
+    chain = llm_factory.get_chain("summarize_query_result", _SUMMARIZE_QUERY_RESULT_PROMPT, _llm(temperature=0.0), text=True)
+    try:
+        inputs = {"query": query, "columns": ", ".join(columns), "row_count": row_count}
+        return (await llm_policy.ainvoke(chain, inputs)).strip()
+    except Exception as e:
+        logger.error("调用 LLM 生成查询结果总结时出错: %s", e)
+        return ""
+
+
+# analyze_analysis_result 提示词里对摘要字段的说明
+_DIGEST_FORMAT = ("本地统计摘要 JSON: row_count 为结果总行数；columns 为各列统计 (数值列的 sum/mean/分位数、top_shares 占比和 "
+                  "outliers 异常值，分类列的 top_values 占比，日期列的时间范围)；trends 为按日期列计算的趋势 "
+                  "(slope_per_day 每天变化量，change_pct 首尾变化率)；sample_rows 为前几行原始数据，sample_truncated 表示是否只是部分行")
+
+# Adapting Dify prompt for analyzing analysis results
+_ANALYZE_ANALYSIS_RESULT_PROMPT = [
+    ("system", """你是一个数据分析报告助手。根据用户问题、分析型 SQL 的查询结果 (JSON 格式)、数据库表结构和表名，生成一份简洁易懂的分析报告。
 
 报告应包含：
 1.  **结果总结**: 以清晰的方式（例如纯文本表格或列表）展示查询结果的关键数据。字段名应易于理解（可参考表结构）。
@@ -345,32 +513,75 @@ def analyze_analysis_result(query: str, sql_result_str: str, schema: str, table_
 
 可用信息:
 - 表结构: {schema}
-- 表名: {table_names_str}
-- 分析结果 (JSON String): {sql_result}"""),
-        ("user", "用户问题: {query}")
-    ])
+- 表名: {table_names_str}"""),
+    # 每次请求都不同的分析结果放在用户消息里，system 消息只随 Schema 变化 (provider 的提示词前缀缓存能命中)
+    ("user", "用户问题: {query}\n分析结果 ({result_format}): {sql_result}")
+]
 
-    chain = prompt_template | llm_gpt4_1 | StrOutputParser()
+def analyze_analysis_result(query: str, sql_result_str: str, schema: str, table_names: List[str]) -> str:
+    """
+    使用 LLM 分析 SQL 分析查询的结果 (JSON 字符串)，并生成包含洞察和建议的报告。
+    对应 Dify 节点: '1743298860520' (结果分析)
+
+    Args:
+        query: 原始用户查询。
+        sql_result_str: 来自 API 的 SQL 分析结果 (JSON 字符串)。
+        schema: 格式化的数据库 Schema JSON 字符串。
+        table_names: 数据库中的表名列表。
+
+    Returns:
+        包含分析、洞察和建议的用户回复字符串。
+
+    settings.ANALYSIS_DIGEST_ENABLED 时发给 LLM 的是 analysis_digest 在本地算好的统计摘要 (各列统计、趋势、异常值和前几行样本)，
+    不再是全部原始行；结果不是对象列表时仍发送原始 JSON。
+    """
+    logger.debug("---LLM 服务: 分析分析结果 (Query: '%s')---", query)
+    chain = llm_factory.get_chain("analyze_analysis_result", _ANALYZE_ANALYSIS_RESULT_PROMPT, _llm(), text=True)
 
     try:
         # Basic check if input string represents an empty list JSON
         if data_processor.is_query_result_empty(sql_result_str):
              return "根据您的分析请求，没有获得有效数据。"
+        inputs = _analysis_prompt_inputs(query, sql_result_str, schema, table_names)
+        result = llm_policy.invoke(chain, inputs).strip()
+        logger.debug("LLM 生成的分析报告:\n%s", result)
+        return result
+    except Exception as e:
+        logger.error("调用 LLM 进行 analyze_analysis_result 时出错: %s", e)
+        return f"分析查询成功，但生成报告时遇到问题。原始结果: {sql_result_str}"
 
-        table_names_str = ", ".join(table_names)
-        try: json.loads(schema)
-        except json.JSONDecodeError: schema = "{}"
-
-        result = chain.invoke({
-            "query": query,
-            "sql_result": sql_result_str,
-            "schema": schema,
-            "table_names_str": table_names_str
-        }).strip()
-        print(f"LLM 生成的分析报告:\n{result}")
+async def aanalyze_analysis_result(query: str, sql_result_str: str, schema: str, table_names: List[str]) -> str:
+    """analyze_analysis_result 的异步版本 (统计摘要在 asyncio.to_thread 里计算)。"""
+    logger.debug("---LLM 服务: 分析分析结果 (Query: '%s')---", query)
+    chain = llm_factory.get_chain("analyze_analysis_result", _ANALYZE_ANALYSIS_RESULT_PROMPT, _llm(), text=True)
+    try:
+        if data_processor.is_query_result_empty(sql_result_str):
+             return "根据您的分析请求，没有获得有效数据。"
+        inputs = await asyncio.to_thread(_analysis_prompt_inputs, query, sql_result_str, schema, table_names)
+        result = (await llm_policy.ainvoke(chain, inputs)).strip()
+        logger.debug("LLM 生成的分析报告:\n%s", result)
         return result
     except Exception as e:
-        print(f"调用 LLM 进行 analyze_analysis_result 时出错: {e}")
+        logger.error("调用 LLM 进行 analyze_analysis_result 时出错: %s", e)
         return f"分析查询成功，但生成报告时遇到问题。原始结果: {sql_result_str}"
 
+def _analysis_prompt_inputs(query: str, sql_result_str: str, schema: str, table_names: List[str]) -> Dict[str, Any]:
+    table_names_str = ", ".join(table_names)
+    try: artifact_store.load_json(schema) # 按内容缓存解析结果，同一份 Schema 只解析一次
+    except json.JSONDecodeError: schema = "{}"
+    schema = schema_notation.for_prompt(schema)
+
+    result_format, result_payload = "JSON String", sql_result_str
+    rows = result_renderer.parse_rows(sql_result_str) if settings.ANALYSIS_DIGEST_ENABLED else None
+    if rows:
+        result_format, result_payload = _DIGEST_FORMAT, analysis_digest.digest_json(rows)
+        logger.debug("分析结果摘要: %d 行 -> %d 字符 (原始 %d 字符)", len(rows), len(result_payload), len(sql_result_str))
+    return {
+        "query": query,
+        "sql_result": result_payload,
+        "result_format": result_format,
+        "schema": schema,
+        "table_names_str": table_names_str
+    }
+
 # TODO: Add format_query_result and analyze_analysis_result functions later 
\ No newline at end of file
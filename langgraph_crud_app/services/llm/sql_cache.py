@@ -0,0 +1,194 @@
+# sql_cache.py: 查询 / 分析流程的 NL→SQL 模板缓存，默认关闭。
+"""
+同一个 (或只差一个编号的) 问题在同一份 Schema 上反复提问时，generate_select_sql / generate_analysis_sql
+每次都要重新请求 LLM。这里把执行成功的 SQL 存成模板，命中时直接绑定新的字面量，跳过生成 SQL 的 LLM 调用。
+
+- 归一化 (normalize_query): NFKC (全角转半角) -> 抽出字面量 (引号内文本、日期、带前缀的编号、数字)
+  换成带类型的占位符 -> 去掉与英文数字无关的空白和句末标点 -> 英文小写。
+  "查询 TKT-0001 状态" 和 "查询TKT-0002状态？" 都归一化为 "查询{id:tkt}状态"。
+  编号占位符保留前缀，TKT-0001 和 REP000777 (很可能是不同的表) 不会共用模板。
+- 键: sha256(流程类型 query/analysis + Schema 指纹 (Schema + 表名) + 归一化后的问题)，Schema 变化后旧模板自然失效。
+- 只有执行成功且有结果的 SQL 才入库 (execute_sql_query_action 调用 store)；
+  每个字面量都必须原样出现在 SQL 的字符串或数字常量里 (例如 '647' 被补零成 'REP000647' 这种改写就无法安全复用)，
+  否则不缓存；同一个值出现在多处常量里 (分不清哪处来自问题) 时也不缓存。命中的 SQL 执行出错时删除该模板。
+- 存储复用 llm_cache.LLMCacheStore (SQLite，LRU)，路径 settings.SQL_CACHE_PATH。
+- 指标: crud_sql_cache_requests_total{kind,result=hit|miss|stored|uncacheable|invalidated}。
+"""
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import unicodedata
+from typing import List, Optional, Tuple
+
+from langgraph_crud_app.config import settings
+from langgraph_crud_app.observability.metrics import registry
+from langgraph_crud_app.services.llm.llm_cache import LLMCacheStore
+
+logger = logging.getLogger(__name__)
+
+SQL_CACHE_REQUESTS = registry.counter(
+    "crud_sql_cache_requests_total", "NL→SQL 模板缓存的查询 / 写入次数", ["kind", "result"])
+
+# 问题中的字面量 (NFKC 之后): 引号内文本 / 日期 / 带字母前缀的编号 / 数字
+_QUERY_LITERAL = re.compile(
+    r"'(?P<sq>[^']+)'|\"(?P<dq>[^\"]+)\"|“(?P<cq>[^”]+)”|‘(?P<csq>[^’]+)’|「(?P<jq>[^」]+)」"
+    r"|(?P<date>\d{4}-\d{1,2}-\d{1,2})"
+    r"|(?P<id>(?P<prefix>[A-Za-z]+)[-_]?\d+)"
+    r"|(?P<num>(?<![A-Za-z0-9])\d+(?:\.\d+)?)"
+)
+# 只保留英文数字之间的空白 ("order by" 保留，"查询 {ID:TKT} 状态" 去掉)
+_SPACES = re.compile(r"(?<![A-Za-z0-9])\s+|\s+(?![A-Za-z0-9])")
+_TRAILING_PUNCT = re.compile(r"[?？!！.。]+$")
+
+# SQL 里的常量: 单引号字符串 / 数字
+_SQL_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'|(?<![\w.])\d+(?:\.\d+)?(?![\w.])")
+# 模板中的占位符: ⟦s0⟧ 在字符串常量内部，⟦n0⟧ 是数字常量
+_SLOT = re.compile(r"⟦([sn])(\d+)⟧")
+
+
+def normalize_query(query: str) -> Tuple[str, List[str]]:
+    """问题 -> (归一化模板, 按出现顺序的字面量列表)。"""
+    text = unicodedata.normalize("NFKC", query or "").strip()
+    literals: List[str] = []
+
+    def _replace(match: "re.Match") -> str:
+        for group, kind in (("sq", "STR"), ("dq", "STR"), ("cq", "STR"), ("csq", "STR"), ("jq", "STR"),
+                            ("date", "DATE"), ("id", "ID"), ("num", "NUM")):
+            value = match.group(group)
+            if value is not None:
+                literals.append(value)
+                if kind == "ID":
+                    return "{ID:%s}" % match.group("prefix").upper()
+                return "{%s}" % kind
+        return match.group(0)
+
+    text = _QUERY_LITERAL.sub(_replace, text)
+    text = _TRAILING_PUNCT.sub("", _SPACES.sub("", re.sub(r"\s+", " ", text)))
+    return text.lower(), literals
+
+
+def build_sql_template(sql: str, literals: List[str]) -> Optional[str]:
+    """
+    把 SQL 中来自问题的字面量换成占位符。返回 None (不可安全复用) 的情况:
+    - 有字面量在 SQL 常量里找不到；
+    - 有字面量匹配到不止一处常量 (例如问题里的 1 和 SQL 的 is_open = 1 LIMIT 1)，分不清哪处来自问题。
+    """
+    hits = [0] * len(literals)
+
+    def _replace(match: "re.Match") -> str:
+        token = match.group(0)
+        if not token.startswith("'"):
+            for i, value in enumerate(literals):
+                if token == value:
+                    hits[i] += 1
+                    return f"⟦n{i}⟧"
+            return token
+        content = token[1:-1]
+        for i, value in enumerate(literals):
+            # 只匹配完整的词 ('%张三%' 可以，'REP000647' 里的 647 不行)
+            pattern = re.compile(rf"(?<!\w){re.escape(value)}(?!\w)")
+            if value:
+                content, count = pattern.subn(f"⟦s{i}⟧", content)
+                hits[i] += count
+        return f"'{content}'"
+
+    template = _SQL_LITERAL.sub(_replace, sql)
+    return template if all(count == 1 for count in hits) else None
+
+
+def bind_sql_template(template: str, literals: List[str]) -> str:
+    """把新问题的字面量填回模板；字符串常量里的值转义单引号和反斜杠。"""
+    def _replace(match: "re.Match") -> str:
+        value = literals[int(match.group(2))]
+        if match.group(1) == "s":
+            return value.replace("\\", "\\\\").replace("'", "''")
+        return value
+    return _SLOT.sub(_replace, template)
+
+
+def schema_fingerprint(schema: str, table_names: List[str]) -> str:
+    return hashlib.sha256(f"{schema}\x00{','.join(sorted(table_names or []))}".encode("utf-8")).hexdigest()
+
+
+def _key(kind: str, template: str, schema: str, table_names: List[str]) -> str:
+    fingerprint = schema_fingerprint(schema, table_names)
+    return hashlib.sha256(f"{kind}\x00{fingerprint}\x00{template}".encode("utf-8")).hexdigest()
+
+
+_store: Optional[LLMCacheStore] = None
+_store_lock = threading.Lock()
+
+
+def _get_store() -> LLMCacheStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = LLMCacheStore(settings.SQL_CACHE_PATH, max_entries=settings.SQL_CACHE_MAX_ENTRIES, ttl_seconds=0)
+        return _store
+
+
+def lookup(kind: str, query: str, schema: str, table_names: List[str]) -> Optional[str]:
+    """命中时返回已绑定新字面量的 SQL，否则返回 None。kind 为 "query" 或 "analysis"。"""
+    if not settings.SQL_CACHE_ENABLED:
+        return None
+    template, literals = normalize_query(query)
+    try:
+        found = _get_store().get(_key(kind, template, schema, table_names))
+    except Exception as e:
+        logger.warning("SQL 模板缓存读取失败: %s", e)
+        return None
+    if not isinstance(found, tuple):
+        SQL_CACHE_REQUESTS.inc(kind=kind, result="miss")
+        return None
+    entry = json.loads(found[0])
+    if entry.get("literals") != len(literals):
+        SQL_CACHE_REQUESTS.inc(kind=kind, result="miss")
+        return None
+    SQL_CACHE_REQUESTS.inc(kind=kind, result="hit")
+    sql = bind_sql_template(entry["sql"], literals)
+    logger.debug("SQL 模板缓存命中 (%s): %s -> %s", kind, template, sql)
+    return sql
+
+
+def store(kind: str, query: str, schema: str, table_names: List[str], sql: str) -> bool:
+    """保存执行成功的 SQL。只接受 SELECT / WITH 语句，字面量无法还原成模板时不保存。"""
+    if not settings.SQL_CACHE_ENABLED or not sql:
+        return False
+    if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+        return False
+    template, literals = normalize_query(query)
+    sql_template = build_sql_template(sql, literals)
+    if sql_template is None:
+        SQL_CACHE_REQUESTS.inc(kind=kind, result="uncacheable")
+        logger.debug("SQL 无法模板化，不缓存: %s", sql)
+        return False
+    value = json.dumps({"sql": sql_template, "literals": len(literals), "query": template}, ensure_ascii=False)
+    try:
+        _get_store().put(_key(kind, template, schema, table_names), kind, value, 0.0)
+    except Exception as e:
+        logger.warning("SQL 模板缓存写入失败: %s", e)
+        return False
+    SQL_CACHE_REQUESTS.inc(kind=kind, result="stored")
+    return True
+
+
+def invalidate(kind: str, query: str, schema: str, table_names: List[str]) -> None:
+    """命中的 SQL 执行失败时删除对应模板 (未命中时是空操作)。"""
+    if not settings.SQL_CACHE_ENABLED:
+        return
+    template, _ = normalize_query(query)
+    try:
+        deleted = _get_store().delete(_key(kind, template, schema, table_names))
+    except Exception as e:
+        logger.warning("SQL 模板缓存删除失败: %s", e)
+        return
+    if deleted:
+        SQL_CACHE_REQUESTS.inc(kind=kind, result="invalidated")
+
+
+def stats() -> dict:
+    return {"enabled": settings.SQL_CACHE_ENABLED,
+            "storage": _store.summary() if _store is not None else {}}
@@ -0,0 +1,112 @@
+# result_renderer.py: 查询结果的确定性文本渲染 (代替 format_query_result 的 LLM 格式化)。
+"""
+format_query_result 原来把完整的 sql_result JSON 发给 LLM，只为了排成 "记录 X:" + "字段名: 字段值" 的格式，
+token 和耗时随结果行数增长，结果很大时还会超出上下文。这里在本地按同样的格式输出:
+
+- 多条记录按 "记录 X:" 分段 (X 从 1 开始)，单条记录直接列出字段；每个字段一行 "字段名: 字段值"
+- 列选择 (select_columns): 问题里提到了部分字段名时只展示这些字段 (外加第一列，通常是编号 / 主键)，否则展示全部字段；
+  字段名按完整的词匹配，只作为过滤条件出现的字段 ("status 为 open") 不算
+- 单个值超过 settings.QUERY_RESULT_MAX_VALUE_CHARS 截断；超过 settings.QUERY_RESULT_MAX_ROWS 条只展示前面的记录，末尾注明总条数
+- 值为 None 显示 "(空)"，嵌套的对象 / 列表按 JSON 输出
+
+可选的一句话总结 (settings.QUERY_RESULT_SUMMARY) 由 llm_query_service 生成，LLM 只看到列名和行数，不接触记录内容。
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+from langgraph_crud_app.config import settings
+
+EMPTY_VALUE = "(空)"
+
+
+def parse_rows(sql_result_str: str) -> Optional[List[Dict[str, Any]]]:
+    """sql_result (JSON 字符串) -> 记录列表；单个对象视为一条记录；不是对象列表时返回 None (交给 LLM 格式化)。"""
+    try:
+        data = json.loads(sql_result_str)
+    except (TypeError, ValueError):
+        return None
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+        return None
+    return data
+
+
+def result_columns(rows: List[Dict[str, Any]]) -> List[str]:
+    """所有记录中出现过的字段，按首次出现的顺序。"""
+    return list(dict.fromkeys(key for row in rows for key in row))
+
+
+def _compact(text: str) -> str:
+    return re.sub(r"[\s_\-]+", "", text).lower()
+
+
+# 字段名后面跟着这些词时是过滤条件 ("id 为 5"、"status = open")，不算要求展示该字段
+_FILTER_SUFFIX = re.compile(r"\s*(?:为|是|不是|不为|等于|大于|小于|[=<>!]=?|<>)")
+
+
+def _column_pattern(col: str) -> Optional[re.Pattern]:
+    """字段名的匹配模式: 忽略大小写、字符间的空格 / 下划线 / 连字符，且必须是完整的词 ("paid" 里的 id 不算)。"""
+    compact = _compact(col)
+    if not compact:
+        return None
+    body = r"[\s_\-]*".join(re.escape(ch) for ch in compact)
+    return re.compile(rf"(?<![A-Za-z0-9]){body}(?![A-Za-z0-9])", re.IGNORECASE)
+
+
+def _mentions_for_display(query: str, col: str) -> bool:
+    pattern = _column_pattern(col)
+    if pattern is None:
+        return False
+    return any(not _FILTER_SUFFIX.match(query, m.end()) for m in pattern.finditer(query))
+
+
+def select_columns(query: str, columns: List[str]) -> List[str]:
+    """
+    问题里明确要求展示的字段 (完整的词，忽略大小写、空格和下划线) + 第一列；一个都没提到时返回全部字段。
+    只出现在过滤条件里的字段 ("id 为 5"、"status = open") 不算，否则结果只剩条件字段本身。
+    """
+    query = query or ""
+    mentioned = [col for col in columns if _mentions_for_display(query, col)]
+    if not mentioned or len(mentioned) == len(columns):
+        return columns
+    if columns[0] not in mentioned:
+        mentioned.insert(0, columns[0])
+    return [col for col in columns if col in mentioned]
+
+
+def format_value(value: Any, max_chars: int) -> str:
+    if value is None:
+        text = EMPTY_VALUE
+    elif isinstance(value, (dict, list)):
+        text = json.dumps(value, ensure_ascii=False, default=str)
+    else:
+        text = str(value)
+    if max_chars > 0 and len(text) > max_chars:
+        text = text[:max_chars] + "…"
+    return text
+
+
+def render_rows(rows: List[Dict[str, Any]], columns: List[str], max_rows: Optional[int] = None,
+                max_value_chars: Optional[int] = None) -> str:
+    """按 "记录 X:" / "字段名: 字段值" 的格式渲染；超出行数上限时末尾注明总条数。"""
+    max_rows = settings.QUERY_RESULT_MAX_ROWS if max_rows is None else max_rows
+    max_value_chars = settings.QUERY_RESULT_MAX_VALUE_CHARS if max_value_chars is None else max_value_chars
+    shown = rows[:max_rows] if max_rows > 0 else rows
+
+    def _fields(row):
+        return [f"{col}: {format_value(row.get(col), max_value_chars)}" for col in columns]
+
+    if len(rows) == 1:
+        return "\n".join(_fields(rows[0]))
+    blocks = ["\n".join([f"记录 {i}:"] + _fields(row)) for i, row in enumerate(shown, start=1)]
+    if len(shown) < len(rows):
+        blocks.append(f"(共 {len(rows)} 条记录，仅显示前 {len(shown)} 条)")
+    return "\n\n".join(blocks)
+
+
+def render_query_result(query: str, rows: List[Dict[str, Any]]) -> str:
+    """按问题选择字段后渲染全部记录 (受行数 / 值长度上限约束)。"""
+    return render_rows(rows, select_columns(query, result_columns(rows)))
@@ -0,0 +1,216 @@
+# schema_index.py: 按用户问题检索相关的表，只把这些表的 Schema / 数据示例放进提示词。
+"""
+生成 SQL / 解析增删改请求的 7 个 LLM 服务原来每次都内联整个 biaojiegou_save 和所有表的 data_sample，
+提示词大小随数据库表数线性增长。这里对每份 Schema 建一个词法索引 (BM25)，按问题选出最相关的表:
+
+- 文档 = 一张表: 表名 (权重 3)、字段名 (2)、表 / 字段描述和数据示例里的文本值 (1)
+- 分词 (_tokens): NFKC + 小写；英文数字按非字母数字切开 (snake_case 自然拆开)，去掉复数 s，纯数字丢掉；
+  中文按双字 (bigram) 切分，单个汉字的片段保留为单字
+- 选表: 得分 > 0 的前 settings.SCHEMA_RETRIEVAL_TOP_K 张表，再加上它们的外键邻居 (两个方向)。外键取自
+  Schema 的 foreign_keys / constraints，/get_schema 没有给出时按 "<表名>_id" 字段推断
+- 索引按 Schema + 数据示例的指纹缓存 (同一份 Schema 只建一次)
+- 表数不超过 settings.SCHEMA_RETRIEVAL_MIN_TABLES、问题和任何表都不匹配或 Schema 无法解析时原样返回，不做缩减
+
+指标: crud_schema_retrieval_total{result=narrowed|all_relevant|no_match|skipped}。
+"""
+
+import hashlib
+import json
+import logging
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from langgraph_crud_app.config import settings
+from langgraph_crud_app.observability.metrics import registry
+from langgraph_crud_app.persistence import artifact_store
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_RETRIEVAL_TOTAL = registry.counter(
+    "crud_schema_retrieval_total", "提示词 Schema 按问题缩减的结果", ["result"])
+
+_ASCII_WORD = re.compile(r"[a-z0-9]+")
+_CJK_RUN = re.compile(r"[\u3400-\u9fff]+")
+_REFERENCE = re.compile(r"^\s*`?(\w+)`?\s*[.(]")
+# BM25 参数
+_K1 = 1.2
+_B = 0.75
+_MAX_INDEXES = 16
+
+
+def _tokens(text: str) -> List[str]:
+    text = unicodedata.normalize("NFKC", str(text)).lower()
+    tokens = []
+    for word in _ASCII_WORD.findall(text):
+        if word.isdigit():
+            continue
+        tokens.append(word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word)
+    for run in _CJK_RUN.findall(text):
+        tokens.extend([run] if len(run) == 1 else [run[i:i + 2] for i in range(len(run) - 1)])
+    return tokens
+
+
+def _referenced_table(value: Any) -> Optional[str]:
+    """外键定义 -> 被引用的表名。支持 {"referenced_table": ...} 和 "users(id)" / "users.id" 两种写法。"""
+    if isinstance(value, dict):
+        if value.get("referenced_table"):
+            return str(value["referenced_table"])
+        return _referenced_table(value.get("references"))
+    if isinstance(value, str):
+        match = _REFERENCE.match(value)
+        return match.group(1) if match else value.strip("` ") or None
+    return None
+
+
+class SchemaIndex:
+    """一份 Schema (+ 数据示例) 上的表检索索引。"""
+
+    def __init__(self, schema: Dict[str, Any], sample: Optional[Dict[str, Any]] = None):
+        sample = sample if isinstance(sample, dict) else {}
+        self.tables = list(schema)
+        self._docs: Dict[str, Counter] = {}
+        for table, info in schema.items():
+            info = info if isinstance(info, dict) else {}
+            doc = Counter()
+            for token in _tokens(table):
+                doc[token] += 3
+            fields = info.get("fields") or {}
+            for name, field in fields.items():
+                for token in _tokens(name):
+                    doc[token] += 2
+                if isinstance(field, dict) and field.get("comment"):
+                    doc.update(_tokens(field["comment"]))
+            if info.get("description"):
+                doc.update(_tokens(info["description"]))
+            rows = sample.get(table)
+            for row in rows if isinstance(rows, list) else []:
+                for value in (row.values() if isinstance(row, dict) else []):
+                    if isinstance(value, str):
+                        doc.update(_tokens(value[:64]))
+            self._docs[table] = doc
+        self._df = Counter(token for doc in self._docs.values() for token in doc)
+        self._lengths = {table: sum(doc.values()) for table, doc in self._docs.items()}
+        self._avg_len = (sum(self._lengths.values()) / len(self._lengths)) if self._lengths else 0.0
+        self.neighbours = self._foreign_keys(schema)
+
+    def _foreign_keys(self, schema: Dict[str, Any]) -> Dict[str, Set[str]]:
+        known = set(self.tables)
+        by_singular = {t[:-1] if t.endswith("s") else t: t for t in self.tables}
+        neighbours: Dict[str, Set[str]] = {t: set() for t in self.tables}
+
+        def _link(a: str, b: Optional[str]) -> None:
+            if b in known and b != a:
+                neighbours[a].add(b)
+                neighbours[b].add(a)
+
+        for table, info in schema.items():
+            info = info if isinstance(info, dict) else {}
+            foreign_keys = info.get("foreign_keys") or {}
+            for fk in (foreign_keys.values() if isinstance(foreign_keys, dict) else foreign_keys):
+                _link(table, _referenced_table(fk))
+            for constraint in info.get("constraints") or []:
+                if isinstance(constraint, dict) and "FOREIGN" in str(constraint.get("type", "")).upper():
+                    _link(table, _referenced_table(constraint.get("references")))
+            # /get_schema 只有 DESCRIBE 的结果，外键按 "<表名>_id" 推断
+            for name in info.get("fields") or {}:
+                lowered = name.lower()
+                if lowered.endswith("_id"):
+                    base = lowered[:-3]
+                    _link(table, by_singular.get(base) or (base if base in known else None))
+        return neighbours
+
+    def scores(self, query: str) -> Dict[str, float]:
+        """BM25 得分 (只包含得分 > 0 的表)。"""
+        n = len(self.tables)
+        query_tokens = set(_tokens(query))
+        result: Dict[str, float] = {}
+        for table, doc in self._docs.items():
+            length = self._lengths[table]
+            score = 0.0
+            for token in query_tokens:
+                tf = doc.get(token)
+                if not tf:
+                    continue
+                df = self._df[token]
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                norm = 1 - _B + _B * (length / self._avg_len if self._avg_len else 1)
+                score += idf * tf * (_K1 + 1) / (tf + _K1 * norm)
+            if score > 0:
+                result[table] = score
+        return result
+
+    def select(self, query: str, top_k: int) -> List[str]:
+        """得分最高的 top_k 张表及其外键邻居，按原 Schema 中的顺序返回；没有任何表匹配时返回空列表。"""
+        scores = self.scores(query)
+        top = sorted(scores, key=scores.get, reverse=True)[:top_k]
+        selected = set(top)
+        for table in top:
+            selected |= self.neighbours[table]
+        return [t for t in self.tables if t in selected]
+
+
+_indexes: "OrderedDict[str, SchemaIndex]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _index_for(schema_str: str, sample_str: Optional[str], schema: Dict[str, Any],
+               sample: Optional[Dict[str, Any]]) -> SchemaIndex:
+    fingerprint = hashlib.sha256(f"{schema_str}\x00{sample_str or ''}".encode("utf-8")).hexdigest()
+    with _lock:
+        index = _indexes.get(fingerprint)
+        if index is not None:
+            _indexes.move_to_end(fingerprint)
+            return index
+    index = SchemaIndex(schema, sample)
+    with _lock:
+        _indexes[fingerprint] = index
+        while len(_indexes) > _MAX_INDEXES:
+            _indexes.popitem(last=False)
+    logger.debug("为 Schema %s 建立表检索索引: %d 张表", fingerprint[:12], len(index.tables))
+    return index
+
+
+def _load(value: Optional[str]) -> Any:
+    if not value:
+        return None
+    try:
+        return artifact_store.load_json(value)
+    except (json.JSONDecodeError, TypeError):
+        return None
+
+
+def narrow(query: str, schema: str, table_names: Optional[List[str]] = None,
+           data_sample: Optional[str] = None) -> Tuple[str, Optional[List[str]], Optional[str]]:
+    """
+    返回只包含与问题相关的表 (及其外键邻居) 的 (schema, table_names, data_sample)，表多时提示词不再随数据库宽度增长；
+    不需要或无法缩减时原样返回。各 LLM 服务在拼提示词前调用。缩减后的 JSON 用 ensure_ascii=False 重新序列化；table_names 按 Schema 中的顺序过滤。
+    """
+    unchanged = (schema, table_names, data_sample)
+    parsed = _load(schema) if settings.SCHEMA_RETRIEVAL_ENABLED else None
+    if not isinstance(parsed, dict) or len(parsed) <= settings.SCHEMA_RETRIEVAL_MIN_TABLES:
+        SCHEMA_RETRIEVAL_TOTAL.inc(result="skipped")
+        return unchanged
+    sample = _load(data_sample)
+    selected = _index_for(schema, data_sample, parsed, sample).select(query, settings.SCHEMA_RETRIEVAL_TOP_K)
+    if not selected:
+        SCHEMA_RETRIEVAL_TOTAL.inc(result="no_match")
+        logger.debug("问题和任何表都不匹配，使用完整 Schema: %r", query[:100])
+        return unchanged
+    if len(selected) == len(parsed):
+        SCHEMA_RETRIEVAL_TOTAL.inc(result="all_relevant")
+        return unchanged
+
+    keep = set(selected)
+    narrowed_schema = json.dumps({t: parsed[t] for t in selected}, ensure_ascii=False)
+    narrowed_tables = [t for t in table_names if t in keep] if table_names is not None else None
+    narrowed_sample = data_sample
+    if isinstance(sample, dict):
+        narrowed_sample = json.dumps({t: rows for t, rows in sample.items() if t in keep}, ensure_ascii=False)
+    SCHEMA_RETRIEVAL_TOTAL.inc(result="narrowed")
+    logger.debug("按问题选出 %d/%d 张表: %s (Schema %d -> %d 字符)",
+                 len(selected), len(parsed), selected, len(schema), len(narrowed_schema))
+    return narrowed_schema, narrowed_tables, narrowed_sample
@@ -0,0 +1,133 @@
+# schema_notation.py: 提示词里 Schema 的紧凑写法 (类 DDL)，代替缩进的嵌套 JSON。
+"""
+/get_schema 给出的 Schema 是 {"表": {"fields": {"字段": {"type", "null", "key", "default"}}, "foreign_keys": {}}}，
+每个字段都重复四个键名和一堆引号 / 大括号，放进提示词后大部分 token 花在 JSON 语法上。这里改成每张表一行:
+
+    users(id int PK, username varchar(50) UNIQUE NOT NULL, dept_id int INDEX REFERENCES dept(id)) -- 用户表
+
+- key: PRI -> PK (隐含 NOT NULL)，UNI -> UNIQUE，MUL -> INDEX；null 为 "NO" 时写 NOT NULL
+- extra (auto_increment 等) 原样大写；default 不为 null 时写 DEFAULT 值 (含空格 / 标点的值加单引号)；
+  字段 comment 写 COMMENT '...'
+- 外键取自 foreign_keys / constraints (FOREIGN KEY)，知道本表字段时写在字段后 REFERENCES 表(字段)，
+  否则作为表级的 FOREIGN KEY REFERENCES 表；constraints 里的 PRIMARY KEY / UNIQUE 补到对应字段上
+- 表 description 写在行尾的 -- 注释里
+
+转换结果按 Schema 内容缓存。settings.PROMPT_SCHEMA_NOTATION 为 "json" 或 Schema 无法解析时原样返回 JSON。
+scripts/bench_prompt_tokens.py 对比两种写法下各个提示词的 token 数。
+"""
+
+import functools
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from langgraph_crud_app.config import settings
+from langgraph_crud_app.persistence import artifact_store
+
+_BARE_VALUE = re.compile(r"^[\w.:+-]+$")
+_KEY_MARKS = {"PRI": "PK", "UNI": "UNIQUE", "MUL": "INDEX"}
+
+
+def enabled() -> bool:
+    return settings.PROMPT_SCHEMA_NOTATION == "compact"
+
+
+def _quote(value: Any) -> str:
+    text = str(value)
+    if _BARE_VALUE.match(text):
+        return text
+    return "'" + text.replace("'", "''") + "'"
+
+
+def _fk_target(value: Any) -> Tuple[Optional[List[str]], Optional[str]]:
+    """外键定义 -> (本表字段列表, "表(字段)" / "表")。支持 {"columns", "referenced_table", "referenced_columns"} 和 "users(id)" 两种写法。"""
+    if isinstance(value, str):
+        return None, value.strip() or None
+    if not isinstance(value, dict):
+        return None, None
+    columns = value.get("columns") or value.get("column")
+    columns = [columns] if isinstance(columns, str) else columns
+    table = value.get("referenced_table")
+    if not table:
+        return columns, _fk_target(value.get("references"))[1]
+    ref_columns = value.get("referenced_columns") or value.get("referenced_column")
+    if isinstance(ref_columns, list):
+        ref_columns = ", ".join(map(str, ref_columns))
+    return columns, f"{table}({ref_columns})" if ref_columns else str(table)
+
+
+def _table_line(table: str, info: Dict[str, Any]) -> str:
+    fields = info.get("fields") if isinstance(info.get("fields"), dict) else {}
+    marks: Dict[str, List[str]] = {name: [] for name in fields}
+    references: Dict[str, str] = {}
+    table_refs: List[str] = []
+
+    foreign_keys = info.get("foreign_keys") or {}
+    fk_defs = list(foreign_keys.values() if isinstance(foreign_keys, dict) else foreign_keys)
+    for constraint in info.get("constraints") or []:
+        if not isinstance(constraint, dict):
+            continue
+        kind = str(constraint.get("type", "")).upper()
+        if "FOREIGN" in kind:
+            fk_defs.append(constraint)
+        elif kind in ("PRIMARY KEY", "UNIQUE"):
+            mark = "PK" if kind == "PRIMARY KEY" else "UNIQUE"
+            for column in constraint.get("columns") or []:
+                if column in marks and mark not in marks[column]:
+                    marks[column].append(mark)
+    for fk in fk_defs:
+        columns, target = _fk_target(fk)
+        if not target:
+            continue
+        if columns and len(columns) == 1 and columns[0] in fields:
+            references[columns[0]] = target
+        else:
+            table_refs.append(f"FOREIGN KEY ({', '.join(columns)}) REFERENCES {target}" if columns
+                              else f"FOREIGN KEY REFERENCES {target}")
+
+    parts = []
+    for name, field in fields.items():
+        field = field if isinstance(field, dict) else {}
+        tokens = [str(name), str(field.get("type") or "")]
+        key_mark = _KEY_MARKS.get(str(field.get("key") or "").upper())
+        for mark in [key_mark] + marks[name]:
+            if mark and mark not in tokens:
+                tokens.append(mark)
+        if str(field.get("null", "")).upper() == "NO" and "PK" not in tokens:
+            tokens.append("NOT NULL")
+        if field.get("extra"):
+            tokens.append(str(field["extra"]).upper())
+        if field.get("default") is not None:
+            tokens.append(f"DEFAULT {_quote(field['default'])}")
+        if name in references:
+            tokens.append(f"REFERENCES {references[name]}")
+        if field.get("comment"):
+            tokens.append(f"COMMENT {_quote(field['comment'])}")
+        parts.append(" ".join(t for t in tokens if t))
+    line = f"{table}({', '.join(parts + table_refs)})"
+    description = info.get("description")
+    return f"{line} -- {' '.join(str(description).split())}" if description else line
+
+
+@functools.lru_cache(maxsize=32)
+def _compact(schema: str) -> Optional[str]:
+    try:
+        parsed = artifact_store.load_json(schema)
+    except (json.JSONDecodeError, TypeError):
+        return None
+    if not isinstance(parsed, dict) or not parsed:
+        return None
+    return "\n".join(_table_line(str(table), info if isinstance(info, dict) else {})
+                     for table, info in parsed.items())
+
+
+def compact(schema: str) -> Optional[str]:
+    """Schema JSON 字符串 -> 每张表一行的紧凑写法；无法解析或为空时返回 None。"""
+    return _compact(schema) if schema else None
+
+
+def for_prompt(schema: Optional[str]) -> Optional[str]:
+    """放进提示词的 Schema: 开启紧凑写法且能转换时返回紧凑写法，否则原样返回。"""
+    if not enabled() or not schema:
+        return schema
+    return compact(schema) or schema
@@ -0,0 +1,112 @@
+# bench_checkpointer.py: 并发会话下各 checkpointer 后端的吞吐和回合延迟对比。
+"""
+模拟 /chat: N 个线程各自代表一个会话，每个会话跑若干回合；每回合走一个
+6 个节点的小图 (节点里 sleep 模拟 LLM / API 调用)，状态里带一份约 20KB 的负载，
+每回合结束再 get_state 一次 (模拟前端拉取状态)。
+
+用法:
+    python scripts/bench_checkpointer.py --sessions 16 --turns 10
+    python scripts/bench_checkpointer.py --backends sqlite_single sqlite --sessions 32
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from typing import List, TypedDict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langgraph.graph import StateGraph, START, END
+
+from langgraph_crud_app.persistence.checkpointer import create_checkpointer
+
+NODES = 6
+
+
+class BenchState(TypedDict):
+    payload: str
+    step: int
+
+
+def build_app(checkpointer, node_sleep: float):
+    builder = StateGraph(BenchState)
+    for i in range(NODES):
+        def node(state, i=i):
+            time.sleep(node_sleep)
+            return {"step": state["step"] + 1}
+        builder.add_node(f"n{i}", node)
+    builder.add_edge(START, "n0")
+    for i in range(NODES - 1):
+        builder.add_edge(f"n{i}", f"n{i + 1}")
+    builder.add_edge(f"n{NODES - 1}", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def run_backend(backend: str, sessions: int, turns: int, node_sleep: float, payload_kb: int) -> dict:
+    tmp_dir = tempfile.mkdtemp(prefix="bench_ckpt_")
+    checkpointer = create_checkpointer(backend, os.path.join(tmp_dir, "sessions.db"))
+    app = build_app(checkpointer, node_sleep)
+    payload = "x" * (payload_kb * 1024)
+    latencies: List[float] = []
+    errors: List[str] = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(sessions)
+
+    def session(idx: int) -> None:
+        config = {"configurable": {"thread_id": f"bench-{idx}"}}
+        barrier.wait()
+        for _ in range(turns):
+            start = time.perf_counter()
+            try:
+                app.invoke({"payload": payload, "step": 0}, config)
+                app.get_state(config)
+            except Exception as e:  # 记录后继续，统计里体现错误数
+                with lock:
+                    errors.append(f"{type(e).__name__}: {e}")
+                continue
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "backend": backend,
+        "turns": len(latencies),
+        "errors": len(errors),
+        "wall_s": wall,
+        "turns_per_s": len(latencies) / wall if wall else 0.0,
+        "p50_ms": statistics.median(latencies) if latencies else 0.0,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="checkpointer 并发基准")
+    parser.add_argument("--backends", nargs="+", default=["sqlite_single", "sqlite"])
+    parser.add_argument("--sessions", type=int, default=16, help="并行会话数")
+    parser.add_argument("--turns", type=int, default=10, help="每个会话的回合数")
+    parser.add_argument("--node-sleep-ms", type=float, default=2.0, help="每个节点模拟的 I/O 耗时")
+    parser.add_argument("--payload-kb", type=int, default=20, help="状态负载大小")
+    args = parser.parse_args()
+
+    print(f"sessions={args.sessions} turns={args.turns} node_sleep={args.node_sleep_ms}ms payload={args.payload_kb}KB")
+    print(f"{'backend':<15}{'turns':>7}{'errors':>8}{'wall(s)':>10}{'turns/s':>10}{'p50(ms)':>10}{'p95(ms)':>10}")
+    for backend in args.backends:
+        r = run_backend(backend, args.sessions, args.turns, args.node_sleep_ms / 1000, args.payload_kb)
+        print(f"{r['backend']:<15}{r['turns']:>7}{r['errors']:>8}{r['wall_s']:>10.2f}"
+              f"{r['turns_per_s']:>10.1f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
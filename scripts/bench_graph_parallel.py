@@ -0,0 +1,132 @@
+# bench_graph_parallel.py: 对比图内步骤顺序执行和并行分支 (settings.GRAPH_PARALLEL_BRANCHES) 时每轮的耗时。
+"""
+把 API (api_client) 和 LLM 服务函数换成固定延迟的假实现 (sleep 后返回预设数据，不访问网络)，
+分别用 build_graph(parallel=False) 和 build_graph(parallel=True) 跑两种会并行的流程各一轮:
+
+- init: 首轮初始化 (获取 Schema -> 格式化 Schema ∥ 提取表名 -> 获取数据示例)，之后主意图为 reset 直接结束
+- composite: 复合预览 (解析计划 -> 处理 {{db(...)}} 占位符 ∥ 格式化预览)
+
+每个流程重复 --repeat 次取中位数。并行分支仍按步 (superstep) 同步，节省的是分支里较短一条的时间。
+
+用法:
+    python scripts/bench_graph_parallel.py
+    python scripts/bench_graph_parallel.py --llm-ms 1200 --api-ms 80 --repeat 5
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 所有 LLM 调用都被替换，不会真正请求 API
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+from langgraph_crud_app.graph.graph_builder import build_graph
+
+SCHEMA = {
+    "users": {"fields": {"id": {"type": "int", "key": "PRI", "null": "NO", "default": None},
+                         "username": {"type": "varchar(50)", "key": "UNI", "null": "NO", "default": None}}},
+    "prompts": {"fields": {"id": {"type": "int", "key": "PRI", "null": "NO", "default": None},
+                           "user_id": {"type": "int", "key": "MUL", "null": "NO", "default": None},
+                           "title": {"type": "varchar(100)", "key": "", "null": "NO", "default": None}}},
+}
+SCHEMA_STR = json.dumps(SCHEMA, ensure_ascii=False)
+TABLES = list(SCHEMA)
+SAMPLE_STR = json.dumps({"users": [{"id": 1, "username": "alice"}],
+                         "prompts": [{"id": 7, "user_id": 1, "title": "周报"}]}, ensure_ascii=False)
+COMPOSITE_PLAN = [
+    {"operation": "insert", "table_name": "prompts",
+     "values": {"user_id": "{{db(SELECT id FROM users WHERE username = 'alice')}}", "title": "日报"}},
+    {"operation": "update", "table_name": "users", "where": {"username": "alice"}, "set": {"username": "alice2"}},
+]
+
+
+def _slow(seconds: float, result: Any) -> Callable:
+    def _stub(*args, **kwargs):
+        time.sleep(seconds)
+        return result(*args, **kwargs) if callable(result) else result
+    return _stub
+
+
+def _sample_query(sql: str, *args, **kwargs) -> str:
+    if sql.lower().startswith("select id from users"):
+        return json.dumps([{"id": 1}])
+    return json.dumps([{"id": 1, "username": "alice"}], ensure_ascii=False)
+
+
+def _patches(llm: float, api: float, intent: str) -> List[Tuple[str, Callable]]:
+    llm_pkg = "langgraph_crud_app.services.llm"
+    return [
+        ("langgraph_crud_app.services.api_client.get_schema", _slow(api, [SCHEMA_STR])),
+        ("langgraph_crud_app.services.api_client.execute_query", _slow(api, _sample_query)),
+        (f"{llm_pkg}.llm_preprocessing_service.extract_table_names", _slow(llm, "\n".join(TABLES))),
+        (f"{llm_pkg}.llm_preprocessing_service.format_schema", _slow(llm, SCHEMA_STR)),
+        (f"{llm_pkg}.llm_query_service.classify_main_intent", _slow(llm, {"intent": intent, "confidence": 0.99})),
+        (f"{llm_pkg}.llm_composite_service.parse_combined_request", _slow(llm, COMPOSITE_PLAN)),
+        (f"{llm_pkg}.llm_composite_service.format_combined_preview", _slow(llm, "新增一条提示并修改用户名")),
+    ]
+
+
+def _initial_state(flow: str) -> Dict[str, Any]:
+    queries = {"init": "重置一下", "composite": "给 alice 新增日报并改名为 alice2"}
+    state: Dict[str, Any] = {"user_query": queries[flow], "raw_user_input": queries[flow]}
+    if flow != "init":
+        state.update(biaojiegou_save=SCHEMA_STR, table_names=TABLES, data_sample=SAMPLE_STR,
+                     raw_schema_result=SCHEMA_STR)
+    return state
+
+
+def _run_once(app, flow: str, llm: float, api: float, run_id: str) -> Tuple[float, Dict[str, Any]]:
+    intent = {"init": "reset", "composite": "composite"}[flow]
+    with contextlib.ExitStack() as stack:
+        for target, stub in _patches(llm, api, intent):
+            stack.enter_context(patch(target, stub))
+        # 节点里的 print 调试输出不计入对比
+        stack.enter_context(contextlib.redirect_stdout(io.StringIO()))
+        start = time.perf_counter()
+        state = app.invoke(_initial_state(flow), {"configurable": {"thread_id": run_id}})
+        return time.perf_counter() - start, state
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="图内并行分支的每轮耗时对比")
+    parser.add_argument("--llm-ms", type=float, default=800, help="每次 LLM 调用的模拟延迟 (毫秒)")
+    parser.add_argument("--api-ms", type=float, default=100, help="每次 API 调用的模拟延迟 (毫秒)")
+    parser.add_argument("--repeat", type=int, default=3, help="每个流程重复次数 (取中位数)")
+    parser.add_argument("--flows", default="init,composite", help="逗号分隔的流程")
+    args = parser.parse_args()
+    llm, api = args.llm_ms / 1000, args.api_ms / 1000
+    logging.disable(logging.CRITICAL)
+
+    apps = {parallel: build_graph(parallel=parallel).compile(checkpointer=InMemorySaver())
+            for parallel in (False, True)}
+    print(f"模拟延迟: LLM {args.llm_ms:.0f} ms, API {args.api_ms:.0f} ms; 每个流程 {args.repeat} 次取中位数")
+    print(f"{'流程':<10}{'顺序 (s)':>10}{'并行 (s)':>10}{'节省':>8}")
+    for flow in [f.strip() for f in args.flows.split(",") if f.strip()]:
+        medians = {}
+        for parallel, app in apps.items():
+            timings = []
+            for i in range(args.repeat):
+                elapsed, state = _run_once(app, flow, llm, api, f"bench-{flow}-{parallel}-{i}")
+                if state.get("error_message"):
+                    print(f"  {flow} ({'并行' if parallel else '顺序'}) 出错: {state['error_message']}")
+                timings.append(elapsed)
+            medians[parallel] = statistics.median(timings)
+        before, after = medians[False], medians[True]
+        saved = f"{(before - after) / before:.0%}" if before else "-"
+        print(f"{flow:<12}{before:>10.2f}{after:>10.2f}{saved:>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+# bench_import_time.py: 各入口的冷启动 import 耗时 (python -X importtime)，与 import_budget.json 中的预算对比。
+"""
+每个入口在全新的子进程里 import 一次 (重复 --repeat 次取中位数)，
+解析 -X importtime 的输出，取入口模块的累计耗时；同时检查不应在启动时加载的重模块。
+
+入口:
+- api:   app (Flask，只访问数据库接口时不应加载 langgraph / langchain / openai)
+- asgi:  asgi (ASGI 入口，图在第一个 /chat 时才导入)
+- graph: langgraph_crud_app.graph.graph_builder (构建图需要 langgraph，但不应加载 openai 客户端)
+- cli:   langgraph_crud_app.main (命令行入口)
+
+超出预算或加载了禁止的模块时退出码为 1，可以放在 CI 里跑。
+预算按慢机器留了余量；换了机器 / 升级依赖后可以用 --update 按本次结果 x1.5 重写预算。
+
+用法:
+    python scripts/bench_import_time.py
+    python scripts/bench_import_time.py --repeat 7 --top 15
+    python scripts/bench_import_time.py --update
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_budget.json")
+
+TARGETS = {
+    "api": "app",
+    "asgi": "asgi",
+    "graph": "langgraph_crud_app.graph.graph_builder",
+    "cli": "langgraph_crud_app.main",
+}
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def _import_once(module: str) -> Tuple[List[Tuple[int, int, int, str]], List[str]]:
+    """在子进程里 import 一次，返回 ([(self_us, cumulative_us, depth, name)], 已加载的模块名)。"""
+    code = f"import sys, {module}; print('\\n'.join(sys.modules))"
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-import-bench")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=env,
+                          capture_output=True, text=True, check=False)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} 失败:\n{proc.stderr[-2000:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            rows.append((int(match.group(1)), int(match.group(2)), len(match.group(3)) // 2, match.group(4)))
+    return rows, proc.stdout.split()
+
+
+def measure(module: str, repeat: int) -> Dict:
+    totals, runs = [], []
+    loaded: List[str] = []
+    for _ in range(repeat):
+        rows, loaded = _import_once(module)
+        total = next((cum for _, cum, _, name in rows if name == module), None)
+        if total is None:
+            raise RuntimeError(f"没有在 importtime 输出中找到 {module}")
+        totals.append(total)
+        runs.append(rows)
+    # 最重的顶层依赖 (按包名汇总自身耗时)，取中位数那一次
+    median_run = runs[totals.index(sorted(totals)[len(totals) // 2])]
+    by_package: Dict[str, int] = {}
+    for self_us, _, _, name in median_run:
+        package = name.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + self_us
+    return {
+        "ms": statistics.median(totals) / 1000,
+        "modules": len(loaded),
+        "loaded": set(loaded),
+        "heaviest": sorted(by_package.items(), key=lambda kv: kv[1], reverse=True),
+    }
+
+
+def _load_budget() -> Dict:
+    with open(BUDGET_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="入口 import 耗时基准")
+    parser.add_argument("--repeat", type=int, default=5, help="每个入口重复次数 (取中位数)")
+    parser.add_argument("--targets", nargs="+", default=list(TARGETS), choices=list(TARGETS))
+    parser.add_argument("--top", type=int, default=8, help="列出最重的前 N 个顶层包")
+    parser.add_argument("--update", action="store_true", help="按本次结果 x1.5 重写预算文件")
+    args = parser.parse_args()
+
+    budget = _load_budget()
+    failures = []
+    print(f"{'target':<8}{'module':<42}{'import(ms)':>12}{'budget(ms)':>12}{'modules':>9}")
+    for target in args.targets:
+        module = TARGETS[target]
+        result = measure(module, args.repeat)
+        spec = budget.get(target, {})
+        limit = spec.get("max_ms")
+        print(f"{target:<8}{module:<42}{result['ms']:>12.1f}{(limit or 0):>12.0f}{result['modules']:>9}")
+        heaviest = ", ".join(f"{name} {us / 1000:.0f}ms" for name, us in result["heaviest"][:args.top])
+        print(f"        最重的包: {heaviest}")
+        if limit is not None and result["ms"] > limit and not args.update:
+            failures.append(f"{target}: {result['ms']:.1f}ms 超出预算 {limit}ms")
+        forbidden = sorted(m for m in spec.get("forbidden", []) if m in result["loaded"])
+        if forbidden:
+            failures.append(f"{target}: 启动时加载了 {', '.join(forbidden)}")
+        if args.update:
+            spec["max_ms"] = round(result["ms"] * 1.5 / 10) * 10
+            budget[target] = spec
+
+    if args.update:
+        with open(BUDGET_PATH, "w", encoding="utf-8") as f:
+            json.dump(budget, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"预算已更新: {BUDGET_PATH}")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+# bench_intent_rules.py: 主意图规则预分类的覆盖率、准确率和每回合节省的 LLM 时间。
+"""
+对一组带标注的用户输入 (内置样例，或 --file 指定的 "标签<TAB>输入" 文件) 跑 intent_rules:
+
+- 规则本身的耗时 (微秒级)
+- 覆盖率: 置信度达到阈值、直接跳过 LLM 的输入占比；以及这些输入上规则的准确率
+- 每回合节省的时间 ≈ 覆盖率 x 一次主意图 LLM 调用的耗时
+  默认按 --llm-ms 估算；加 --live 时真实调用 LLM (需要 OPENAI_API_KEY)，测量实际耗时并对比规则与 LLM 的一致率。
+
+用法:
+    python scripts/bench_intent_rules.py
+    python scripts/bench_intent_rules.py --threshold 0.85 --llm-ms 900
+    python scripts/bench_intent_rules.py --file samples.tsv --live
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langgraph_crud_app.config import settings
+from langgraph_crud_app.services import intent_rules
+
+# 提示词里的示例 + 常见的会话输入
+SAMPLES: List[Tuple[str, str]] = [
+    ("confirm_other", "保存"), ("confirm_other", "是"), ("confirm_other", "好的"), ("confirm_other", "确定"),
+    ("confirm_other", "继续"), ("confirm_other", "否"), ("confirm_other", "你好"), ("confirm_other", "取消"),
+    ("reset", "重置"), ("reset", "重新开始"), ("reset", "重置所有数据"), ("reset", "清空对话"),
+    ("query_analysis", "查询 TKT-2307-0001 状态"), ("query_analysis", "统计工单数量"),
+    ("query_analysis", "数据表中一共多少工单?"), ("query_analysis", "查找用户名为Alice的记录"),
+    ("query_analysis", "统计每个部门的工单数量"), ("query_analysis", "分析不同优先级工单的平均解决时间"),
+    ("query_analysis", "找出提示数量最多的前三个用户"), ("query_analysis", "查看 REP000777 详情"),
+    ("query_analysis", "列出所有状态为 open 的工单"), ("query_analysis", "有多少个用户?"),
+    ("modify", "修改 TKT-2307-0001 状态为已解决"), ("modify", "把 Alice 的邮箱改成 a@b.com"),
+    ("modify", "更新用户 Bob 的电话为 123456"), ("modify", "找出用户'张三'并更新他的电话号码"),
+    ("add", "新增一条工单"), ("add", "添加用户 Carol，邮箱 carol@example.com"), ("add", "创建一个新的部门：研发部"),
+    ("delete", "删除 TKT-2307-0001"), ("delete", "删除所有状态为'过期'且创建时间早于去年的任务"),
+    ("delete", "找出所有过期的任务并删除它们"), ("delete", "移除用户 Dave"),
+    ("composite", "修改用户A的邮箱并为用户B新增一条地址记录"),
+    ("composite", "删除users表的用户X并同时删除orders表中的相关订单"),
+    ("composite", "新增产品P，然后立即更新其库存"),
+]
+
+
+def _load(path: str) -> List[Tuple[str, str]]:
+    samples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if "\t" in line:
+                label, query = line.rstrip("\n").split("\t", 1)
+                samples.append((label.strip(), query))
+    return samples
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="主意图规则预分类基准")
+    parser.add_argument("--file", help="标注文件，每行 '标签<TAB>输入'")
+    parser.add_argument("--threshold", type=float, default=settings.INTENT_RULES_MIN_CONFIDENCE)
+    parser.add_argument("--llm-ms", type=float, default=800.0, help="估算用的主意图 LLM 调用耗时 (ms)")
+    parser.add_argument("--live", action="store_true", help="真实调用 LLM 测量耗时和一致率")
+    parser.add_argument("--repeat", type=int, default=200, help="测量规则耗时的重复次数")
+    args = parser.parse_args()
+
+    samples = _load(args.file) if args.file else SAMPLES
+    rule_us = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        for _, query in samples:
+            intent_rules.match_main_intent(query)
+        rule_us.append((time.perf_counter() - start) * 1e6 / len(samples))
+
+    covered = correct = 0
+    mistakes = []
+    by_rule = Counter()
+    for label, query in samples:
+        match = intent_rules.match_main_intent(query)
+        if match is None or match.confidence < args.threshold:
+            continue
+        covered += 1
+        by_rule[match.rule] += 1
+        if match.intent == label:
+            correct += 1
+        else:
+            mistakes.append((query, label, match))
+
+    llm_ms = args.llm_ms
+    if args.live:
+        from langgraph_crud_app.services.llm import llm_query_service
+
+        latencies, agree, compared = [], 0, 0
+        for label, query in samples:
+            start = time.perf_counter()
+            llm_intent, _ = llm_query_service._classify_main_intent_llm(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+            match = intent_rules.match_main_intent(query)
+            if match is not None:
+                compared += 1
+                agree += match.intent == llm_intent
+        llm_ms = statistics.median(latencies)
+        print(f"LLM 主意图调用: 中位数 {llm_ms:.0f}ms，规则有结果的 {compared} 条中与 LLM 一致 {agree} 条")
+
+    coverage = covered / len(samples)
+    print(f"样本数 {len(samples)}，阈值 {args.threshold}")
+    print(f"规则耗时: {statistics.median(rule_us):.1f}us/条")
+    print(f"覆盖率 (跳过 LLM): {coverage:.1%} ({covered} 条)，其中与标注一致 {correct} 条")
+    print(f"按规则分布: {dict(by_rule)}")
+    print(f"每回合平均节省: {coverage * llm_ms:.0f}ms (主意图 LLM 调用 {llm_ms:.0f}ms)")
+    for query, label, match in mistakes:
+        print(f"  不一致: {query!r} 标注={label} 规则={match.intent} ({match.rule}, {match.confidence:.2f})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
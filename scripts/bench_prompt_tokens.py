@@ -0,0 +1,169 @@
+# bench_prompt_tokens.py: 对比 Schema 用 JSON 和紧凑写法 (schema_notation) 时各个提示词的输入 token 数。
+"""
+依次调用所有会把 Schema 放进提示词的 LLM 服务函数 (查询 / 分析 / 新增 / 修改 / 删除 / 复合)，
+把 llm_policy.invoke 换成只记录最终发给模型的消息 (不真正调用 LLM)，
+分别在 PROMPT_SCHEMA_NOTATION=json 和 compact 下统计每个提示词的 token 数。
+
+- Schema 默认用 text/testresource/表结构.txt，数据示例取 text/testresource/*.csv 每张表的前几行
+- 默认关闭 Schema 检索 (SCHEMA_RETRIEVAL_ENABLED)，只看写法本身的差别；加 --retrieval 时两者叠加
+- token 数用 tiktoken (o200k_base) 计算；没有可用的编码文件 (离线) 时按 汉字 1 个 / 其他字符 4 个 一个 token 估算
+
+用法:
+    python scripts/bench_prompt_tokens.py
+    python scripts/bench_prompt_tokens.py --schema schema.json --sample sample.json
+    python scripts/bench_prompt_tokens.py --sample-rows 5 --retrieval
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import logging
+import os
+import re
+import sys
+from typing import Any, Callable, Dict, List, Tuple
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 只渲染提示词，不会真正请求 API
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+
+from langgraph_crud_app.config import settings
+from langgraph_crud_app.services import schema_notation
+from langgraph_crud_app.services.llm import (llm_add_service, llm_composite_service, llm_delete_service,
+                                             llm_modify_service, llm_policy, llm_query_service)
+
+RESOURCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "text", "testresource")
+_CJK = re.compile(r"[\u3000-\u9fff\uff00-\uffef]")
+
+
+def _token_counter() -> Tuple[str, Callable[[str], int]]:
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("o200k_base")
+        return "tiktoken o200k_base", lambda text: len(encoding.encode(text))
+    except Exception:
+        def _estimate(text: str) -> int:
+            cjk = len(_CJK.findall(text))
+            return cjk + (len(text) - cjk + 3) // 4
+        return "估算 (汉字 1 / 其他 4 字符)", _estimate
+
+
+def _load_sample(schema: Dict[str, Any], rows: int) -> Dict[str, List[Dict[str, Any]]]:
+    """testresource 里的 CSV 没有表头，按 Schema 的字段顺序对应。"""
+    sample = {}
+    for table, info in schema.items():
+        path = os.path.join(RESOURCE_DIR, f"{table}.csv")
+        if not os.path.exists(path):
+            continue
+        columns = list((info.get("fields") or {}).keys())
+        with open(path, encoding="utf-8") as f:
+            sample[table] = [dict(zip(columns, values)) for values, _ in zip(csv.reader(f), range(rows))]
+    return sample
+
+
+class _Reply(str):
+    """同时满足 StrOutputParser 链 (返回 str) 和直接调用模型 (读 .content) 的返回值。"""
+
+    @property
+    def content(self) -> str:
+        return str(self)
+
+
+def _render(runnable: Any, inputs: Any) -> str:
+    if isinstance(inputs, list):
+        messages = inputs
+    else:
+        # get_chain 返回的链带 with_config，外面包了一层 RunnableBinding
+        chain = getattr(runnable, "bound", runnable)
+        messages = chain.first.invoke(inputs).to_messages()
+    return "\n".join(m["content"] if isinstance(m, dict) else m.content for m in messages)
+
+
+def _capture(func: Callable, *args) -> List[str]:
+    """调用服务函数，返回它发出的所有提示词 (回复是假的，服务函数之后的解析失败不影响统计)。"""
+    prompts = []
+
+    def _fake_invoke(runnable, inputs, **kwargs):
+        prompts.append(_render(runnable, inputs))
+        return _Reply("SELECT 1")
+
+    # 假回复会让服务函数打印解析失败的日志，这里不关心
+    with patch.object(llm_policy, "invoke", _fake_invoke), contextlib.redirect_stdout(io.StringIO()):
+        try:
+            func(*args)
+        except Exception:
+            pass
+    return prompts
+
+
+def _cases(schema: str, tables: List[str], sample: str) -> List[Tuple[str, Callable, tuple]]:
+    delete_rows = json.dumps([{"table_name": tables[0], "id": "1"}], ensure_ascii=False)
+    records = {tables[0]: [{"id": "1"}]}
+    return [
+        ("query.generate_select_sql", llm_query_service.generate_select_sql, ("查询用户 Alice 的提示词", schema, tables, sample)),
+        ("query.generate_analysis_sql", llm_query_service.generate_analysis_sql, ("统计每个用户的提示词数量", schema, tables, sample)),
+        ("query.analyze_analysis_result", llm_query_service.analyze_analysis_result,
+         ("统计每个用户的提示词数量", '[{"user_id": 1, "n": 3}]', schema, tables)),
+        ("add.parse_add_request", llm_add_service.parse_add_request, ("新增用户 Carol，邮箱随机", schema, sample)),
+        ("add.format_add_preview", llm_add_service.format_add_preview, ("新增用户 Carol", schema, tables, records)),
+        ("modify.generate_modify_context_sql", llm_modify_service.generate_modify_context_sql,
+         ("把 Alice 的邮箱改成 a@b.com", schema, tables, sample)),
+        ("modify.parse_modify_request", llm_modify_service.parse_modify_request,
+         ("把 Alice 的邮箱改成 a@b.com", schema, tables, sample, "[]")),
+        ("delete.generate_delete_preview_sql", llm_delete_service.generate_delete_preview_sql,
+         ("删除用户 Dave 的所有 token", schema, tables, sample)),
+        ("delete.format_delete_preview", llm_delete_service.format_delete_preview, (delete_rows, schema)),
+        ("composite.parse_combined_request", llm_composite_service.parse_combined_request,
+         ("修改 Alice 的邮箱并为她新增一条提示词", schema, tables, sample)),
+    ]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="提示词 Schema 写法的 token 对比")
+    parser.add_argument("--schema", default=os.path.join(RESOURCE_DIR, "表结构.txt"), help="Schema JSON 文件")
+    parser.add_argument("--sample", help="数据示例 JSON 文件 (默认取 testresource 的 CSV)")
+    parser.add_argument("--sample-rows", type=int, default=3, help="每张表取的示例行数")
+    parser.add_argument("--retrieval", action="store_true", help="同时开启 Schema 检索")
+    args = parser.parse_args()
+
+    with open(args.schema, encoding="utf-8") as f:
+        schema_str = f.read().strip()
+    schema = json.loads(schema_str)
+    if args.sample:
+        with open(args.sample, encoding="utf-8") as f:
+            sample_str = f.read().strip()
+    else:
+        sample_str = json.dumps(_load_sample(schema, args.sample_rows), ensure_ascii=False)
+    tables = list(schema)
+    counter_name, count = _token_counter()
+    logging.disable(logging.CRITICAL)
+
+    results: Dict[str, Dict[str, int]] = {}
+    for notation in ("json", "compact"):
+        with patch.object(settings, "PROMPT_SCHEMA_NOTATION", notation), \
+             patch.object(settings, "SCHEMA_RETRIEVAL_ENABLED", args.retrieval):
+            for name, func, call_args in _cases(schema_str, tables, sample_str):
+                results.setdefault(name, {})[notation] = sum(count(p) for p in _capture(func, *call_args))
+
+    print(f"Schema: {len(tables)} 张表, {len(schema_str)} 字符; token 计数: {counter_name}; "
+          f"Schema 检索: {'开' if args.retrieval else '关'}")
+    with patch.object(settings, "PROMPT_SCHEMA_NOTATION", "compact"):
+        print(f"Schema 本身: json {count(schema_str)} -> compact {count(schema_notation.for_prompt(schema_str))} tokens")
+    print(f"{'提示词':<38}{'json':>8}{'compact':>9}{'节省':>8}")
+    totals = [0, 0]
+    for name, counts in results.items():
+        before, after = counts.get("json", 0), counts.get("compact", 0)
+        totals[0] += before
+        totals[1] += after
+        saved = f"{(before - after) / before:.0%}" if before else "-"
+        print(f"{name:<40}{before:>8}{after:>9}{saved:>8}")
+    saved = f"{(totals[0] - totals[1]) / totals[0]:.0%}" if totals[0] else "-"
+    print(f"{'合计':<38}{totals[0]:>8}{totals[1]:>9}{saved:>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+# bench_write_behind.py: 逐步落盘 vs write-behind 的 checkpoint 写入次数和回合延迟对比 (按流程)。
+"""
+用真实的 build_graph() 跑几个典型流程，LLM / API 调用全部打桩 (和集成测试一样)，
+底层存储用 PooledSqliteSaver (临时文件)，统计每回合底层存储实际执行的 put / put_writes 次数和耗时。
+
+流程:
+- query: 一回合简单查询
+- add:   新增三回合 (发起请求 -> "保存" -> "是")
+
+用法:
+    python scripts/bench_write_behind.py --rounds 20
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langgraph_crud_app.graph.graph_builder import build_graph
+from langgraph_crud_app.persistence.checkpointer import PooledSqliteSaver
+from langgraph_crud_app.persistence.write_behind import WriteBehindSaver
+
+SCHEMA = json.dumps({
+    "users": {
+        "fields": {
+            "id": {"type": "int", "key": "PRI", "null": "NO", "default": None},
+            "username": {"type": "varchar(50)", "key": "UNI", "null": "NO", "default": None},
+            "email": {"type": "varchar(100)", "key": "UNI", "null": "NO", "default": None},
+        },
+        "constraints": [{"name": "PRIMARY", "type": "PRIMARY KEY", "columns": ["id"]}],
+        "description": "用户表",
+    }
+})
+SAMPLE = json.dumps({"users": [{"id": 1, "username": "Alice", "email": "alice@example.com"}]})
+ADD_DATA = '[{"table_name": "users", "fields": {"username": "Bob", "email": "bob@example.com"}}]'
+
+
+def _patches(intent: str) -> ExitStack:
+    stack = ExitStack()
+    svc = "langgraph_crud_app.services"
+    stack.enter_context(patch(f"{svc}.llm.llm_query_service.classify_main_intent",
+                              return_value={"intent": intent, "confidence": 0.99}))
+    stack.enter_context(patch(f"{svc}.llm.llm_query_service.classify_query_analysis_intent",
+                              return_value={"intent": "query", "confidence": 0.99}))
+    stack.enter_context(patch(f"{svc}.llm.llm_query_service.generate_select_sql",
+                              return_value="SELECT id, username FROM users WHERE username = 'Alice'"))
+    stack.enter_context(patch(f"{svc}.api_client.execute_query",
+                              return_value=[{"id": 1, "username": "Alice"}]))
+    stack.enter_context(patch(f"{svc}.llm.llm_query_service.format_query_result", return_value="找到 Alice"))
+    stack.enter_context(patch(f"{svc}.llm.llm_add_service.parse_add_request", return_value=ADD_DATA))
+    stack.enter_context(patch(f"{svc}.llm.llm_add_service.format_add_preview", return_value="新增 Bob"))
+    stack.enter_context(patch(f"{svc}.llm.llm_flow_control_service.classify_yes_no", return_value="yes"))
+    stack.enter_context(patch(f"{svc}.api_client.insert_record",
+                              return_value={"status": "success", "ids": [2]}))
+    stack.enter_context(patch(f"{svc}.llm.llm_flow_control_service.format_api_result", return_value="新增成功"))
+    return stack
+
+
+# 每个流程: [(用户输入, 主意图)]
+FLOWS = {
+    "query": [("查一下 Alice", "query_analysis")],
+    "add": [("新增用户 Bob", "add"), ("保存", "confirm_other"), ("是", "confirm_other")],
+}
+
+
+def _count_calls(saver, counts):
+    """在实例上包一层 put / put_writes，统计底层存储的真实写入。"""
+    put, put_writes = saver.put, saver.put_writes
+
+    def counted_put(*args, **kwargs):
+        counts["put"] += 1
+        return put(*args, **kwargs)
+
+    def counted_put_writes(*args, **kwargs):
+        counts["put_writes"] += 1
+        return put_writes(*args, **kwargs)
+
+    saver.put, saver.put_writes = counted_put, counted_put_writes
+
+
+def run(mode: str, flow: str, rounds: int) -> dict:
+    tmp_dir = tempfile.mkdtemp(prefix="bench_wb_")
+    inner = PooledSqliteSaver(os.path.join(tmp_dir, "sessions.db"))
+    counts = defaultdict(int)
+    _count_calls(inner, counts)
+    saver = WriteBehindSaver(inner) if mode == "write_behind" else inner
+    app = build_graph().compile(checkpointer=saver)
+
+    latencies = []
+    for r in range(rounds):
+        config = {"configurable": {"thread_id": f"{flow}-{r}"}}
+        # 预置已初始化的会话，跳过初始化流程
+        app.update_state(config, {"biaojiegou_save": SCHEMA, "table_names": ["users"], "data_sample": SAMPLE})
+        if isinstance(saver, WriteBehindSaver):
+            saver.flush(config)
+        counts.clear()
+        for query, intent in FLOWS[flow]:
+            with _patches(intent):
+                start = time.perf_counter()
+                for _ in app.stream({"user_query": query}, config=config, stream_mode="values"):
+                    pass
+                if isinstance(saver, WriteBehindSaver):
+                    saver.flush(config)
+                latencies.append((time.perf_counter() - start) * 1000)
+        if r == 0:
+            first_counts = dict(counts)
+    inner.close()
+    return {
+        "mode": mode, "flow": flow,
+        "puts_per_turn": first_counts.get("put", 0) / len(FLOWS[flow]),
+        "writes_per_turn": first_counts.get("put_writes", 0) / len(FLOWS[flow]),
+        "p50_ms": statistics.median(latencies),
+        "mean_ms": statistics.mean(latencies),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="write-behind checkpoint 基准")
+    parser.add_argument("--rounds", type=int, default=20, help="每个流程跑多少个会话")
+    parser.add_argument("--flows", nargs="+", default=list(FLOWS))
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    print(f"{'flow':<8}{'mode':<14}{'put/turn':>10}{'put_writes/turn':>17}{'p50(ms)':>10}{'mean(ms)':>10}")
+    for flow in args.flows:
+        for mode in ("sync", "write_behind"):
+            r = run(mode, flow, args.rounds)
+            print(f"{r['flow']:<8}{r['mode']:<14}{r['puts_per_turn']:>10.1f}{r['writes_per_turn']:>17.1f}"
+                  f"{r['p50_ms']:>10.1f}{r['mean_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
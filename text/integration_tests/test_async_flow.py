@@ -0,0 +1,185 @@
+import asyncio
+import json
+import threading
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+# 将项目根目录添加到 sys.path 以便导入 langgraph_crud_app
+import sys
+import os
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from langgraph_crud_app.graph.graph_builder import build_graph
+from langgraph_crud_app.persistence.checkpointer import PooledSqliteSaver, create_async_checkpointer
+from langgraph_crud_app.persistence.write_behind import WriteBehindSaver
+from langgraph_crud_app.services import api_client
+from langgraph.checkpoint.memory import InMemorySaver
+
+MOCK_SCHEMA_JSON_STRING = json.dumps({
+    "users": {
+        "fields": {
+            "id": {"type": "int", "key": "PRI", "null": "NO", "default": None},
+            "username": {"type": "varchar(50)", "key": "UNI", "null": "NO", "default": None},
+        },
+        "constraints": [{"name": "PRIMARY", "type": "PRIMARY KEY", "columns": ["id"]}],
+        "description": "用户表。"
+    }
+})
+
+
+def _query_patches(execute_query):
+    """LLM 全部打桩 (同步和异步版本)；api_client.execute_query / aexecute_query 换成 execute_query。"""
+    svc = "langgraph_crud_app.services.llm.llm_query_service"
+    llm_returns = {
+        "classify_main_intent": {"intent": "query_analysis", "confidence": 0.95},
+        "classify_query_analysis_intent": {"intent": "query", "confidence": 0.92},
+        "generate_select_sql": "SELECT id, username FROM users WHERE username = 'Alice'",
+        "format_query_result": "找到了 Alice。",
+    }
+
+    async def aexecute_query(sql):
+        return execute_query(sql)
+
+    patches = []
+    for name, value in llm_returns.items():
+        patches.append(patch(f"{svc}.{name}", return_value=value))
+        patches.append(patch(f"{svc}.a{name}", return_value=value))
+    patches.append(patch.object(api_client, "execute_query", side_effect=execute_query))
+    patches.append(patch.object(api_client, "aexecute_query", side_effect=aexecute_query))
+    return patches
+
+
+def _initial_state():
+    return {
+        "user_query": "查找用户名为Alice的记录",
+        "biaojiegou_save": MOCK_SCHEMA_JSON_STRING,
+        "table_names": ["users"],
+        "data_sample": json.dumps({"users": [{"id": 1, "username": "Bob"}]}),
+    }
+
+
+def _recording_execute_query(calls):
+    def execute_query(sql):
+        calls.append((sql, threading.current_thread()))
+        return [{"id": 1, "username": "Alice"}]
+    return execute_query
+
+
+def test_query_flow_ainvoke_awaits_query_nodes_on_the_event_loop():
+    """
+    graph.ainvoke 跑查询流程: 查询路径上的节点注册了异步版本，API 调用直接在事件循环上 await
+    (不占线程池的线程)；最终结果与同步路径一致。
+    """
+    compiled_app = build_graph().compile(checkpointer=InMemorySaver())
+    calls = []
+    patches = _query_patches(_recording_execute_query(calls))
+    for p in patches:
+        p.start()
+    try:
+        async def run():
+            config = {"configurable": {"thread_id": "async-query-1"}}
+            return await compiled_app.ainvoke(_initial_state(), config=config), threading.current_thread()
+        final_state, loop_thread = asyncio.run(run())
+        assert api_client.aexecute_query.call_count == 1
+        assert api_client.execute_query.call_count == 0
+    finally:
+        for p in patches:
+            p.stop()
+
+    assert final_state.get("final_answer") == "找到了 Alice。"
+    assert final_state.get("error_message") is None
+    assert [sql for sql, _ in calls] == ["SELECT id, username FROM users WHERE username = 'Alice';"]
+    assert calls[0][1] is loop_thread
+
+
+def test_query_flow_invoke_still_uses_sync_nodes():
+    """同步入口 (Flask /chat 的 graph.invoke) 仍然走同步版本的节点。"""
+    compiled_app = build_graph().compile(checkpointer=InMemorySaver())
+    calls = []
+    patches = _query_patches(_recording_execute_query(calls))
+    for p in patches:
+        p.start()
+    try:
+        final_state = compiled_app.invoke(_initial_state(), config={"configurable": {"thread_id": "sync-query-1"}})
+        assert api_client.execute_query.call_count == 1
+        assert api_client.aexecute_query.call_count == 0
+    finally:
+        for p in patches:
+            p.stop()
+
+    assert final_state.get("final_answer") == "找到了 Alice。"
+
+
+def test_aexecute_query_posts_over_async_client():
+    """aexecute_query 经 httpx.AsyncClient 发请求，SQL 处理和返回值与 execute_query 相同。"""
+    requests_seen = []
+
+    def handler(request):
+        requests_seen.append(json.loads(request.content))
+        return httpx.Response(200, json=[{"id": 1, "username": "Alice"}])
+
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            with patch.object(api_client, "_async_client", return_value=client):
+                return await api_client.aexecute_query("SELECT id, username FROM users;")
+        finally:
+            await client.aclose()
+
+    result = asyncio.run(run())
+    assert json.loads(result) == [{"id": 1, "username": "Alice"}]
+    assert requests_seen == [{"sql_query": "SELECT id, username FROM users"}]
+
+
+def test_asgi_forwards_other_routes_to_flask():
+    """/chat 以外的路径经 a2wsgi 交给 Flask 应用，响应原样返回。"""
+    import asgi
+
+    async def _get():
+        transport = httpx.ASGITransport(app=asgi.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            return await client.get("/metrics")
+
+    response = asyncio.run(_get())
+    assert response.status_code == 200
+    assert "crud_http_requests_in_flight" in response.text
+
+
+def test_async_write_behind_flushes_to_sync_store(tmp_path):
+    """异步存储挂在 WriteBehindSaver.ainner 上: aflush 之后同步的 inner 也能读到本回合的最终状态。"""
+    db_path = str(tmp_path / "sessions.db")
+    inner = PooledSqliteSaver(db_path)
+
+    async def run():
+        store = await create_async_checkpointer("sqlite", db_path)
+        try:
+            saver = WriteBehindSaver(inner, ainner=store)
+            compiled_app = build_graph().compile(checkpointer=saver)
+            config = {"configurable": {"thread_id": "async-wb-1"}}
+            await compiled_app.ainvoke(_initial_state(), config=config)
+            # 回合结束前最终状态只在缓冲里
+            before = inner.get_tuple(config)
+            assert before is None or before.checkpoint["channel_values"].get("final_answer") is None
+            await saver.aflush(config)
+            return config
+        finally:
+            # aiosqlite 的后台线程不是守护线程，不关闭会挂住进程
+            await store.conn.close()
+
+    patches = _query_patches(_recording_execute_query([]))
+    for p in patches:
+        p.start()
+    try:
+        config = asyncio.run(run())
+    finally:
+        for p in patches:
+            p.stop()
+
+    saved = inner.get_tuple(config)
+    inner.close()
+    assert saved is not None
+    assert saved.checkpoint["channel_values"]["final_answer"] == "找到了 Alice。"
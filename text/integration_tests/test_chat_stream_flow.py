@@ -0,0 +1,147 @@
+import asyncio
+import json
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+# 将项目根目录添加到 sys.path 以便导入 app / asgi
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+import app as flask_module
+import asgi
+from langgraph_crud_app.graph.graph_builder import build_graph
+
+SESSION_ID = "stream-session"
+MOCK_SCHEMA_JSON_STRING = json.dumps({
+    "users": {"fields": {"id": {"type": "int", "key": "PRI", "null": "NO", "default": None},
+                         "username": {"type": "varchar(50)", "key": "UNI", "null": "NO", "default": None}}}
+})
+
+
+@pytest.fixture
+def saver():
+    """已经完成初始化的会话 (Schema / 数据示例已在 checkpoint 里)，本回合直接进入意图分类。"""
+    saver = InMemorySaver()
+    build_graph().compile(checkpointer=saver).update_state(
+        {"configurable": {"thread_id": SESSION_ID}},
+        {"biaojiegou_save": MOCK_SCHEMA_JSON_STRING, "table_names": ["users"],
+         "data_sample": json.dumps({"users": [{"id": 1, "username": "Bob"}]})})
+    return saver
+
+
+def _query_patches(renderer="llm"):
+    """
+    查询流程，其余 LLM 调用和会话管理打桩。renderer="llm": format_query_result 走 LLM 格式化 (逐词输出的假模型)；
+    "template" (默认配置): 模板渲染记录，开启一句话总结，假模型只生成总结。
+    """
+    svc = "langgraph_crud_app.services.llm.llm_query_service"
+    reply = "找到 1 位 用户: Alice" if renderer == "llm" else "共找到 1 条 用户记录。"
+    fake_llm = GenericFakeChatModel(messages=iter([AIMessage(content=reply)]))
+    intent = {"intent": "query_analysis", "sub_intent": "query"}
+    sql = "SELECT id, username FROM users WHERE username = 'Alice'"
+    rows = [{"id": 1, "username": "Alice"}]
+    return [
+        # ASGI 入口 (astream) 走查询节点的异步版本
+        patch(f"{svc}.classify_main_intent", return_value=intent),
+        patch(f"{svc}.aclassify_main_intent", return_value=intent),
+        patch(f"{svc}.generate_select_sql", return_value=sql),
+        patch(f"{svc}.agenerate_select_sql", return_value=sql),
+        patch(f"{svc}._llm", return_value=fake_llm),
+        patch(f"{svc}.settings.QUERY_RESULT_RENDERER", renderer),
+        patch(f"{svc}.settings.QUERY_RESULT_SUMMARY", renderer == "template"),
+        patch("langgraph_crud_app.services.api_client.execute_query", return_value=rows),
+        patch("langgraph_crud_app.services.api_client.aexecute_query", return_value=rows),
+        patch.object(flask_module, "get_session_manager", return_value=MagicMock()),
+    ]
+
+
+def _parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def _assert_stream(events):
+    names = [name for name, _ in events]
+    assert names[0] == "start" and names[-1] == "done"
+    # 节点进度按执行顺序推送，token 在回答节点完成之前到达
+    nodes = [data["node"] for name, data in events if name == "node"]
+    assert nodes.index("classify_main_intent_node") < nodes.index("execute_sql_query") < nodes.index("format_query_result")
+    tokens = [data for name, data in events if name == "token"]
+    assert {t["node"] for t in tokens} == {"format_query_result"}
+    assert "".join(t["text"] for t in tokens) == "找到 1 位 用户: Alice"
+    assert names.index("token") < names.index("answer") < names.index("done")
+    done = events[-1][1]
+    assert done["success"] is True and done["session_id"] == SESSION_ID
+    assert done["message"] == "找到 1 位 用户: Alice"
+    assert [data for name, data in events if name == "answer"] == [{"node": "format_query_result", "text": done["message"]}]
+
+
+def test_flask_chat_stream_emits_progress_tokens_and_final_state(saver):
+    """Flask /chat/stream: start -> node ... -> token ... -> done，done 内容与 /chat 的响应体一致。"""
+    patches = _query_patches() + [patch.object(flask_module, "get_langgraph_checkpointer", return_value=saver)]
+    for p in patches:
+        p.start()
+    try:
+        client = flask_module.app.test_client()
+        response = client.post("/chat/stream", json={"message": "查找用户名为Alice的记录", "session_id": SESSION_ID})
+        assert response.status_code == 200
+        assert response.mimetype == "text/event-stream"
+        _assert_stream(_parse_sse(response.get_data(as_text=True)))
+
+        assert client.post("/chat/stream", json={"session_id": SESSION_ID}).status_code == 400
+    finally:
+        for p in patches:
+            p.stop()
+
+
+def test_asgi_chat_stream_matches_flask_events(saver):
+    """ASGI 的 achat_stream 走 astream，事件序列与 Flask 版本相同。"""
+    async def _collect():
+        return [event async for event in asgi.achat_stream(
+            {"message": "查找用户名为Alice的记录", "session_id": SESSION_ID}, "trace-stream")]
+
+    async def _graph():
+        return build_graph().compile(checkpointer=saver), saver
+
+    patches = _query_patches() + [patch.object(asgi, "_get_graph", _graph)]
+    for p in patches:
+        p.start()
+    try:
+        events = _parse_sse("".join(asyncio.run(_collect())))
+    finally:
+        for p in patches:
+            p.stop()
+    assert events[0][1]["trace_id"] == "trace-stream"
+    _assert_stream(events)
+
+
+def test_chat_stream_template_renderer_sends_answer_event(saver):
+    """默认的模板渲染: 没有回答 token (总结的 token 不推送)，完整回答 (总结 + 渲染的记录) 通过 answer 事件到达。"""
+    patches = _query_patches("template") + [patch.object(flask_module, "get_langgraph_checkpointer", return_value=saver)]
+    for p in patches:
+        p.start()
+    try:
+        response = flask_module.app.test_client().post(
+            "/chat/stream", json={"message": "查找用户名为Alice的记录", "session_id": SESSION_ID})
+        events = _parse_sse(response.get_data(as_text=True))
+    finally:
+        for p in patches:
+            p.stop()
+    names = [name for name, _ in events]
+    assert "token" not in names
+    done = events[-1][1]
+    assert done["success"] is True
+    assert done["message"].startswith("共找到 1 条 用户记录。\n\n") and "Alice" in done["message"]
+    assert [data for name, data in events if name == "answer"] == [{"node": "format_query_result", "text": done["message"]}]
+    assert names.index("answer") < names.index("done")
@@ -14,6 +14,7 @@ if project_root not in sys.path:
 from langgraph_crud_app.graph.state import GraphState
 from langgraph_crud_app.graph.graph_builder import build_graph
 from langgraph.checkpoint.sqlite import SqliteSaver 
+from langgraph.checkpoint.memory import InMemorySaver
 
 # --- 模拟的 API 和 LLM 返回数据 ---
 MOCK_RAW_SCHEMA = {
@@ -461,6 +462,49 @@ def test_initialization_flow_state_reset_after_success(compiled_graph, memory_sa
         mock_get_schema_step2.assert_not_called()
         mock_extract_tables_step2.assert_not_called()
 
+def _run_first_initialization(graph, format_schema_side_effect=None):
+    """首轮初始化 (主意图为 reset，初始化后直接结束)，返回最终状态和各 mock。"""
+    with patch('langgraph_crud_app.services.api_client.get_schema', return_value=MOCK_API_GET_SCHEMA_RESPONSE), \
+         patch('langgraph_crud_app.services.api_client.execute_query',
+               side_effect=lambda sql, *a, **k: json.dumps(MOCK_USERS_SAMPLE_DATA if "`users`" in sql else MOCK_POSTS_SAMPLE_DATA)), \
+         patch('langgraph_crud_app.services.llm.llm_preprocessing_service.extract_table_names',
+               return_value=MOCK_LLM_EXTRACTED_TABLE_NAMES_STR), \
+         patch('langgraph_crud_app.services.llm.llm_preprocessing_service.format_schema',
+               return_value=MOCK_LLM_FORMATTED_SCHEMA_STR, side_effect=format_schema_side_effect), \
+         patch('langgraph_crud_app.services.llm.llm_query_service.classify_main_intent',
+               return_value={"intent": "reset", "confidence": 0.99}) as mock_classify_main_intent:
+        final_state = graph.invoke({"user_query": "重置"}, {"configurable": {"thread_id": "test-init-parallel"}})
+    return final_state, mock_classify_main_intent
+
+
+@pytest.mark.parametrize("parallel", [True, False])
+def test_initialization_parallel_and_sequential_graphs_give_same_state(parallel):
+    """
+    测试场景 1.6: 初始化的两条分支 (格式化 Schema ∥ 提取表名 -> 数据示例) 并行或顺序执行，结果一致。
+    """
+    graph = build_graph(parallel=parallel).compile(checkpointer=InMemorySaver())
+    final_state, mock_classify_main_intent = _run_first_initialization(graph)
+
+    assert final_state.get("biaojiegou_save") == MOCK_LLM_FORMATTED_SCHEMA_STR
+    assert final_state.get("table_names") == MOCK_PROCESSED_TABLE_NAMES_LIST
+    assert json.loads(final_state["data_sample"]) == MOCK_FINAL_DATA_SAMPLE_STR_FOR_COMPARISON
+    assert final_state.get("error_message") is None
+    assert final_state.get("user_query") == "重置"
+    mock_classify_main_intent.assert_called_once()
+
+
+def test_initialization_parallel_branch_error_routes_to_handle_init_error():
+    """
+    测试场景 1.7: 并行时格式化 Schema 出错，另一条分支不会把错误覆盖掉，流程进入 handle_init_error。
+    """
+    graph = build_graph(parallel=True).compile(checkpointer=InMemorySaver())
+    final_state, mock_classify_main_intent = _run_first_initialization(
+        graph, format_schema_side_effect=RuntimeError("LLM 超时"))
+
+    assert final_state.get("error_message")
+    assert final_state.get("final_answer", "").startswith("初始化错误")
+    mock_classify_main_intent.assert_not_called()
+
 # === 集成测试经验总结 (针对初始化流程) ===
 # 1. 错误路由至关重要:
 #    - 问题: 初始化序列中的节点 (如 fetch_schema, extract_table_names) 发生错误后，流程未立即中断并导向错误处理 (handle_init_error)，
@@ -592,5 +592,42 @@ def test_query_sql_execution_fails_clarification(compiled_app):
         print("test_query_sql_execution_fails_clarification 已通过.")
 
 
+def test_joint_intent_classification_skips_sub_intent_llm(compiled_app, monkeypatch):
+    """
+    测试: 主意图 LLM 一次返回 {"intent": "query_analysis", "sub_intent": "analysis"} 时，
+    不再调用 classify_query_analysis_intent；同一会话下一回合 LLM 只给出主意图时，子意图不沿用上一回合，重新单独分类。
+    """
+    from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+    from langchain_core.messages import AIMessage
+    from langgraph_crud_app.services.llm import llm_query_service
+
+    monkeypatch.setattr(llm_query_service.settings, "INTENT_RULES_ENABLED", False)
+    fake_llm = GenericFakeChatModel(messages=iter([
+        AIMessage(content='{"intent": "query_analysis", "sub_intent": "analysis"}'),
+        AIMessage(content="query_analysis"),
+    ]))
+    with patch('langgraph_crud_app.services.llm.llm_query_service._llm', return_value=fake_llm), \
+         patch('langgraph_crud_app.services.llm.llm_query_service.classify_query_analysis_intent', return_value="query") as mock_classify_sub, \
+         patch('langgraph_crud_app.services.llm.llm_query_service.generate_analysis_sql', return_value="SELECT COUNT(*) FROM users") as mock_generate_analysis_sql, \
+         patch('langgraph_crud_app.services.llm.llm_query_service.generate_select_sql', return_value="SELECT name FROM users WHERE id = 1") as mock_generate_select_sql, \
+         patch('langgraph_crud_app.services.api_client.execute_query', return_value=[{"COUNT(*)": 5}]), \
+         patch('langgraph_crud_app.services.llm.llm_query_service.analyze_analysis_result', return_value="共 5 位用户。"), \
+         patch('langgraph_crud_app.services.llm.llm_query_service.format_query_result', return_value="Bob"):
+        config = {"configurable": {"thread_id": "test-joint-intent-thread"}}
+        base_state = {"biaojiegou_save": MOCK_SCHEMA_JSON_STRING, "table_names": MOCK_TABLE_NAMES,
+                      "data_sample": json.dumps({"users": [{"id": 1, "name": "Bob"}]})}
+
+        first = compiled_app.invoke({**base_state, "user_query": "用户一共有几位"}, config=config)
+        assert first.get("query_analysis_intent") == "analysis"
+        assert first.get("final_answer") == "共 5 位用户。"
+        mock_classify_sub.assert_not_called()
+        mock_generate_analysis_sql.assert_called_once()
+
+        second = compiled_app.invoke({**base_state, "user_query": "Bob 的邮箱是什么"}, config=config)
+        mock_classify_sub.assert_called_once_with("Bob 的邮箱是什么")
+        assert second.get("query_analysis_intent") == "query"
+        mock_generate_select_sql.assert_called_once()
+
+
 # TODO: 从 TEXT_PLAN.txt 为其他查询/分析场景添加更多测试:
 # ... 其他流程
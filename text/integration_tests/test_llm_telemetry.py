@@ -0,0 +1,184 @@
+"""
+集成测试：LLM 调用遥测
+用 LangChain 自带的假聊天模型代替 ChatOpenAI，验证回调记录的 token / 成本 / 重试，
+以及按节点、会话、流程的聚合和 trace 中的 llm span。
+"""
+
+import asyncio
+import pytest
+import sys
+import os
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+# 将项目根目录添加到 sys.path 以便导入 langgraph_crud_app
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from langgraph_crud_app.observability import llm_telemetry, tracing
+from langgraph_crud_app.observability.metrics import registry
+
+
+def _fake_llm(flow, *replies):
+    """返回带遥测回调的假模型，每条回复携带 usage_metadata。"""
+    messages = [
+        AIMessage(content=text, usage_metadata={
+            "input_tokens": prompt, "output_tokens": completion, "total_tokens": prompt + completion,
+            "input_token_details": {"cache_read": cached},
+        })
+        for text, prompt, completion, cached in replies
+    ]
+    return GenericFakeChatModel(messages=iter(messages), callbacks=llm_telemetry.callbacks(flow))
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    registry.reset()
+    llm_telemetry.reset_sessions()
+    yield
+
+
+def test_estimate_cost_matches_model_prefix():
+    """带版本后缀的模型名按最长前缀匹配价格，缓存 token 按缓存价计费。"""
+    # gpt-4o-mini 不能被 gpt-4o 的价格匹配到
+    assert llm_telemetry.estimate_cost("gpt-4o-mini-2024-07-18", 1_000_000, 0) == pytest.approx(0.15)
+    assert llm_telemetry.estimate_cost("gpt-4o-2024-08-06", 1_000_000, 1_000_000) == pytest.approx(12.5)
+    assert llm_telemetry.estimate_cost("gpt-4.1", 1_000_000, 0, cached_tokens=500_000) == pytest.approx(1.25)
+    assert llm_telemetry.estimate_cost("unknown-model", 1000, 1000) == 0.0
+
+
+def test_calls_aggregated_per_node_session_and_flow():
+    """LangGraph 注入的 langgraph_node / thread_id 被用作节点和会话标签。"""
+    llm = _fake_llm("query", ("a", 100, 10, 0), ("b", 200, 20, 50))
+    config = {"metadata": {"langgraph_node": "generate_select_sql_node", "thread_id": "session-1"}}
+    llm.invoke("hi", config=config)
+    llm.invoke("hi", config=config)
+
+    summary = llm_telemetry.session_summary("session-1")
+    assert summary["total"]["calls"] == 2
+    assert summary["total"]["prompt_tokens"] == 300
+    assert summary["total"]["completion_tokens"] == 30
+    assert summary["total"]["cached_tokens"] == 50
+    assert summary["flows"]["query"]["calls"] == 2
+    assert summary["nodes"]["generate_select_sql_node"]["calls"] == 2
+    # 其他会话不受影响
+    assert llm_telemetry.session_summary("session-2")["total"]["calls"] == 0
+
+    assert registry.get_value("llm_tokens_total", flow="query", model="unknown", type="prompt") == 300
+    assert registry.get_value("llm_calls_total", flow="query", node="generate_select_sql_node",
+                              model="unknown", status="ok") == 2
+    assert "llm_call_duration_seconds_count" in registry.render()
+
+
+def test_llm_span_recorded_under_current_node():
+    """图外调用时从 tracing 取节点和会话，并在活动 trace 中追加 kind=llm 的 span。"""
+    llm = _fake_llm("modify", ("ok", 10, 5, 0))
+    trace = tracing.start_trace(session_id="session-trace")
+    try:
+        tracing.traced_node("parse_modify_request_action", lambda: llm.invoke("hi"))()
+    finally:
+        tracing.end_trace()
+
+    node_span, llm_span = sorted(trace.spans, key=lambda s: s["id"])
+    assert llm_span["kind"] == "llm"
+    assert llm_span["parent_id"] == node_span["id"]
+    assert llm_span["attrs"]["flow"] == "modify"
+    assert llm_span["attrs"]["prompt_tokens"] == 10
+    summary = llm_telemetry.session_summary("session-trace")
+    assert summary["nodes"]["parse_modify_request_action"]["completion_tokens"] == 5
+
+
+class _RateLimitError(Exception):
+    status_code = 429
+
+
+class FlakyFakeModel(GenericFakeChatModel):
+    """前 failures 次请求抛限流错误 (可重试)，delays 依次是每次请求前的等待秒数 (异步)。"""
+    failures: int = 0
+    delays: list = []
+    attempts: list = []
+    started: list = []
+
+    def _generate(self, *args, **kwargs):
+        self.attempts.append(1)
+        if len(self.attempts) <= self.failures:
+            raise _RateLimitError("429")
+        return super()._generate(*args, **kwargs)
+
+    async def _agenerate(self, *args, **kwargs):
+        n = len(self.started)
+        self.started.append(1)
+        await asyncio.sleep(self.delays[n] if n < len(self.delays) else 0.01)
+        return self._generate(*args, **kwargs)
+
+
+def _flaky_llm(flow, replies, **fields):
+    return FlakyFakeModel(messages=iter([AIMessage(content=r) for r in replies]), attempts=[], started=[],
+                          callbacks=llm_telemetry.callbacks(flow), **fields)
+
+
+@pytest.fixture
+def policy(monkeypatch):
+    from langgraph_crud_app.services.llm import llm_policy
+    monkeypatch.setattr(llm_policy.settings, "LLM_POLICY_ENABLED", True)
+    monkeypatch.setattr(llm_policy.settings, "LLM_CALL_POLICIES_JSON", "")
+    monkeypatch.setattr(llm_policy.settings, "LLM_CALL_POLICIES", {
+        "default": {"deadline": 5, "attempt_timeout": 2, "max_tokens": 0, "retries": 1, "backoff": 0},
+        "query": {"hedge": ["classify"], "hedge_after": 0.05},
+    })
+    llm_policy.clear()
+    yield llm_policy
+    llm_policy.clear()
+
+
+def test_policy_retries_counted_on_the_extra_attempt(policy):
+    """调用策略重试时，额外的那次请求记为 1 次重试，按节点 / 会话 / 流程都能看到 (SDK 重试已关掉)。"""
+    llm = _flaky_llm("delete", ["x"], failures=1)
+    config = {"metadata": {"langgraph_node": "parse_delete_ids", "thread_id": "session-retry"}}
+    assert policy.invoke(llm, "hi", config=config).content == "x"
+
+    summary = llm_telemetry.session_summary("session-retry")
+    assert (summary["total"]["calls"], summary["total"]["errors"], summary["total"]["retries"]) == (2, 1, 1)
+    assert summary["nodes"]["parse_delete_ids"]["retries"] == 1
+    assert registry.get_value("llm_retries_total", flow="delete", model="unknown") == 1
+
+
+def test_policy_retries_and_hedges_counted_per_call_when_concurrent(policy):
+    """同一个事件循环上并发的调用各自计数: 重试 / 对冲只算在发出它们的会话上。"""
+    async def _run():
+        flaky = _flaky_llm("query", ["x"], failures=1)
+        steady = _flaky_llm("query", ["y"])
+        # 首个请求慢于 hedge_after，对冲请求先返回
+        hedged = _flaky_llm("query", ["z", "z"], delays=[0.3, 0.0])
+        await asyncio.gather(
+            policy.ainvoke(flaky, "hi", config={"metadata": {"thread_id": "session-flaky"}}),
+            policy.ainvoke(steady, "hi", config={"metadata": {"thread_id": "session-steady"}}),
+            policy.ainvoke(hedged.with_config(metadata={"prompt": "classify"}), "hi",
+                           config={"metadata": {"thread_id": "session-hedged"}}),
+        )
+
+    asyncio.run(_run())
+    assert llm_telemetry.session_summary("session-flaky")["total"]["retries"] == 1
+    assert llm_telemetry.session_summary("session-steady")["total"]["retries"] == 0
+    assert llm_telemetry.session_summary("session-hedged")["total"]["retries"] == 1
+
+
+def test_prompt_prefix_cache_tokens_recorded_per_prompt():
+    """get_chain 组装的链把提示词名带进回调 metadata，按提示词记录输入 token 和前缀缓存命中的 token。"""
+    from langgraph_crud_app.services.llm import llm_factory
+
+    llm = _fake_llm("query", ("SELECT 1", 1200, 10, 0), ("SELECT 2", 1250, 10, 1024))
+    chain = llm_factory.get_chain("test_select_sql", [("system", "规则"), ("human", "{query}")], llm)
+    config = {"metadata": {"thread_id": "session-prompt"}}
+    try:
+        chain.invoke({"query": "查询 Alice"}, config=config)
+        chain.invoke({"query": "查询 Bob"}, config=config)
+    finally:
+        llm_factory.clear()
+
+    assert registry.get_value("llm_prompt_tokens_total", prompt="test_select_sql", type="input") == 2450
+    assert registry.get_value("llm_prompt_tokens_total", prompt="test_select_sql", type="cached") == 1024
+    prompt_stats = llm_telemetry.session_summary("session-prompt")["prompts"]["test_select_sql"]
+    assert (prompt_stats["calls"], prompt_stats["cached_tokens"]) == (2, 1024)
@@ -0,0 +1,52 @@
+import json
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+# 将项目根目录添加到 sys.path 以便导入 langgraph_crud_app
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+from langgraph_crud_app.graph.graph_builder import build_graph
+from langgraph_crud_app.services.llm import llm_cache, sql_cache
+
+MOCK_SCHEMA_JSON_STRING = json.dumps({
+    "tickets": {"fields": {"ticket_id": {"type": "varchar(8)", "key": "PRI", "null": "NO", "default": None},
+                           "status": {"type": "varchar(16)", "key": "", "null": "YES", "default": None}}}
+})
+
+
+@pytest.fixture
+def sql_cache_enabled(monkeypatch, tmp_path):
+    store = llm_cache.LLMCacheStore(str(tmp_path / "sql_cache.db"), ttl_seconds=0)
+    monkeypatch.setattr(sql_cache.settings, "SQL_CACHE_ENABLED", True)
+    monkeypatch.setattr(sql_cache, "_store", store)
+    yield store
+    store.close()
+
+
+def test_similar_question_reuses_sql_without_llm(sql_cache_enabled):
+    """第一次生成的 SQL 执行成功后入库；只差编号的第二个问题直接绑定新编号，不再调用 generate_select_sql。"""
+    app = build_graph().compile(checkpointer=InMemorySaver())
+    with patch('langgraph_crud_app.services.llm.llm_query_service.classify_main_intent', return_value="query_analysis"), \
+         patch('langgraph_crud_app.services.llm.llm_query_service.classify_query_analysis_intent', return_value="query"), \
+         patch('langgraph_crud_app.services.llm.llm_query_service.generate_select_sql') as mock_generate, \
+         patch('langgraph_crud_app.services.api_client.execute_query') as mock_execute, \
+         patch('langgraph_crud_app.services.llm.llm_query_service.format_query_result', return_value="ok"):
+        mock_generate.return_value = "SELECT status FROM tickets WHERE ticket_id = 'TKT-0001'"
+        mock_execute.return_value = [{"status": "open"}]
+
+        for i, question in enumerate(["查询 TKT-0001 的状态", "查询TKT-0002的状态？"]):
+            app.invoke({"user_query": question, "biaojiegou_save": MOCK_SCHEMA_JSON_STRING,
+                        "table_names": ["tickets"],
+                        "data_sample": json.dumps({"tickets": [{"ticket_id": "TKT-0009", "status": "closed"}]})},
+                       config={"configurable": {"thread_id": f"sql-cache-{i}"}})
+
+        mock_generate.assert_called_once()
+        assert mock_execute.call_args_list[-1].args[0] == "SELECT status FROM tickets WHERE ticket_id = 'TKT-0002';"
+        assert sql_cache_enabled.summary()["query"]["stored_hits"] == 1
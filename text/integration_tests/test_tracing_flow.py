@@ -0,0 +1,111 @@
+"""
+集成测试：节点 span 计时与 trace 传播
+验证 build_graph() 中注册的节点都会在活动 trace 中记录 span，
+以及 api_client 会把 trace id 作为 HTTP 头发出并记录 HTTP span。
+"""
+
+import json
+import pytest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+
+# 将项目根目录添加到 sys.path 以便导入 langgraph_crud_app
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from langgraph_crud_app.graph.graph_builder import build_graph
+from langgraph_crud_app.observability import tracing
+from langgraph_crud_app.services import api_client
+
+MOCK_SCHEMA_JSON_STRING = json.dumps({
+    "users": {
+        "fields": {
+            "id": {"type": "int(11)", "null": "NO", "key": "PRI", "default": None},
+            "username": {"type": "varchar(255)", "null": "NO", "key": "UNI", "default": None}
+        },
+        "foreign_keys": {}
+    }
+})
+
+
+@pytest.fixture(scope="function")
+def compiled_app():
+    return build_graph().compile()
+
+
+def test_reset_turn_records_node_spans(compiled_app):
+    """一次重置回合应记录入口路由、意图分类和重置节点的 span，且按开始时间排序。"""
+    initial_state = {
+        "user_query": "重置",
+        "biaojiegou_save": MOCK_SCHEMA_JSON_STRING,
+        "table_names": ["users"],
+        "data_sample": json.dumps({"users": [{"id": 1, "username": "a"}]}),
+    }
+    config = {"configurable": {"thread_id": "test-tracing-reset"}}
+
+    with patch('langgraph_crud_app.services.llm.llm_query_service.classify_main_intent') as mock_classify:
+        mock_classify.return_value = "reset"
+        trace = tracing.start_trace(session_id="test-tracing-reset")
+        try:
+            compiled_app.invoke(initial_state, config)
+        finally:
+            tracing.end_trace()
+
+    names = [s["name"] for s in trace.to_dict()["spans"]]
+    assert names[:3] == ["route_initialization_node", "classify_main_intent_node", "handle_reset"]
+    assert all(s["kind"] == "node" and s["status"] == "ok" for s in trace.spans)
+    assert trace.duration_ms is not None
+    waterfall = trace.waterfall()
+    assert trace.trace_id in waterfall
+    assert "handle_reset" in waterfall
+
+
+def test_nodes_without_active_trace_are_noop(compiled_app):
+    """没有活动 trace 时节点照常执行，不记录任何东西。"""
+    assert tracing.current_trace() is None
+    with patch('langgraph_crud_app.services.llm.llm_query_service.classify_main_intent') as mock_classify:
+        mock_classify.return_value = "reset"
+        final_state = compiled_app.invoke({
+            "user_query": "重置",
+            "biaojiegou_save": MOCK_SCHEMA_JSON_STRING,
+            "table_names": ["users"],
+            "data_sample": "{}",
+        }, {"configurable": {"thread_id": "test-tracing-noop"}})
+    assert final_state.get("final_answer")
+
+
+def test_api_client_propagates_trace_header():
+    """api_client 发出的请求带上当前 trace id，并把 Server-Timing 中的数据库耗时记到 HTTP span。"""
+    fake_response = MagicMock()
+    fake_response.status_code = 200
+    fake_response.headers = {"Server-Timing": "db;dur=3.50, app;dur=7.25"}
+    fake_response.json.return_value = [{"id": 1}]
+
+    trace = tracing.start_trace("abc-123")
+    try:
+        with patch('langgraph_crud_app.services.api_client.requests.request', return_value=fake_response) as mock_request:
+            api_client.execute_query("SELECT id FROM users")
+    finally:
+        tracing.end_trace()
+
+    sent_headers = mock_request.call_args.kwargs["headers"]
+    assert sent_headers[tracing.TRACE_HEADER] == "abc-123"
+    http_span = trace.spans[0]
+    assert http_span["name"] == "http POST /execute_query"
+    assert http_span["attrs"]["server_db_ms"] == 3.5
+    assert http_span["attrs"]["status"] == 200
+
+
+def test_export_trace_writes_json_lines(tmp_path):
+    """export_trace 以 JSON Lines 追加写入本地文件。"""
+    path = tmp_path / "traces.jsonl"
+    for _ in range(2):
+        trace = tracing.start_trace()
+        with tracing.span("step"):
+            pass
+        tracing.export_trace(tracing.end_trace(), str(path))
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[0])["spans"][0]["name"] == "step"
@@ -0,0 +1,65 @@
+import json
+import os
+import sys
+from unittest.mock import patch
+
+# 将项目根目录添加到 sys.path 以便导入 langgraph_crud_app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from langgraph_crud_app.services import analysis_digest
+from langgraph_crud_app.services.llm import llm_query_service
+
+
+def test_grouped_counts_shares_and_outliers():
+    """GROUP BY 结果: 分类列作为标签，数值列给出分位数、top-k 占比和 IQR 异常值；Decimal 字符串按数值处理。"""
+    rows = [{"department": f"部门{i}", "tickets": n, "avg_hours": f"{n / 2:.2f}"}
+            for i, n in enumerate([10, 12, 11, 9, 13, 10, 95], start=1)]
+    digest = analysis_digest.build_digest(rows, sample_rows=3, top_k=2)
+
+    assert digest["row_count"] == 7 and digest["label_column"] == "department"
+    tickets = digest["columns"]["tickets"]
+    assert (tickets["sum"], tickets["min"], tickets["max"], tickets["p50"]) == (160, 9, 95, 11)
+    assert tickets["top_shares"][0] == {"label": "部门7", "value": 95, "share": round(95 / 160, 4)}
+    assert tickets["outliers"]["count"] == 1
+    assert tickets["outliers"]["items"] == [{"label": "部门7", "value": 95, "direction": "high"}]
+    assert digest["columns"]["avg_hours"]["kind"] == "numeric"
+    assert digest["columns"]["department"]["distinct"] == 7
+    assert len(digest["sample_rows"]) == 3 and digest["sample_truncated"] is True
+
+
+def test_date_trend_supports_iso_and_flask_http_dates():
+    """日期列 (ISO / Flask jsonify 的 RFC 1123 格式) 上按日期排序做最小二乘。"""
+    rows = [
+        {"day": "Wed, 03 Jan 2024 00:00:00 GMT", "created": 30},
+        {"day": "2024-01-01", "created": 10},
+        {"day": "2024-01-02", "created": 20},
+        {"day": "2024-01-04", "created": None},
+    ]
+    digest = analysis_digest.build_digest(rows)
+    assert digest["columns"]["day"]["kind"] == "date"
+    assert digest["columns"]["created"]["nulls"] == 1
+    (trend,) = digest["trends"]
+    assert (trend["date_column"], trend["value_column"], trend["points"]) == ("day", "created", 3)
+    assert (trend["slope_per_day"], trend["change_pct"]) == (10.0, 2.0)
+    assert (trend["from"], trend["to"]) == ("2024-01-01", "2024-01-03")
+
+
+def test_analyze_analysis_result_sends_digest_instead_of_rows():
+    """LLM 收到的是摘要: 大结果只带前几行样本，不再包含全部原始行。"""
+    rows = [{"user": f"u{i}", "prompts": i % 7} for i in range(2000)]
+    captured = {}
+
+    def _fake_invoke(chain, inputs, **kwargs):
+        captured.update(inputs)
+        return "报告"
+
+    with patch.object(llm_query_service.settings, "ANALYSIS_DIGEST_ENABLED", True), \
+         patch.object(llm_query_service.settings, "ANALYSIS_DIGEST_SAMPLE_ROWS", 20), \
+         patch.object(llm_query_service, "_llm"), \
+         patch.object(llm_query_service.llm_policy, "invoke", _fake_invoke):
+        assert llm_query_service.analyze_analysis_result("每个用户的提示数", json.dumps(rows), "{}", ["prompts"]) == "报告"
+
+    digest = json.loads(captured["sql_result"])
+    assert digest["row_count"] == 2000 and len(digest["sample_rows"]) == 20
+    assert captured["result_format"].startswith("本地统计摘要")
+    assert len(captured["sql_result"]) < len(json.dumps(rows)) / 10
@@ -0,0 +1,80 @@
+import json
+import os
+import sys
+
+import pytest
+
+# 将项目根目录添加到 sys.path 以便导入 langgraph_crud_app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from langgraph_crud_app.persistence import artifact_store
+from langgraph_crud_app.persistence.artifact_store import ArtifactStore, REF_PREFIX
+from langgraph_crud_app.nodes.routers.initialization_router import _get_initialization_route
+
+BIG_SCHEMA = json.dumps({f"table_{i}": {"fields": {"id": {"type": "int(11)", "key": "PRI"}}} for i in range(50)})
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ArtifactStore(str(tmp_path / "artifacts.db"), inline_limit=64, cache_size=8)
+    artifact_store.set_store(store)
+    yield store
+    artifact_store.set_store(None)
+    store.close()
+
+
+def test_put_returns_ref_and_small_values_stay_inline(store):
+    """大内容返回 cas 引用且同内容同引用；小内容、None 和已有引用原样返回。"""
+    ref = store.put(BIG_SCHEMA)
+    assert ref.startswith(REF_PREFIX)
+    assert len(ref) < 100
+    assert store.put(BIG_SCHEMA) == ref
+    assert store.put(ref) == ref
+    assert store.put("{}") == "{}"
+    assert store.put(None) is None
+    assert store.resolve(ref) == BIG_SCHEMA
+    assert store.resolve("{}") == "{}"
+
+
+def test_resolve_survives_restart_and_missing_content(store, tmp_path):
+    """引用在新进程 (新的 store 实例) 中仍可还原；找不到的引用返回 None。"""
+    ref = store.put(BIG_SCHEMA)
+    reopened = ArtifactStore(store.db_path, inline_limit=64)
+    try:
+        assert reopened.resolve(ref) == BIG_SCHEMA
+    finally:
+        reopened.close()
+    assert store.resolve(REF_PREFIX + "0" * 64) is None
+
+
+def test_load_json_parses_once(store, monkeypatch):
+    """同一份内容只解析一次，引用与原文共享缓存结果；非法 JSON 抛出 JSONDecodeError。"""
+    ref = store.put(BIG_SCHEMA)
+    calls = []
+    real_loads = json.loads
+    monkeypatch.setattr(artifact_store.json, "loads", lambda s: calls.append(1) or real_loads(s))
+
+    first = store.load_json(ref)
+    assert store.load_json(ref) is first
+    assert len(calls) == 1
+    assert first["table_0"]["fields"]["id"]["key"] == "PRI"
+    with pytest.raises(json.JSONDecodeError):
+        store.load_json("not json")
+
+
+def test_purge_removes_idle_artifacts(store):
+    """长时间未使用的内容被清理，之后引用按缺失处理。"""
+    ref = store.put(BIG_SCHEMA)
+    store.conn.execute("UPDATE artifacts SET last_used = 0")
+    store.conn.commit()
+    assert store.purge(3600) == 1
+    assert store.resolve(ref) is None
+
+
+def test_initialization_route_treats_missing_artifact_as_uninitialized(store):
+    """状态里的引用能还原时直接进入主流程，内容丢失时重新初始化。"""
+    state = {"biaojiegou_save": store.put(BIG_SCHEMA), "table_names": ["table_0"],
+             "data_sample": store.put(json.dumps({"table_0": [{"id": i} for i in range(20)]}))}
+    assert _get_initialization_route(state) == "continue_to_main_flow"
+    state["biaojiegou_save"] = REF_PREFIX + "f" * 64
+    assert _get_initialization_route(state) == "start_initialization"
@@ -0,0 +1,129 @@
+import sqlite3
+import time
+import operator
+from typing import Annotated, List, TypedDict
+
+import pytest
+import os
+import sys
+
+from langgraph.checkpoint.base.id import uuid6
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.graph import StateGraph, START, END
+
+# 将项目根目录添加到 sys.path 以便导入 langgraph_crud_app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from langgraph_crud_app.persistence import checkpoint_retention as retention
+
+
+class _State(TypedDict):
+    items: Annotated[List[str], operator.add]
+
+
+def _build_app(saver):
+    """两个节点的小图，每次 invoke 产生 4 个 checkpoint (input / loop / step1 / step2)。"""
+    builder = StateGraph(_State)
+    builder.add_node("step1", lambda s: {"items": ["a" * 200]})
+    builder.add_node("step2", lambda s: {"items": ["b" * 200]})
+    builder.add_edge(START, "step1")
+    builder.add_edge("step1", "step2")
+    builder.add_edge("step2", END)
+    return builder.compile(checkpointer=saver)
+
+
+@pytest.fixture
+def saver(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    saver = SqliteSaver(conn)
+    saver.db_path = db_path
+    yield saver
+    conn.close()
+
+
+def _count(saver, thread_id):
+    with saver.cursor(transaction=False) as cur:
+        return cur.execute("SELECT COUNT(*) FROM checkpoints WHERE thread_id = ?", (thread_id,)).fetchone()[0]
+
+
+def test_checkpoint_id_time_roundtrip():
+    """uuid6 的 checkpoint_id 可以还原出创建时间，按时间构造的下界与真实 id 的字符串顺序一致。"""
+    now = time.time()
+    real_id = str(uuid6())
+    assert abs(retention.checkpoint_timestamp(real_id) - now) < 1
+    assert retention.checkpoint_id_for_time(now - 60) < real_id < retention.checkpoint_id_for_time(now + 60)
+    assert retention.checkpoint_timestamp("not-a-uuid") is None
+
+
+def test_prune_keeps_last_n_and_latest_state(saver):
+    """每个会话只保留最近 N 个 checkpoint，最新状态仍可读取，孤立的 writes 被清理。"""
+    app = _build_app(saver)
+    config = {"configurable": {"thread_id": "t1"}}
+    for _ in range(5):
+        app.invoke({"items": []}, config)
+    app.invoke({"items": []}, {"configurable": {"thread_id": "t2"}})
+    before_state = app.get_state(config).values
+
+    result = retention.prune_checkpoints(saver, keep_last=3)
+
+    assert _count(saver, "t1") == 3
+    assert _count(saver, "t2") == 3
+    assert result["checkpoints"] == 20 - 3 + 4 - 3
+    assert app.get_state(config).values == before_state
+    with saver.cursor(transaction=False) as cur:
+        orphans = cur.execute("""
+            SELECT COUNT(*) FROM writes w WHERE NOT EXISTS (
+                SELECT 1 FROM checkpoints c WHERE c.thread_id = w.thread_id
+                AND c.checkpoint_ns = w.checkpoint_ns AND c.checkpoint_id = w.checkpoint_id)
+        """).fetchone()[0]
+    assert orphans == 0
+    # 会话还能继续对话
+    app.invoke({"items": []}, config)
+    assert len(app.get_state(config).values["items"]) == len(before_state["items"]) + 2
+
+
+def test_expire_idle_threads_by_ttl(saver):
+    """最近 checkpoint 早于 TTL 的会话整个删除，活跃会话保留。"""
+    app = _build_app(saver)
+    app.invoke({"items": []}, {"configurable": {"thread_id": "idle"}})
+    time.sleep(0.05)
+    cutoff_now = time.time()
+    app.invoke({"items": []}, {"configurable": {"thread_id": "active"}})
+
+    # 以 cutoff_now + 1s 作为当前时间、TTL 1s: idle 早于下界，active 晚于下界
+    assert retention.expire_idle_threads(saver, ttl_seconds=1.0, now=cutoff_now + 1.0) == 1
+    assert _count(saver, "idle") == 0
+    assert _count(saver, "active") == 4
+    assert retention.expire_idle_threads(saver, ttl_seconds=0) == 0
+
+
+def test_compact_reports_sizes_and_truncates_wal(saver):
+    """compact 返回前后大小报告，VACUUM 后 WAL 被截断、空闲页被回收。"""
+    app = _build_app(saver)
+    for i in range(20):
+        app.invoke({"items": []}, {"configurable": {"thread_id": f"s{i}"}})
+
+    report = retention.compact(saver, saver.db_path, keep_last=1, ttl_seconds=0, run_vacuum=True)
+
+    assert report["before"]["checkpoints"] == 80
+    assert report["after"]["checkpoints"] == 20
+    assert report["after"]["threads"] == 20
+    assert report["before"]["wal_bytes"] > 0
+    assert report["after"]["wal_bytes"] == 0
+    assert report["after"]["freelist_pages"] == 0
+    assert report["after"]["page_count"] < report["before"]["page_count"]
+
+
+def test_compactor_run_once_records_report(saver):
+    """CheckpointCompactor.run_once 执行一次维护并保存最近的报告；interval=0 时不启动线程。"""
+    app = _build_app(saver)
+    app.invoke({"items": []}, {"configurable": {"thread_id": "c1"}})
+    compactor = retention.CheckpointCompactor(saver, saver.db_path, interval=0, keep_last=2,
+                                              ttl_seconds=0, vacuum_interval=0)
+    compactor.start()
+    assert compactor._thread is None
+    report = compactor.run_once()
+    assert report is compactor.last_report
+    assert report["pruned_checkpoints"] == 2
+    assert report["vacuumed"] is False
@@ -0,0 +1,109 @@
+import operator
+import os
+import sys
+import threading
+from typing import Annotated, List, TypedDict
+
+import pytest
+
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import StateGraph, START, END
+
+# 将项目根目录添加到 sys.path 以便导入 langgraph_crud_app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from langgraph_crud_app.persistence import checkpoint_retention
+from langgraph_crud_app.persistence.checkpointer import (
+    PooledSqliteSaver, create_checkpointer, register_backend,
+)
+
+
+class _State(TypedDict):
+    items: Annotated[List[int], operator.add]
+
+
+def _build_app(saver):
+    builder = StateGraph(_State)
+    builder.add_node("step1", lambda s: {"items": [1]})
+    builder.add_node("step2", lambda s: {"items": [2]})
+    builder.add_edge(START, "step1")
+    builder.add_edge("step1", "step2")
+    builder.add_edge("step2", END)
+    return builder.compile(checkpointer=saver)
+
+
+@pytest.fixture
+def saver(tmp_path):
+    saver = PooledSqliteSaver(str(tmp_path / "sessions.db"), pool_size=4)
+    yield saver
+    saver.close()
+
+
+def test_parallel_sessions_keep_their_own_state(saver):
+    """多个线程并发跑不同会话，各自的状态互不干扰，且没有 database is locked 之类的错误。"""
+    app = _build_app(saver)
+    errors = []
+
+    def run(idx):
+        config = {"configurable": {"thread_id": f"s{idx}"}}
+        try:
+            for _ in range(5):
+                app.invoke({"items": []}, config)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    for i in range(8):
+        assert app.get_state({"configurable": {"thread_id": f"s{i}"}}).values["items"] == [1, 2] * 5
+    # 借出的连接都已归还，空闲连接不超过池大小
+    assert saver._idle.qsize() <= saver.pool_size
+
+
+def test_reads_do_not_wait_for_writers(saver):
+    """只读操作不拿进程内写锁：写锁被占用时，其他线程仍能读取会话状态。"""
+    app = _build_app(saver)
+    config = {"configurable": {"thread_id": "reader"}}
+    app.invoke({"items": []}, config)
+
+    result = {}
+    with saver._write_lock:
+        reader = threading.Thread(target=lambda: result.setdefault("tuple", saver.get_tuple(config)))
+        reader.start()
+        reader.join(timeout=5)
+        assert not reader.is_alive(), "读取被写锁阻塞"
+    assert result["tuple"].checkpoint["channel_values"]["items"] == [1, 2]
+
+
+def test_pragmas_applied(saver):
+    """连接启用 WAL、配置的 synchronous 级别和 busy_timeout。"""
+    with saver.cursor(transaction=False) as cur:
+        assert cur.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert cur.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert cur.execute("PRAGMA busy_timeout").fetchone()[0] == saver.busy_timeout_ms
+
+
+def test_compaction_works_with_pooled_saver(saver):
+    """保留策略 / VACUUM 同样适用于连接池后端。"""
+    app = _build_app(saver)
+    for _ in range(3):
+        app.invoke({"items": []}, {"configurable": {"thread_id": "c"}})
+    report = checkpoint_retention.compact(saver, saver.db_path, keep_last=2, run_vacuum=True)
+    assert report["after"]["checkpoints"] == 2
+    assert report["after"]["wal_bytes"] == 0
+
+
+def test_backend_registry(tmp_path):
+    """按名字创建后端；未知后端报错；可以注册自定义后端。"""
+    assert isinstance(create_checkpointer("sqlite", str(tmp_path / "a.db")), PooledSqliteSaver)
+    with pytest.raises(ValueError):
+        create_checkpointer("no-such-backend", "x")
+    assert isinstance(create_checkpointer("memory", ""), InMemorySaver)
+    custom = InMemorySaver()
+    register_backend("test_custom", lambda url: custom)
+    assert create_checkpointer("test_custom", "") is custom
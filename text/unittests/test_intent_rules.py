@@ -0,0 +1,94 @@
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+# 将项目根目录添加到 sys.path 以便导入 langgraph_crud_app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from langgraph_crud_app.services import intent_rules
+from langgraph_crud_app.services.llm import llm_query_service
+
+
+@pytest.mark.parametrize("query, intent", [
+    ("保存", "confirm_other"),
+    ("好的。", "confirm_other"),
+    ("重置所有数据", "reset"),
+    ("查询 TKT-2307-0001 状态", "query_analysis"),
+    ("数据表中一共多少工单？", "query_analysis"),
+    ("修改 TKT-2307-0001 状态为已解决", "modify"),
+    ("请新增一条工单", "add"),
+    ("删除所有状态为过期且创建时间早于去年的任务", "delete"),
+])
+def test_confident_rules(query, intent):
+    match = intent_rules.match_main_intent(query)
+    assert match.intent == intent
+    assert intent_rules.is_confident(match)
+
+
+@pytest.mark.parametrize("query", [
+    "取消",                               # 否定确认还是删除，交给 LLM
+    "找出所有过期的任务并删除它们",          # 查询动词 + 写操作
+    "统计新增工单数",                      # 统计词 + 写操作
+    "修改用户A的邮箱并为用户B新增一条地址记录",  # 复合操作只作参考
+    "你好",
+])
+def test_ambiguous_inputs_fall_through(query):
+    assert not intent_rules.is_confident(intent_rules.match_main_intent(query))
+
+
+def _fake_llm(intent):
+    def _classify(query):
+        return intent, None
+    return _classify
+
+
+def test_classify_main_intent_short_circuits_and_records_agreement(caplog):
+    """有把握的输入不调用 LLM；没把握的调用 LLM，并记录规则与 LLM 的一致情况。"""
+    with patch.object(llm_query_service, "_classify_main_intent_llm", side_effect=_fake_llm("composite")) as llm:
+        assert llm_query_service.classify_main_intent("删除 TKT-2307-0001")["intent"] == "delete"
+        llm.assert_not_called()
+
+        with caplog.at_level("INFO", logger=intent_rules.__name__):
+            assert llm_query_service.classify_main_intent("把 Alice 的邮箱更新为 a@b.com")["intent"] == "composite"
+        llm.assert_called_once()
+        assert "规则预分类与 LLM 不一致" in caplog.text
+
+
+def test_main_intent_llm_is_booked_to_intent_flow():
+    """主意图分类每回合都会调用，用量统计 / 调用策略记在 intent 流程下，而不是 query。"""
+    flows = []
+
+    def _get_chat_model(flow, temperature=0.0):
+        flows.append(flow)
+        return object()
+
+    with patch.object(llm_query_service.llm_factory, "get_chat_model", side_effect=_get_chat_model), \
+         patch.object(llm_query_service.llm_factory, "get_chain"), \
+         patch.object(llm_query_service.llm_policy, "invoke", return_value='{"intent": "reset"}'):
+        assert llm_query_service._classify_main_intent_llm("清空一下") == ("reset", None)
+        llm_query_service.classify_query_analysis_intent("统计每个用户的提示数")
+    assert flows == ["intent", "query"]
+
+
+@pytest.mark.parametrize("query, answer", [
+    ("是", "yes"), ("好的👍", "yes"), ("ＯＫ！", "yes"), ("是的，确定", "yes"), ("确定删除", "yes"), ("可以的", "yes"),
+    ("否", "no"), ("取消", "no"), ("算了吧", "no"), ("不了，谢谢", "no"), ("❌", "no"),
+    ("保存", "unknown"),
+])
+def test_yes_no_lexicon(query, answer):
+    assert intent_rules.match_yes_no(query).intent == answer
+
+
+@pytest.mark.parametrize("query", ["不确定", "是，不", "好的，不过把邮箱改一下", "等一下"])
+def test_yes_no_ambiguous_falls_back_to_llm(query):
+    assert intent_rules.match_yes_no(query) is None
+
+
+def test_classify_yes_no_skips_llm_for_clear_answers():
+    from langgraph_crud_app.services.llm import llm_flow_control_service
+
+    with patch.object(llm_flow_control_service.llm_factory, "get_chat_model") as get_model:
+        assert llm_flow_control_service.classify_yes_no("好的！") == "yes"
+        get_model.assert_not_called()
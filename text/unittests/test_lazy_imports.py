@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+
+def _loaded_after_import(module):
+    """在全新的子进程里 import 模块，返回之后 sys.modules 中的模块名。"""
+    code = f"import sys, {module}; print('\\n'.join(sys.modules))"
+    env = dict(os.environ, OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY") or "sk-test")
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
+    return set(proc.stdout.split())
+
+
+@pytest.mark.parametrize("module", ["app", "asgi"])
+def test_api_entry_does_not_load_langgraph_or_llm_clients(module):
+    """只启动 API (数据库接口) 时不加载 langgraph / langchain / openai，这些在第一个 /chat 时才导入。"""
+    loaded = _loaded_after_import(module)
+    assert not {"langgraph", "langchain_core", "langchain_openai", "openai"} & loaded
+
+
+def test_graph_builder_does_not_load_llm_clients():
+    """构建图不加载 openai 客户端；LLM 服务模块只在用到时导入。"""
+    loaded = _loaded_after_import("langgraph_crud_app.graph.graph_builder")
+    assert "langchain_openai" not in loaded and "openai" not in loaded
+    assert "langgraph_crud_app.services.llm.llm_factory" in loaded
+
+    loaded = _loaded_after_import("langgraph_crud_app.services")
+    assert not any(name.startswith("langgraph_crud_app.services.llm") for name in loaded)
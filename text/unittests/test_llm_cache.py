@@ -0,0 +1,80 @@
+import os
+import sys
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+# 将项目根目录添加到 sys.path 以便导入 langgraph_crud_app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from langgraph_crud_app.services.llm import llm_cache
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = llm_cache.LLMCacheStore(str(tmp_path / "llm_cache.db"), max_entries=10, ttl_seconds=60)
+    llm_cache._stats.reset()
+    yield store
+    store.close()
+    llm_cache._stats.reset()
+
+
+def _fake_llm(cache, *answers):
+    return GenericFakeChatModel(messages=iter([AIMessage(content=a) for a in answers]), cache=cache)
+
+
+def test_repeated_prompt_is_served_from_cache(store):
+    """同一 prompt 第二次直接返回缓存结果 (不调用模型)，并记录命中和节省的时间；不同 prompt 不会命中。"""
+    cache = llm_cache.LLMCache(store, "query")
+    llm = _fake_llm(cache, "query_analysis", "delete")
+
+    assert llm.invoke("查一下工单").content == "query_analysis"
+    cached = llm.invoke("查一下工单")
+    assert cached.content == "query_analysis"
+    assert "input_tokens" not in (cached.usage_metadata or {})
+    assert llm.invoke("删除工单 3").content == "delete"
+
+    flow = llm_cache.stats()["flows"]["query"]
+    assert (flow["hits"], flow["misses"], flow["hit_rate"]) == (1, 2, round(1 / 3, 4))
+    assert store.summary()["query"]["entries"] == 2
+
+    # 持久化: 新的缓存实例 (相当于进程重启) 仍然能命中
+    reopened = llm_cache.LLMCache(llm_cache.LLMCacheStore(store.db_path), "query")
+    assert _fake_llm(reopened).invoke("查一下工单").content == "query_analysis"
+
+
+def test_ttl_expiry_and_lru_eviction(store):
+    """过期条目视为未命中并删除；超出上限时淘汰最久未访问的条目。"""
+    store.put("old", "add", "[]", 10.0, now=0.0)
+    assert store.get("old", now=100.0) == "expired"
+    assert store.get("old", now=100.0) is None
+
+    for i in range(10):
+        store.put(f"k{i}", "add", "[]", 1.0, now=100.0 + i)
+    store.get("k0", now=120.0)  # k0 最近访问过，不应被淘汰
+    store.put("k10", "add", "[]", 1.0, now=121.0)
+
+    # 超过 10 条后淘汰到 9 条: 最久未访问的 k1、k2 被删除
+    assert store.summary()["add"]["entries"] == 9
+    assert store.get("k0", now=122.0) is not None
+    assert store.get("k1", now=122.0) is None
+    assert store.get("k10", now=122.0) is not None
+
+
+def test_cache_only_for_enabled_low_temperature_flows(monkeypatch, tmp_path):
+    """未开启、流程未列出或温度超过上限时不挂缓存。"""
+    monkeypatch.setattr(llm_cache, "_store", llm_cache.LLMCacheStore(str(tmp_path / "llm_cache.db")))
+    monkeypatch.setattr(llm_cache, "_caches", {})
+    monkeypatch.setattr(llm_cache.settings, "LLM_CACHE_FLOWS", "query,add")
+    monkeypatch.setattr(llm_cache.settings, "LLM_CACHE_MAX_TEMPERATURE", 0.1)
+
+    monkeypatch.setattr(llm_cache.settings, "LLM_CACHE_ENABLED", False)
+    assert llm_cache.cache_for("query", 0.0) is None
+
+    monkeypatch.setattr(llm_cache.settings, "LLM_CACHE_ENABLED", True)
+    assert llm_cache.cache_for("query", 0.0) is llm_cache.cache_for("query", 0.0)
+    assert llm_cache.cache_for("add", 0.1) is not None
+    assert llm_cache.cache_for("add", 0.2) is None
+    assert llm_cache.cache_for("modify", 0.0) is None
+    llm_cache._store.close()
@@ -0,0 +1,63 @@
+import os
+import sys
+
+import pytest
+
+# 将项目根目录添加到 sys.path 以便导入 langgraph_crud_app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from langgraph_crud_app.observability import llm_telemetry
+from langgraph_crud_app.services.llm import llm_factory
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry(monkeypatch):
+    # ChatOpenAI 创建时就要求有 API Key (不会真的发请求)
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    llm_factory.clear()
+    yield
+    llm_factory.clear()
+
+
+def test_same_config_reuses_client_across_flows():
+    """同一 (model, temperature, params) 只建一个客户端；不同流程共享底层 openai 客户端，只有回调不同。"""
+    add_a = llm_factory.get_chat_model("add", temperature=0.1, model="gpt-4.1")
+    add_b = llm_factory.get_chat_model("add", temperature=0.1, model="gpt-4.1")
+    delete = llm_factory.get_chat_model("delete", temperature=0.1, model="gpt-4.1")
+
+    assert add_a is add_b
+    assert delete is not add_a
+    assert delete.root_client is add_a.root_client
+    assert delete.root_async_client is add_a.root_async_client
+    assert add_a.callbacks == llm_telemetry.callbacks("add")
+    assert delete.callbacks == llm_telemetry.callbacks("delete")
+    assert llm_factory.stats() == {"clients": 1, "flow_bindings": 2}
+
+    # 温度或参数不同则是另一个客户端
+    llm_factory.get_chat_model("add", temperature=0.2, model="gpt-4.1")
+    llm_factory.get_chat_model("add", temperature=0.1, model="gpt-4.1", max_tokens=64)
+    assert llm_factory.stats()["clients"] == 3
+
+
+def test_default_model_comes_from_flow_settings(monkeypatch):
+    """未指定 model 时按 LLM_FLOW_MODELS 取流程的模型，未配置的流程使用 OPENAI_MODEL_NAME。"""
+    monkeypatch.setattr(llm_factory, "_FLOW_MODELS", llm_factory._parse_flow_models("flow_control=gpt-4o-mini, bad"))
+    monkeypatch.setattr(llm_factory.settings, "OPENAI_MODEL_NAME", "gpt-4.1")
+
+    assert llm_factory.get_chat_model("flow_control", temperature=0.7).model_name == "gpt-4o-mini"
+    assert llm_factory.get_chat_model("add", temperature=0.1).model_name == "gpt-4.1"
+
+
+def test_get_chain_builds_prompt_once_per_name():
+    """同名提示词的链只组装一次；模型换了 (比如清缓存后重建) 时复用已解析的模板，只重新接上模型。"""
+    llm = llm_factory.get_chat_model("query", temperature=0.0, model="gpt-4.1")
+    chain = llm_factory.get_chain("test_prompt", [("system", "固定说明"), ("human", "{query}")], llm)
+
+    assert llm_factory.get_chain("test_prompt", "忽略: 同名只解析第一次", llm) is chain
+    assert chain.config["metadata"] == {"prompt": "test_prompt"}
+    messages = chain.bound.first.invoke({"query": "你好"}).to_messages()
+    assert [m.content for m in messages] == ["固定说明", "你好"]
+
+    other = llm_factory.get_chat_model("query", temperature=0.7, model="gpt-4.1")
+    rebuilt = llm_factory.get_chain("test_prompt", [("system", "固定说明"), ("human", "{query}")], other)
+    assert rebuilt is not chain and rebuilt.bound.first is chain.bound.first
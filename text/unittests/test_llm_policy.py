@@ -0,0 +1,137 @@
+import asyncio
+import os
+import sys
+import time
+from typing import Any, List
+
+import pytest
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+# 将项目根目录添加到 sys.path 以便导入 langgraph_crud_app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from langgraph_crud_app.observability.metrics import registry
+from langgraph_crud_app.services.llm import llm_factory, llm_policy
+
+
+class _FlowTag(BaseCallbackHandler):
+    """和 LLM 用量统计的回调一样带 flow 属性，策略据此找到流程。"""
+
+    def __init__(self, flow: str):
+        self.flow = flow
+
+
+class _ScriptedModel(BaseChatModel):
+    """按顺序执行脚本: 数字表示 sleep 秒数后返回 reply，异常实例直接抛出；记录每次调用收到的参数。"""
+
+    script: List[Any]
+    reply: str = "ok"
+    calls: List[dict] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        step = self.script[min(len(self.calls), len(self.script) - 1)]
+        self.calls.append(kwargs)
+        if isinstance(step, Exception):
+            raise step
+        time.sleep(step)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+
+class _RateLimitError(Exception):
+    status_code = 429
+
+
+def _model(flow: str, script: List[Any], reply: str = "ok") -> _ScriptedModel:
+    return _ScriptedModel(script=script, reply=reply, callbacks=[_FlowTag(flow)])
+
+
+def _count(metric: str, **labels) -> float:
+    return registry.get_value(metric, **labels) or 0.0
+
+
+@pytest.fixture(autouse=True)
+def policies(monkeypatch):
+    monkeypatch.setattr(llm_policy.settings, "LLM_POLICY_ENABLED", True)
+    monkeypatch.setattr(llm_policy.settings, "LLM_CALL_POLICIES_JSON", "")
+    monkeypatch.setattr(llm_policy.settings, "LLM_CALL_POLICIES", {
+        "default": {"deadline": 2, "attempt_timeout": 0.3, "max_tokens": 64, "retries": 1, "backoff": 0.01},
+        "t_fallback": {"fallback_model": "fast-model", "fallback_within": 0.1},
+        "t_hedge": {"hedge": ["classify"], "hedge_after": 0.05},
+    })
+    llm_policy.clear()
+    yield
+    llm_policy.clear()
+
+
+def test_retryable_errors_retry_with_bound_request_params():
+    """限流错误退避后重试；每次请求都带上策略的 timeout / max_tokens。非可重试错误原样抛出、不重试。"""
+    model = _model("t_retry", [_RateLimitError("429"), 0])
+    before = _count("llm_policy_calls_total", flow="t_retry", path="retry")
+
+    assert llm_policy.invoke(model, "你好").content == "ok"
+    assert model.calls == [{"timeout": 0.3, "max_tokens": 64}] * 2
+    assert _count("llm_policy_calls_total", flow="t_retry", path="retry") == before + 1
+
+    broken = _model("t_retry", [ValueError("bad request"), 0])
+    with pytest.raises(ValueError):
+        llm_policy.invoke(broken, "你好")
+    assert len(broken.calls) == 1
+
+
+def test_attempt_timeout_falls_back_to_fast_model(monkeypatch):
+    """单次请求超时后改用 fallback_model (同流程同温度)，调用方拿到降级模型的结果。"""
+    fast = _model("t_fallback", [0], reply="fast")
+    requested = []
+    monkeypatch.setattr(llm_factory, "get_chat_model",
+                        lambda flow, temperature=0.0, model=None: requested.append((flow, model)) or fast)
+    slow = _model("t_fallback", [1.0])
+    before = _count("llm_policy_events_total", flow="t_fallback", event="attempt_timeout")
+
+    started = time.monotonic()
+    assert llm_policy.invoke(slow, "你好").content == "fast"
+    assert time.monotonic() - started < 0.9
+    assert requested == [("t_fallback", "fast-model")]
+    assert _count("llm_policy_events_total", flow="t_fallback", event="attempt_timeout") == before + 1
+    assert _count("llm_policy_calls_total", flow="t_fallback", path="fallback") >= 1
+
+
+def test_hedged_request_wins_when_first_is_slow():
+    """允许对冲的提示词: 首个请求超过 hedge_after 仍未返回时再发一个，取先返回的。"""
+    model = _model("t_hedge", [0.25, 0])
+    chain = model.with_config(metadata={"prompt": "classify"})
+    before = _count("llm_policy_calls_total", flow="t_hedge", path="hedge")
+
+    started = time.monotonic()
+    assert llm_policy.invoke(chain, "是").content == "ok"
+    assert time.monotonic() - started < 0.2
+    assert len(model.calls) == 2
+    assert _count("llm_policy_calls_total", flow="t_hedge", path="hedge") == before + 1
+
+    # 没列在 hedge 里的提示词不对冲
+    other = _model("t_hedge", [0.1, 0])
+    assert llm_policy.invoke(other.with_config(metadata={"prompt": "format"}), "是").content == "ok"
+    assert len(other.calls) == 1
+
+
+def test_deadline_exceeded_and_async_path(monkeypatch):
+    """重试用完仍超时时抛 LLMDeadlineExceeded (服务函数的 except 会接住)；异步版本行为一致。"""
+    slow = _model("t_deadline", [1.0])
+    with pytest.raises(llm_policy.LLMDeadlineExceeded):
+        llm_policy.invoke(slow, "你好")
+    assert len(slow.calls) == 2
+
+    flaky = _model("t_deadline", [_RateLimitError("429"), 0])
+    assert asyncio.run(llm_policy.ainvoke(flaky, "你好")).content == "ok"
+
+    # 关闭策略或认不出模型时直接调用
+    monkeypatch.setattr(llm_policy.settings, "LLM_POLICY_ENABLED", False)
+    plain = _model("t_deadline", [0])
+    assert llm_policy.invoke(plain, "你好").content == "ok"
+    assert plain.calls == [{}]
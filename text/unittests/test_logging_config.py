@@ -0,0 +1,93 @@
+import pytest
+import logging
+import os
+
+# 将项目根目录添加到 sys.path 以便导入 langgraph_crud_app
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from langgraph_crud_app.config.logging_config import (
+    DebugSamplingFilter,
+    LazyJson,
+    TruncatingFormatter,
+    _parse_levels,
+    truncate,
+)
+
+
+def _make_record(msg, args=(), level=logging.DEBUG, lineno=1):
+    return logging.LogRecord("test.logger", level, __file__, lineno, msg, args, None)
+
+
+def test_truncate_long_payload():
+    """超长载荷被截断，并注明原始长度。"""
+    text = "x" * 50
+    result = truncate(text, 10)
+    assert result.startswith("x" * 10)
+    assert "共 50 字符" in result
+    assert truncate("short", 10) == "short"  # 未超长时原样返回
+    assert truncate(text, 0) == text  # 0 表示不截断
+
+
+def test_lazy_json_only_serializes_on_str():
+    """LazyJson 在 str() 之前不做序列化。"""
+    class Boom:
+        def __str__(self):
+            raise AssertionError("不应在构造时序列化")
+
+    lazy = LazyJson({"a": 1, "中文": "值"})
+    assert str(lazy) == '{"a": 1, "中文": "值"}'
+    LazyJson(Boom())  # 构造本身不能触发 __str__
+
+
+def test_formatter_truncates_args_lazily():
+    """格式化器按 max_payload 截断每个参数，数字参数保持原样。"""
+    formatter = TruncatingFormatter("%(message)s", max_payload=20)
+    record = _make_record("payload=%s count=%d", ("a" * 30, 42))
+    output = formatter.format(record)
+    assert output.startswith("payload=" + "a" * 20 + "...")
+    assert "a" * 21 not in output
+    assert output.endswith("count=42")
+
+
+def test_formatter_survives_bad_args():
+    """参数与占位符不匹配时不抛异常，保留原始消息。"""
+    formatter = TruncatingFormatter("%(message)s", max_payload=100)
+    record = _make_record("需要两个参数 %s %s", ("只有一个",))
+    assert "需要两个参数" in formatter.format(record)
+
+
+def test_debug_sampling_filter():
+    """DEBUG 记录按调用点采样，INFO 及以上不受影响。"""
+    sampler = DebugSamplingFilter(0.25)  # 每 4 条保留 1 条
+    kept = sum(sampler.filter(_make_record("debug")) for _ in range(8))
+    assert kept == 2
+    assert all(sampler.filter(_make_record("info", level=logging.INFO)) for _ in range(8))
+    assert not DebugSamplingFilter(0).filter(_make_record("debug"))
+
+
+def test_parse_levels():
+    """子系统级别配置解析，忽略无法识别的条目。"""
+    levels = _parse_levels("app=WARNING, langgraph_crud_app.services=debug,bad,x=NOPE")
+    assert levels == {"app": logging.WARNING, "langgraph_crud_app.services": logging.DEBUG}
+
+
+def test_setup_logging_registers_atexit_once(monkeypatch):
+    """重复 setup_logging(force=True) 只注册一次退出时的 shutdown_logging。"""
+    from langgraph_crud_app.config import logging_config
+
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    registered = []
+    monkeypatch.setattr(logging_config.atexit, "register", registered.append)
+    monkeypatch.setattr(logging_config, "_atexit_registered", False)
+    # 不动已经在运行的 listener，测试结束后由 monkeypatch 还原
+    monkeypatch.setattr(logging_config, "_listener", None)
+    try:
+        logging_config.setup_logging(force=True)
+        logging_config.setup_logging(force=True)
+    finally:
+        logging_config.shutdown_logging()
+        root.handlers[:] = saved_handlers
+        root.setLevel(saved_level)
+    assert registered == [logging_config.shutdown_logging]
@@ -0,0 +1,129 @@
+import pytest
+import threading
+import pymysql
+import os
+from unittest.mock import patch
+
+# 将项目根目录添加到 sys.path 以便导入 app
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app import app
+from langgraph_crud_app.observability import metrics
+from langgraph_crud_app.observability.metrics import MetricsRegistry, registry
+
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    registry.reset()  # 每个用例从干净的指标开始
+    with app.test_client() as client:
+        yield client
+
+
+# ======== /metrics 端点测试 (不需要数据库) ========
+
+def test_metrics_endpoint_format(client):
+    """/metrics 返回 Prometheus 文本格式，并包含所有已注册指标的 HELP/TYPE。"""
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    body = response.get_data(as_text=True)
+    for name in ("crud_http_request_duration_seconds", "crud_http_requests_in_flight",
+                 "crud_db_query_duration_seconds", "crud_db_connect_duration_seconds",
+                 "crud_db_errors_total", "crud_db_rows_returned_total", "crud_db_rows_affected_total"):
+        assert f"# TYPE {name}" in body, f"缺少指标 {name}"
+
+
+def test_metrics_records_route_latency_and_status(client):
+    """被拒绝的非 SELECT 查询 (403) 也应计入按路由 / 状态码划分的延迟直方图。"""
+    response = client.post('/execute_query', json={'sql_query': 'UPDATE users SET username = 1'})
+    assert response.status_code == 403
+
+    count = registry.get_value("crud_http_request_duration_seconds",
+                               route="/execute_query", method="POST", status=403)
+    assert count == 1
+    # 请求结束后 in-flight 应回到 0
+    assert registry.get_value("crud_http_requests_in_flight", route="/execute_query") == 0
+
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'crud_http_request_duration_seconds_count{route="/execute_query",method="POST",status="403"} 1' in body
+    assert 'le="+Inf"' in body
+
+
+def test_metrics_counts_connection_errors_by_errno(client):
+    """连接数据库失败时按 MySQL errno 计数，并记录连接获取耗时。"""
+    with patch('app.pymysql.connect', side_effect=pymysql.err.OperationalError(2003, "Can't connect")):
+        response = client.get('/get_schema')
+    assert response.status_code == 500
+    assert registry.get_value("crud_db_errors_total", route="/get_schema", errno="2003") == 1
+    assert registry.get_value("crud_db_connect_duration_seconds") == 1
+
+
+# ======== 注册表本身 ========
+
+def test_registry_aggregates_across_threads():
+    """多线程并发写入各自分片，汇总结果与单线程一致；gauge 在不同线程 inc/dec 后归零。"""
+    local_registry = MetricsRegistry()
+    counter = local_registry.counter("t_total", "测试计数", ["k"])
+    gauge = local_registry.gauge("t_gauge", "测试 gauge", ["k"])
+    histogram = local_registry.histogram("t_seconds", "测试直方图", ["k"], buckets=(0.1, 1.0))
+
+    def worker():
+        for _ in range(500):
+            counter.inc(k="a")
+            gauge.inc(k="a")
+            histogram.observe(0.5, k="a")
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    gauge.dec(2000, k="a")  # 在主线程里减回去
+
+    assert local_registry.get_value("t_total", k="a") == 2000
+    assert local_registry.get_value("t_gauge", k="a") == 0
+    assert local_registry.get_value("t_seconds", k="a") == 2000
+    text = local_registry.render()
+    assert 't_seconds_bucket{k="a",le="0.1"} 0' in text
+    assert 't_seconds_bucket{k="a",le="1"} 2000' in text
+
+
+def test_snapshot_retries_copy_without_double_counting(monkeypatch):
+    """拷贝其他线程的分片失败 (字典扩容) 时只重试拷贝: 计数不重复累加，连续失败也不丢分片。"""
+    local_registry = MetricsRegistry()
+    counter = local_registry.counter("t_total", "测试计数")
+    histogram = local_registry.histogram("t_seconds", "测试直方图", buckets=(1.0,))
+    counter.inc(5)
+    histogram.observe(0.5)
+
+    original_copy = metrics._Shard.copy
+    failures = {"left": 4}
+
+    def flaky_copy(shard):
+        if failures["left"]:
+            failures["left"] -= 1
+            raise RuntimeError("dictionary changed size during iteration")
+        return original_copy(shard)
+
+    monkeypatch.setattr(metrics._Shard, "copy", flaky_copy)
+    assert local_registry.get_value("t_total") == 5
+    assert local_registry.get_value("t_seconds") == 1
+    assert failures["left"] == 0
+
+
+# ======== trace id 传播 ========
+
+def test_trace_id_echoed_with_server_timing(client):
+    """端点回显调用方传入的 X-Trace-Id，并通过 Server-Timing 返回数据库 / 端点耗时。"""
+    response = client.post('/execute_query', json={'sql_query': 'DELETE FROM users'},
+                           headers={'X-Trace-Id': 'trace-abc-1'})
+    assert response.status_code == 403
+    assert response.headers['X-Trace-Id'] == 'trace-abc-1'
+    assert 'db;dur=' in response.headers['Server-Timing']
+
+    # 非法的 trace id (可能被拼进 SQL 注释) 会被替换成新生成的 id
+    response = client.post('/execute_query', json={'sql_query': 'DELETE FROM users'},
+                           headers={'X-Trace-Id': '*/ DROP TABLE users; /*'})
+    assert response.headers['X-Trace-Id'] != '*/ DROP TABLE users; /*'
@@ -0,0 +1,84 @@
+import json
+import os
+import sys
+from unittest.mock import patch
+
+# 将项目根目录添加到 sys.path 以便导入 langgraph_crud_app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from langgraph_crud_app.services import result_renderer
+from langgraph_crud_app.services.llm import llm_query_service
+
+ROWS = [
+    {"id": 1, "username": "Alice", "email": "alice@example.com", "note": None},
+    {"id": 2, "username": "Bob", "email": "bob@example.com", "note": {"vip": True}},
+]
+
+
+def test_render_layout_matches_llm_prompt_format():
+    """多条记录按 "记录 X:" 分段，单条记录直接列字段；None 显示为 (空)，嵌套值按 JSON 输出。"""
+    columns = result_renderer.result_columns(ROWS)
+    assert result_renderer.render_rows(ROWS, columns, max_rows=0, max_value_chars=0) == (
+        "记录 1:\nid: 1\nusername: Alice\nemail: alice@example.com\nnote: (空)\n\n"
+        "记录 2:\nid: 2\nusername: Bob\nemail: bob@example.com\nnote: {\"vip\": true}"
+    )
+    assert result_renderer.render_rows(ROWS[:1], ["id", "username"]) == "id: 1\nusername: Alice"
+
+
+def test_column_selection_row_cap_and_truncation():
+    """问题提到的字段 + 第一列；超过行数上限注明总条数；过长的值截断。"""
+    columns = result_renderer.result_columns(ROWS)
+    assert result_renderer.select_columns("查看 Alice 的 Email", columns) == ["id", "email"]
+    assert result_renderer.select_columns("查看所有用户", columns) == columns
+
+    rows = [{"id": i, "title": "x" * 30} for i in range(1, 301)]
+    text = result_renderer.render_rows(rows, ["id", "title"], max_rows=2, max_value_chars=10)
+    assert text.endswith("(共 300 条记录，仅显示前 2 条)")
+    assert "记录 3:" not in text
+    assert "title: xxxxxxxxxx…" in text
+
+    assert result_renderer.parse_rows('{"id": 1}') == [{"id": 1}]
+    assert result_renderer.parse_rows('[1, 2]') is None
+
+
+def test_column_selection_ignores_filter_fields_and_partial_words():
+    """只出现在过滤条件里的字段不触发列选择；字段名必须是完整的词。"""
+    rows = [{"id": 5, "username": "Alice", "status": "open", "email": "alice@example.com"}]
+    text = result_renderer.render_query_result("查询 id 为 5 的用户", rows)
+    assert text == "id: 5\nusername: Alice\nstatus: open\nemail: alice@example.com"
+
+    text = result_renderer.render_query_result("查询 status 为 open 的用户", rows)
+    assert "username: Alice" in text and "email: alice@example.com" in text
+
+    orders = [{"id": 1, "amount": 20, "state": "paid"}]
+    assert result_renderer.select_columns("查询 paid 订单", result_renderer.result_columns(orders)) == ["id", "amount", "state"]
+
+    # 条件之外明确提到的字段照常选择
+    columns = result_renderer.result_columns(rows)
+    assert result_renderer.select_columns("status = open 的用户的 email", columns) == ["id", "email"]
+    assert result_renderer.select_columns("查看 user name", columns) == ["id", "username"]
+
+
+def test_format_query_result_renders_without_sending_rows_to_llm():
+    """模板模式下不调用 LLM；开启总结时 LLM 只收到列名和行数。"""
+    rows = [{"id": i, "username": f"user{i}"} for i in range(300)]
+    with patch.object(llm_query_service.settings, "QUERY_RESULT_RENDERER", "template"), \
+         patch.object(llm_query_service.settings, "QUERY_RESULT_SUMMARY", False), \
+         patch.object(llm_query_service, "_llm") as mock_llm:
+        text = llm_query_service.format_query_result("列出所有用户", json.dumps(rows))
+    mock_llm.assert_not_called()
+    assert text.startswith("记录 1:\nid: 0\nusername: user0")
+
+    captured = {}
+
+    def _fake_summary(chain, inputs):
+        captured.update(inputs)
+        return "共找到 300 位用户。"
+
+    with patch.object(llm_query_service.settings, "QUERY_RESULT_RENDERER", "template"), \
+         patch.object(llm_query_service.settings, "QUERY_RESULT_SUMMARY", True), \
+         patch.object(llm_query_service, "_llm"), \
+         patch.object(llm_query_service.llm_policy, "invoke", _fake_summary):
+        text = llm_query_service.format_query_result("列出所有用户", json.dumps(rows))
+    assert text.startswith("共找到 300 位用户。\n\n记录 1:")
+    assert captured == {"query": "列出所有用户", "columns": "id, username", "row_count": 300}
@@ -0,0 +1,87 @@
+import json
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+# 将项目根目录添加到 sys.path 以便导入 langgraph_crud_app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from langgraph_crud_app.services import schema_index
+from langgraph_crud_app.services.llm import llm_query_service
+
+
+def _table(*fields, description=None, foreign_keys=None):
+    info = {"fields": {name: {"type": "varchar(64)", "key": "", "null": "YES", "default": None} for name in fields},
+            "foreign_keys": foreign_keys or {}}
+    if description:
+        info["description"] = description
+    return info
+
+
+SCHEMA = {
+    "users": _table("id", "username", "email", description="用户信息表"),
+    "orders": _table("id", "user_id", "amount", "status", description="订单表"),
+    "order_items": _table("id", "order_id", "product_id", "quantity"),
+    "products": _table("id", "name", "price"),
+    "departments": _table("id", "dept_name"),
+    "tickets": _table("id", "ticket_no", "title", "priority"),
+    "audit_logs": _table("id", "action", "created_at"),
+    "invoices": _table("id", "invoice_no", "total",
+                       foreign_keys={"invoices_ibfk_1": {"referenced_table": "orders", "columns": ["order_no"]}}),
+}
+SAMPLE = {
+    "tickets": [{"id": 1, "ticket_no": "TKT-2307-0001", "title": "打印机故障", "priority": "high"}],
+    "users": [{"id": 1, "username": "Alice", "email": "alice@example.com"}],
+}
+SCHEMA_STR, SAMPLE_STR = json.dumps(SCHEMA, ensure_ascii=False), json.dumps(SAMPLE, ensure_ascii=False)
+TABLE_NAMES = list(SCHEMA)
+
+
+@pytest.fixture(autouse=True)
+def retrieval_settings(monkeypatch):
+    monkeypatch.setattr(schema_index.settings, "SCHEMA_RETRIEVAL_ENABLED", True)
+    monkeypatch.setattr(schema_index.settings, "SCHEMA_RETRIEVAL_TOP_K", 1)
+    monkeypatch.setattr(schema_index.settings, "SCHEMA_RETRIEVAL_MIN_TABLES", 6)
+
+
+def test_selects_top_tables_with_foreign_key_neighbours():
+    """最相关的表 + 外键邻居 (显式 foreign_keys 和按 "<表名>_id" 推断的，两个方向)，表名列表和数据示例同步缩减。"""
+    schema, tables, sample = schema_index.narrow("统计每个订单的金额", SCHEMA_STR, TABLE_NAMES, SAMPLE_STR)
+    assert tables == ["users", "orders", "order_items", "invoices"]
+    assert list(json.loads(schema)) == tables
+    assert json.loads(sample) == {"users": SAMPLE["users"]}
+
+
+def test_sample_values_and_chinese_descriptions_are_indexed():
+    """编号前缀 (数据示例里的 TKT-...) 和中文描述都能命中对应的表。"""
+    _, tables, _ = schema_index.narrow("查询 TKT-2308-0042 的状态", SCHEMA_STR, TABLE_NAMES, SAMPLE_STR)
+    assert tables == ["tickets"]
+    _, tables, _ = schema_index.narrow("把Alice的邮箱改成 a@b.com", SCHEMA_STR, TABLE_NAMES, SAMPLE_STR)
+    assert tables[:1] == ["users"] and "tickets" not in tables
+
+
+def test_unchanged_when_small_unmatched_or_disabled(monkeypatch):
+    """表数不多、问题和任何表都不匹配、或关闭时原样返回。"""
+    unchanged = (SCHEMA_STR, TABLE_NAMES, SAMPLE_STR)
+    assert schema_index.narrow("你好呀", SCHEMA_STR, TABLE_NAMES, SAMPLE_STR) == unchanged
+    small = json.dumps({t: SCHEMA[t] for t in TABLE_NAMES[:3]})
+    assert schema_index.narrow("统计订单金额", small, TABLE_NAMES[:3], SAMPLE_STR) == (small, TABLE_NAMES[:3], SAMPLE_STR)
+    monkeypatch.setattr(schema_index.settings, "SCHEMA_RETRIEVAL_ENABLED", False)
+    assert schema_index.narrow("统计订单金额", SCHEMA_STR, TABLE_NAMES, SAMPLE_STR) == unchanged
+
+
+def test_generate_select_sql_prompt_only_contains_relevant_tables():
+    captured = {}
+
+    def _fake_invoke(chain, inputs, **kwargs):
+        captured.update(inputs)
+        return "SELECT * FROM tickets WHERE ticket_no = 'TKT-2308-0042'"
+
+    # 紧凑写法下每张表一行，方便断言只带了哪些表
+    with patch.object(llm_query_service.settings, "PROMPT_SCHEMA_NOTATION", "compact"), \
+         patch.object(llm_query_service, "_llm"), patch.object(llm_query_service.llm_policy, "invoke", _fake_invoke):
+        llm_query_service.generate_select_sql("查询 TKT-2308-0042 的状态", SCHEMA_STR, TABLE_NAMES, SAMPLE_STR)
+    assert captured["table_names_str"] == "tickets"
+    assert captured["schema"].startswith("tickets(") and "users(" not in captured["schema"]
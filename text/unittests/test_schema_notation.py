@@ -0,0 +1,69 @@
+import json
+import os
+import sys
+from unittest.mock import patch
+
+# 将项目根目录添加到 sys.path 以便导入 langgraph_crud_app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from langgraph_crud_app.services import schema_notation
+from langgraph_crud_app.services.llm import llm_modify_service, llm_query_service
+
+SCHEMA = json.dumps({
+    "users": {
+        "fields": {
+            "id": {"type": "int", "key": "PRI", "null": "NO", "default": None, "extra": "auto_increment"},
+            "username": {"type": "varchar(50)", "key": "UNI", "null": "NO", "default": None},
+            "status": {"type": "varchar(20)", "key": "", "null": "YES", "default": "active user", "comment": "账号状态"},
+        },
+        "foreign_keys": {},
+        "description": "用户表。",
+    },
+    "orders": {
+        "fields": {
+            "id": {"type": "int", "key": "PRI", "null": "NO", "default": None},
+            "user_id": {"type": "int", "key": "MUL", "null": "NO", "default": None},
+            "created_at": {"type": "datetime", "key": "", "null": "NO", "default": "CURRENT_TIMESTAMP"},
+        },
+        "constraints": [{"name": "fk_user", "type": "FOREIGN KEY", "columns": ["user_id"], "references": "users(id)"}],
+    },
+}, ensure_ascii=False)
+
+
+def test_compact_notation():
+    """每张表一行: PK / UNIQUE / INDEX / NOT NULL / DEFAULT / REFERENCES，描述写在 -- 注释里。"""
+    assert schema_notation.compact(SCHEMA) == (
+        "users(id int PK AUTO_INCREMENT, username varchar(50) UNIQUE NOT NULL, "
+        "status varchar(20) DEFAULT 'active user' COMMENT 账号状态) -- 用户表。\n"
+        "orders(id int PK, user_id int INDEX NOT NULL REFERENCES users(id), "
+        "created_at datetime NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+    )
+    assert len(schema_notation.compact(SCHEMA)) < len(SCHEMA) / 2
+    assert schema_notation.compact("not json") is None
+
+
+def test_flag_and_fallback():
+    with patch.object(schema_notation.settings, "PROMPT_SCHEMA_NOTATION", "json"):
+        assert schema_notation.for_prompt(SCHEMA) == SCHEMA
+    with patch.object(schema_notation.settings, "PROMPT_SCHEMA_NOTATION", "compact"):
+        assert schema_notation.for_prompt(SCHEMA).startswith("users(")
+        assert schema_notation.for_prompt("{}") == "{}"
+
+
+def test_services_send_compact_schema(monkeypatch):
+    """SQL 生成和修改上下文 SQL 的模板变量都是紧凑写法 (修改流程原来直接拼接消息，会把大括号加倍)。"""
+    # 修改服务会真的创建 ChatOpenAI (不发请求)，创建时要求有 API Key
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    captured = []
+
+    def _fake_invoke(chain, inputs, **kwargs):
+        captured.append(inputs)
+        return "SELECT 1"
+
+    with patch.object(schema_notation.settings, "PROMPT_SCHEMA_NOTATION", "compact"), \
+         patch.object(llm_query_service, "_llm"), \
+         patch.object(llm_query_service.llm_policy, "invoke", _fake_invoke):
+        llm_query_service.generate_select_sql("查询 Alice 的订单", SCHEMA, ["users", "orders"], "{}")
+        llm_modify_service.generate_modify_context_sql("把 Alice 改成 Bob", SCHEMA, ["users", "orders"], "{}")
+    assert captured[0]["schema"] == schema_notation.compact(SCHEMA)
+    assert captured[1]["schema"] == schema_notation.compact(SCHEMA)
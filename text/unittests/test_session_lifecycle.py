@@ -0,0 +1,134 @@
+import os
+import sys
+import time
+from typing import Optional, TypedDict
+
+import pytest
+
+from langgraph.graph import StateGraph, START, END
+
+# 将项目根目录添加到 sys.path 以便导入 langgraph_crud_app / app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+import app as app_module
+from langgraph_crud_app.observability import llm_telemetry
+from langgraph_crud_app.persistence.checkpointer import PooledSqliteSaver
+from langgraph_crud_app.persistence import session_lifecycle
+from langgraph_crud_app.persistence.session_lifecycle import (
+    SessionArchive, SessionManager, register_eviction_hook,
+)
+from langgraph_crud_app.persistence.write_behind import WriteBehindSaver
+
+DAY = 24 * 3600
+
+
+class _State(TypedDict, total=False):
+    user_query: str
+    save_content: Optional[str]
+
+
+def _build_app(saver):
+    builder = StateGraph(_State)
+    builder.add_node("stage", lambda s: {"save_content": "新增路径"})
+    builder.add_edge(START, "stage")
+    builder.add_edge("stage", END)
+    return builder.compile(checkpointer=saver)
+
+
+@pytest.fixture
+def manager(tmp_path):
+    inner = PooledSqliteSaver(str(tmp_path / "sessions.db"))
+    archive = SessionArchive(str(tmp_path / "archive.db"))
+    manager = SessionManager(WriteBehindSaver(inner), archive, ttl_seconds=DAY)
+    yield manager
+    archive.close()
+    inner.close()
+
+
+def _chat(manager, session_id, now=None):
+    manager.touch(session_id, now)
+    config = {"configurable": {"thread_id": session_id}}
+    _build_app(manager.saver).invoke({"user_query": "hi"}, config)
+    manager.saver.flush(config)
+
+
+def test_list_sessions_reports_footprint(manager):
+    """列出存活会话: checkpoint 数、字节数；include_staged 时附带暂存的待确认操作。"""
+    _chat(manager, "s1")
+    sessions = {s["session_id"]: s for s in manager.list_sessions(include_staged=True)}
+    assert sessions["s1"]["checkpoints"] >= 1
+    assert sessions["s1"]["bytes"] > 0
+    assert sessions["s1"]["staged_operation"] == "新增路径"
+    assert sessions["s1"]["idle_seconds"] < 60
+    assert "staged_operation" not in manager.list_sessions()[0]
+
+
+def test_list_sessions_applies_limit_newest_first(manager, monkeypatch):
+    """按最近活跃时间倒序截断；不传 limit 时用 SESSION_LIST_LIMIT。"""
+    now = time.time()
+    for i in range(3):
+        manager.touch(f"s{i}", now + i)
+    assert [s["session_id"] for s in manager.list_sessions(limit=2)] == ["s2", "s1"]
+    monkeypatch.setattr(session_lifecycle.settings, "SESSION_LIST_LIMIT", 1)
+    assert [s["session_id"] for s in manager.list_sessions()] == ["s2"]
+
+
+def test_idle_sessions_are_archived_and_evicted(manager, monkeypatch):
+    """空闲超过 TTL 的会话: 最终状态压缩归档、checkpoint 删除、内存缓存清理；活跃会话保留。"""
+    monkeypatch.setattr(session_lifecycle, "_eviction_hooks", list(session_lifecycle._eviction_hooks))
+    evicted = []
+    register_eviction_hook(evicted.append)
+    _chat(manager, "idle")
+    _chat(manager, "active")
+    llm_telemetry._record_session("idle", "query", "n", {"status": "ok", "retries": 0, "prompt_tokens": 1,
+                                                         "completion_tokens": 1, "cached_tokens": 0,
+                                                         "cost_usd": 0.0, "latency_ms": 1.0})
+    later = time.time() + 2 * DAY
+    manager.touch("active", later)
+
+    assert manager.expire_idle(now=later) == 1
+    remaining = [s["session_id"] for s in manager.list_sessions(now=later)]
+    assert remaining == ["active"]
+    assert "idle" in evicted
+    assert llm_telemetry.session_summary("idle")["total"]["calls"] == 0
+    archived = manager.archive.load("idle", manager.saver.serde)
+    assert archived["save_content"] == "新增路径"
+    assert manager.saver.get_tuple({"configurable": {"thread_id": "idle"}}) is None
+
+
+def test_admin_sessions_endpoint(manager, monkeypatch):
+    """GET /admin/sessions 列出会话，DELETE 立即过期，不存在的会话返回 404。"""
+    monkeypatch.setattr(app_module.settings, "ADMIN_API_ENABLED", True)
+    monkeypatch.setattr(app_module.settings, "ADMIN_API_TOKEN", "")
+    monkeypatch.setattr(app_module, "_checkpointer", manager.saver)
+    monkeypatch.setattr(app_module, "_session_manager", manager)
+    _chat(manager, "web")
+    client = app_module.app.test_client()
+
+    body = client.get("/admin/sessions").get_json()
+    assert body["count"] == 1 and body["sessions"][0]["session_id"] == "web"
+    assert "staged_operation" not in body["sessions"][0]
+    staged = client.get("/admin/sessions?staged=1").get_json()
+    assert staged["sessions"][0]["staged_operation"] == "新增路径"
+
+    assert client.delete("/admin/sessions/web").status_code == 200
+    assert client.get("/admin/sessions").get_json()["count"] == 0
+    assert client.delete("/admin/sessions/web").status_code == 404
+
+
+def test_admin_sessions_gated(manager, monkeypatch):
+    """管理接口默认关闭 (404)；配置了 ADMIN_API_TOKEN 时缺少或错误的 token 返回 401。"""
+    monkeypatch.setattr(app_module, "_checkpointer", manager.saver)
+    monkeypatch.setattr(app_module, "_session_manager", manager)
+    client = app_module.app.test_client()
+
+    monkeypatch.setattr(app_module.settings, "ADMIN_API_ENABLED", False)
+    assert client.get("/admin/sessions").status_code == 404
+    assert client.post("/admin/sessions/expire").status_code == 404
+
+    monkeypatch.setattr(app_module.settings, "ADMIN_API_ENABLED", True)
+    monkeypatch.setattr(app_module.settings, "ADMIN_API_TOKEN", "s3cret")
+    assert client.get("/admin/sessions").status_code == 401
+    assert client.get("/admin/sessions", headers={"X-Admin-Token": "wrong"}).status_code == 401
+    assert client.get("/admin/sessions", headers={"X-Admin-Token": "s3cret"}).status_code == 200
+    assert client.get("/admin/sessions", headers={"Authorization": "Bearer s3cret"}).status_code == 200
@@ -0,0 +1,37 @@
+import os
+import sys
+
+# 将项目根目录添加到 sys.path 以便导入 langgraph_crud_app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from langgraph_crud_app.services.llm import sql_cache
+
+
+def test_normalization_shares_template_across_literals_and_widths():
+    """空白、全角 / 半角、句末标点和具体编号不同的问题归一化为同一模板；编号前缀不同则不同。"""
+    assert sql_cache.normalize_query("查询 TKT-0001 状态") == ("查询{id:tkt}状态", ["TKT-0001"])
+    assert sql_cache.normalize_query("查询ＴＫＴ－０００２  状态？") == ("查询{id:tkt}状态", ["TKT-0002"])
+    assert sql_cache.normalize_query("查询 REP000777 状态")[0] != "查询{id:tkt}状态"
+    assert sql_cache.normalize_query("查找名字为“张三”的前 10 条 Open 记录") == (
+        "查找名字为{str}的前{num}条open记录", ["张三", "10"])
+
+
+def test_sql_template_rebinds_literals():
+    """SQL 中的字面量换成占位符后可绑定新值；被 LLM 改写过的字面量 (补零) 不能模板化。"""
+    template = sql_cache.build_sql_template(
+        "SELECT * FROM tickets WHERE ticket_id = 'TKT-0001' AND title LIKE '%张三%' LIMIT 10;",
+        ["TKT-0001", "张三", "10"])
+    assert sql_cache.bind_sql_template(template, ["TKT-0002", "O'Neil", "5"]) == \
+        "SELECT * FROM tickets WHERE ticket_id = 'TKT-0002' AND title LIKE '%O''Neil%' LIMIT 5;"
+    assert sql_cache.build_sql_template("SELECT * FROM reports WHERE id = 'REP000647'", ["647"]) is None
+
+
+def test_sql_template_rejects_ambiguous_literals():
+    """同一个值匹配到多处常量时分不清哪处来自问题，不能模板化 (否则 LIMIT 1 也会跟着换成新值)。"""
+    assert sql_cache.build_sql_template(
+        "SELECT * FROM tickets WHERE is_open = 1 LIMIT 1", ["1"]) is None
+    assert sql_cache.build_sql_template(
+        "SELECT * FROM users WHERE name = '张三' OR nickname LIKE '%张三%'", ["张三"]) is None
+    assert sql_cache.build_sql_template(
+        "SELECT * FROM tickets WHERE is_open = 1 LIMIT 20", ["1"]) == \
+        "SELECT * FROM tickets WHERE is_open = ⟦n0⟧ LIMIT 20"
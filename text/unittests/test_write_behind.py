@@ -0,0 +1,106 @@
+import os
+import sys
+from typing import Optional, TypedDict
+
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import StateGraph, START, END
+from langgraph.types import interrupt
+
+# 将项目根目录添加到 sys.path 以便导入 langgraph_crud_app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from langgraph_crud_app.persistence.write_behind import WriteBehindSaver
+
+
+class _State(TypedDict, total=False):
+    step: int
+    save_content: Optional[str]
+
+
+class _CountingSaver(InMemorySaver):
+    """记录底层真正执行的 put 次数。"""
+
+    def __init__(self):
+        super().__init__()
+        self.puts = 0
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        self.puts += 1
+        return super().put(config, checkpoint, metadata, new_versions)
+
+
+def _build_app(saver, stage_at=None, interrupt_at=None):
+    builder = StateGraph(_State)
+    for i in range(6):
+        def node(state, i=i):
+            if i == interrupt_at:
+                interrupt("confirm?")
+            update = {"step": state.get("step", 0) + 1}
+            if i == stage_at:
+                update["save_content"] = "新增路径"
+            return update
+        builder.add_node(f"n{i}", node)
+    builder.add_edge(START, "n0")
+    for i in range(5):
+        builder.add_edge(f"n{i}", f"n{i + 1}")
+    builder.add_edge("n5", END)
+    return builder.compile(checkpointer=saver)
+
+
+def test_buffers_intermediate_steps_until_flush():
+    """一回合 6 个节点只在 flush 时写一次；flush 前图内读到的是缓存中的最新状态。"""
+    inner = _CountingSaver()
+    saver = WriteBehindSaver(inner)
+    app = _build_app(saver)
+    config = {"configurable": {"thread_id": "t1"}}
+
+    app.invoke({"step": 0}, config)
+    assert inner.puts == 0
+    assert app.get_state(config).values["step"] == 6
+
+    saver.flush(config)
+    assert inner.puts == 1
+    assert inner.get_tuple(config).checkpoint["channel_values"]["step"] == 6
+
+    # 下一回合接着上一回合的状态继续，父节点指向已落盘的 checkpoint
+    app.invoke({"step": 6}, config)
+    saver.flush(config)
+    assert inner.puts == 2
+    tup = inner.get_tuple(config)
+    assert tup.checkpoint["channel_values"]["step"] == 12
+    assert tup.parent_config is not None
+
+
+def test_sync_saver_writes_every_step():
+    """对照: 不包装时每个图步骤都会写一次。"""
+    inner = _CountingSaver()
+    _build_app(inner).invoke({"step": 0}, {"configurable": {"thread_id": "t"}})
+    assert inner.puts >= 7
+
+
+def test_staged_fields_are_flushed_immediately():
+    """修改 save_content 的步骤立即落盘，不等回合结束。"""
+    inner = _CountingSaver()
+    saver = WriteBehindSaver(inner)
+    config = {"configurable": {"thread_id": "t2"}}
+    _build_app(saver, stage_at=2).invoke({"step": 0}, config)
+    assert inner.puts == 1
+    assert inner.get_tuple(config).checkpoint["channel_values"]["save_content"] == "新增路径"
+
+
+def test_interrupt_flushes_and_resumes():
+    """中断时立即落盘，换一个新的包装器 (模拟进程重启) 后能从中断处恢复。"""
+    from langgraph.types import Command
+
+    inner = _CountingSaver()
+    config = {"configurable": {"thread_id": "t3"}}
+    _build_app(WriteBehindSaver(inner), interrupt_at=3).invoke({"step": 0}, config)
+    assert inner.puts == 1
+    assert inner.get_tuple(config).pending_writes
+
+    restarted = WriteBehindSaver(inner)
+    app = _build_app(restarted, interrupt_at=3)
+    assert app.get_state(config).next == ("n3",)
+    app.invoke(Command(resume="yes"), config)
+    restarted.flush(config)
+    assert inner.get_tuple(config).checkpoint["channel_values"]["step"] == 6